@@ -12,9 +12,13 @@ ln -s $curr_dir/rna_tools/tools/clanstix/rna_clanstix.py $curr_dir/bin/rna_clans
 
 ln -s $curr_dir/rna_tools/rna_dot2ct.py $curr_dir/bin/rna_dot2ct.py
 ln -s $curr_dir/rna_tools/rna_secondary_structure_prediction.py $curr_dir/bin/rna_secondary_structure_prediction.py
+ln -s $curr_dir/rna_tools/rna_mmcif.py $curr_dir/bin/rna_mmcif.py
+ln -s $curr_dir/rna_tools/rna_archive.py $curr_dir/bin/rna_archive.py
 
 ln -s $curr_dir/rna_tools/tools/rna_multimodels/rna_pdb_merge_into_one.py $curr_dir/bin/rna_pdb_merge_into_one.py
 ln -s $curr_dir/rna_tools/tools/rna_calc_inf/rna_calc_inf.py $curr_dir/bin/rna_calc_inf.py
+ln -s $curr_dir/rna_tools/tools/rna_bp/bp_annotate.py $curr_dir/bin/bp_annotate.py
+ln -s $curr_dir/rna_tools/tools/rna_bp/bp_ensemble.py $curr_dir/bin/bp_ensemble.py
 ln -s $curr_dir/rna_tools/tools/rna_convert_pseudoknot_formats/rna_pk_simrna_to_one_line.py $curr_dir/bin/rna_pk_simrna_to_one_line.py
 ln -s $curr_dir/rna_tools/tools/clarna_app/clarna_app.py $curr_dir/bin/clarna_app.py
 ln -s $curr_dir/rna_tools/tools/rna_helix_vis/rna_helix_vis.py $curr_dir/bin/rna_helix_vis.py
@@ -28,6 +32,7 @@ ln -s $curr_dir/rna_tools/tools/rna_rosetta/rna_rosetta_n.py $curr_dir/bin/rna_r
 ln -s $curr_dir/rna_tools/tools/rna_rosetta/rna_rosetta_extract_lowscore_decoys.py $curr_dir/bin/rna_rosetta_extract_lowscore_decoys.py
 ln -s $curr_dir/rna_tools/tools/rna_rosetta/rna_rosetta_check_progress.py $curr_dir/bin/rna_rosetta_check_progress.py
 ln -s $curr_dir/rna_tools/tools/rna_rosetta/rna_rosetta_head.py $curr_dir/bin/rna_rosetta_head.py
+ln -s $curr_dir/rna_tools/tools/rna_rosetta/rna_rosetta_silent.py $curr_dir/bin/rna_rosetta_silent.py
 
 ln -s $curr_dir/rna_tools/tools/simrna_trajectory/rna_simrna_lowest.py $curr_dir/bin/rna_simrna_lowest.py
 ln -s $curr_dir/rna_tools/tools/simrna_trajectory/rna_simrna_extract.py $curr_dir/bin/rna_simrna_extract.py
@@ -79,6 +84,9 @@ ln -s $curr_dir/rna_tools/tools/rna_alignment/random_assignment_of_nucleotides.p
 ln -s $curr_dir/rna_tools/tools/rna_seq_search_BLASTn_outfmt-6/select_seq_fromBLAStn_6outfm.py $curr_dir/bin/select_seq_fromBLAStn_6outfm.py
 
 ln -s $curr_dir/rna_tools/tools/pefx/pefx.py $curr_dir/bin/pefx.py
+ln -s $curr_dir/rna_tools/tools/rna_cluster/rna_cluster.py $curr_dir/bin/rna_cluster.py
+ln -s $curr_dir/rna_tools/tools/rna_cluster/rna_cluster_incremental.py $curr_dir/bin/rna_cluster_incremental.py
+ln -s $curr_dir/rna_tools/tools/rna_mutate/rna_mutate.py $curr_dir/bin/rna_mutate.py
 
 echo 'Installed in ./bin'
 ls -l bin
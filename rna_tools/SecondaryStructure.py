@@ -3,13 +3,20 @@
 """Secondary structure analysis"""
 
 import os
+import string
 import tempfile
 import shutil
 import subprocess
 
+import numpy as np
+
 from rna_tools.rna_tools_config import VARNA_JAR_NAME, VARNA_PATH
 
 
+# brackets of levels of pseudoknots, () is the level 0, [] the level 1 etc.
+BRACKETS = ['()', '[]', '{}', '<>'] + [u + l for u, l in zip(string.ascii_uppercase, string.ascii_lowercase)]
+
+
 class ExceptionOpenPairsProblem(Exception):
     pass
 
@@ -56,6 +63,222 @@ def draw_ss(title, seq, ss, img_out, resolution=4, verbose=False):
         shutil.move(t.name, img_out)
 
 
+class SecondaryStructure(object):
+    """Secondary structure as a partner array, ``pt[i] = j`` (numbered from 0, -1 for unpaired),
+    with a level of pseudoknot for every pair (0 for ``()``, 1 for ``[]``, 2 for ``{}``, 3 for ``<>``,
+    then ``Aa``, ``Bb`` etc.).
+
+    Queries (is paired, partner) take O(1), conversions are linear::
+
+        >>> s = SecondaryStructure('((..[[..))..]]')
+        >>> s.partner(0), s.partner(2), s.is_paired(4)
+        (9, -1, True)
+        >>> s.get_pairs()
+        [[1, 10], [2, 9], [5, 14], [6, 13]]
+        >>> s.get_pairs(level=1, first=0)
+        [[4, 13], [5, 12]]
+        >>> print(s.to_multiline())
+        ((......))....
+        ....((......))
+        >>> SecondaryStructure.from_pairs([[1, 10], [2, 9], [5, 14], [6, 13]], 14).to_dot_bracket()
+        '((..[[..))..]]'
+        >>> s.get_helices()
+        [(0, 9, 2), (4, 13, 2)]
+    """
+    def __init__(self, ss=''):
+        self.pt = np.full(len(ss), -1, dtype=int)
+        self.level = np.full(len(ss), -1, dtype=int)
+        if ss:
+            self._parse(ss)
+
+    def _parse(self, ss):
+        chars = np.array(list(ss))
+        for level, (o, c) in enumerate(BRACKETS):
+            opening = chars == o
+            closing = chars == c
+            if not opening.any() and not closing.any():
+                continue
+            stack = []
+            for i in np.flatnonzero(opening | closing).tolist():
+                if opening[i]:
+                    stack.append(i)
+                elif stack:
+                    j = stack.pop()
+                    self.pt[i], self.pt[j] = j, i
+                else:
+                    raise ExceptionOpenPairsProblem('Too many closing pairs %s in structure' % (c * 2))
+            if stack:
+                raise ExceptionOpenPairsProblem('Too many open pairs %s in structure' % (o * 2 + c * 2))
+            self.level[opening | closing] = level
+
+    def __len__(self):
+        return len(self.pt)
+
+    def __repr__(self):
+        return self.to_dot_bracket()
+
+    def is_paired(self, i):
+        return bool(self.pt[i] > -1)
+
+    def partner(self, i):
+        """Get a partner of i, -1 if i is not paired."""
+        return int(self.pt[i])
+
+    @classmethod
+    def from_pairs(cls, pairs, n, first=1, levels=None):
+        """Get a structure from pairs, e.g. [[1, 10], [2, 9]].
+
+        Args:
+            pairs (list): pairs (i, j)
+            n (int): length of the structure
+            first (int): numbering of pairs, from 1 (as parse_vienna_to_pairs()) or 0
+            levels (list): levels of pairs, if None levels are assigned, pairs that cross
+                pairs of a level go to the next level
+        """
+        s = cls()
+        s.pt = np.full(n, -1, dtype=int)
+        s.level = np.full(n, -1, dtype=int)
+        pairs = np.array(pairs, dtype=int).reshape(-1, 2) - first
+        if (pairs < 0).any() or (pairs >= n).any():
+            raise Exception('Pairs out of the structure (of length %i)' % n)
+        pairs.sort(axis=1)
+        i, j = pairs[:, 0], pairs[:, 1]
+        s.pt[i], s.pt[j] = j, i
+        if levels is None:
+            levels = s._get_levels(pairs)
+        s.level[i] = s.level[j] = levels
+        return s
+
+    @staticmethod
+    def _get_levels(pairs):
+        """Assign levels to pairs, a pair goes to the first level without a crossing pair."""
+        levels = np.zeros(len(pairs), dtype=int)
+        stacks = []  # an open pairs (j) for every level
+        for k in np.argsort(pairs[:, 0], kind='stable').tolist():
+            i, j = pairs[k]
+            for level, stack in enumerate(stacks):
+                while stack and stack[-1] < i:
+                    stack.pop()
+                if not stack or stack[-1] > j:
+                    break
+            else:
+                level = len(stacks)
+                stacks.append([])
+            stacks[level].append(j)
+            levels[k] = level
+        return levels
+
+    def get_pairs(self, level=None, first=1):
+        """Get pairs (i < j), sorted, of all levels or of one level."""
+        i = np.flatnonzero(self.pt > np.arange(len(self.pt)))
+        if level is not None:
+            i = i[self.level[i] == level]
+        return (np.stack([i, self.pt[i]], axis=1) + first).tolist()
+
+    def to_dot_bracket(self):
+        """Get dot-bracket notation (levels as ``()[]{}<>Aa``...)."""
+        out = np.full(len(self.pt), '.', dtype='U1')
+        idx = np.arange(len(self.pt))
+        for level in np.unique(self.level[self.level > -1]).tolist():
+            at = self.level == level
+            out[at & (self.pt > idx)] = BRACKETS[level][0]
+            out[at & (self.pt < idx)] = BRACKETS[level][1]
+        return ''.join(out.tolist())
+
+    @classmethod
+    def from_multiline(cls, lines):
+        """Get a structure from the SimRNA format, one line of ``()`` per level."""
+        lines = [l.rstrip('\n') for l in lines if l.strip() and not l.startswith('>')]
+        pairs, levels = [], []
+        for level, line in enumerate(lines):
+            p = cls(line).get_pairs(0, first=0)
+            pairs += p
+            levels += [level] * len(p)
+        return cls.from_pairs(pairs, max([len(l) for l in lines]), first=0, levels=levels)
+
+    def to_multiline(self):
+        """Get the SimRNA format, one line of ``()`` per level."""
+        idx = np.arange(len(self.pt))
+        lines = []
+        for level in range(self.level.max(initial=-1) + 1):
+            out = np.full(len(self.pt), '.', dtype='U1')
+            at = self.level == level
+            out[at & (self.pt > idx)] = '('
+            out[at & (self.pt < idx)] = ')'
+            lines.append(''.join(out.tolist()))
+        return '\n'.join(lines or ['.' * len(self.pt)])
+
+    def to_ct(self, seq, title='ss'):
+        """Get the ct format (as dot2ct of RNAstructure).
+
+        >>> print(SecondaryStructure('((.))').to_ct('GGACC'))
+            5  ss
+            1 G       0    2    5    1
+            2 G       1    3    4    2
+            3 A       2    4    0    3
+            4 C       3    5    2    4
+            5 C       4    0    1    5
+        """
+        n = len(self.pt)
+        if len(seq) != n:
+            raise Exception('Sequence and secondary structure of different lengths')
+        idx = np.arange(1, n + 1)
+        after = np.where(idx < n, idx + 1, 0)
+        lines = ['%5i  %s' % (n, title)]
+        lines += ['%5i %s %7i %4i %4i %4i' % r for r in zip(idx.tolist(), seq, (idx - 1).tolist(),
+                                                          after.tolist(), (self.pt + 1).tolist(),
+                                                          idx.tolist())]
+        return '\n'.join(lines)
+
+    @classmethod
+    def from_ct(cls, txt):
+        """Get a structure (and a sequence) from the ct format.
+
+        Returns:
+            (SecondaryStructure, str)
+        """
+        rows = [l.split() for l in txt.strip().splitlines()[1:] if l.strip()]
+        seq = ''.join([r[1] for r in rows])
+        pt = np.array([int(r[4]) for r in rows], dtype=int)
+        i = np.flatnonzero(pt > np.arange(1, len(pt) + 1))
+        return cls.from_pairs(np.stack([i, pt[i] - 1], axis=1), len(pt), first=0), seq
+
+    def get_helices(self):
+        """Get helices (stems), stacked pairs (i, j), (i + 1, j - 1) ...
+
+        Returns:
+            list of (i, j, length), i, j of the first (outer) pair, numbered from 0
+        """
+        i = np.flatnonzero(self.pt > np.arange(len(self.pt)))
+        j = self.pt[i]
+        # a pair starts a helix if the previous residue is not paired with j + 1
+        prev = np.full(len(i), -1)
+        ok = i > 0
+        prev[ok] = self.pt[i[ok] - 1]
+        start = prev != j + 1
+        groups = np.cumsum(start) - 1
+        lengths = np.bincount(groups)
+        return list(zip(i[start].tolist(), j[start].tolist(), lengths.tolist()))
+
+    def remove_positions(self, mask):
+        """Get a structure without positions of the mask (e.g. gaps of an alignment),
+        pairs with removed positions are removed.
+
+        >>> SecondaryStructure('((--..)).').remove_positions(np.array(list('GG--AACCA')) == '-')
+        ((..)).
+        """
+        keep = ~np.asarray(mask, dtype=bool)
+        new = np.cumsum(keep) - 1
+        pt = self.pt.copy()
+        paired = pt > -1
+        broken = paired & ~keep[np.where(paired, pt, 0)]
+        pt[broken] = -1
+        s = SecondaryStructure()
+        s.pt = np.where(pt > -1, new[np.where(pt > -1, pt, 0)], -1)[keep]
+        s.level = np.where(pt > -1, self.level, -1)[keep]
+        return s
+
+
 def parse_vienna_to_pairs(ss, remove_gaps_in_ss=False):
     """Parse Vienna (dot-bracket notation) to get pairs.
 
@@ -64,11 +287,12 @@ def parse_vienna_to_pairs(ss, remove_gaps_in_ss=False):
        ss (str): secondary stucture in Vienna (dot-bracket notation) notation
        remove_gaps_in_ss (bool): remove - from ss or not, design for DCA (tpp case
                                  ``ss = "(((((((((.((((.(((.....))))))......------)....."``
-                                 works with pk of the first level, ``[[]]``
+                                 works with pks of all levels, ``[[]]``, ``{{}}``, ``<<>>``, ``AAaa``...
 
     Returns:
 
-        list of two lists: (pairs, pairs_pk)
+        list of two lists: (pairs, pairs_pk), pairs_pk are pairs of all levels of pks,
+        see SecondaryStructure
 
     Examples::
 
@@ -78,6 +302,9 @@ def parse_vienna_to_pairs(ss, remove_gaps_in_ss=False):
         >>> parse_vienna_to_pairs('(([[))]]')
         ([[1, 6], [2, 5]], [[3, 8], [4, 7]])
 
+        >>> parse_vienna_to_pairs('(([[)){{]]}}')
+        ([[1, 6], [2, 5]], [[3, 10], [4, 9], [7, 12], [8, 11]])
+
         >>> parse_vienna_to_pairs('((--))')
         ([[1, 6], [2, 5]], [])
 
@@ -97,27 +324,9 @@ def parse_vienna_to_pairs(ss, remove_gaps_in_ss=False):
     """
     if remove_gaps_in_ss:
         ss = ss.replace('-', '')
-    stack = []
-    pairs = []
-    pairs_pk = []
-    stack_pk = []
-    for c, s in enumerate(ss):
-        if s == '(':
-            stack.append(c + 1)
-        if s == ')':
-            pairs.append([stack.pop(), c + 1])
-        if s == '[':
-            stack_pk.append(c + 1)
-        if s == ']':
-            pairs_pk.append([stack_pk.pop(), c + 1])
-
-    if stack:
-        raise ExceptionOpenPairsProblem('Too many open pairs (()) in structure')
-    if stack_pk:
-        raise ExceptionOpenPairsProblem('Too many open pairs [[]] in structure')
-
-    pairs.sort()
-    pairs_pk.sort()
+    s = SecondaryStructure(ss)
+    pairs = s.get_pairs(level=0)
+    pairs_pk = [p for p in s.get_pairs() if s.level[p[0] - 1] > 0]
     return(pairs, pairs_pk)
 
 
@@ -51,6 +51,10 @@ except KeyError:
 import subprocess
 import tempfile
 import sys
+import json
+import hashlib
+import threading
+from multiprocessing.pool import ThreadPool
 
 
 from rna_tools.rna_tools_config import CONTEXTFOLD_PATH, RNASTRUCTURE_PATH
@@ -83,12 +87,13 @@ class RNASequence(object):
     def __repr__(self):
         return self.seq
 
-    def eval(self, no_dangling_end_energies=True, verbose=False):
+    def eval(self, no_dangling_end_energies=True, verbose=False, cache=None):
         """Evaluate energy of RNA sequence.
 
         Args:
             no_dangling_end_energies (Boolean)
             verbose (Boolean)
+            cache (ResultCache): if given, the energy is taken from/saved to the cache, see `eval_batch`
 
         Returns:
             Energy (flaot)
@@ -104,6 +109,9 @@ class RNASequence(object):
 
         Read more: http://rna.tbi.univie.ac.at//cgi-bin/RNAWebSuite/RNAeval.cgi
         """
+        if cache is not None:
+            return eval_batch([self], no_dangling_end_energies, cache=cache, verbose=verbose)[0]
+
         tf = tempfile.NamedTemporaryFile(delete=False)
         tf.name += '.fa'
         with open(tf.name, 'w') as f:
@@ -123,13 +131,15 @@ class RNASequence(object):
         return float(self.ss_log.strip().split(' ')[-1].replace('(','').replace(')', ''))
 
 
-    def predict_ss(self, method="RNAfold", constraints='', shapefn='', verbose=0):
+    def predict_ss(self, method="RNAfold", constraints='', shapefn='', verbose=0, cache=None):
         """Predict secondary structure of the seq.
 
         :param method:
         :param constraints:
         :param shapefn: path to a file with shape reactivites
         :param verbose:
+        :param cache: ResultCache, results of RNAfold, RNAsubopt, ipknot and centroid_fold
+                      are taken from/saved to the cache, see `predict_ss_batch`
 
         It creates a seq fasta file and runs various methods for secondary structure
         prediction. You can provide also a constraints file for RNAfold and RNAsubopt.
@@ -175,6 +185,9 @@ class RNASequence(object):
         You can easily see that the first G is unpaired right now! The reactivity of this G was
         set to 10. Worked!
         """
+        if cache is not None and method in BATCH_METHODS and not shapefn:
+            return predict_ss_batch([self], method, [constraints], cache=cache, verbose=verbose)[0]
+
         tf = tempfile.NamedTemporaryFile(delete=False)
         tf.name += '.fa'
         with open(tf.name, 'w') as f:
@@ -303,7 +316,7 @@ class RNASequence(object):
         #     return self.ss_log.strip().split('\n')[-1].split()[0]
 
         elif method == "ipknot":
-            self.ss_log = subprocess.check_output('ipknot ' + tf.name, shell=True)
+            self.ss_log = subprocess.check_output('ipknot ' + tf.name, shell=True).decode()
             return '\n'.join(self.ss_log.split('\n')[2:])
 
         elif method == "contextfold":
@@ -318,7 +331,7 @@ class RNASequence(object):
             return '\n'.join(self.ss_log.split('\n')[1:])
 
         elif method == "centroid_fold":
-            self.ss_log = subprocess.check_output('centroid_fold ' + tf.name, shell=True)
+            self.ss_log = subprocess.check_output('centroid_fold ' + tf.name, shell=True).decode()
             return '\n'.join(self.ss_log.split('\n')[2:])
 
         elif method == "rnastructure":
@@ -372,6 +385,255 @@ class RNASequence(object):
             raise MethodNotChosen('You have to define a correct method to use.')
 
 
+# methods that can be run with predict_ss_batch
+# (method, can be run with many sequences in one call of the program)
+BATCH_METHODS = {
+    'RNAfold': True,
+    'RNAsubopt': True,
+    'ipknot': False,
+    'centroid_fold': False,
+    }
+
+
+class ResultCache(object):
+    """On-disk cache of results of the external programs.
+
+    Results are saved as small json files in ``path``, one file per result,
+    the name of a file is a sha1 of a key (sequence, structure, method and options)::
+
+        >>> import tempfile
+        >>> c = ResultCache(tempfile.mkdtemp())
+        >>> k = c.key('RNAeval', 'GGGAAACCC', '(((...)))', ['-d0'])
+        >>> c.get(k) is None
+        True
+        >>> c.put(k, -1.2)
+        >>> c.get(k)
+        -1.2
+
+    Results are also kept in memory, so the same result is read from the disk only once.
+    """
+    def __init__(self, path):
+        self.path = path
+        self.memory = {}
+        if not os.path.isdir(path):
+            os.makedirs(path)
+
+    @staticmethod
+    def key(method, seq, ss='', options=()):
+        """Get a key for a result of `method` run on `seq` with `ss` (structure or constraints)."""
+        txt = json.dumps([method, seq, ss, list(options)])
+        return hashlib.sha1(txt.encode()).hexdigest()
+
+    def _fn(self, key):
+        return os.path.join(self.path, key[:2], key + '.json')
+
+    def get(self, key):
+        """Get a result or None if there is no result for this key."""
+        if key in self.memory:
+            return self.memory[key]
+        try:
+            with open(self._fn(key)) as f:
+                value = json.load(f)
+        except (IOError, OSError, ValueError):
+            return None
+        self.memory[key] = value
+        return value
+
+    def put(self, key, value):
+        """Save a result, the file is written to a temp file and renamed so
+        concurrent readers never see a half-written result."""
+        self.memory[key] = value
+        fn = self._fn(key)
+        d = os.path.dirname(fn)
+        if not os.path.isdir(d):
+            try:
+                os.makedirs(d)
+            except OSError:  # made by another process
+                pass
+        tmp = '%s.%i.%i.tmp' % (fn, os.getpid(), threading.current_thread().ident)
+        with open(tmp, 'w') as f:
+            json.dump(value, f)
+        os.rename(tmp, fn)
+
+
+def _to_rna_sequences(seqs):
+    """Get a list of RNASequence objects from a list of RNASequence, strings or
+    (seq, ss) tuples."""
+    rseqs = []
+    for s in seqs:
+        if isinstance(s, RNASequence):
+            rseqs.append(s)
+        elif isinstance(s, (tuple, list)):
+            r = RNASequence(s[0])
+            r.ss = s[1]
+            rseqs.append(r)
+        else:
+            rseqs.append(RNASequence(s))
+    return rseqs
+
+
+def _run_vienna(program, options, records, verbose=False):
+    """Run a ViennaRNA program once for many records.
+
+    Args:
+        program (str): e.g. RNAfold, RNAeval
+        options (list): command line options
+        records (list): list of (name, seq, extra line), the extra line
+                        (structure or constraints) can be empty
+
+    Returns:
+        list of outputs (str), one per record, in the order of records
+    """
+    txt = ''
+    for name, seq, extra in records:
+        txt += '>' + name + '\n' + seq + '\n'
+        if extra:
+            txt += extra + '\n'
+    cmd = [program] + list(options)
+    if verbose:
+        print(' '.join(cmd) + ' # for %i sequences' % len(records))
+    p = subprocess.Popen(cmd, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+    out, err = p.communicate(txt.encode())
+    if p.returncode:
+        raise Exception('%s failed: %s' % (program, err.decode()))
+    outputs = ['>' + o for o in ('\n' + out.decode()).split('\n>')[1:]]
+    if len(outputs) != len(records):
+        raise Exception('%s returned %i results for %i sequences' % (program, len(outputs), len(records)))
+    return outputs
+
+
+def _run_batch(rseqs, method, extras, options, cache, run, verbose=False):
+    """Helper for the batch functions, do the cache lookups and run `run` only
+    for sequences that are not in the cache. Identical queries are run only once.
+
+    Args:
+        rseqs (list): RNASequence objects
+        extras (list): structure/constraints for each sequence
+        options (list): options (list) of the program for each sequence, used in the cache key
+        run (function): takes a list of indexes of rseqs and returns the list of
+                        results for them
+
+    Returns:
+        list of results
+    """
+    results = [None] * len(rseqs)
+    keys = []
+    todo = {}  # key -> list of indexes
+    for i, (s, extra, opts) in enumerate(zip(rseqs, extras, options)):
+        k = ResultCache.key(method, s.seq, extra, opts)
+        keys.append(k)
+        if cache is not None:
+            r = cache.get(k)
+            if r is not None:
+                results[i] = r
+                continue
+        todo.setdefault(k, []).append(i)
+    if todo:
+        if verbose:
+            print('%s: %i sequences, %i to compute' % (method, len(rseqs), len(todo)))
+        first = [ids[0] for ids in todo.values()]
+        for i, r in zip(first, run(first)):
+            for j in todo[keys[i]]:
+                results[j] = r
+            if cache is not None:
+                cache.put(keys[i], r)
+    return results
+
+
+def eval_batch(seqs, no_dangling_end_energies=True, cache=None, verbose=False):
+    """Evaluate energies of many sequences with one call of RNAeval.
+
+    Args:
+        seqs (list): RNASequence objects (with ``.ss`` set) or (seq, ss) tuples
+        no_dangling_end_energies (Boolean): run RNAeval with -d0
+        cache (ResultCache): if given, energies already computed are taken from
+                             the cache and new ones are saved there
+        verbose (Boolean)
+
+    Returns:
+        list of energies (float)
+    """
+    rseqs = _to_rna_sequences(seqs)
+    options = ['-d0'] if no_dangling_end_energies else []
+
+    def run(ids):
+        outputs = _run_vienna('RNAeval', options,
+                              [(rseqs[i].name, rseqs[i].seq, rseqs[i].ss) for i in ids], verbose)
+        energies = []
+        for i, o in zip(ids, outputs):
+            rseqs[i].ss_log = o
+            energies.append(float(o.strip().split(' ')[-1].replace('(', '').replace(')', '')))
+        return energies
+    return _run_batch(rseqs, 'RNAeval', [s.ss for s in rseqs], [options] * len(rseqs), cache, run, verbose)
+
+
+def predict_ss_batch(seqs, method="RNAfold", constraints=None, cache=None, threads=4, verbose=False):
+    """Predict secondary structures of many sequences.
+
+    RNAfold and RNAsubopt are run once for all sequences (multi-record input),
+    ipknot and centroid_fold are run in a pool of `threads` workers.
+
+    Args:
+        seqs (list): RNASequence objects or sequences (str)
+        method (str): RNAfold, RNAsubopt, ipknot or centroid_fold
+        constraints (list): constraints for each sequence, can be empty strings (only RNAfold and RNAsubopt)
+        cache (ResultCache): if given, results already computed are taken from
+                             the cache and new ones are saved there
+        threads (int): number of workers for methods run one sequence at a time
+        verbose (Boolean)
+
+    Returns:
+        list of outputs (str), the same as `RNASequence.predict_ss` would give for each sequence
+
+    Usage::
+
+        >>> print(predict_ss_batch(["CCCCUUUUGGGG", "GGGAAACCC"])[0])
+        >rna_seq
+        CCCCUUUUGGGG
+        ((((....)))) ( -6.40)
+    """
+    if method not in BATCH_METHODS:
+        raise MethodNotChosen('Method %s can not be used with predict_ss_batch.' % method)
+    rseqs = _to_rna_sequences(seqs)
+    if not constraints:
+        constraints = [''] * len(rseqs)
+    if len(constraints) != len(rseqs):
+        raise Exception('You need constraints for each sequence (can be empty)')
+    for s, c in zip(rseqs, constraints):
+        if c and len(s.seq) != len(c):
+            raise Exception('The seq and constraints should be of the same length: %i %s %i %s' % (len(s.seq), s.seq, len(c), c))
+    options = [['-C'] if c else [] for c in constraints]
+
+    def run(ids):
+        if BATCH_METHODS[method]:
+            opts = []
+            records = [(rseqs[i].name, rseqs[i].seq, constraints[i]) for i in ids]
+            if any(c for _, _, c in records):
+                # '.' means no constraint for a given position
+                opts = ['-C']
+                records = [(n, seq, c or '.' * len(seq)) for n, seq, c in records]
+            if method == 'RNAfold':
+                opts.append('--noPS')
+            outputs = _run_vienna(method, opts, records, verbose)
+            results = []
+            for i, o in zip(ids, outputs):
+                rseqs[i].ss_log = o
+                # the last record keeps the final newline of the output
+                o = o.strip()
+                # the header is not cached, it depends on the name of a sequence
+                results.append(o.split('\n', 1)[1])
+            return results
+        pool = ThreadPool(threads)
+        try:
+            return pool.map(lambda i: rseqs[i].predict_ss(method, constraints[i], verbose=verbose), ids)
+        finally:
+            pool.close()
+    results = _run_batch(rseqs, method, constraints, options, cache, run, verbose)
+    if BATCH_METHODS[method]:
+        results = ['>' + s.name + '\n' + r for s, r in zip(rseqs, results)]
+    return results
+
+
 # main
 if __name__ == '__main__':
     import doctest
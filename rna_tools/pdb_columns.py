@@ -0,0 +1,54 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""pdb_columns.py - atoms of lines of a PDB file as arrays, and editing of fixed columns
+(occupancy, bfactor) of these lines in place::
+
+    >>> lines = ['ATOM      1  P     G A   1      -7.1  -1.9  11.6  1.00  0.00           P']
+    >>> t = get_atom_table(lines)
+    >>> t.chains.tolist(), t.resis.tolist(), t.names.tolist()
+    (['A'], [1], ['P'])
+    >>> set_column(lines, 'bfactor', 12.5, t.idx)[0][60:66]
+    ' 12.50'
+"""
+from collections import namedtuple
+
+import numpy as np
+
+COLUMNS = {'occupancy': (54, 60), 'bfactor': (60, 66)}
+
+AtomTable = namedtuple('AtomTable', ['idx', 'chains', 'resis', 'names'])
+
+
+def get_atom_table(lines):
+    """Get arrays of atoms (ATOM and HETATM lines).
+
+    Returns:
+        AtomTable: idx (indexes of lines), chains, resis, names (atom names)
+    """
+    idx = [i for i, l in enumerate(lines) if l.startswith(('ATOM', 'HETATM'))]
+    return AtomTable(np.array(idx, dtype=int),
+                     np.array([lines[i][21:22] for i in idx], dtype='U1'),
+                     np.array([int(lines[i][22:26]) for i in idx], dtype=int),
+                     np.array([lines[i][12:16].strip() for i in idx], dtype='U4'))
+
+
+def set_column(lines, column, values, idx):
+    """Set a column (occupancy or bfactor) of lines.
+
+    Args:
+        lines (list): lines of a PDB file, modified in place
+        column (str): occupancy or bfactor
+        values (float or np.array): a value for all or an array of values, one per idx
+        idx (np.array): indexes of lines to edit
+
+    Returns:
+        list: lines
+    """
+    start, end = COLUMNS[column]
+    values = np.broadcast_to(np.asarray(values, dtype=float), (len(idx),))
+    for i, v in zip(idx.tolist(), values.tolist()):
+        l = lines[i]
+        if len(l) < end:
+            l = l.ljust(end)
+        lines[i] = l[:start] + ('%6.2f' % v) + l[end:]
+    return lines
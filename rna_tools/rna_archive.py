@@ -0,0 +1,526 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_archive.py - keep a library of models (e.g. decoys) in one file.
+
+Directories of 10^4-10^6 small PDB files are slow, for every tool most of the time goes to
+the filesystem and parsing. An archive (``.rnarc``) keeps:
+
+- a topology (lines of a model without coordinates) once for models of the same atoms
+  (the same sequence, names of atoms etc.),
+- coordinates of every model as a block of float32 (3 x 4 bytes per atom),
+- other lines of a model (e.g. REMARKs, a table of energies of Rosetta), if there are any,
+- an index: names of models, offsets of their blocks and metadata (numbers, e.g. energies),
+  at the end of the file.
+
+The file is memory-mapped, coordinates of a model are read without reading other models.
+Models can be added (appended) to an archive and exported to PDB files exactly as they were
+imported (coordinates in the PDB format, ``%8.3f``, are kept exactly by float32).
+
+A model of an archive is given to tools as ``<archive>:<name>``, an archive in a list of
+files is expanded to all its models (see expand_archives())::
+
+    $ rna_archive.py decoys.rnarc decoys/*.pdb
+    # of models: 1000 (+1000) # of topologies: 1
+    $ rna_archive.py decoys.rnarc --list | head -n 2
+    decoy_0001.pdb 2290 GGCGCUUAGCGCC
+    decoy_0002.pdb 2290 GGCGCUUAGCGCC
+    $ rna_calc_rmsd.py -t target.pdb decoys.rnarc
+    $ rna_archive.py decoys.rnarc decoy_0001.pdb --extract out
+
+Metadata can be imported from a csv file, the first column is a name of a model (``--scores``).
+"""
+from __future__ import print_function
+
+import argparse
+import csv
+import hashlib
+import io
+import mmap
+import os
+import struct
+import sys
+
+import numpy as np
+
+from rna_tools.rna_mmcif import read_pdb
+
+EXT = '.rnarc'
+MAGIC = b'RNARC001'
+FOOTER = struct.Struct('<QQ8s')  # offset and size of the index
+FOOTER_MAGIC = b'RNARCEND'
+ALIGN = 16
+ATOM_RECORDS = ('ATOM', 'HETATM')
+TOPOLOGY_RECORDS = ('ATOM', 'HETATM', 'TER', 'MODEL', 'ENDMDL', 'END')
+COORDS = '%8.3f%8.3f%8.3f'
+
+
+def split_model(lines):
+    """Split lines of a PDB file to a topology, coordinates and other lines.
+
+    Args:
+        lines (list): lines of a PDB file
+
+    Returns:
+        str (topology, lines without coordinates), np.array (n x 3, float32),
+        list of (position, line), other lines
+
+    >>> top, coords, extra = split_model(['REMARK 1', 'ATOM      1  P     G A   1    '
+    ...                                   '  10.000  -2.500   0.125  1.00  0.00           P', 'END'])
+    >>> top.split('\\n'), coords.tolist(), extra
+    (['ATOM      1  P     G A   1      1.00  0.00           P', 'END'], [[10.0, -2.5, 0.125]], [(0, 'REMARK 1')])
+    """
+    template, coords, extra = [], [], []
+    for i, l in enumerate(lines):
+        l = l.rstrip('\r\n')
+        if l.startswith(ATOM_RECORDS):
+            template.append(l[:30] + l[54:])
+            coords.append(l[30:54])
+        elif l.startswith(TOPOLOGY_RECORDS):
+            template.append(l)
+        else:
+            extra.append((i, l))
+    try:
+        xyz = np.array([(c[:8], c[8:16], c[16:24]) for c in coords], dtype=float)
+    except ValueError as e:
+        raise Exception('Coordinates are not in the PDB format: %s' % e)
+    xyz = xyz.astype(np.float32).reshape(-1, 3)
+    if ''.join([COORDS % tuple(c) for c in xyz.tolist()]) != ''.join(coords):
+        raise Exception('Coordinates are not in the PDB format (%8.3f), they would not be kept exactly')
+    return '\n'.join(template), xyz, extra
+
+
+class Topology(object):
+    """Lines of a model without coordinates, shared by models of the same atoms.
+
+    Attributes:
+        text (str): lines, ATOM/HETATM without columns of coordinates
+        n_atoms (int): # of atoms (ATOM/HETATM)
+        seq (str): a sequence (chains separated by spaces)
+    """
+    def __init__(self, text):
+        self.text = text
+        self.lines = text.split('\n') if text else []
+        self.atoms = [i for i, l in enumerate(self.lines) if l.startswith(ATOM_RECORDS)]
+        self.n_atoms = len(self.atoms)
+        self._heads = [self.lines[i][:30] for i in self.atoms]
+        self._tails = [self.lines[i][30:] for i in self.atoms]
+        self._table = None
+
+    @property
+    def seq(self):
+        seq = []
+        last = None
+        for i in self.atoms:
+            l = self.lines[i]
+            if last and l[21] != last[21]:
+                seq.append(' ')
+            if not last or l[21:27] != last[21:27]:
+                resname = l[17:20].strip()
+                seq.append(resname[-1] if len(resname) < 3 else 'X')
+            last = l
+        return ''.join(seq)
+
+    @property
+    def table(self):
+        """Atoms (AtomTable, see rna_mmcif.py) with coordinates of zeros."""
+        if self._table is None:
+            self._table = read_pdb(self.get_lines(np.zeros((self.n_atoms, 3))))
+        return self._table
+
+    def get_lines(self, coords, extra=()):
+        """Get lines (without new lines) of a model of these coordinates (and other lines)."""
+        lines = list(self.lines)
+        for i, h, t, (x, y, z) in zip(self.atoms, self._heads, self._tails, coords.tolist()):
+            lines[i] = '%s%8.3f%8.3f%8.3f%s' % (h, x, y, z, t)
+        for pos, line in extra:
+            lines.insert(pos, line)
+        return lines
+
+
+class Archive(object):
+    """An archive of models.
+
+    Args:
+        fn (str): a file (``.rnarc``)
+        mode (str): ``r`` to read, ``a`` to read and add models (a new file is created),
+            the index is written by close() (or at the end of ``with``)
+
+    Attributes:
+        names (list): names of models
+        index (dict): name -> index of a model
+        metadata (dict): key -> list of values of models (nan if not given)
+
+    Models are accessed by names or indexes::
+
+        with Archive('decoys.rnarc', 'a') as a:
+            a.add_pdb('decoy_0001.pdb', metadata={'energy': -120.5})
+        a = Archive('decoys.rnarc')
+        a.get_coords('decoy_0001.pdb')  # n x 3, float32, memory-mapped
+        a.get_metadata('energy')
+    """
+    def __init__(self, fn, mode='r'):
+        if mode not in ('r', 'a'):
+            raise Exception('mode should be r or a, not %s' % mode)
+        self.fn = fn
+        self.mode = mode
+        self.names = []
+        self.index = {}
+        self.metadata = {}
+        self._offsets = []
+        self._extra_sizes = []
+        self._model_topologies = []
+        self._topology_offsets = []
+        self._topology_sizes = []
+        self._topology_atoms = []
+        self._topology_keys = []  # sha1 of topologies
+        self._topology_hashes = {}  # sha1 of a topology -> its index
+        self._topologies = {}  # loaded topologies
+        self._end = len(MAGIC)  # where new blocks are written
+        self._f = None
+        self._mm = None
+        if os.path.exists(fn):
+            self._read_index()
+        elif mode == 'r':
+            raise Exception('No such archive: %s' % fn)
+
+    def __len__(self):
+        return len(self.names)
+
+    def __contains__(self, name):
+        return name in self.index
+
+    def __iter__(self):
+        return iter(self.names)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def _read_index(self):
+        with open(self.fn, 'rb') as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise Exception('Not an archive: %s' % self.fn)
+            end = self._find_footer(f)
+            if end is None:
+                raise Exception('The archive has no index (not closed?): %s' % self.fn)
+            f.seek(end - FOOTER.size)
+            offset, size, magic = FOOTER.unpack(f.read(FOOTER.size))
+            f.seek(offset)
+            data = np.load(io.BytesIO(f.read(size)))
+        # blocks are added after the index (it's valid until close() writes a new one)
+        self._end = end
+        self.names = data['names'].tolist()
+        self.index = dict((n, i) for i, n in enumerate(self.names))
+        self._offsets = data['offsets'].tolist()
+        self._extra_sizes = data['extra_sizes'].tolist()
+        self._model_topologies = data['topologies'].tolist()
+        self._topology_offsets = data['topology_offsets'].tolist()
+        self._topology_sizes = data['topology_sizes'].tolist()
+        self._topology_atoms = data['topology_atoms'].tolist()
+        self._topology_keys = data['topology_hashes'].tolist()
+        self._topology_hashes = dict((h, i) for i, h in enumerate(self._topology_keys))
+        for k in data.files:
+            if k.startswith('meta_'):
+                self.metadata[k[len('meta_'):]] = data[k].tolist()
+
+    @staticmethod
+    def _find_footer(f):
+        """Get the end of the last valid footer, blocks after it (of an add that was not
+        closed, e.g. killed) are skipped, None if there is no footer."""
+        f.seek(0, os.SEEK_END)
+        end = f.tell()
+        if end < len(MAGIC) + FOOTER.size:
+            return None
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            pos = end
+            while True:
+                pos = mm.rfind(FOOTER_MAGIC, len(MAGIC), pos)
+                if pos < 0:
+                    return None
+                start = pos + len(FOOTER_MAGIC) - FOOTER.size
+                if start >= len(MAGIC):
+                    offset, size, magic = FOOTER.unpack(mm[start:start + FOOTER.size])
+                    if offset + size == start:
+                        return start + FOOTER.size
+                pos += len(FOOTER_MAGIC) - 1
+
+    def _get_mm(self, end):
+        """Memory-mapped file (mapped again if blocks were added)."""
+        if self._mm is None or len(self._mm) < end:
+            if self._f:
+                self._f.flush()
+            self._mm = np.memmap(self.fn, dtype=np.uint8, mode='r')
+        return self._mm
+
+    def _i(self, name):
+        if isinstance(name, int):
+            return name
+        try:
+            return self.index[name]
+        except KeyError:
+            raise Exception('No model %s in %s' % (name, self.fn))
+
+    def get_topology(self, name):
+        """Get Topology of a model (a name or an index)."""
+        t = self._model_topologies[self._i(name)]
+        if t not in self._topologies:
+            start = self._topology_offsets[t]
+            data = self._get_mm(start + self._topology_sizes[t])[start:start + self._topology_sizes[t]]
+            self._topologies[t] = Topology(data.tobytes().decode('utf-8'))
+        return self._topologies[t]
+
+    def get_coords(self, name):
+        """Get coordinates (n x 3, float32, read-only) of a model (a name or an index)."""
+        i = self._i(name)
+        n = self._topology_atoms[self._model_topologies[i]]
+        return np.frombuffer(self._get_mm(self._offsets[i] + n * 12), dtype='<f4', count=n * 3,
+                             offset=self._offsets[i]).reshape(n, 3)
+
+    def get_all_coords(self, names=None):
+        """Get coordinates of models of the same # of atoms, (n x m x 3, float32)."""
+        names = self.names if names is None else names
+        return np.array([self.get_coords(n) for n in names]).reshape(len(names), -1, 3)
+
+    def _get_extra(self, i):
+        size = self._extra_sizes[i]
+        if not size:
+            return []
+        start = self._offsets[i] + self._topology_atoms[self._model_topologies[i]] * 12
+        text = self._get_mm(start + size)[start:start + size].tobytes().decode('utf-8')
+        extra = []
+        for l in text.split('\n'):
+            pos, line = l.split(' ', 1)
+            extra.append((int(pos), line))
+        return extra
+
+    def get_lines(self, name):
+        """Get lines of a model (as in the imported file, without new lines)."""
+        i = self._i(name)
+        return self.get_topology(i).get_lines(self.get_coords(i), self._get_extra(i))
+
+    def get_text(self, name):
+        return ''.join([l + '\n' for l in self.get_lines(name)])
+
+    def get_table(self, name):
+        """Get atoms of a model as AtomTable (see rna_mmcif.py)."""
+        i = self._i(name)
+        return self.get_topology(i).table._replace(coords=self.get_coords(i).astype(float))
+
+    def get_metadata(self, key):
+        """Get values (np.array, nan if not given) of metadata of all models."""
+        return np.array(self.metadata.get(key, [np.nan] * len(self)), dtype=float)
+
+    def get_hash(self, name):
+        """Get sha1 of a model (its topology, coordinates and other lines)."""
+        i = self._i(name)
+        t = self._model_topologies[i]
+        start = self._offsets[i]
+        end = start + self._topology_atoms[t] * 12 + self._extra_sizes[i]
+        h = hashlib.sha1(self._topology_keys[t].encode())
+        h.update(self._get_mm(end)[start:end].tobytes())
+        return h.hexdigest()
+
+    def _write(self, data):
+        """Write a block (aligned), return its offset."""
+        if self._f is None:
+            if self.mode != 'a':
+                raise Exception('The archive is open to read, use mode a to add models')
+            new = not os.path.exists(self.fn)
+            self._f = open(self.fn, 'w+b' if new else 'r+b')
+            if new:
+                self._f.write(MAGIC)
+            self._f.seek(self._end)
+            self._f.truncate()  # blocks of an add that was not closed
+        self._f.write(b'\0' * (-self._end % ALIGN))
+        offset = self._f.tell()
+        self._f.write(data)
+        self._end = self._f.tell()
+        return offset
+
+    def add(self, name, lines, metadata=None):
+        """Add a model.
+
+        Args:
+            name (str): a name, e.g. a file name
+            lines (list): lines of a PDB file
+            metadata (dict): key -> a number, e.g. {'energy': -120.5}
+        """
+        if name in self.index:
+            raise Exception('%s is already in %s' % (name, self.fn))
+        text, coords, extra = split_model(lines)
+        key = hashlib.sha1(text.encode('utf-8')).hexdigest()
+        if key not in self._topology_hashes:
+            data = text.encode('utf-8')
+            self._topology_offsets.append(self._write(data))
+            self._topology_sizes.append(len(data))
+            self._topology_atoms.append(len(coords))
+            self._topology_hashes[key] = len(self._topology_keys)
+            self._topology_keys.append(key)
+        extra = '\n'.join(['%i %s' % e for e in extra]).encode('utf-8')
+        self._offsets.append(self._write(coords.astype('<f4').tobytes() + extra))
+        self._extra_sizes.append(len(extra))
+        self._model_topologies.append(self._topology_hashes[key])
+        self.index[name] = len(self.names)
+        self.names.append(name)
+        metadata = metadata or {}
+        for k in metadata:
+            if k not in self.metadata:
+                self.metadata[k] = [np.nan] * (len(self) - 1)
+        for k, values in self.metadata.items():
+            values.append(float(metadata.get(k, np.nan)))
+
+    def add_pdb(self, fn, name=None, metadata=None):
+        """Add a PDB file (by default, named by its base name)."""
+        with open(fn) as f:
+            self.add(name or os.path.basename(fn), f.readlines(), metadata)
+
+    def export(self, name, fn):
+        """Save a model to a PDB file."""
+        with open(fn, 'w') as f:
+            f.write(self.get_text(name))
+
+    @property
+    def n_topologies(self):
+        return len(self._topology_offsets)
+
+    def close(self):
+        """Write the index (if models were added)."""
+        if self._f is None:
+            return
+        index = {'names': np.array(self.names, dtype=str),
+                 'offsets': np.array(self._offsets, dtype=np.int64),
+                 'extra_sizes': np.array(self._extra_sizes, dtype=np.int64),
+                 'topologies': np.array(self._model_topologies, dtype=np.int64),
+                 'topology_offsets': np.array(self._topology_offsets, dtype=np.int64),
+                 'topology_sizes': np.array(self._topology_sizes, dtype=np.int64),
+                 'topology_atoms': np.array(self._topology_atoms, dtype=np.int64),
+                 'topology_hashes': np.array(self._topology_keys, dtype=str)}
+        for k, values in self.metadata.items():
+            index['meta_' + k] = np.array(values, dtype=float)
+        data = io.BytesIO()
+        np.savez(data, **index)
+        data = data.getvalue()
+        self._f.seek(self._end)
+        self._f.write(data)
+        self._f.write(FOOTER.pack(self._end, len(data), FOOTER_MAGIC))
+        self._f.truncate()
+        self._f.close()
+        self._f = None
+        self._mm = None
+
+
+_archives = {}
+
+
+def is_archive(fn):
+    """Is the file an archive (by the extension)?"""
+    return isinstance(fn, str) and fn.endswith(EXT)
+
+
+def is_archive_ref(fn):
+    """Is it a model of an archive, ``<archive>:<name>``?"""
+    return isinstance(fn, str) and EXT + ':' in fn
+
+
+def open_archive(fn):
+    """Open an archive to read, opened archives are kept (for models given one by one)."""
+    key = os.path.abspath(fn)
+    if key not in _archives:
+        _archives[key] = Archive(fn)
+    return _archives[key]
+
+
+def get_model(ref):
+    """Get (Archive, name) of ``<archive>:<name>``."""
+    fn, name = ref.split(EXT + ':', 1)
+    return open_archive(fn + EXT), name
+
+
+def expand_archives(files):
+    """Replace archives in a list of files with their models (``<archive>:<name>``)."""
+    out = []
+    for f in files:
+        if is_archive(f):
+            out.extend(['%s:%s' % (f, name) for name in open_archive(f).names])
+        else:
+            out.append(f)
+    return out
+
+
+def get_lines(ref):
+    """Get lines of a model of an archive."""
+    a, name = get_model(ref)
+    return a.get_lines(name)
+
+
+def get_table(ref):
+    """Get atoms (AtomTable) of a model of an archive."""
+    a, name = get_model(ref)
+    return a.get_table(name)
+
+
+def export_model(ref, directory):
+    """Save a model of an archive to a PDB file in a directory, return the file."""
+    a, name = get_model(ref)
+    fn = os.path.join(directory, os.path.basename(name))
+    a.export(name, fn)
+    return fn
+
+
+def read_scores(fn):
+    """Read metadata of models from a csv file (a name of a model in the first column).
+
+    Returns:
+        dict name -> dict key -> value
+    """
+    scores = {}
+    with open(fn) as f:
+        reader = csv.reader(f)
+        keys = next(reader)[1:]
+        for row in reader:
+            if row:
+                scores[os.path.basename(row[0])] = dict(
+                    (k, float(v)) for k, v in zip(keys, row[1:]) if v.strip())
+    return scores
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-l', '--list', action='store_true', help="list models (name, # of atoms, sequence)")
+    parser.add_argument('-x', '--extract', help="save models (given, or all) to this folder")
+    parser.add_argument('--scores', help="metadata of models to add, a csv file (name,energy,...)")
+    parser.add_argument('archive', help="an archive (.rnarc)")
+    parser.add_argument('files', nargs='*', help="PDB files to add (new are added), or names of models to extract")
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    if args.extract:
+        a = Archive(args.archive)
+        if not os.path.isdir(args.extract):
+            os.makedirs(args.extract)
+        for name in args.files or a.names:
+            a.export(name, os.path.join(args.extract, os.path.basename(name)))
+    elif args.list:
+        a = Archive(args.archive)
+        for name in a.names:
+            top = a.get_topology(name)
+            print(name, top.n_atoms, top.seq)
+    elif args.files:
+        scores = read_scores(args.scores) if args.scores else {}
+        with Archive(args.archive, 'a') as a:
+            n = len(a)
+            for fn in args.files:
+                name = os.path.basename(fn)
+                if name not in a:
+                    a.add_pdb(fn, name, scores.get(name))
+            print('# of models: %i (+%i) # of topologies: %i' % (len(a), len(a) - n, a.n_topologies))
+    else:
+        parser.print_help()
+        sys.exit(1)
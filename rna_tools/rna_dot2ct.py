@@ -3,24 +3,19 @@
 """
 The output file is <input-file>.ct
 
-Wrapper to
+The ct file is written natively (see SecondaryStructure.to_ct()), in the format of dot2ct of
 
 RNAstructure: software for RNA secondary structure prediction and analysis. (2010). RNAstructure: software for RNA secondary structure prediction and analysis., 11, 129. http://doi.org/10.1186/1471-2105-11-129
+
+All levels of pseudoknots are supported, ``()[]{}<>`` and ``Aa``, ``Bb``...
 """
 from __future__ import print_function
 import textwrap
 import argparse
-import subprocess
-import tempfile
 import six
 
+from rna_tools.SecondaryStructure import SecondaryStructure
 
-def exe(cmd):
-    o = subprocess.Popen(
-        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out = o.stdout.read().strip().decode()
-    err = o.stderr.read().strip().decode()
-    return out, err
 
 def dot2ct_file(path, path_output='', verbose=False):
     """
@@ -33,11 +28,14 @@ def dot2ct_file(path, path_output='', verbose=False):
     """
     if not path_output:
         path_output = path + '.ct'
-    cmd='dot2ct ' + path + ' ' + path_output + '.ct'
-    out, err= exe(cmd)
-    if verbose: print(out, end='')
-    if not err:
-        if verbose: print(' Created: %s' % args.file + '.ct')
+    with open(path) as f:
+        lines = [l.strip() for l in f if l.strip()]
+    title = lines[0][1:].strip() if lines[0].startswith('>') else 'ss'
+    seq, ss = lines[-2:]
+    with open(path_output, 'w') as f:
+        f.write(SecondaryStructure(ss).to_ct(seq, title) + '\n')
+    if verbose:
+        print(' Created: %s' % path_output)
     return path_output
 
 
@@ -49,25 +47,23 @@ def dot2ct(seq, ss, verbose=True):
 
     Returns:
         ct (str): content of the output ct file
+
+    >>> print(dot2ct('GGAAACC', '((...))', verbose=False))
+        7  ss
+        1 G       0    2    7    1
+        2 G       1    3    6    2
+        3 A       2    4    0    3
+        4 A       3    5    0    4
+        5 A       4    6    0    5
+        6 C       5    7    2    6
+        7 C       6    0    1    7
     """
-    t = tempfile.NamedTemporaryFile(delete=False)
-    with open(t.name, 'w') as f:
-        f.write('> ss\n')
-        if not isinstance(seq, six.string_types):
-            seq = seq.seq
-        f.write(seq.strip() + '\n')
-        f.write(ss.strip() + '\n')
-
-    cmd='dot2ct ' + t.name + ' ' + t.name + '.ct'
-    if verbose: print(cmd)
-    out, err = exe(cmd)
-    print(out, end='')
-    if not err:
-        print(' Created: %s' % f + '.ct')
-    else:
-        print(err)
-    with open(t.name + '.ct') as f:
-        return f.read().strip()
+    if not isinstance(seq, six.string_types):
+        seq = seq.seq
+    ct = SecondaryStructure(ss.strip()).to_ct(seq.strip())
+    if verbose:
+        print(ct)
+    return ct
 
 
 def get_parser():
@@ -87,4 +83,4 @@ if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
 
-    dot2ct_file(args.file)
+    dot2ct_file(args.file, verbose=args.verbose)
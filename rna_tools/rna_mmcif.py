@@ -0,0 +1,306 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_mmcif.py - read and write atoms (``_atom_site``) of mmCIF files.
+
+The ``_atom_site`` loop is read line by line (also ``.cif.gz``) into arrays, one array per
+column (see AtomTable), without objects for atoms. Only one model (or all models) is kept,
+residues and chains can be numbered as in the PDB format (``auth_*``, by default) or as in
+mmCIF (``label_*``).
+
+Large assemblies (e.g. ribosomes) do not fit the PDB format (serials of atoms, chain ids of
+more than 1 character), but they can be read and saved as mmCIF::
+
+    $ rna_mmcif.py --to-pdb 1xjr.cif > 1xjr.pdb
+    $ rna_mmcif.py --to-cif 1xjr.pdb > 1xjr.cif
+"""
+from __future__ import print_function
+from collections import namedtuple
+
+import argparse
+import gzip
+import operator
+import re
+import sys
+
+import numpy as np
+
+AtomTable = namedtuple('AtomTable', ['records', 'serials', 'names', 'altlocs', 'resnames',
+                                     'chains', 'resis', 'icodes', 'coords', 'occupancies',
+                                     'bfactors', 'elements', 'models'])
+
+# columns of _atom_site for AtomTable, (auth, label) numbering
+COLUMNS = {
+    'records': ('group_PDB', 'group_PDB'),
+    'serials': ('id', 'id'),
+    'names': ('auth_atom_id', 'label_atom_id'),
+    'altlocs': ('label_alt_id', 'label_alt_id'),
+    'resnames': ('auth_comp_id', 'label_comp_id'),
+    'chains': ('auth_asym_id', 'label_asym_id'),
+    'resis': ('auth_seq_id', 'label_seq_id'),
+    'icodes': ('pdbx_PDB_ins_code', 'pdbx_PDB_ins_code'),
+    'x': ('Cartn_x', 'Cartn_x'),
+    'y': ('Cartn_y', 'Cartn_y'),
+    'z': ('Cartn_z', 'Cartn_z'),
+    'occupancies': ('occupancy', 'occupancy'),
+    'bfactors': ('B_iso_or_equiv', 'B_iso_or_equiv'),
+    'elements': ('type_symbol', 'type_symbol'),
+    'models': ('pdbx_PDB_model_num', 'pdbx_PDB_model_num'),
+}
+
+WRITE_COLUMNS = ['group_PDB', 'id', 'type_symbol', 'label_atom_id', 'label_alt_id', 'label_comp_id',
+                 'label_asym_id', 'label_seq_id', 'pdbx_PDB_ins_code', 'Cartn_x', 'Cartn_y',
+                 'Cartn_z', 'occupancy', 'B_iso_or_equiv', 'auth_seq_id', 'auth_comp_id',
+                 'auth_asym_id', 'auth_atom_id', 'pdbx_PDB_model_num']
+
+TOKENS = re.compile(r"""'(.*?)'(?=\s|$)|"(.*?)"(?=\s|$)|(\S+)""")
+
+
+def is_cif(fn):
+    """Is the file mmCIF (by the extension)?"""
+    return fn.lower().endswith(('.cif', '.cif.gz', '.mmcif'))
+
+
+def _open(fn):
+    if fn.endswith('.gz'):
+        return gzip.open(fn, 'rt')
+    return open(fn)
+
+
+def _split(line):
+    """Split a line of values, with quotes.
+
+    >>> _split('''ATOM 1 C "C1'" A 'a b' 1.0''')
+    ['ATOM', '1', 'C', "C1'", 'A', 'a b', '1.0']
+    """
+    values = line.split()
+    if '"' not in line and "'" not in line:
+        return values
+    for i, v in enumerate(values):
+        if v[0] in '\'"':
+            if len(v) > 1 and v[-1] == v[0]:  # e.g. "C1'"
+                values[i] = v[1:-1]
+            else:  # with spaces
+                return [a or b or c for a, b, c in TOKENS.findall(line)]
+    return values
+
+
+def _none(values, empty=''):
+    """'?' and '.' (no value in mmCIF) to empty."""
+    values = np.array(values)
+    values[(values == '?') | (values == '.')] = empty
+    return values
+
+
+def _to_int(values):
+    values = _none(values, '0')
+    try:
+        return values.astype(int)
+    except ValueError:  # e.g. hetero residues without label_seq_id
+        return np.array([int(v) if v.lstrip('-').isdigit() else 0 for v in values], dtype=int)
+
+
+def read_atom_site(fn, model=1, numbering='auth', hydrogens=True):
+    """Read atoms of a mmCIF file.
+
+    Args:
+        fn (str): a mmCIF file (or .cif.gz)
+        model (int): a model (``pdbx_PDB_model_num``), None for all models
+        numbering (str): ``auth`` (as in the PDB format) or ``label`` for chains, residues,
+            residue and atom names
+        hydrogens (bool): keep hydrogens
+
+    Returns:
+        AtomTable: arrays of atoms, coords (n x 3)
+    """
+    if numbering not in ('auth', 'label'):
+        raise Exception('numbering should be auth or label, not %s' % numbering)
+    keys = []
+    rows = None
+    with _open(fn) as f:
+        for line in f:
+            if rows is None:  # the header of the loop
+                if line.startswith('_atom_site.'):
+                    keys.append(line.split()[0][len('_atom_site.'):])
+                    continue
+                elif keys:  # the first row
+                    index = {}
+                    for k, v in COLUMNS.items():  # e.g. auth_atom_id, if not then label_atom_id
+                        v = v if numbering == 'auth' else v[::-1]
+                        if v[0] in keys or v[1] in keys:
+                            index[k] = keys.index(v[0] if v[0] in keys else v[1])
+                    selected = list(index)
+                    get = operator.itemgetter(*[index[k] for k in selected])
+                    rows = []
+                    model_i = index.get('models')
+                    element_i = index.get('elements')
+                    row = []
+                else:
+                    continue
+            if line.startswith(('_', 'loop_', '#', 'data_')):  # the end of the loop
+                break
+            row.extend(_split(line))
+            if len(row) < len(keys):  # a row in many lines
+                continue
+            if model is not None and model_i is not None and int(row[model_i]) != model:
+                row = []
+                continue
+            if not hydrogens and element_i is not None and row[element_i] in ('H', 'D'):
+                row = []
+                continue
+            rows.append(get(row))
+            row = []
+    if not rows:
+        raise Exception('No atoms (_atom_site) in %s (model: %s)' % (fn, model))
+    columns = dict(zip(selected, zip(*rows)))
+    for k in COLUMNS:
+        if k not in columns:
+            columns[k] = ['?'] * len(rows)
+    return AtomTable(
+        np.array(columns['records']), _to_int(columns['serials']), _none(columns['names']),
+        _none(columns['altlocs']), _none(columns['resnames']), _none(columns['chains']),
+        _to_int(columns['resis']), _none(columns['icodes']),
+        np.array([columns['x'], columns['y'], columns['z']], dtype=float).T,
+        np.array(_none(columns['occupancies'], '1'), dtype=float),
+        np.array(_none(columns['bfactors'], '0'), dtype=float),
+        _none(columns['elements']), _to_int(columns['models']))
+
+
+def read_pdb(fn):
+    """Read atoms (ATOM/HETATM, all models) of a PDB file (or a list of lines) into AtomTable."""
+    rows = []
+    model = 1
+    for l in (_open(fn) if isinstance(fn, str) else fn):
+        if l.startswith('MODEL'):
+            model = int(l[10:14])
+        elif l.startswith(('ATOM', 'HETATM')):
+            name = l[12:16].strip()
+            element = l[76:78].strip() or name.lstrip('0123456789')[:1]
+            rows.append((l[:6].strip(), l[6:11], name, l[16].strip(), l[17:20].strip(), l[21].strip(),
+                         l[22:26], l[26].strip(), l[30:38], l[38:46], l[46:54],
+                         l[54:60].strip() or '1', l[60:66].strip() or '0', element, model))
+    if not rows:
+        raise Exception('No atoms in %s' % (fn if isinstance(fn, str) else 'the lines'))
+    c = list(zip(*rows))
+    return AtomTable(np.array(c[0]), _to_int([s.strip() for s in c[1]]), np.array(c[2]),
+                     np.array(c[3]), np.array(c[4]), np.array(c[5]),
+                     np.array(c[6], dtype=int), np.array(c[7]),
+                     np.array(c[8:11], dtype=float).T, np.array(c[11], dtype=float),
+                     np.array(c[12], dtype=float), np.array(c[13]), np.array(c[14], dtype=int))
+
+
+def _quote(values):
+    """Values for mmCIF: empty to '?', with spaces or quotes, quoted."""
+    out = []
+    for v in values:
+        if not v:
+            v = '?'
+        elif ' ' in v or v[0] in '\'"_#$;[]':
+            v = "'" + v + "'" if "'" not in v else '"' + v + '"'
+        elif "'" in v and v[0] != '"':
+            v = '"' + v + '"'
+        out.append(v)
+    return out
+
+
+def write_atom_site(table, fn=None, name='rna_tools'):
+    """Write atoms (AtomTable) in the mmCIF format, numbering (auth) is also used as label.
+
+    Args:
+        table (AtomTable): atoms
+        fn (str): a file, or None to get text
+
+    Returns:
+        str: text if fn is None
+    """
+    n = len(table.coords)
+    names = _quote(table.names)
+    altlocs = [a or '.' for a in table.altlocs]
+    resnames = _quote(table.resnames)
+    chains = _quote(table.chains)
+    icodes = _quote(table.icodes)
+    elements = _quote(table.elements)
+    records = [r if r else 'ATOM' for r in table.records]
+    fmt = '%s %i %s %s %s %s %s %i %s %.3f %.3f %.3f %.2f %.2f %i %s %s %s %i\n'
+    text = ['data_%s\n#\nloop_\n' % name] + ['_atom_site.%s\n' % c for c in WRITE_COLUMNS]
+    x, y, z = table.coords.T.tolist()
+    text += [fmt % row for row in zip(records, table.serials.tolist(), elements, names, altlocs,
+                                      resnames, chains, table.resis.tolist(), icodes, x, y, z,
+                                      table.occupancies.tolist(), table.bfactors.tolist(),
+                                      table.resis.tolist(), resnames, chains, names,
+                                      table.models.tolist())]
+    text.append('#\n')
+    text = ''.join(text)
+    if fn is None:
+        return text
+    with open(fn, 'w') as f:
+        f.write(text)
+
+
+def to_pdb_lines(table):
+    """Get lines (ATOM/HETATM, no TER/END) in the PDB format of atoms, atoms of more
+    than one model are given in MODEL/ENDMDL records.
+
+    Serials of atoms above 99999 start again from 1, chain ids have to be of one
+    character and residue names of max three characters."""
+    long_chains = set([c for c in table.chains.tolist() if len(c) > 1])
+    if long_chains:
+        raise Exception('Chain ids do not fit the PDB format: %s' % ' '.join(sorted(long_chains)))
+    long_resnames = set([r for r in table.resnames.tolist() if len(r) > 3])
+    if long_resnames:
+        raise Exception('Residue names do not fit the PDB format: %s' % ' '.join(sorted(long_resnames)))
+    models = table.models.tolist()
+    many = len(set(models)) > 1
+    lines = []
+    for k, (rec, serial, name, alt, resname, chain, resi, icode, (x, y, z), occ, b, el) in enumerate(zip(
+            table.records.tolist(), table.serials.tolist(), table.names.tolist(),
+            table.altlocs.tolist(), table.resnames.tolist(), table.chains.tolist(),
+            table.resis.tolist(), table.icodes.tolist(), table.coords.tolist(),
+            table.occupancies.tolist(), table.bfactors.tolist(), table.elements.tolist())):
+        if many and (k == 0 or models[k] != models[k - 1]):
+            if k:
+                lines.append('ENDMDL')
+            lines.append('MODEL     %4i' % models[k])
+        if len(name) < 4 and len(el) < 2:
+            name = ' ' + name
+        lines.append('%-6s%5i %-4s%1s%3s %1s%4i%1s   %8.3f%8.3f%8.3f%6.2f%6.2f          %2s' %
+                     (rec, (serial - 1) % 99999 + 1, name, alt, resname, chain, resi, icode,
+                      x, y, z, occ, b, el))
+    if many:
+        lines.append('ENDMDL')
+    return lines
+
+
+def get_pdb_lines(fn):
+    """Get lines of a PDB file, or of a mmCIF file in the PDB format (see to_pdb_lines())."""
+    if is_cif(fn):
+        return [l + '\n' for l in to_pdb_lines(read_atom_site(fn))]
+    with _open(fn) as f:
+        return f.readlines()
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--to-pdb', action='store_true', help="mmCIF to the PDB format")
+    parser.add_argument('--to-cif', action='store_true', help="PDB to the mmCIF format")
+    parser.add_argument('--model', type=int, default=1, help="a model, 0 for all models")
+    parser.add_argument('--numbering', default='auth', choices=['auth', 'label'],
+                        help="chains and residues of mmCIF as auth_* (default) or label_*")
+    parser.add_argument('file', help="a mmCIF or PDB file")
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    if args.to_pdb:
+        table = read_atom_site(args.file, args.model or None, args.numbering)
+        sys.stdout.write('\n'.join(to_pdb_lines(table)) + '\nEND\n')
+    elif args.to_cif:
+        table = read_pdb(args.file)
+        if args.model:
+            table = AtomTable(*[c[table.models == args.model] for c in table])
+        sys.stdout.write(write_atom_site(table, name=args.file.split('/')[-1].split('.')[0]))
+    else:
+        parser.error('use --to-pdb or --to-cif')
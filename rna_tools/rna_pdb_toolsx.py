@@ -31,9 +31,9 @@ import tempfile
 import progressbar
 
 from rna_tools.rna_tools_lib import edit_pdb, add_header, get_version, \
-                          collapsed_view, fetch, fetch_ba, replace_chain, RNAStructure, \
+                          collapsed_view, fetch_many, replace_chain, RNAStructure, \
                           select_pdb_fragment
-from rna_tools.tools.rna_x3dna.rna_x3dna import x3DNA
+from rna_tools.tools.rna_x3dna.rna_x3dna import get_secstrucs
 
 
 def get_parser():
@@ -73,10 +73,12 @@ def get_parser():
 
     parser.add_argument('--get-chain', help='get chain, one or many, e.g, A, but now also ABC works')
 
-    parser.add_argument('--fetch', action='store_true', help='fetch file from the PDB db')
+    parser.add_argument('--fetch', action='store_true', help=textwrap.dedent("""fetch file from the PDB db,
+many ids can be given, use --threads to download many files at the same time,
+files already downloaded are skipped, e.g. rna_pdb_toolsx.py --fetch --threads 8 1xjr 1y26 2gdi"""))
 
     parser.add_argument('--fetch_ba', action='store_true',
-                        help='fetch biological assembly from the PDB db')
+                        help='fetch biological assembly from the PDB db, works like --fetch')
 
     parser.add_argument('--get_seq', help='get seq', action='store_true')
     parser.add_argument('--hide-warnings', help='hide warnings, works with --get-chain, it hides warnings that given changes are not detected in a PDB file', action='store_true')
@@ -96,6 +98,14 @@ ACCCGCAAGGCCGACGGCGCCGCCGCUGGUGCAAGUCCAGCCACGCUUCGGCGUGGGCGCUCAUGGGU # A:1-68
 
     parser.add_argument('--get_ss', help='get secondary structure', action='store_true')
 
+    parser.add_argument('--native', help=textwrap.dedent("""used with --get_ss, base pairs are annotated with
+rna_bp/bp_annotate.py (no x3dna-dssr needed)"""), action='store_true')
+
+    parser.add_argument('--threads', help='number of threads, used with --get_ss, --fetch and --fetch_ba', type=int, default=1)
+
+    parser.add_argument('--cache', help=textwrap.dedent("""a folder to keep results, used with --get_ss,
+a file is processed again only if its content has changed"""))
+
     parser.add_argument('--rosetta2generic', help='convert ROSETTA-like format to a generic pdb',
                         action='store_true')
 
@@ -285,10 +295,18 @@ if __name__ == '__main__':
         if list != type(args.file):
             args.file = [args.file]
         ##################################
-        for f in args.file:
+        cache = None
+        if args.cache:
+            from rna_tools.Seq import ResultCache
+            cache = ResultCache(args.cache)
+        if args.native:
+            from rna_tools.tools.rna_bp.bp_annotate import get_secstrucs as get_secstrucs_native
+            secstrucs = get_secstrucs_native(args.file, args.threads)
+        else:
+            secstrucs = get_secstrucs(args.file, args.threads, cache)
+        for f, ss in secstrucs:
             output = f + '\n'
-            p = x3DNA(f)
-            output += p.get_secstruc() + '\n'
+            output += ss + '\n'
             try:
                 sys.stdout.write(output)
                 sys.stdout.flush()
@@ -478,46 +496,19 @@ if __name__ == '__main__':
         if list != type(args.file):
             args.file = [args.file]
         ##################################
-        try:
-            from moderna import *
-        except ImportError:
-            raise Exception('To use this functionality please install ModeRNA, e.g. pip install moderna')
+        from rna_tools.tools.rna_mutate.rna_mutate import BaseMutator, parse_mutations
 
         for f in args.file:
             if args.inplace:
                 shutil.copy(f, f + '~')  # create a backup copy if inplace
 
-            # create a working copy of the main file
-            ftf = tempfile.NamedTemporaryFile(delete=False).name  # f temp file
-            shutil.copy(f, ftf)  # create a backup copy if inplace
-
-            # go over each chain
-            for m in args.mutate.split(','):  # A:1A, B:1A
-                chain, resi_mutate_to = m.strip().split(':')  # A:1A+2C
-                resi_mutate_to_list = resi_mutate_to.split('+')  # A:1A+2C
-
-                model = load_model(f, chain)
-                # go over each mutation in this chain
-                for resi_mutate_to in resi_mutate_to_list:
-                    resi = resi_mutate_to[:-1]
-                    mutate_to = resi_mutate_to[-1]
-                    if args.verbose:
-                        print('Mutate', model[resi], 'to', mutate_to)
-                    exchange_single_base(model[resi], mutate_to)
-
-                # multi mutation in one chain
-                tf = tempfile.NamedTemporaryFile(delete=False)
-                model.write_pdb_file(tf.name)
-
-                # work on the copy of f, ftf
-                output = replace_chain(ftf, tf.name, chain)
-                with open(ftf, 'w') as tmp:
-                    tmp.write(output)
+            # one parse, all mutations (all chains) at once, in memory
+            output = BaseMutator(f).mutate(parse_mutations(args.mutate), verbose=args.verbose)
 
             # write: inplace
             if args.inplace:
-                # ftf now is f, get ready for the final output
-                shutil.copy(ftf, f)
+                with open(f, 'w') as tmp:
+                    tmp.write(output)
             else:  # write: to stdout
                 try:
                     sys.stdout.write(output)
@@ -605,10 +596,10 @@ if __name__ == '__main__':
 
 
     if args.fetch:
-        fetch(args.file)
+        fetch_many(args.file, threads=args.threads)
 
     if args.fetch_ba:
-        fetch_ba(args.file)
+        fetch_many(args.file, kind='ba', threads=args.threads)
 
     if args.collapsed_view or args.cv:
         collapsed_view(args)
@@ -6,11 +6,14 @@ VARNA_JAR_NAME = None
 RFAM_DB_PATH = None  # path to Rfam.cm
 CONTEXTFOLD_PATH = None
 CPUS_CLUSTER = 1000
+SCHEDULER = "sge"  # sge, slurm or local (a pool of CPUS_CLUSTER jobs on this machine)
 DIFF_TOOL = "diff"
 
 RNA_ROSETTA_RUN_ROOT_DIR_MODELING = "/home/magnus/rosetta-runs"
 RNA_ROSETTA_NSTRUC = 10000
 
+PDB_DOWNLOAD_URL = "https://files.rcsb.org/download/"  # or a local mirror
+
 EASY_CAT_PATH = ""
 RNASTRUCTURE_PATH = ""
 
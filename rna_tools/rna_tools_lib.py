@@ -9,6 +9,7 @@ import sys
 from collections import OrderedDict
 import re
 import string
+import threading
 import time
 import gzip
 import tempfile
@@ -16,6 +17,9 @@ import shutil
 import subprocess
 
 from rna_tools.tools.extra_functions.select_fragment import select_pdb_fragment_pymol_style, select_pdb_fragment
+from rna_tools.pdb_columns import get_atom_table, set_column
+from rna_tools.rna_mmcif import is_cif, read_atom_site, to_pdb_lines
+from rna_tools.rna_archive import is_archive_ref, get_lines
 
 import logging
 logger = logging.getLogger('rna-pdb-tools')
@@ -93,8 +97,10 @@ class RNAStructure:
 
     Atributes:
 
-        fn (string)  : filename of the pdb file
+        fn (string)  : filename of the pdb file (or a model of an archive, see rna_archive.py)
         lines (list) : the PDB file is loaded and ATOM/HETATM/TER/END go to self.lines
+        atom_table (AtomTable) : atoms of a mmCIF file (the first model), see rna_mmcif.py,
+                       atoms go to self.lines in the PDB format (if they fit it)
 
     """
 
@@ -107,7 +113,18 @@ class RNAStructure:
         self.mol2_format = False
 
         self.lines = []
-        lines = open(fn).read().strip().split('\n')
+        self.atom_table = None
+        if is_cif(fn):
+            self.atom_table = read_atom_site(fn)
+            try:
+                lines = to_pdb_lines(self.atom_table)
+            except Exception as e:  # e.g. chains of 2 characters, only get_seq() works
+                lines = []
+                self.report.append('mmCIF: ' + str(e))
+        elif is_archive_ref(fn):  # a model of an archive, see rna_archive.py
+            lines = get_lines(fn)
+        else:
+            lines = open(fn).read().strip().split('\n')
         self.has_many_models = False
 
         for l in lines:
@@ -351,33 +368,28 @@ class RNAStructure:
 
         .. warning :: take only ATOM and HETATM lines.
         """
-        seq = self.lines[0][19]
         chains = OrderedDict()
         resi_prev = None
         chain_prev = None
-        for l in self.lines:
-            if l.startswith('ATOM') or l.startswith('HETATM'):
-                resi = int(l[22:26])
-                if resi_prev != resi:
-                    resname = l[17:20].strip()
-                    chain_curr = l[21]
-                    if len(resname) == 'GTP':  # DG -> g GTP
-                        resname = 'g'
-                    if len(resname) > 1:  # DG -> g GTP
-                        resname = resname[-1].lower()
+        for chain_curr, resi, resname in self._get_atoms_residues():
+            if resi_prev != resi:
+                if len(resname) == 'GTP':  # DG -> g GTP
+                    resname = 'g'
+                if len(resname) > 1:  # DG -> g GTP
+                    resname = resname[-1].lower()
 
-                    try:
-                        chains[chain_curr]['resi'].append(resi)
-                        chains[chain_curr]['seq'].append(resname)
-                    except KeyError:
-                        chains[chain_curr] = {}
-                        chains[chain_curr]['resi'] = []
-                        chains[chain_curr]['resi'].append(resi)
-                        chains[chain_curr]['seq'] = []
-                        chains[chain_curr]['seq'].append(resname)
+                try:
+                    chains[chain_curr]['resi'].append(resi)
+                    chains[chain_curr]['seq'].append(resname)
+                except KeyError:
+                    chains[chain_curr] = {}
+                    chains[chain_curr]['resi'] = []
+                    chains[chain_curr]['resi'].append(resi)
+                    chains[chain_curr]['seq'] = []
+                    chains[chain_curr]['seq'].append(resname)
 
-                    resi_prev = resi
-                    chain_prev = chain_curr
+                resi_prev = resi
+                chain_prev = chain_curr
 
         for c in list(chains.keys()):
             header = c + ':' + str(chains[c]['resi'][0]) + '-'  # add A:1-
@@ -406,6 +418,15 @@ class RNAStructure:
                 txt += ''.join(chains[c]['seq']) + '\n'
             return txt.strip()
 
+    def _get_atoms_residues(self):
+        """Get (chain, resi, resname) of atoms (ATOM/HETATM), for mmCIF files that do not fit
+        the PDB format (no self.lines) from atom_table."""
+        if self.atom_table is not None and not self.lines:
+            t = self.atom_table
+            return zip(t.chains.tolist(), t.resis.tolist(), t.resnames.tolist())
+        return [(l[21], int(l[22:26]), l[17:20].strip()) for l in self.lines
+                if l.startswith('ATOM') or l.startswith('HETATM')]
+
     def __get_seq(self):
         """get_seq DEPRECATED
 
@@ -1456,16 +1477,9 @@ class RNAStructure:
 
     def set_occupancy_atoms(self, occupancy):
         """
-        :param occupancy:
+        :param occupancy: a value for all atoms, or an array of values (one per atom)
         """
-        nlines = []
-        for l in self.lines:
-            if l.startswith('ATOM'):
-                l = self.set_atom_occupancy(l, 0.00)
-                nlines.append(l)
-            else:
-                nlines.append(l)
-        self.lines = nlines
+        set_column(self.lines, 'occupancy', occupancy, get_atom_table(self.lines).idx)
 
     def edit_occupancy_of_pdb(txt, pdb, pdb_out, v=False):
         """Make all atoms 1 (flexi) and then set occupancy 0 for seletected atoms.
@@ -1645,28 +1659,151 @@ def collapsed_view(args):
             print(l)
 
 
+class PDBFetcher(object):
+    """Download files from the PDB (or from a local mirror) with one shared pool of connections.
+
+    Files are streamed to a temp file and renamed when the download is done, so a file
+    with a given name is always complete. Files that are already there (and look valid)
+    are not downloaded again. Failed requests (errors of connections, 429, 5xx) are
+    retried with an exponential backoff.
+
+    Args:
+        base_url (str): by default PDB_DOWNLOAD_URL from rna_tools_config (https://files.rcsb.org/download/)
+        threads (int): number of downloads at the same time (and the size of the pool of connections)
+        retries (int): how many times a failed request is repeated
+        backoff (float): backoff factor in seconds, sleep between retries is backoff * 2 ** (retry - 1)
+        timeout (float): timeout in seconds of connecting/reading
+        gzip (bool): download <file>.gz and uncompress it on the fly
+    """
+    # kind: (suffix of the url, suffix of the output file)
+    KINDS = {
+        'pdb': ('.pdb', '.pdb'),
+        'ba': ('.pdb1', '_ba.pdb'),
+        'cif': ('.cif', '.cif'),
+        'cif_ba': ('-assembly1.cif', '_ba.cif'),
+    }
+
+    def __init__(self, base_url=None, threads=4, retries=3, backoff=0.5, timeout=60, gzip=False, verbose=False):
+        try:
+            import urllib3
+        except ImportError:
+            raise ImportError('urllib3 is required')
+        if base_url is None:
+            from rna_tools.rna_tools_config import PDB_DOWNLOAD_URL
+            base_url = PDB_DOWNLOAD_URL
+        if not base_url.endswith('/'):
+            base_url += '/'
+        self.base_url = base_url
+        self.threads = threads
+        self.gzip = gzip
+        self.verbose = verbose
+        retry = urllib3.Retry(total=retries, backoff_factor=backoff,
+                              status_forcelist=[429, 500, 502, 503, 504], raise_on_status=False)
+        self.http = urllib3.PoolManager(maxsize=max(threads, 1), block=True, retries=retry,
+                                        timeout=urllib3.Timeout(connect=timeout, read=timeout))
+
+    @staticmethod
+    def is_valid(npath):
+        """Check if a file is there and it's complete (a PDB file ends with END, a cif file
+        starts with data_)."""
+        if not os.path.isfile(npath) or not os.path.getsize(npath):
+            return False
+        with open(npath, 'rb') as f:
+            if npath.endswith('.cif'):
+                return f.read(5) == b'data_'
+            f.seek(max(os.path.getsize(npath) - 100, 0))
+            return b'END' in f.read()
+
+    def get_url(self, pdb_id, kind='pdb'):
+        """Get url of a file of given pdb_id and kind (pdb, ba, cif, cif_ba)."""
+        url = self.base_url + pdb_id + self.KINDS[kind][0]
+        if self.gzip:
+            url += '.gz'
+        return url
+
+    def fetch(self, pdb_id, kind='pdb', path='.', force=False):
+        """Download one file.
+
+        Args:
+            pdb_id (str): e.g. 1xjr
+            kind (str): pdb, ba, cif, cif_ba
+            path (str): output folder
+            force (bool): download even if a valid file is already there
+
+        Returns:
+            str: path to the file
+
+        Raises:
+            PDBFetchError: if the file can not be downloaded
+        """
+        import zlib
+        npath = os.path.join(path, pdb_id + self.KINDS[kind][1])
+        if not force and self.is_valid(npath):
+            if self.verbose:
+                print('already there... ' + npath)
+            return npath
+        url = self.get_url(pdb_id, kind)
+        if self.verbose:
+            print('downloading... ' + url)
+        try:
+            response = self.http.request('GET', url, preload_content=False)
+        except Exception as e:
+            raise PDBFetchError('%s: %s' % (url, e))
+        tmp = npath + '.part%i.%i' % (os.getpid(), threading.current_thread().ident)
+        try:
+            if response.status != 200:
+                raise PDBFetchError('%s: HTTP %i' % (url, response.status))
+            decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if self.gzip else None
+            with open(tmp, 'wb') as f:
+                for chunk in response.stream(2 ** 16):
+                    if decompressor:
+                        chunk = decompressor.decompress(chunk)
+                    f.write(chunk)
+                if decompressor:
+                    f.write(decompressor.flush())
+            os.rename(tmp, npath)
+        except Exception as e:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            if isinstance(e, PDBFetchError):
+                raise
+            raise PDBFetchError('%s: %s' % (url, e))
+        finally:
+            response.release_conn()
+        return npath
+
+    def fetch_many(self, pdb_ids, kind='pdb', path='.', force=False):
+        """Download many files, at most self.threads at the same time.
+
+        Returns:
+            list of (pdb_id, path to the file or None, error or None), in the order of pdb_ids
+        """
+        from multiprocessing.pool import ThreadPool
+
+        def get(pdb_id):
+            try:
+                return pdb_id, self.fetch(pdb_id, kind, path, force), None
+            except PDBFetchError as e:
+                return pdb_id, None, e
+        unique = list(OrderedDict.fromkeys(pdb_ids))  # an id given twice is downloaded once
+        pool = ThreadPool(max(self.threads, 1))
+        try:
+            results = dict((r[0], r) for r in pool.map(get, unique))
+        finally:
+            pool.close()
+        return [results[pdb_id] for pdb_id in pdb_ids]
+
+
 def fetch(pdb_id, path="."):
     """fetch pdb file from RCSB.org
     https://files.rcsb.org/download/1Y26.pdb"""
-    import urllib3
-    http = urllib3.PoolManager()
-    # try:
     pdb_id = pdb_id.replace('.pdb', '')
-    response = http.request('GET', 'https://files.rcsb.org/download/' + pdb_id + '.pdb')
-    if not response.status == 200:
-        raise PDBFetchError()
-
-    # except urllib3.HTTPError:
-    #    raise Exception('The PDB does not exists: ' + pdb_id)
-    txt = response.data
-
     if path != '.':
         npath = path + os.sep + pdb_id + '.pdb'
     else:
         npath = pdb_id + '.pdb'
     print('downloading... ' + npath)
-    with open(npath, 'wb') as f:
-        f.write(txt)
+    PDBFetcher(threads=1).fetch(pdb_id, 'pdb', path, force=True)
     print('ok')
     return npath
 
@@ -1677,46 +1814,53 @@ def fetch_ba(pdb_id, path="."):
     >>> fetch_ba('1xjr')
     ...
     """
-    try:
-        import urllib3
-    except ImportError:
-        print('urllib3 is required')
-        return
-    http = urllib3.PoolManager()
-    # try:
-    response = http.request('GET', url='https://files.rcsb.org/download/' +
-                            pdb_id.lower() + '.pdb1')
-    if not response.status == 200:
-        raise PDBFetchError()
-    txt = response.data
-
     npath = path + os.sep + pdb_id + '_ba.pdb'
     print('downloading...' + npath)
-    with open(npath, 'wb') as f:
-        f.write(txt)
+    PDBFetcher(threads=1).fetch(pdb_id.lower(), 'ba', path, force=True)
+    if pdb_id != pdb_id.lower():
+        os.rename(os.path.join(path, pdb_id.lower() + '_ba.pdb'), npath)
     print('ok')
     return pdb_id + '_ba.pdb'
 
 
 def fetch_cif_ba(cif_id, path="."):
     """fetch biological assembly cif file from RCSB.org"""
-    import urrlib3
-    http = urllib3.PoolManager()
-    # try:
-    response = http.request('GET', url='https://files.rcsb.org/download/' +
-                            cif_id.lower() + '-assembly1.cif')
-    if not response.status == 200:
-        raise PDBFetchError()
-    txt = response.data
-
     npath = path + os.sep + cif_id + '_ba.cif'
     print('downloading...' + npath)
-    with open(npath, 'wb') as f:
-        f.write(txt)
+    PDBFetcher(threads=1).fetch(cif_id.lower(), 'cif_ba', path, force=True)
+    if cif_id != cif_id.lower():
+        os.rename(os.path.join(path, cif_id.lower() + '_ba.cif'), npath)
     print('ok')
     return cif_id + '_ba.cif'
 
 
+def fetch_many(pdb_ids, path=".", kind='pdb', threads=8, base_url=None, gzip=False, force=False):
+    """Fetch many files from RCSB.org (or a mirror, see `base_url`), files
+    that are already in `path` are not downloaded again.
+
+    Args:
+        pdb_ids (list): e.g. ['1xjr', '1y26']
+        kind (str): pdb, ba (biological assembly), cif or cif_ba
+        threads (int): number of downloads at the same time
+        gzip (bool): download gzipped files
+
+    Returns:
+        list of paths to the files (None if a file could not be downloaded)
+    """
+    ids = [i.replace('.pdb', '').replace('.cif', '') for i in pdb_ids]
+    if kind in ['ba', 'cif_ba']:
+        ids = [i.lower() for i in ids]
+    fetcher = PDBFetcher(base_url, threads=threads, gzip=gzip)
+    paths = []
+    for pdb_id, npath, error in fetcher.fetch_many(ids, kind, path, force):
+        if error:
+            print('error: %s' % error)
+        else:
+            print('ok ' + npath)
+        paths.append(npath)
+    return paths
+
+
 def replace_chain(struc_fn, insert_fn, chain_id):
     """Replace chain of the main file (struc_fn) with some new chain (insert_fn) of given chain id.
 
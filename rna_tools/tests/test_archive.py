@@ -0,0 +1,77 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import glob
+import os
+
+import numpy as np
+
+from rna_tools.rna_archive import Archive, expand_archives, get_lines
+from rna_tools.rna_tools_lib import RNAStructure
+from rna_tools.tools.extra_functions.run_journal import RunJournal
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+from rna_tools.tools.rna_calc_rmsd.lib.rmsd.calculate_rmsd import get_coordinates
+
+INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'input')
+RMSD = os.path.join(INPUT, os.pardir, 'tools', 'rna_calc_rmsd', 'test_data')
+
+
+def test_pdb_round_trip(tmpdir):
+    files = sorted(glob.glob(os.path.join(INPUT, '1xjr*.pdb')))
+    fn = str(tmpdir.join('t.rnarc'))
+    with Archive(fn, 'a') as a:
+        for f in files:
+            a.add_pdb(f)
+    a = Archive(fn)
+    assert len(a) == len(files)
+    for f in files:
+        with open(f) as fh:
+            text = fh.read()
+        assert a.get_text(os.path.basename(f)) == text.rstrip('\n') + '\n'
+
+
+def test_append_metadata_and_tools(tmpdir):
+    files = sorted(glob.glob(os.path.join(RMSD, 'struc*.pdb')))
+    fn = str(tmpdir.join('decoys.rnarc'))
+    with Archive(fn, 'a') as a:
+        a.add_pdb(files[0], metadata={'energy': -10})
+    with Archive(fn, 'a') as a:  # append
+        for f in files[1:]:
+            a.add_pdb(f, metadata={'score': 1})
+    a = Archive(fn)
+    assert a.names == [os.path.basename(f) for f in files]
+    assert a.n_topologies == 1
+    assert np.isnan(a.get_metadata('score')[0]) and a.get_metadata('energy')[0] == -10
+    assert a.get_coords(1).dtype == np.float32
+
+    refs = expand_archives([fn])
+    assert len(refs) == len(files)
+    for f, ref in zip(files, refs):
+        assert np.allclose(get_coordinates(ref, None, None, 'pdb', True)[1],
+                           get_coordinates(f, None, None, 'pdb', True)[1])
+        assert np.allclose(get_coord_table(ref).coords, get_coord_table(f).coords)
+        assert RNAStructure(ref).get_seq() == RNAStructure(f).get_seq()
+    with open(files[0]) as f:
+        assert get_lines(refs[0]) == f.read().splitlines()
+
+    j = RunJournal(str(tmpdir.join('rmsds.csv.journal')))
+    assert j.file_hash(refs[0]) == a.get_hash(0) != a.get_hash(1)
+
+
+def test_interrupted_append(tmpdir):
+    files = sorted(glob.glob(os.path.join(RMSD, 'struc*.pdb')))
+    fn = str(tmpdir.join('decoys.rnarc'))
+    with Archive(fn, 'a') as a:
+        for f in files[:3]:
+            a.add_pdb(f)
+    a = Archive(fn, 'a')
+    a.add_pdb(files[3])
+    a._f.close()  # killed, the new index is not written
+    a = Archive(fn)
+    assert a.names == [os.path.basename(f) for f in files[:3]]
+    with open(files[0]) as f:
+        assert a.get_text(os.path.basename(files[0])) == f.read().rstrip('\n') + '\n'
+    with Archive(fn, 'a') as a:  # blocks of the interrupted add are dropped
+        a.add_pdb(files[3])
+    assert Archive(fn).names == [os.path.basename(f) for f in files]
+    with open(files[3]) as f:
+        assert Archive(fn).get_text(os.path.basename(files[3])) == f.read().rstrip('\n') + '\n'
@@ -0,0 +1,90 @@
+#!/usr/bin/env python
+"""Test of PDBFetcher with a local http server (a mirror of the PDB)."""
+import gzip
+import os
+import shutil
+import tempfile
+import threading
+
+try:
+    from http.server import HTTPServer, SimpleHTTPRequestHandler
+except ImportError:  # py2
+    from BaseHTTPServer import HTTPServer
+    from SimpleHTTPServer import SimpleHTTPRequestHandler
+
+from rna_tools.rna_tools_lib import PDBFetcher, PDBFetchError, fetch_many
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+INPUT = os.path.join(DIRNAME, os.pardir, 'input')
+
+REQUESTS = []
+
+
+class FlakyHandler(SimpleHTTPRequestHandler):
+    """Serve files from the current folder, the first request of a file ends with 503."""
+    def do_GET(self):
+        REQUESTS.append(self.path)
+        if REQUESTS.count(self.path) == 1:
+            self.send_error(503)
+            return
+        return SimpleHTTPRequestHandler.do_GET(self)
+
+    def translate_path(self, path):
+        return os.path.join(self.server.root, path.lstrip('/'))
+
+    def log_message(self, *args):
+        pass
+
+
+def start_server():
+    root = tempfile.mkdtemp()
+    shutil.copy(os.path.join(INPUT, '1xjr.pdb'), root)
+    shutil.copy(os.path.join(INPUT, '1xjr_ba.pdb'), os.path.join(root, '1xjr.pdb1'))
+    with open(os.path.join(INPUT, '1xjr.pdb'), 'rb') as f:
+        with gzip.open(os.path.join(root, '1xjr.pdb.gz'), 'wb') as g:
+            g.write(f.read())
+    server = HTTPServer(('127.0.0.1', 0), FlakyHandler)
+    server.root = root
+    t = threading.Thread(target=server.serve_forever)
+    t.daemon = True
+    t.start()
+    return server, 'http://127.0.0.1:%i/' % server.server_address[1]
+
+
+def test_fetcher():
+    server, url = start_server()
+    out = tempfile.mkdtemp()
+    try:
+        with open(os.path.join(INPUT, '1xjr.pdb'), 'rb') as f:
+            correct = f.read()
+        fetcher = PDBFetcher(url, threads=2, backoff=0.01)
+        results = fetcher.fetch_many(['1xjr', 'xxxx'], path=out)
+        assert results[0] == ('1xjr', os.path.join(out, '1xjr.pdb'), None)
+        assert isinstance(results[1][2], PDBFetchError)
+        with open(results[0][1], 'rb') as f:
+            assert f.read() == correct
+        # only the complete file is left
+        assert os.listdir(out) == ['1xjr.pdb']
+
+        # the file is there, so nothing is downloaded
+        n = len(REQUESTS)
+        assert fetcher.fetch('1xjr', path=out) == os.path.join(out, '1xjr.pdb')
+        assert len(REQUESTS) == n
+
+        # gzip and biological assemblies
+        os.remove(os.path.join(out, '1xjr.pdb'))
+        paths = fetch_many(['1xjr'], out, threads=1, base_url=url, gzip=True)
+        with open(paths[0], 'rb') as f:
+            assert f.read() == correct
+        paths = fetch_many(['1XJR'], out, kind='ba', base_url=url)
+        assert paths == [os.path.join(out, '1xjr_ba.pdb')]
+
+        # an id given twice is downloaded once
+        os.remove(os.path.join(out, '1xjr.pdb'))
+        n = len(REQUESTS)
+        results = fetcher.fetch_many(['1xjr', '1xjr'], path=out, force=True)
+        assert results[0] == results[1] == ('1xjr', os.path.join(out, '1xjr.pdb'), None)
+        assert sorted(os.listdir(out)) == ['1xjr.pdb', '1xjr_ba.pdb']
+        assert len(REQUESTS) == n + 1
+    finally:
+        server.shutdown()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import gzip
+import os
+
+import numpy as np
+import pytest
+
+from rna_tools.rna_mmcif import AtomTable, read_atom_site, read_pdb, write_atom_site, to_pdb_lines
+from rna_tools.rna_tools_lib import RNAStructure
+
+INPUT = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'input')
+
+CIF = """data_test
+#
+loop_
+_atom_site.group_PDB
+_atom_site.id
+_atom_site.type_symbol
+_atom_site.label_atom_id
+_atom_site.label_alt_id
+_atom_site.label_comp_id
+_atom_site.label_asym_id
+_atom_site.label_entity_id
+_atom_site.label_seq_id
+_atom_site.pdbx_PDB_ins_code
+_atom_site.Cartn_x
+_atom_site.Cartn_y
+_atom_site.Cartn_z
+_atom_site.occupancy
+_atom_site.B_iso_or_equiv
+_atom_site.auth_seq_id
+_atom_site.auth_comp_id
+_atom_site.auth_asym_id
+_atom_site.auth_atom_id
+_atom_site.pdbx_PDB_model_num
+ATOM   1 P P     . G   A  1 1 ? 1.000 2.000 3.000 1.00 10.00 101 G   A1 P     1
+ATOM   2 C "C1'" . G   A  1 1 ? 2.000 2.000 3.000 1.00 10.00 101 G   A1 "C1'" 1
+ATOM   3 H "H1'" . G   A  1 1 ? 2.500 2.000 3.000 1.00 10.00 101 G   A1 "H1'" 1
+ATOM   4 C "C1'" . C   A  1 2 A 3.000 2.000 3.000
+1.00 10.00 102 C   A1 "C1'" 1
+HETATM 5 MG MG   . MG  B  2 . ? 9.000 9.000 9.000 1.00 20.00 201 MG  A1 MG    1
+ATOM   6 P P     . G   A  1 1 ? 1.100 2.000 3.000 1.00 10.00 101 G   A1 P     2
+#
+"""
+
+
+def test_read(tmpdir):
+    fn = str(tmpdir.join('test.cif'))
+    with open(fn, 'w') as f:
+        f.write(CIF)
+    t = read_atom_site(fn)
+    assert t.names.tolist() == ['P', "C1'", "H1'", "C1'", 'MG']
+    assert t.chains.tolist() == ['A1'] * 5  # auth
+    assert t.resis.tolist() == [101, 101, 101, 102, 201]
+    assert t.icodes.tolist() == ['', '', '', 'A', '']
+    assert np.allclose(t.coords[3], [3, 2, 3])  # a row in two lines
+    t = read_atom_site(fn, numbering='label', hydrogens=False)
+    assert t.chains.tolist() == ['A', 'A', 'A', 'B'] and t.resis.tolist() == [1, 1, 2, 0]
+    assert len(read_atom_site(fn, model=None).coords) == 6
+    assert read_atom_site(fn, model=2).coords.tolist() == [[1.1, 2, 3]]
+    # .gz, chains of 2 characters for get_seq()
+    with gzip.open(fn + '.gz', 'wt') as f:
+        f.write(CIF)
+    s = RNAStructure(fn + '.gz')
+    assert s.lines == [] and s.get_seq() == '> A1:101-102 201-201\nGCg'
+
+
+def test_as_pdb(tmpdir):
+    """A mmCIF file (Biopython, without auth_atom_id etc.) is the same as the PDB file."""
+    p = read_pdb(os.path.join(INPUT, '1a9l_NMR_1_2_models.pdb'))
+    for model in [1, 2]:
+        t = read_atom_site(os.path.join(INPUT, '1a9l_NMR_1_2_models.cif'), model=model)
+        m = p.models == model
+        assert np.allclose(t.coords, p.coords[m])
+        assert t.names.tolist() == p.names[m].tolist() and t.resis.tolist() == p.resis[m].tolist()
+    # write and read again, PDB lines as in the file
+    fn = str(tmpdir.join('1a9l.cif'))
+    write_atom_site(AtomTable(*[c[p.models == 1] for c in p]), fn)
+    lines = to_pdb_lines(read_atom_site(fn))
+    with open(os.path.join(INPUT, '1a9l_NMR_1_2_models.pdb')) as f:
+        pdb = [l[:66] for l in f if l.startswith('ATOM')][:len(lines)]
+    assert [l[:66] for l in lines] == pdb
+    s = RNAStructure(os.path.join(INPUT, '1a9l_NMR_1_2_models.cif'))
+    assert s.get_seq() == RNAStructure(os.path.join(INPUT, '1a9l_NMR_1_2_models.pdb')).get_seq()
+
+
+def test_pdb_models_and_resnames():
+    t = read_atom_site(os.path.join(INPUT, '1a9l_NMR_1_2_models.cif'), model=None)
+    lines = to_pdb_lines(t)
+    assert [l for l in lines if l.startswith(('MODEL', 'ENDMDL'))] == \
+        ['MODEL        1', 'ENDMDL', 'MODEL        2', 'ENDMDL']
+    p = read_pdb(lines)
+    assert p.models.tolist() == t.models.tolist() and np.allclose(p.coords, t.coords)
+    assert not [l for l in to_pdb_lines(read_atom_site(os.path.join(INPUT, '1a9l_NMR_1_2_models.cif')))
+                if l.startswith('MODEL')]
+    t = t._replace(resnames=np.array(['LONGG'] * len(t.resnames)))
+    with pytest.raises(Exception):
+        to_pdb_lines(t)
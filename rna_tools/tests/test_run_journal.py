@@ -0,0 +1,39 @@
+#!/usr/bin/env python
+"""Test of RunJournal, results of a run are kept and re-used."""
+import os
+import tempfile
+
+from rna_tools.tools.extra_functions.run_journal import RunJournal
+
+
+def test_run_journal():
+    d = tempfile.mkdtemp()
+    fn = os.path.join(d, 'out.csv.journal')
+    models = []
+    for i in range(5):
+        models.append(os.path.join(d, 'm%i.pdb' % i))
+        with open(models[-1], 'w') as f:
+            f.write('ATOM %i' % i)
+
+    j = RunJournal(fn, batch_size=2)
+    for m in models[:3]:
+        j.add(m, [m, 1.0], '', 'A:1-10', 'rmsd')
+    # a crash, only full batches are saved
+    j = RunJournal(fn)
+    assert [j.is_done(m, '', 'A:1-10', 'rmsd') for m in models] == [True, True, False, False, False]
+    # other selection or method
+    assert not j.is_done(models[0], '', 'A:1-11', 'rmsd')
+    assert not j.is_done(models[0], '', 'A:1-10', 'inf')
+
+    # a model is changed, so it has to be calculated again
+    with open(models[1], 'w') as f:
+        f.write('ATOM changed')
+    os.utime(models[1], (0, 0))
+    with j:
+        assert not j.is_done(models[1], '', 'A:1-10', 'rmsd')
+        j.add(models[1], [models[1], 2.0], '', 'A:1-10', 'rmsd')
+    j = RunJournal(fn)
+    assert j.get(models[1], '', 'A:1-10', 'rmsd') == [models[1], 2.0]
+    assert j.is_done(models[1], '', 'A:1-10', 'rmsd')
+    # force
+    assert not RunJournal(fn, force=True).is_done(models[0], '', 'A:1-10', 'rmsd')
@@ -0,0 +1,37 @@
+#!/usr/bin/env python
+"""Test of the local scheduler, a pool of jobs run on this machine."""
+import time
+
+from rna_tools.tools.extra_functions.scheduler import LocalScheduler, get_scheduler, \
+    QUEUED, DONE, FAILED
+
+
+def test_local_pool_and_cancel():
+    s = LocalScheduler(cpus=1)
+    ids = [s.submit('sleep 5', name='long'), s.submit('exit 1', name='fail')]
+    assert s.poll([ids[1]]) == {ids[1]: QUEUED}  # one cpu, the second job waits
+    s.cancel([ids[0]])
+    assert s.collect(ids) == {ids[0]: FAILED, ids[1]: FAILED}
+    assert s.jobs() == []
+
+
+def test_cancel_kills_all_processes_of_job():
+    s = LocalScheduler(cpus=1)
+    id = s.submit('sleep 8; echo x', name='long')
+    time.sleep(0.5)
+    s.cancel([id])
+    t = time.time()
+    assert s.collect([id]) == {id: FAILED}
+    assert time.time() - t < 5
+
+
+def test_submit_scripts(tmpdir, monkeypatch):
+    monkeypatch.chdir(str(tmpdir))
+    with open('job.sh', 'w') as f:
+        f.write('#!/bin/bash\n#$ -N t\necho ok > out.txt\n')
+    with open('qsubMINI', 'w') as f:
+        f.write('qsub job.sh\n')
+    s = get_scheduler('local')
+    ids = s.submit_scripts('qsubMINI')
+    assert s.collect(ids) == {ids[0]: DONE}
+    assert open('out.txt').read() == 'ok\n'
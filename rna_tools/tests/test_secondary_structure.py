@@ -0,0 +1,59 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from rna_tools.SecondaryStructure import SecondaryStructure, ExceptionOpenPairsProblem, \
+    parse_vienna_to_pairs
+
+
+def test_levels():
+    ss = '((AB[[))..]]ab{.}<>'
+    s = SecondaryStructure(ss)
+    assert s.to_dot_bracket() == ss
+    assert s.get_pairs(level=4) == [[3, 13]]
+    assert s.partner(2) == 12 and s.partner(12) == 2
+    assert not s.is_paired(9)
+    # levels are assigned again, the same pairs
+    s2 = SecondaryStructure.from_pairs(s.get_pairs(), len(ss))
+    assert s2.get_pairs() == s.get_pairs()
+    assert SecondaryStructure(s2.to_dot_bracket()).get_pairs() == s.get_pairs()
+
+
+def test_errors():
+    with pytest.raises(ExceptionOpenPairsProblem):
+        SecondaryStructure('((..)')
+    with pytest.raises(ExceptionOpenPairsProblem):
+        SecondaryStructure('(..))')
+    with pytest.raises(ExceptionOpenPairsProblem):
+        SecondaryStructure('..Aa..a')
+
+
+def test_ct():
+    seq, ss = 'GGGAAACCCAGAUC', '(((.[[))).]]..'
+    s, seq2 = SecondaryStructure.from_ct(SecondaryStructure(ss).to_ct(seq))
+    assert seq2 == seq
+    assert s.get_pairs() == SecondaryStructure(ss).get_pairs()
+
+
+def test_multiline():
+    s = SecondaryStructure('((..[[))..{{]]..}}')
+    lines = s.to_multiline().split('\n')
+    assert len(lines) == 3
+    assert SecondaryStructure.from_multiline(lines).to_dot_bracket() == '((..[[))..{{]]..}}'
+
+
+def test_helices():
+    s = SecondaryStructure('(((..((...))..)))..((.))')
+    assert s.get_helices() == [(0, 16, 3), (5, 11, 2), (19, 23, 2)]
+
+
+def test_remove_positions():
+    s = SecondaryStructure('((.[-)).]')
+    mask = np.array(list('GG.G-CCC-')) == '-'  # the partner of [ is removed
+    assert s.remove_positions(mask).to_dot_bracket() == '((..)).'
+
+
+def test_parse_vienna_to_pairs():
+    assert parse_vienna_to_pairs('((..[[))..]]') == ([[1, 8], [2, 7]], [[5, 12], [6, 11]])
+    assert parse_vienna_to_pairs('((--))', remove_gaps_in_ss=True) == ([[1, 4], [2, 3]], [])
@@ -0,0 +1,89 @@
+#!/usr/bin/env python
+"""Test of the batch RNAfold/RNAeval driver of Seq with stub programs.
+
+The stubs mimic the CLI of ViennaRNA (multi-record FASTA on stdin) and save
+each call to a log file, so we can count how many times they were run.
+"""
+import os
+import stat
+import tempfile
+
+from rna_tools.Seq import RNASequence, ResultCache, eval_batch, predict_ss_batch
+
+STUB = '''#!/usr/bin/env python
+import os
+import sys
+with open(os.environ['STUB_LOG'], 'a') as f:
+    f.write(' '.join(sys.argv) + '\\n')
+lines = [l.strip() for l in sys.stdin if l.strip()]
+i = 0
+while i < len(lines):
+    name, seq = lines[i], lines[i + 1]
+    i += 2
+    ss = '.' * len(seq)
+    if i < len(lines) and not lines[i].startswith('>'):
+        ss = lines[i]
+        i += 1
+    print(name)
+    print(seq)
+    print('%s (%6.2f)' % (ss, 0.0 - ss.count('(')))
+'''
+
+
+def setup_stubs(monkeypatch):
+    d = tempfile.mkdtemp()
+    for program in ['RNAfold', 'RNAeval', 'RNAsubopt']:
+        fn = os.path.join(d, program)
+        with open(fn, 'w') as f:
+            f.write(STUB)
+        os.chmod(fn, os.stat(fn).st_mode | stat.S_IEXEC)
+    # restored by monkeypatch after the test
+    monkeypatch.setenv('PATH', d + os.pathsep + os.environ['PATH'])
+    monkeypatch.setenv('STUB_LOG', os.path.join(d, 'log'))
+    return os.environ['STUB_LOG']
+
+
+def ncalls(log):
+    if not os.path.exists(log):
+        return 0
+    with open(log) as f:
+        return len(f.readlines())
+
+
+def test_eval_batch(monkeypatch):
+    log = setup_stubs(monkeypatch)
+    cache = ResultCache(tempfile.mkdtemp())
+    seqs = [('GGGAAACCC', '(((...)))'), ('GGAAACC', '((...))'), ('GGGAAACCC', '(((...)))')]
+    assert eval_batch(seqs, cache=cache) == [-3.0, -2.0, -3.0]
+    assert ncalls(log) == 1
+    # all from the cache now, also for a new instance of the cache
+    cache = ResultCache(cache.path)
+    assert eval_batch(seqs, cache=cache) == [-3.0, -2.0, -3.0]
+    seq = RNASequence('GGAAACC')
+    seq.ss = '((...))'
+    assert seq.eval(cache=cache) == -2.0
+    assert ncalls(log) == 1
+
+
+def test_predict_ss_batch(monkeypatch):
+    log = setup_stubs(monkeypatch)
+    cache = ResultCache(tempfile.mkdtemp())
+    seq = RNASequence('GGGAAACCC')
+    seq.name = 'RNA01'
+    out = predict_ss_batch([seq, 'GGAAACC'], constraints=['(((...)))', ''], cache=cache)
+    assert out == ['>RNA01\nGGGAAACCC\n(((...))) ( -3.00)',
+                   '>rna_seq\nGGAAACC\n....... (  0.00)']
+    assert ncalls(log) == 1
+    # the name is not a part of the key
+    seq.name = 'RNA02'
+    assert seq.predict_ss(constraints='(((...)))', cache=cache) == '>RNA02\nGGGAAACCC\n(((...))) ( -3.00)'
+    assert ncalls(log) == 1
+
+
+def test_predict_ss_batch_order(monkeypatch):
+    setup_stubs(monkeypatch)
+    seqs = ['GGGAAACCC', 'GGAAACC']
+    out = predict_ss_batch(seqs, method='RNAsubopt', cache=ResultCache(tempfile.mkdtemp()))
+    # the same result for the last record of a batch
+    assert out == predict_ss_batch(seqs[::-1], method='RNAsubopt')[::-1]
+    assert out[1] == '>rna_seq\nGGAAACC\n....... (  0.00)'
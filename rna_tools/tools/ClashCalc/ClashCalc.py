@@ -2,6 +2,7 @@
 
 from Bio.PDB import NeighborSearch, PDBParser, Selection, Atom
 from numpy import array
+from rna_tools.rna_mmcif import get_pdb_lines
 
 def check_clash(str_name, v=True):
         """check_clash, fract of clashes!
@@ -14,11 +15,11 @@ def check_clash(str_name, v=True):
         c is counter
         """
         print(str_name)
-        structure = open(str_name)
+        structure = get_pdb_lines(str_name)  # a PDB or mmCIF file
         #model = structure[0]
         atoms_A = []
         atoms_B = []
-        for line in structure.readlines():
+        for line in structure:
             if line[:4] == "ATOM":
                 #print line
                 at_nam = line[12:16].strip()
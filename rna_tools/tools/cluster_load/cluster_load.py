@@ -5,11 +5,12 @@ Set MAX_JOBS to calc % of usage, it's an approximation of max number of jobs, e.
 
 .. warning MAX_JOBS in hardcoded in the code. To fix at some point."""
 from __future__ import print_function
-import subprocess
+import getpass
 import logging
 import argparse
 
 from rna_tools.rna_tools_config import CPUS_CLUSTER
+from rna_tools.tools.extra_functions.scheduler import get_scheduler, HELD
 
 MAX_JOBS = CPUS_CLUSTER
 print('MAX_JOBS:', MAX_JOBS)
@@ -22,67 +23,23 @@ handler.setFormatter(formatter)
 logger.addHandler(handler)
 
 
-def stats_for_cluster():
-    """get stats (#jobs) per cluster"""
+def stats_for_cluster(jobs):
+    """get stats (#jobs) per cluster, held jobs (hqw) are skipped"""
+    return sum([j['slots'] for j in jobs if j['state'] != HELD])
 
-    cmd = "/home/oge/bin/lx24-amd64/qstat -u '*'"
 
-    logger.info(cmd)
-
-    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out = p.stdout.read().strip()
-
-    cc = 0
-    for l in out.split('\n'):
-        if l.strip():
-            if l.find('hqw') > -1:
-                continue
-            c = l.split()[-1]
-            try:
-                cc += int(c)
-            except ValueError:
-                pass
-    return cc
-
-
-def stats_for_user():
+def stats_for_user(jobs, user=None):
     """get stats (#jobs) per user"""
-    cmd = "/home/oge/bin/lx24-amd64/qstat "  # -u '*'"
-
-    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out = p.stdout.read().strip()
+    user = user or getpass.getuser()
+    return sum([j['slots'] for j in jobs if j['user'] == user])
 
-    cc = 0
-    for l in out.split('\n'):
-        if l:
-            c = l.split()[-1]
-            try:
-                cc += int(c)
-            except ValueError:
-                pass
-    return cc
 
-
-def per_user():
+def per_user(jobs):
     """get stats (#cpus) per user"""
     # {'deepak': 160, 'azyla': 8, 'magnus': 755}
-    cmd = "/home/oge/bin/lx24-amd64/qstat -u '*'"
-
-    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out = p.stdout.read().strip()
-
     per_user = {}
-    for l in out.split('\n'):
-        if l.startswith('job-ID') or l.startswith('---'):
-            pass
-        else:
-            ll = l.split()
-            user = ll[3]
-            cpus = int(ll[-1])
-            if user in per_user:
-                per_user[user] += cpus
-            else:
-                per_user[user] = cpus
+    for j in jobs:
+        per_user[j['user']] = per_user.get(j['user'], 0) + j['slots']
     return per_user
 
 
@@ -90,6 +47,7 @@ def get_parser():
     parser = argparse.ArgumentParser()
     parser.add_argument("-v", "--verbose", help="increase output verbosity",
                         action="store_true")
+    parser.add_argument('--scheduler', help="sge, slurm or local (default: SCHEDULER of rna_tools_config)")
     return parser
 
 
@@ -100,8 +58,13 @@ if __name__ == '__main__':
     if args.verbose:
         logger.setLevel(logging.INFO)
 
-    cc = stats_for_cluster()
+    # one query of the scheduler for all stats
+    scheduler = get_scheduler(args.scheduler)
+    logger.info(scheduler.name)
+    jobs = scheduler.jobs(all_users=True)
+
+    cc = stats_for_cluster(jobs)
     print('#jobs cluster', cc, 'load: ', cc / float(MAX_JOBS), ' to use:', MAX_JOBS - cc)
-    cc = stats_for_user()
+    cc = stats_for_user(jobs)
     print('#jobs you    ', cc, 'load: ', cc / float(MAX_JOBS), ' to use:', MAX_JOBS - cc)
-    print(per_user())
+    print(per_user(jobs))
@@ -1,15 +1,5 @@
 #!/usr/bin/python
+from rna_tools.tools.extra_functions.scheduler import get_scheduler, HELD
 
-import subprocess
-
-cmd="/home/oge/bin/lx24-amd64/qstat -u '*' | grep -v 'hqw' "
-out = subprocess.getoutput(cmd)
-cc = 0
-for l in out.split('\n'):
-    if l:
-        c = l.split()[-1]
-        try:
-            cc += int(c)
-        except ValueError:
-            pass
+cc = sum([j['slots'] for j in get_scheduler().jobs(all_users=True) if j['state'] != HELD])
 print((cc, cc/1000.0, -(1000 - cc)))
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+"""A journal of a scoring run (e.g. rna_calc_rmsd.py, rna_calc_inf.py), to make runs resumable.
+
+Results are appended to ``<journal>`` (one json record per line) and flushed in batches,
+so if a run crashes only the last batch is lost. A manifest ``<journal>.manifest`` keeps
+sha1 of input files (with their size and time of modification, so files are hashed only if
+they changed). A re-run skips results of (model, target, selection, method) that are
+already in the journal, unless the model or the target has changed::
+
+    >>> import tempfile, os
+    >>> d = tempfile.mkdtemp()
+    >>> model = os.path.join(d, 'model.pdb')
+    >>> with open(model, 'w') as f:
+    ...     _ = f.write('ATOM')
+    >>> with RunJournal(os.path.join(d, 'rmsds.csv.journal')) as j:
+    ...     print(j.is_done(model, method='rmsd'))
+    ...     j.add(model, [1.5, 100], method='rmsd')
+    False
+    >>> j = RunJournal(os.path.join(d, 'rmsds.csv.journal'))
+    >>> j.is_done(model, method='rmsd'), j.get(model, method='rmsd')
+    (True, [1.5, 100])
+"""
+from __future__ import print_function
+
+import hashlib
+import json
+import os
+
+from rna_tools.rna_archive import is_archive_ref, get_model
+
+
+class RunJournal(object):
+    """Append-only results of a run.
+
+    Args:
+        fn (str): a file of the journal, e.g. ``rmsds.csv.journal``
+        batch_size (int): results are written every batch_size results
+        force (bool): ignore results already in the journal (they are kept in the file,
+            the new ones win)
+    """
+    def __init__(self, fn, batch_size=100, force=False):
+        self.fn = fn
+        self.manifest_fn = fn + '.manifest'
+        self.batch_size = batch_size
+        self.records = {}
+        self.buffer = []
+        self.manifest = {}
+        self._manifest_changed = False
+        if os.path.exists(self.manifest_fn):
+            with open(self.manifest_fn) as f:
+                self.manifest = json.load(f)
+        if os.path.exists(fn) and not force:
+            with open(fn) as f:
+                for l in f:
+                    try:
+                        r = json.loads(l)
+                    except ValueError:  # an incomplete line of a crashed run
+                        continue
+                    self.records[self._key(r['model'], r['target'], r['selection'], r['method'])] = r
+
+    @staticmethod
+    def _key(model, target='', selection='', method=''):
+        return (model, target, selection, method)
+
+    def file_hash(self, fn):
+        """Get sha1 of a file, taken from the manifest if the file has not changed."""
+        if not fn:
+            return ''
+        if is_archive_ref(fn):  # a model of an archive, see rna_archive.py
+            a, name = get_model(fn)
+            return a.get_hash(name)
+        fn = os.path.abspath(fn)
+        st = os.stat(fn)
+        entry = self.manifest.get(fn)
+        if entry and entry[0] == st.st_size and entry[1] == st.st_mtime:
+            return entry[2]
+        h = hashlib.sha1()
+        with open(fn, 'rb') as f:
+            for chunk in iter(lambda: f.read(1 << 20), b''):
+                h.update(chunk)
+        self.manifest[fn] = [st.st_size, st.st_mtime, h.hexdigest()]
+        self._manifest_changed = True
+        return h.hexdigest()
+
+    def _get_record(self, model, target, selection, method):
+        return self.records.get(self._key(os.path.abspath(model),
+                                          os.path.abspath(target) if target else '',
+                                          selection, method))
+
+    def is_done(self, model, target='', selection='', method=''):
+        """Is the result in the journal, and are the model and the target not changed."""
+        r = self._get_record(model, target, selection, method)
+        if not r:
+            return False
+        return r['model_hash'] == self.file_hash(model) and r['target_hash'] == self.file_hash(target)
+
+    def get(self, model, target='', selection='', method=''):
+        """Get a result (a row), None if not in the journal."""
+        r = self._get_record(model, target, selection, method)
+        return r['row'] if r else None
+
+    def add(self, model, row, target='', selection='', method=''):
+        """Add a result, row is a list of values (anything that json can keep)."""
+        r = {'model': os.path.abspath(model), 'target': os.path.abspath(target) if target else '',
+             'selection': selection, 'method': method, 'model_hash': self.file_hash(model),
+             'target_hash': self.file_hash(target), 'row': row}
+        self.records[self._key(r['model'], r['target'], selection, method)] = r
+        self.buffer.append(r)
+        if len(self.buffer) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        """Write results from the buffer and the manifest to the disk."""
+        if self.buffer:
+            with open(self.fn, 'a') as f:
+                f.write(''.join([json.dumps(r) + '\n' for r in self.buffer]))
+                f.flush()
+                os.fsync(f.fileno())
+            self.buffer = []
+        if self._manifest_changed:
+            tmp = self.manifest_fn + '.tmp%i' % os.getpid()
+            with open(tmp, 'w') as f:
+                json.dump(self.manifest, f)
+            os.rename(tmp, self.manifest_fn)
+            self._manifest_changed = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.flush()
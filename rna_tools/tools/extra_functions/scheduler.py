@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+"""Schedulers to run jobs (commands or job scripts) on SGE, SLURM or locally.
+
+All backends share the same interface: ``submit()`` (a command) or ``submit_script()``
+(a job script, e.g. of ``qsub_files/``), ``jobs()`` (all jobs with one call of the
+scheduler), ``poll()``, ``cancel()`` and ``collect()`` (wait for jobs to finish).
+States of jobs are unified to the states of SGE: ``qw`` (queued), ``hqw`` (held),
+``r`` (running), ``done``, ``failed`` (and ``Eqw`` for errors of SGE).
+
+Set the backend with ``SCHEDULER`` in rna_tools_config_local.py (``sge``, ``slurm``,
+``local``). The local backend runs jobs in a pool of max ``CPUS_CLUSTER`` workers (but
+not more than cpus of the machine)::
+
+    >>> s = LocalScheduler(cpus=2)
+    >>> ids = [s.submit('echo %i' % i, name='job%i' % i) for i in range(3)]
+    >>> s.collect(ids)
+    {1: 'done', 2: 'done', 3: 'done'}
+    >>> s.get_output(3)
+    '2\\n'
+"""
+from __future__ import print_function
+
+import concurrent.futures
+import getpass
+import os
+import re
+import shlex
+import signal
+import subprocess
+import threading
+import time
+
+from rna_tools.rna_tools_config import CPUS_CLUSTER, SCHEDULER
+
+QUEUED = 'qw'
+HELD = 'hqw'
+RUNNING = 'r'
+DONE = 'done'
+FAILED = 'failed'
+ACTIVE = (QUEUED, HELD, RUNNING)
+
+
+def run_cmd(args):
+    """Run a command (a list of arguments), return stdout, raise Exception on errors."""
+    try:
+        p = subprocess.Popen(args, stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                             universal_newlines=True)
+    except OSError as e:
+        raise Exception('%s can not be run: %s' % (args[0], e))
+    out, err = p.communicate()
+    if p.returncode:
+        raise Exception('%s failed: %s' % (' '.join(args), err.strip()))
+    return out
+
+
+def get_scripts(fn='qsubMINI'):
+    """Get job scripts of a submit file (e.g. qsubMINI of rosetta_submit.py), the last
+    word of each line of ``qsub``/``sbatch``, e.g. ``qsub qsub_files/qsub0.sh``."""
+    scripts = []
+    with open(fn) as f:
+        for l in f:
+            ll = l.split()
+            if ll and ll[0] in ('qsub', 'sbatch', 'bash', 'sh'):
+                scripts.append(ll[-1])
+    return scripts
+
+
+def parse_qstat(out):
+    """Parse the output of ``qstat`` (SGE).
+
+    >>> out = '''job-ID  prior   name       user         state submit/start at     queue                          slots ja-task-ID
+    ... -----------------------------------------------------------------------------------------------------------------
+    ...     123 0.55500 rp17s2199  magnus       r     05/03/2019 21:31:30 all.q@node1                        1
+    ...     124 0.00000 rp17s2185  magnus       qw    05/03/2019 21:31:30                                    8 1-10:1'''
+    >>> [(j['id'], j['name'], j['state'], j['slots']) for j in parse_qstat(out)]
+    [('123', 'rp17s2199', 'r', 1), ('124', 'rp17s2185', 'qw', 8)]
+    """
+    jobs = []
+    for l in out.splitlines():
+        ll = l.split()
+        if not ll or not ll[0].isdigit():  # header, ---
+            continue
+        state = ll[4]
+        if 'E' in state:
+            state = 'Eqw'
+        elif 'h' in state:
+            state = HELD
+        elif state in ('t', 'Rr', 'Rt') or 'r' in state:
+            state = RUNNING
+        else:
+            state = QUEUED
+        # the queue is empty for waiting jobs
+        slots = ll[8] if len(ll) > 8 and '@' in ll[7] else ll[7]
+        jobs.append({'id': ll[0], 'name': ll[2], 'user': ll[3], 'state': state,
+                     'slots': int(slots)})
+    return jobs
+
+
+def parse_squeue(out):
+    """Parse the output of ``squeue -h -o '%i|%j|%u|%t|%C'`` (SLURM).
+
+    >>> [(j['id'], j['state'], j['slots']) for j in parse_squeue('12|rp17_1|magnus|R|1\\n13|rp17_2|magnus|PD|4')]
+    [('12', 'r', 1), ('13', 'qw', 4)]
+    """
+    states = {'R': RUNNING, 'CG': RUNNING, 'PD': QUEUED, 'CF': QUEUED, 'S': HELD}
+    jobs = []
+    for l in out.splitlines():
+        if l.strip():
+            id, name, user, state, slots = l.strip().split('|')
+            jobs.append({'id': id, 'name': name, 'user': user,
+                         'state': states.get(state, QUEUED), 'slots': int(slots)})
+    return jobs
+
+
+class Scheduler(object):
+    """A base of schedulers, jobs() is the only query of the scheduler."""
+    name = ''
+
+    def submit(self, cmd, name='job', cwd='.'):
+        """Submit a command (a shell line), return an id of the job."""
+        raise NotImplementedError
+
+    def submit_script(self, script, name=''):
+        """Submit a job script (with directives of the scheduler, e.g. ``#$ -N``)."""
+        raise NotImplementedError
+
+    def jobs(self, all_users=False):
+        """Get jobs (dicts with id, name, user, state, slots) that are in the scheduler."""
+        raise NotImplementedError
+
+    def cancel(self, ids):
+        """Cancel (kill) jobs, with one call of the scheduler."""
+        raise NotImplementedError
+
+    def submit_scripts(self, fn='qsubMINI'):
+        """Submit job scripts of a submit file (e.g. qsubMINI, see get_scripts())."""
+        return [self.submit_script(s) for s in get_scripts(fn)]
+
+    def poll(self, ids):
+        """Get states of jobs, jobs that are gone from the scheduler are done."""
+        states = dict((j['id'], j['state']) for j in self.jobs())
+        return dict((i, states.get(i, DONE)) for i in ids)
+
+    def collect(self, ids, interval=30):
+        """Wait for jobs (one query of the scheduler per interval), return their states."""
+        while True:
+            states = self.poll(ids)
+            if not [s for s in states.values() if s in ACTIVE]:
+                return states
+            time.sleep(interval)
+
+
+class SGEScheduler(Scheduler):
+    """Sun/Open Grid Engine (qsub, qstat, qdel)."""
+    name = 'sge'
+
+    def _get_id(self, out):
+        # Your job 123 ("rp17") has been submitted
+        return re.search(r'job(?:-array)? (\d+)', out).group(1)
+
+    def submit(self, cmd, name='job', cwd='.'):
+        return self._get_id(run_cmd(['qsub', '-b', 'y', '-wd', os.path.abspath(cwd),
+                                     '-N', name, 'bash', '-c', shlex.quote(cmd)]))
+
+    def submit_script(self, script, name=''):
+        return self._get_id(run_cmd(['qsub'] + (['-N', name] if name else []) + [script]))
+
+    def jobs(self, all_users=False):
+        return parse_qstat(run_cmd(['qstat', '-u', '*' if all_users else getpass.getuser()]))
+
+    def cancel(self, ids):
+        if ids:
+            run_cmd(['qdel'] + list(ids))
+
+
+class SLURMScheduler(Scheduler):
+    """SLURM (sbatch, squeue, scancel)."""
+    name = 'slurm'
+
+    def submit(self, cmd, name='job', cwd='.'):
+        return run_cmd(['sbatch', '--parsable', '-J', name, '-D', os.path.abspath(cwd),
+                        '--wrap', cmd]).strip().split(';')[0]
+
+    def submit_script(self, script, name=''):
+        return run_cmd(['sbatch', '--parsable'] + (['-J', name] if name else []) +
+                       [script]).strip().split(';')[0]
+
+    def jobs(self, all_users=False):
+        return parse_squeue(run_cmd(['squeue', '-h', '-o', '%i|%j|%u|%t|%C'] +
+                                    ([] if all_users else ['-u', getpass.getuser()])))
+
+    def cancel(self, ids):
+        if ids:
+            run_cmd(['scancel'] + list(ids))
+
+
+class LocalScheduler(Scheduler):
+    """Run jobs on this machine, in a pool of cpus workers (each job is a process).
+
+    Args:
+        cpus (int): # of jobs run at once, by default CPUS_CLUSTER of rna_tools_config
+           but not more than cpus of the machine
+    """
+    name = 'local'
+
+    def __init__(self, cpus=None):
+        self.cpus = cpus or min(CPUS_CLUSTER, os.cpu_count() or 1)
+        self.pool = concurrent.futures.ThreadPoolExecutor(max_workers=self.cpus)
+        self.lock = threading.Lock()
+        self._jobs = {}  # id: [name, future, process, cancelled]
+
+    def _run(self, id, args, cwd):
+        with self.lock:
+            job = self._jobs[id]
+            if job[3]:
+                return None
+            # a new session, so cancel() kills also processes started by the job
+            p = subprocess.Popen(args, cwd=cwd, stdout=subprocess.PIPE,
+                                 stderr=subprocess.STDOUT, universal_newlines=True,
+                                 start_new_session=True)
+            job[2] = p
+        out = p.communicate()[0]
+        return p.returncode, out
+
+    def submit(self, cmd, name='job', cwd='.', args=None):
+        with self.lock:
+            id = len(self._jobs) + 1
+            self._jobs[id] = [name, None, None, False]
+            # _run() waits for the lock, so the future is set before the job starts
+            self._jobs[id][1] = self.pool.submit(self._run, id, args or ['bash', '-c', cmd],
+                                                 os.path.abspath(cwd))
+        return id
+
+    def submit_script(self, script, name=''):
+        return self.submit('', name or os.path.basename(script), args=['bash', script])
+
+    def _get_state(self, id):
+        with self.lock:
+            name, future, p, cancelled = self._jobs[id]
+        if cancelled or future.cancelled():
+            return FAILED
+        if future.done():
+            r = future.result()
+            return DONE if r and r[0] == 0 else FAILED
+        return RUNNING if p else QUEUED
+
+    def jobs(self, all_users=False):
+        user = getpass.getuser()
+        with self.lock:
+            names = [(id, job[0]) for id, job in self._jobs.items()]
+        states = [(id, name, self._get_state(id)) for id, name in names]
+        return [{'id': id, 'name': name, 'user': user, 'state': state, 'slots': 1}
+                for id, name, state in states if state in ACTIVE]
+
+    def poll(self, ids):
+        return dict((id, self._get_state(id)) for id in ids)
+
+    def cancel(self, ids):
+        for id in ids:
+            with self.lock:
+                job = self._jobs[id]
+                job[3] = True
+                job[1].cancel()
+                if job[2] and job[2].poll() is None:
+                    try:
+                        os.killpg(job[2].pid, signal.SIGKILL)
+                    except OSError:  # the job has just finished
+                        pass
+
+    def collect(self, ids, interval=None):
+        with self.lock:
+            futures = [self._jobs[id][1] for id in ids]
+        concurrent.futures.wait(futures)
+        return self.poll(ids)
+
+    def get_output(self, id):
+        """Get the output (stdout and stderr) of a finished job."""
+        r = self._jobs[id][1].result()
+        return r[1] if r else ''
+
+
+SCHEDULERS = {'sge': SGEScheduler, 'slurm': SLURMScheduler, 'local': LocalScheduler}
+
+
+def get_scheduler(name=None):
+    """Get a scheduler, by default SCHEDULER of rna_tools_config (sge, slurm or local)."""
+    name = (name or SCHEDULER).lower()
+    if name not in SCHEDULERS:
+        raise Exception('Unknown scheduler: %s (use one of %s)' % (name, ', '.join(sorted(SCHEDULERS))))
+    return SCHEDULERS[name]()
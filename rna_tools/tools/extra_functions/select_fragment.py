@@ -1,26 +1,330 @@
 #!/usr/bin/env python
+"""Selections of fragments of PDB files.
 
+A selection is parsed (compiled) once to a :class:`Selection`, a dictionary of chains with
+:class:`ResidueSet` objects. A ResidueSet keeps ranges of residues (not expanded into lists)
+and a bitmap, so ``resi in selection[chain]`` is O(1), even for a selection of a whole ribosome::
+
+    >>> s = select_pdb_fragment('A:1-3000+B:1-11')
+    >>> 2999 in s['A'], 3001 in s['A'], s.contains('B', 11)
+    (True, False, True)
+
+Selections can be used to get masks for arrays of an atom table, and can be combined
+with ``|``, ``&`` and ``-``::
+
+    >>> s = select_pdb_fragment('A:1-10') - select_pdb_fragment('A:3-8')
+    >>> s['A']
+    [1, 2, 9, 10]
+    >>> s.mask(['A', 'A', 'B'], [1, 5, 1]).tolist()
+    [True, False, False]
+"""
 from __future__ import print_function
 from collections import OrderedDict
 import re
 import string
 import sys
 
+import numpy as np
+
+
+class ResidueSet(object):
+    """Residues of one chain.
+
+    Ranges (inclusive) are kept in the order of the selection, so the set can be
+    used as a list (iteration, ``len``, ``index``, ``[i]``) like before, while
+    membership is tested with a bitmap.
+
+        >>> r = ResidueSet([(10, 12)]) + [1]
+        >>> r
+        [10, 11, 12, 1]
+        >>> 11 in r, 2 in r, r.index(1), r[1]
+        (True, False, 3, 11)
+    """
+    def __init__(self, ranges=()):
+        self.ranges = []
+        self._bits = None
+        self._offset = 0
+        for start, end in ranges:
+            self.add_range(start, end)
+
+    def add_range(self, start, end):
+        """Add a range of residues, ``end`` is included."""
+        start, end = int(start), int(end)
+        if start > end:
+            raise ValueError('range start > end %i-%i' % (start, end))
+        if self.ranges and self.ranges[-1][1] + 1 == start:
+            self.ranges[-1] = (self.ranges[-1][0], end)
+        else:
+            self.ranges.append((start, end))
+        self._bits = None
+
+    def extend(self, residues):
+        """Add residues (a ResidueSet or a list of numbers)."""
+        if isinstance(residues, ResidueSet):
+            for start, end in residues.ranges:
+                self.add_range(start, end)
+        else:
+            for resi in residues:
+                self.add_range(resi, resi)
+        return self
+
+    __iadd__ = extend
+
+    def __add__(self, residues):
+        return ResidueSet(self.ranges).extend(residues)
+
+    def _compile(self):
+        if not self.ranges:
+            self._offset, self._bits = 0, bytearray()
+            return
+        self._offset = min(s for s, e in self.ranges)
+        self._bits = bytearray(max(e for s, e in self.ranges) - self._offset + 1)
+        for start, end in self.ranges:
+            self._bits[start - self._offset:end - self._offset + 1] = b'\x01' * (end - start + 1)
+
+    def __contains__(self, resi):
+        if self._bits is None:
+            self._compile()
+        try:
+            i = int(resi) - self._offset
+        except (TypeError, ValueError):
+            return False
+        return 0 <= i < len(self._bits) and self._bits[i] == 1
+
+    def mask(self, resis):
+        """Get a bool array, True for residues (an array of numbers) in the set."""
+        if self._bits is None:
+            self._compile()
+        i = np.asarray(resis, dtype=int) - self._offset
+        ok = (i >= 0) & (i < len(self._bits))
+        mask = np.zeros(i.shape, dtype=bool)
+        mask[ok] = np.frombuffer(self._bits, dtype=np.uint8)[i[ok]] == 1
+        return mask
+
+    def __iter__(self):
+        for start, end in self.ranges:
+            for resi in range(start, end + 1):
+                yield resi
+
+    def __len__(self):
+        return sum(end - start + 1 for start, end in self.ranges)
+
+    def __bool__(self):
+        return bool(self.ranges)
+
+    __nonzero__ = __bool__
+
+    def index(self, resi):
+        """Get the position of resi in the selection (as list.index)."""
+        resi = int(resi)
+        n = 0
+        for start, end in self.ranges:
+            if start <= resi <= end:
+                return n + resi - start
+            n += end - start + 1
+        raise ValueError('%i is not in the selection' % resi)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return list(self)[i]
+        if i < 0:
+            i += len(self)
+        for start, end in self.ranges:
+            if 0 <= i <= end - start:
+                return start + i
+            i -= end - start + 1
+        raise IndexError('selection index out of range')
+
+    def __eq__(self, other):
+        if isinstance(other, (ResidueSet, list, tuple)):
+            return list(self) == list(other)
+        return NotImplemented
+
+    def __ne__(self, other):
+        eq = self.__eq__(other)
+        return eq if eq is NotImplemented else not eq
+
+    __hash__ = None
+
+    def __repr__(self):
+        return repr(list(self))
+
+    @classmethod
+    def _from_bits(cls, offset, bits):
+        """Make a set (sorted) out of a bool array, bits[0] is residue ``offset``."""
+        r = cls()
+        idx = np.flatnonzero(np.diff(np.concatenate([[0], bits.astype(np.int8), [0]])))
+        for start, end in zip(idx[::2], idx[1::2]):
+            r.add_range(offset + start, offset + end - 1)
+        return r
+
+    def _combine(self, other, op):
+        ranges = self.ranges + other.ranges
+        if not ranges:
+            return ResidueSet()
+        lo = min(s for s, e in ranges)
+        resis = np.arange(lo, max(e for s, e in ranges) + 1)
+        return ResidueSet._from_bits(lo, op(self.mask(resis), other.mask(resis)))
+
+    def __or__(self, other):
+        return self._combine(other, np.logical_or)
+
+    def __and__(self, other):
+        return self._combine(other, np.logical_and)
+
+    def __sub__(self, other):
+        return self._combine(other, lambda a, b: a & ~b)
+
+
+class Selection(OrderedDict):
+    """A compiled selection, chain -> :class:`ResidueSet`.
+
+    Atoms can be selected as well (PyMOL-style selections, ``A/57/O2'``), then
+    ``self.atoms`` keeps for such chains a dictionary atom name -> ResidueSet (``None``
+    for all atoms of residues, a frozenset of names for all atoms but these, e.g. after
+    ``A:1-5`` - ``A/1-3/P``)."""
+    def __init__(self, *args, **kwargs):
+        super(Selection, self).__init__(*args, **kwargs)
+        self.atoms = {}
+
+    def add(self, chain, start, end=None, atoms=None):
+        """Add residues start-end (included) of chain, optionally only atoms (a list of names)."""
+        end = start if end is None else end
+        if atoms and chain not in self.atoms:
+            self.atoms[chain] = {None: ResidueSet(self[chain].ranges)} if chain in self else {}
+        if chain in self.atoms:
+            for atom in (atoms or [None]):
+                self.atoms[chain].setdefault(atom, ResidueSet()).add_range(start, end)
+        self.setdefault(chain, ResidueSet()).add_range(start, end)
+
+    def _get_atoms(self, chain):
+        """Get atoms of chain, atom name -> ResidueSet."""
+        if chain in self.atoms:
+            return self.atoms[chain]
+        return {None: self[chain]} if chain in self else {}
+
+    def contains(self, chain, resi, atom=None):
+        """Is residue (or the atom of the residue) in the selection? If atom is None,
+        True if any atom of the residue is selected."""
+        if chain not in self:
+            return False
+        if atom is None:
+            return resi in self[chain]
+        for key, rs in self._get_atoms(chain).items():
+            if (key == atom or key is None or (isinstance(key, frozenset) and atom not in key)) \
+               and resi in rs:
+                return True
+        return False
+
+    def mask(self, chains, resis, atoms=None):
+        """Get a bool mask for arrays of an atom table (chain ids, residue numbers, and
+        optionally atom names)."""
+        chains = np.asarray(chains)
+        resis = np.asarray(resis, dtype=int)
+        mask = np.zeros(len(resis), dtype=bool)
+        for chain in self:
+            in_chain = chains == chain
+            if atoms is None:
+                mask[in_chain] = self[chain].mask(resis[in_chain])
+                continue
+            names = np.asarray(atoms)[in_chain]
+            m = np.zeros(len(names), dtype=bool)
+            for atom, rs in self._get_atoms(chain).items():
+                sel = rs.mask(resis[in_chain])
+                if atom is None:
+                    m |= sel
+                elif isinstance(atom, frozenset):
+                    m |= sel & ~np.isin(names, list(atom))
+                else:
+                    m |= sel & (names == atom)
+            mask[in_chain] = m
+        return mask
+
+    def _get_classes(self, chain, names):
+        """Get residues of chain selected for every atom of names, and for any other atom
+        (``None``)."""
+        classes = dict((n, ResidueSet()) for n in names)
+        classes[None] = ResidueSet()
+        for key, rs in self._get_atoms(chain).items():
+            if key is None or isinstance(key, frozenset):  # all atoms (but excluded ones)
+                for n in classes:
+                    if n is None or not key or n not in key:
+                        classes[n] = classes[n] | rs
+            else:
+                classes[key] = classes[key] | rs
+        return classes
+
+    @staticmethod
+    def _from_classes(classes):
+        """Get atoms (as _get_atoms()) of residues selected for atoms (see _get_classes())."""
+        whole = classes[None]
+        atoms = {}
+        groups = [(frozenset(), whole)]  # residues of all atoms but some, by excluded atoms
+        for n in sorted(n for n in classes if n is not None):
+            rs = classes[n]
+            if rs - whole:
+                atoms[n] = rs - whole
+            excluded = whole - rs
+            if excluded:
+                groups = [(e | set([n]) if k else e, g & excluded if k else g - excluded)
+                          for e, g in groups for k in (True, False)]
+                groups = [(e, g) for e, g in groups if g]
+        for e, g in groups:
+            if g:
+                atoms[e or None] = g
+        return atoms
+
+    def _combine(self, other, op):
+        """Combine selections, residues of every atom (see _get_classes()) with op."""
+        s = Selection()
+        for chain in list(self) + [c for c in other if c not in self]:
+            names = set()
+            for sel in (self, other):
+                for key in sel._get_atoms(chain):
+                    if isinstance(key, frozenset):
+                        names |= key
+                    elif key is not None:
+                        names.add(key)
+            a, b = self._get_classes(chain, names), other._get_classes(chain, names)
+            atoms = self._from_classes(dict((n, op(a[n], b[n])) for n in a))
+            if not atoms:
+                continue
+            residues = ResidueSet()
+            for rs in atoms.values():
+                residues = residues | rs
+            s[chain] = residues
+            if list(atoms) != [None]:
+                s.atoms[chain] = atoms
+        return s
+
+    def union(self, other):
+        return self._combine(other, lambda a, b: a | b)
+
+    def intersection(self, other):
+        return self._combine(other, lambda a, b: a & b)
+
+    def difference(self, other):
+        return self._combine(other, lambda a, b: a - b)
+
+    __or__ = union
+    __and__ = intersection
+    __sub__ = difference
+
+
 def select_pdb_fragment(txt, separator="-", splitting='[:\+]', verbose=False):
-    """Take txt such as ``A:1-31+B:1-11`` and parse into::
+    """Take txt such as ``A:1-31+B:1-11`` and parse into a :class:`Selection`::
 
-          OrderedDict([('A', [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14, 
+          Selection([('A', [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11, 12, 13, 14,
           15, 16, 17, 18, 19, 20, 21, 22, 23, 24, 25, 26, 27, 28, 29, 30, 31]),
-          ('B', [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11])])          
-    
+          ('B', [1, 2, 3, 4, 5, 6, 7, 8, 9, 10, 11])])
+
       .. warning:: e.g. for A:1-31, resi 31 is included"""
     txt = txt.replace(' ','')
     if verbose: print(txt)
-    #l = re.split, txt)
     l = re.split(splitting, txt)
     if verbose: print(l)
 
-    selection = OrderedDict()
+    selection = Selection()
     for i in l: # ['A', '1-10', '15', '25-30', 'B', '1-10']
         if i in string.ascii_letters:
             if verbose: print('chain', i)
@@ -34,67 +338,52 @@ def select_pdb_fragment(txt, separator="-", splitting='[:\+]', verbose=False):
             if start > ends:
                 print('Error: range start > end ' + i, file=sys.stderr)
                 sys.exit(1)
-            index = list(range(int(start), int(ends)+1)) # without +1 python like, with +1 people-like
+            selection.add(chain_curr, start, ends)
         else:
-            index=[int(i)]
-        if chain_curr in selection:
-            selection[chain_curr] += index
-        else:
-            selection[chain_curr] = index
+            selection.add(chain_curr, int(i))
     return selection
 
 
 def select_pdb_fragment_pymol_style(txt):
-    """Take txt such as A/10-15/P and parse into::
-    
-      A/57/O2' -> ['A', ['57'], "O2'"]
+    """Take txt such as A/10-15/P and parse into a :class:`Selection` with atoms::
+
+      >>> s = select_pdb_fragment_pymol_style("A/57/O2'")
+      >>> s.contains('A', 57, "O2'"), s.contains('A', 57, 'P')
+      (True, False)
 
     If you want to combine a few subselections, please use ``,``::
- 
+
        --model_ignore_selection "A/57/O2',A/58/O2'"
-    
-    .. warning:: e.g. for A:1-31, resi 31 is included"""
-    v = 0
-    selection = OrderedDict()
-    if txt.find(',') > -1:
-        txt = txt.replace(' ','').split(',')
-    else:
-        txt = [txt]
-    for t in txt:
-        l = t.split('/')
-        if v:print(l)
-        l[1] = l[1].split('+')
 
+    .. warning:: e.g. for A/1-31/P, resi 31 is included"""
+    selection = Selection()
+    for t in txt.replace(' ', '').split(','):
+        l = t.split('/')
         if l[0] in string.ascii_letters:
             chain_curr = l[0]
-
-        for i in l[1]:
+        atoms = l[2].split('+')
+        for i in l[1].split('+'):
             if i.find('-') > -1:
                 start, ends = i.split('-')
-                if start > ends:
+                if int(start) > int(ends):
                     print('Error: range start > end ' + i, file=sys.stderr)
                     return False
-                index = list(range(int(start), int(ends)))#+1)
+                selection.add(chain_curr, int(start), int(ends), atoms)
             else:
-                index=[int(i)]
-
-            index_and_atoms = [index, l[2].split('+')]
-            if v: print(index_and_atoms)
-
-            if chain_curr in selection:
-                selection[chain_curr] += [index_and_atoms]
-            else:
-                selection[chain_curr] = [index_and_atoms]
-
+                selection.add(chain_curr, int(i), atoms=atoms)
     return selection
 
+
 def is_in_selection(selection, curr_chain_id, curr_resi, curr_atom_name):
+    """Is the atom in the selection (see select_pdb_fragment_pymol_style())."""
+    if isinstance(selection, Selection):
+        return selection.contains(curr_chain_id, curr_resi, curr_atom_name)
     if curr_chain_id in selection:
-            for sele_range in selection[curr_chain_id]:
-                if curr_resi in sele_range[0]:
-                        if curr_atom_name in sele_range[1]:
-                            return True
-    return False                  
+        for sele_range in selection[curr_chain_id]:
+            if curr_resi in sele_range[0]:
+                if curr_atom_name in sele_range[1]:
+                    return True
+    return False
 
 #main
 if __name__ == '__main__':
@@ -108,9 +397,9 @@ if __name__ == '__main__':
     if selection:
         print(is_in_selection(selection, curr_chain_id, curr_resi, curr_atom_name))
 
-    print(is_in_selection(selection, 'X', curr_resi, curr_atom_name))        
-    print(is_in_selection(selection, 'E', curr_resi, "C'"))        
-    print(is_in_selection(selection, 'A', curr_resi, "P'"))        
+    print(is_in_selection(selection, 'X', curr_resi, curr_atom_name))
+    print(is_in_selection(selection, 'E', curr_resi, "C'"))
+    print(is_in_selection(selection, 'A', curr_resi, "P'"))
 
     print(select_pdb_fragment_pymol_style('A/48/OP2,B/48/OP2'))
 
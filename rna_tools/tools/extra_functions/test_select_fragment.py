@@ -0,0 +1,44 @@
+from rna_tools.tools.extra_functions.select_fragment import (ResidueSet, select_pdb_fragment,
+                                                             select_pdb_fragment_pymol_style)
+
+
+def test_residue_set():
+    r = ResidueSet([(10, 12), (1, 1)])
+    assert list(r) == [10, 11, 12, 1] and len(r) == 4
+    assert 11 in r and 2 not in r and 'x' not in r
+    assert r.mask([0, 1, 12, 13]).tolist() == [False, True, True, False]
+    assert list(r | ResidueSet([(2, 3)])) == [1, 2, 3, 10, 11, 12]
+    assert list(r & ResidueSet([(11, 20)])) == [11, 12]
+    assert list(r - ResidueSet([(11, 11)])) == [1, 10, 12]
+
+
+def test_residue_sets():
+    a = select_pdb_fragment('A:1-10+B:1-5')
+    b = select_pdb_fragment('A:5-15+C:1')
+    assert (a | b)['A'] == list(range(1, 16)) and list(a | b) == ['A', 'B', 'C']
+    assert (a & b)['A'] == list(range(5, 11)) and list(a & b) == ['A']
+    assert (a - b)['A'] == [1, 2, 3, 4] and (a - b)['B'] == [1, 2, 3, 4, 5]
+
+
+def test_atoms():
+    a = select_pdb_fragment('A:1-5')
+    p = select_pdb_fragment_pymol_style('A/1-3/P')
+    u = select_pdb_fragment_pymol_style("A/2/P+O2'") | p
+    assert u.contains('A', 2, "O2'") and u.contains('A', 3, 'P') and not u.contains('A', 3, "O2'")
+    i = a & select_pdb_fragment_pymol_style('A/4-8/P')
+    assert i['A'] == [4, 5] and i.contains('A', 4, 'P') and not i.contains('A', 4, 'N1')
+    assert not (p - a)
+
+
+def test_residues_minus_atoms():
+    s = select_pdb_fragment('A:1-5') - select_pdb_fragment_pymol_style('A/1-3/P')
+    assert s['A'] == [1, 2, 3, 4, 5]
+    assert not s.contains('A', 2, 'P') and s.contains('A', 2, "C1'") and s.contains('A', 4, 'P')
+    mask = s.mask(['A'] * 4 + ['B'], [2, 2, 4, 6, 2], ['P', 'N1', 'P', 'P', 'N1'])
+    assert mask.tolist() == [False, True, True, False, False]
+    # atoms removed from residues can be added back, and removed from all atoms of residues
+    s = s | select_pdb_fragment_pymol_style('A/2/P')
+    assert s.contains('A', 2, 'P') and not s.contains('A', 3, 'P')
+    s = s - select_pdb_fragment_pymol_style("A/3/O2'")
+    assert not s.contains('A', 3, "O2'") and not s.contains('A', 3, 'P') and s.contains('A', 3, 'N1')
+    assert (s & select_pdb_fragment_pymol_style('A/1-5/P'))['A'] == [2, 4, 5]
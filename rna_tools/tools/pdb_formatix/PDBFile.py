@@ -1,17 +1,16 @@
 #!/usr/bin/env python
 # -*- coding: utf-8 -*-
+import numpy as np
+
+from rna_tools.pdb_columns import set_column
 from rna_tools.tools.pdb_formatix.SingleLineUtils import get_res_code, get_res_num, get_atom_code, \
-    set_atom_code, set_line_bfactor
-import re
+    set_atom_code
 
 
 class PDBFile(object):
     """Class for holding data from a PDB file and modifying it.
     """
 
-    # find 'ATOM' lines in a PDB file
-    ATOM_LINE_PATTERN = re.compile('^ATOM')
-
     # dictionary for changing residue names from 3 letters to 1 letter
     RES3TO1 = {
         'GUA': 'G',
@@ -69,6 +68,10 @@ class PDBFile(object):
              * pdb_string = PDB as a string
              * pdb_path = string with path to a PDB file
              * pdb_handle = handle to a PDB file
+
+        The structure is kept as a list of lines (``pdb_lines``), this is the
+        only canonical copy of the data. ``pdb_string`` is built from the lines
+        on demand (and cached until the next fix is applied).
         """
         self.verbose = verbose
 
@@ -83,9 +86,36 @@ class PDBFile(object):
                 input_string = f.read()
         elif pdb_handle is not None:
             input_string = pdb_handle.read()
-        self.pdb_string = input_string
-        self.pdb_lines = self.pdb_string.split('\n')
         self.fixes = []
+        # list of (fix_name, number of lines changed by this fix)
+        self.changes = []
+        self.set_string(input_string)
+
+    @property
+    def pdb_lines(self):
+        """List of lines of the PDB file (canonical representation)."""
+        return self._lines
+
+    @pdb_lines.setter
+    def pdb_lines(self, lines):
+        self._lines = lines
+        self._invalidate()
+
+    @property
+    def pdb_string(self):
+        """PDB file as a string, materialized from ``pdb_lines`` only when needed."""
+        if self._string is None:
+            self._string = '\n'.join(self._lines)
+        return self._string
+
+    @pdb_string.setter
+    def pdb_string(self, pdb_string):
+        self.set_string(pdb_string)
+
+    def _invalidate(self):
+        """Drop everything that is computed from the lines (string, ATOM index)."""
+        self._string = None
+        self._atom_idx = None
 
     def save(self, file_path):
         """Save current PDB to disk
@@ -96,24 +126,41 @@ class PDBFile(object):
         with open(file_path, 'w') as f:
             f.write(self.pdb_string)
 
-    def _apply_fix(self, fix_name, result_string, result_lines=None):
+    def _apply_fix(self, fix_name, result_lines, changed=None):
         """Helper function for applying fixes and saving information about them.
 
         Arguments:
-          * fix_name = string that will be added to self.pdb_fixes, unless
-            result_string is the same as pdb_string
-          * result_string = string after applying this fix
-          * result_lines = optional, list of lines, use this argument if you
-            already have such list and don't want to lose time on splitting
-            result_string
+          * fix_name = string that will be added to self.fixes, unless
+            result_lines are the same as pdb_lines
+          * result_lines = list of lines after applying this fix (a string
+            is accepted as well and split into lines)
+          * changed = optional, number of lines changed by the fix, if you
+            know it; if not given the line lists are compared
         """
-        if self.pdb_string != result_string:
-            self.fixes.append(fix_name)
-            self.pdb_string = result_string
-            if result_lines is not None:
-                self.pdb_lines = result_lines
+        if isinstance(result_lines, str):
+            result_lines = result_lines.split('\n')
+        if changed is None:
+            if result_lines == self._lines:
+                return
+            if len(result_lines) == len(self._lines):
+                changed = sum(1 for a, b in zip(result_lines, self._lines) if a != b)
             else:
-                self.pdb_lines = self.pdb_string.split('\n')
+                changed = abs(len(result_lines) - len(self._lines))
+        self._lines = result_lines
+        self._record_fix(fix_name, changed)
+
+    def _record_fix(self, fix_name, changed):
+        """Register a fix that modified ``self.pdb_lines`` in place.
+
+        Arguments:
+          * fix_name = name of the fix
+          * changed = number of lines changed, nothing is recorded for 0
+        """
+        if not changed:
+            return
+        self.fixes.append(fix_name)
+        self.changes.append((fix_name, changed))
+        self._invalidate()
 
     def set_string(self, pdb_string):
         """Change PDB string stored in this instance of the class
@@ -121,13 +168,21 @@ class PDBFile(object):
         Arguments:
           * pdb_string = new PDB string
         """
-        self.pdb_string = pdb_string
-        self.pdb_lines = pdb_string.split('\n')
+        self._lines = pdb_string.split('\n')
+        self._invalidate()
+        self._string = pdb_string
+
+    def _get_atom_indexes(self):
+        """Get indexes of lines with ATOM information (cached until the next fix)
+        """
+        if self._atom_idx is None:
+            self._atom_idx = [i for i, l in enumerate(self._lines) if l.startswith('ATOM')]
+        return self._atom_idx
 
     def _get_atom_lines(self):
         """Get only lines with ATOM information
         """
-        return [l for l in self.pdb_lines if re.match(self.ATOM_LINE_PATTERN, l)]
+        return [self._lines[i] for i in self._get_atom_indexes()]
 
     def validate_pdb(self):
         """Check if file is a PDB structure
@@ -210,7 +265,7 @@ class PDBFile(object):
         """Remove all lines that are not ATOMs
         """
         result = self._get_atom_lines()
-        self._apply_fix('Removed non-atom lines', '\n'.join(result), result)
+        self._apply_fix('Removed non-atom lines', result)
 
     def _check_resname_3(self):
         """Check if PDB uses 3 or 1 letter residue names.
@@ -218,25 +273,27 @@ class PDBFile(object):
         Output:
           * bool, True if 3 letters, False otherwise
         """
-        for l in self.pdb_lines:
-            if l.startswith('ATOM'):
-                return 3 == len(l.split()[3])
+        for i in self._get_atom_indexes():
+            return 3 == len(self._lines[i].split()[3])
 
     def _resname_3to1(self):
         """Convert residue names in PDB file from 3 letters to 1 letter.
         """
-        result = []
-        for l in self.pdb_lines:
-            if l.startswith('ATOM'):
-                long_name = l.split()[3]
-                try:
-                    short_name = self.RES3TO1[long_name]
-                except KeyError:
-                    short_name = 'X'
-                result.append(l[:17] + '  ' + short_name + l[20:])
-            else:
-                result.append(l)
-        self._apply_fix('resname_3to1', '\n'.join(result), result)
+        lines = self._lines
+        updates = []
+        for i in self._get_atom_indexes():
+            l = lines[i]
+            long_name = l.split()[3]
+            try:
+                short_name = self.RES3TO1[long_name]
+            except KeyError:
+                short_name = 'X'
+            new_line = l[:17] + '  ' + short_name + l[20:]
+            if new_line != l:
+                updates.append((i, new_line))
+        for i, new_line in updates:
+            lines[i] = new_line
+        self._record_fix('resname_3to1', len(updates))
 
     def resname_check_and_3to1(self):
         """Check if resnames are 3 letter long and if so convert them to 1 letter.
@@ -250,25 +307,24 @@ class PDBFile(object):
     def terminate_chains(self):
         """Add 'TER' at the end of chain if none 'TER's are found in PDB.
         """
-        for l in self.pdb_lines:
+        for l in self._lines:
             if l.startswith('TER'):
                 return
-        else:
-            result = []
-            chain_started = False
-            ter_added = False
-            for l in self.pdb_lines:
-                if 'ATOM' in l:
-                    chain_started = True
-                else:
-                    if chain_started:
-                        result.append('TER')
-                        ter_added = True
-                        chain_started = False
-                result.append(l)
+        result = []
+        chain_started = False
+        ter_added = False
+        for l in self._lines:
+            if 'ATOM' in l:
+                chain_started = True
+            else:
+                if chain_started:
+                    result.append('TER')
+                    ter_added = True
+                    chain_started = False
+            result.append(l)
         if not ter_added:
             result.append('TER')
-        self._apply_fix('terminate_chains', '\n'.join(result), result)
+        self._apply_fix('terminate_chains', result)
 
     def _split_by_ters(self, separator='TER\n'):
         """Split a PDB string by TER lines or other separator
@@ -281,58 +337,78 @@ class PDBFile(object):
     def remove_short_chains(self, threshold=9):
         """Remove chains that have chains with a small number of atoms.
 
+        Chains are separated by 'TER' lines. A separator between two chains
+        that are kept is left as an empty line.
+
         Arguments:
           * threshold = if chain has more atoms, it stays in the result
         """
-        chains = self.pdb_string.split('TER\n')
-        good_chains = [c for c in chains if len(c.split('\nATOM')) > threshold]
-        self._apply_fix('remove_short_chains', '\n'.join(good_chains))
+        lines = self._lines
+        # indexes of lines that split the file into chains, the last line
+        # can not be a separator (there is no new line after it)
+        borders = [i for i, l in enumerate(lines[:-1]) if l == 'TER']
+        starts = [0] + [i + 1 for i in borders]
+        ends = borders + [len(lines)]
+        result = []
+        for chain_no, (start, end) in enumerate(zip(starts, ends)):
+            # the first line of a chain is not counted (as in the original
+            # string-based implementation, atoms were counted by '\nATOM')
+            natoms = 1 + sum(1 for l in lines[start + 1:end] if l.startswith('ATOM'))
+            if natoms > threshold:
+                result.extend(lines[start:end])
+                if chain_no < len(borders):
+                    result.append('')
+        if not result:
+            result = ['']
+        self._apply_fix('remove_short_chains', result)
 
     def check_and_add_P_at_start(self):
-        residues = {}
-        for l in self.pdb_lines:
+        """Check if the first residue has a P atom, if not, rename O5' to P.
+
+        The lines are modified in place, the order of the lines is kept.
+        """
+        first_resi = None
+        first_residue = []
+        for i, l in enumerate(self._lines):
             res_num = get_res_num(l)
-            if res_num in residues:
-                residues[res_num].append(l)
-            else:
-                residues[res_num] = [l]
-        first_residue = residues[min(residues.keys())]
+            if first_resi is None or res_num < first_resi:
+                first_resi = res_num
+                first_residue = [i]
+            elif res_num == first_resi:
+                first_residue.append(i)
         # check P
-        has_p = False
-        for l in first_residue:
-            if get_atom_code(l) == 'P':
-                has_p = True
-        if not has_p:
-            # add P
-            corrected_residue = []
-            for l in first_residue:
-                if get_atom_code(l) == 'O5\'' or get_atom_code(l) == 'O5*':
-                    corrected_residue.append(set_atom_code(l, 'P'))
-                else:
-                    corrected_residue.append(l)
-            residues[min(residues.keys())] = corrected_residue
-            residues = ['\n'.join(residues[r]) for r in residues]
-            self._apply_fix('add_P_at_start', '\n'.join(residues))
+        for i in first_residue:
+            if get_atom_code(self._lines[i]) == 'P':
+                return
+        # add P
+        changed = 0
+        for i in first_residue:
+            l = self._lines[i]
+            if get_atom_code(l) == 'O5\'' or get_atom_code(l) == 'O5*':
+                self._lines[i] = set_atom_code(l, 'P')
+                changed += 1
+        self._record_fix('add_P_at_start', changed)
 
     def set_residues_bfactor(self, bfactors):
         """Set B-factor to any value you want
 
         Arguments:
-          * bfactors = list of B-factors that will be set, should be of same
-            length as nucleotide sequence
+          * bfactors = list (or an array) of B-factors that will be set, should be
+            of same length as nucleotide sequence, ATOM lines of residues without
+            a B-factor are removed
         """
-        ans = []
-        for l in self.pdb_lines:
-            if l.startswith('ATOM'):
-                res_num = get_res_num(l)
-                try:
-                    ans.append(set_line_bfactor(l, bfactors[res_num - 1]))
-                except IndexError:
-                    pass
-            else:
-                ans.append(l)
-        self.pdb_lines = ans
-        self.pdb_string = '\n'.join(ans)
+        lines = self._lines
+        idx = np.array([i for i, l in enumerate(lines) if l.startswith('ATOM')], dtype=int)
+        res_nums = np.array([get_res_num(lines[i]) for i in idx], dtype=int)
+        bfactors = np.asarray(bfactors, dtype=float)
+        ok = res_nums <= len(bfactors)
+        set_column(lines, 'bfactor', bfactors[res_nums[ok] - 1], idx[ok])
+        if ok.all():
+            self._record_fix('set_residues_bfactor', len(idx))
+        else:
+            drop = set(idx[~ok].tolist())
+            ans = [l for i, l in enumerate(lines) if i not in drop]
+            self._apply_fix('set_residues_bfactor', ans, len(idx))
 
     def pedantic_pdb(self):
         """Do everything that's possible to fix PDB: 3-to-1, no HETATMs, TERs etc.
@@ -366,7 +442,7 @@ class PDBFile(object):
         result = self.pdb_lines[:model_borders[0][0]]
         result.extend(self.pdb_lines[model_borders[model_num][0]:model_borders[model_num][1] + 1])
         result.extend(self.pdb_lines[model_borders[-1][1] + 1:])
-        self._apply_fix('get_model', '\n'.join(result), result)
+        self._apply_fix('get_model', result)
 
     def check_and_get_first_model(self):
         """Check if there are more than one models and get only the first one
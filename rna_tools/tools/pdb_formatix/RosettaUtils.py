@@ -36,7 +36,7 @@ class RosettaPDBFile(PDBFile):
             else:
                 if not l.startswith('HETATM'):
                     result.append(l)
-        self._apply_fix('make_rna_rosetta_ready', '\n'.join(result), result)
+        self._apply_fix('make_rna_rosetta_ready', result)
     
     
     def make_rna_non_rosetta(self):
@@ -55,4 +55,4 @@ class RosettaPDBFile(PDBFile):
                 result.append(line[:18] + ' ' + line[19:])
             else:
                 result.append(l)
-        self._apply_fix('make_rna_non_rosetta_ready', '\n'.join(result), result)
\ No newline at end of file
+        self._apply_fix('make_rna_non_rosetta_ready', result)
\ No newline at end of file
@@ -93,20 +93,51 @@ class FormatlibTests(TestCase):
         self.assertEqual(pdb_file.pdb_string, correct)
 
     def test_terminate_chains(self):
-        # TODO: write it
-        pass
+        pdb_file = PDBFile(pdb_path=os.path.join(DIRNAME, '1kxkA_rasp.native.pdb'))
+        pdb_file.terminate_chains()
+        self.assertEqual(pdb_file.fixes, ['terminate_chains'])
+        self.assertEqual(pdb_file.pdb_lines.count('TER'), 1)
+        # nothing to do when TERs are already there
+        pdb_file.terminate_chains()
+        self.assertEqual(pdb_file.fixes, ['terminate_chains'])
 
     def test_remove_short_chains(self):
-        # TODO: write it
-        pass
+        atom = TEST_LINE
+        pdb = '\n'.join([atom] * 12 + ['TER'] + [atom] * 3 + ['TER'] + [atom] * 10 + ['TER', 'END', ''])
+        pdb_file = PDBFile(pdb_string=pdb)
+        pdb_file.remove_short_chains()
+        chains = pdb.split('TER\n')
+        correct = '\n'.join([c for c in chains if len(c.split('\nATOM')) > 9])
+        self.assertEqual(pdb_file.pdb_string, correct)
+        self.assertEqual(pdb_file.fixes, ['remove_short_chains'])
 
     def test_check_and_add_P_at_start(self):
-        # TODO: write it
-        pass
+        pdb_file = PDBFile(pdb_path=os.path.join(DIRNAME, '1xjrA_M1+ter.pdb'))
+        pdb_file.remove_non_atoms()
+        nlines = len(pdb_file.pdb_lines)
+        pdb_file.check_and_add_P_at_start()
+        self.assertEqual(pdb_file.changes[-1], ('add_P_at_start', 1))
+        self.assertEqual(SingleLineUtils.get_atom_code(pdb_file.pdb_lines[0]), 'P')
+        self.assertEqual(len(pdb_file.pdb_lines), nlines)
 
     def test_set_residues_bfactor(self):
-        # TODO: write it
-        pass
+        pdb_file = PDBFile(pdb_path=os.path.join(DIRNAME, 'test0.in'))
+        pdb_file.set_residues_bfactor([float(i) for i in range(1, 35)])
+        atoms = pdb_file._get_atom_lines()
+        self.assertEqual(atoms[0][60:66], '  1.00')
+        self.assertEqual(atoms[-1][60:66], ' 34.00')
+        self.assertTrue(pdb_file.pdb_string.startswith(pdb_file.pdb_lines[0]))
+
+    def test_fixes_chained_in_place(self):
+        pdb_file = PDBFile(pdb_path=os.path.join(DIRNAME, 'test0.in'))
+        lines = pdb_file.pdb_lines
+        pdb_file.resname_check_and_3to1()
+        # the same list is modified, the string is rebuilt only on access
+        self.assertIs(pdb_file.pdb_lines, lines)
+        self.assertIsNone(pdb_file._string)
+        with open(os.path.join(DIRNAME, 'test0_3to1.out')) as f:
+            self.assertEqual(pdb_file.pdb_string, f.read())
+        self.assertEqual([c[0] for c in pdb_file.changes], pdb_file.fixes)
 
     def test_count_models(self):
         pdb_file = PDBFile(pdb_path=os.path.join(DIRNAME, 'test_nmr.in'))
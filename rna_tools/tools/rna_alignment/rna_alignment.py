@@ -38,6 +38,7 @@ import shutil
 import re
 import gzip
 import copy
+import numpy as np
 
 
 class RNAalignmentError(Exception):
@@ -186,16 +187,11 @@ class RNASeq(object):
 
     def remove_columns(self, to_remove):
         """indexing from 0"""
-        nseq = ''
-        for i, s in enumerate(self.seq):
-            if i not in to_remove:
-                nseq += s
-
+        to_remove = set(to_remove)
+        nseq = ''.join([s for i, s in enumerate(self.seq) if i not in to_remove])
         nss = ''
         if self.ss:
-            for i, s in enumerate(self.ss):
-                if i not in to_remove:
-                    nss += s
+            nss = ''.join([s for i, s in enumerate(self.ss) if i not in to_remove])
         self.seq = nseq
         self.ss = nss
 
@@ -253,62 +249,26 @@ class RNASeq(object):
         gaps will be remove as well.
         """
         GAPS = ['-', '.']
+        CANONICAL = ['AU', 'UA', 'GC', 'CG'] + (['GU', 'UG'] if allow_gu else [])
 
-        nseq = ''
-        nss = ''
-        for (nt, nt_ss) in zip(self.seq, self.ss):
-            if nt in GAPS and nt_ss in GAPS:
-                pass
-            else:
-                nseq += nt
-                nss += nt_ss
-        self.seq = nseq
-        self.ss = nss
-
-        nss = list()
-        bps = self.ss_to_bps()
+        seq = np.array(list(self.seq), dtype='U1')
+        ss = np.array(list(self.ss), dtype='U1')
+        keep = ~(np.isin(seq, GAPS) & np.isin(ss, GAPS))
+        seq, ss = seq[keep], ss[keep]
 
+        pairs = np.array(SecondaryStructure.SecondaryStructure(''.join(ss)).get_pairs(first=0),
+                         dtype=int).reshape(-1, 2)
+        left, right = seq[pairs[:, 0]], seq[pairs[:, 1]]
+        broken = np.zeros(len(pairs), dtype=bool)
         if check_bps:
-            nss = list(self.ss)
-            for bp in bps:
-                nt_left = self.seq[bp[0]]
-                nt_right = self.seq[bp[1]]
-                if nt_left == '-' or nt_right == '-':
-                    nss[bp[0]] = '.'
-                    nss[bp[1]] = '.'
-            self.ss = ''.join(nss)
-
+            broken |= (left == '-') | (right == '-')
         if only_canonical:
-            nseq = list(self.seq)
-            nss = list(self.ss)
-            for bp in bps:
-                nt_left = nseq[bp[0]]
-                nt_right = nseq[bp[1]]
-                if (nt_left == 'A' and nt_right == 'U') or (nt_left == 'U' and nt_right == 'A'):
-                    pass
-                elif (nt_left == 'G' and nt_right == 'C') or (nt_left == 'C' and nt_right == 'G'):
-                    pass
-                elif (nt_left == 'G' and nt_right == 'U') or (nt_left == 'U' and nt_right == 'G'):
-                    if allow_gu:
-                        pass
-                    else:
-                        nss[bp[0]] = '.'
-                        nss[bp[1]] = '.'
-                else:
-                    nss[bp[0]] = '.'
-                    nss[bp[1]] = '.'
-            self.ss = ''.join(nss)
-
-        # two?????? what is "two"?
-        nss = []
-        nseq = ''
-        for i, (c, s) in enumerate(zip(self.seq, self.ss)):
-            if c != '-':
-                nseq += c
-                nss.append(s)
+            broken |= ~np.isin(np.char.add(left, right), CANONICAL)
+        ss[pairs[broken].ravel()] = '.'
 
-        self.seq = nseq
-        self.ss = ''.join(nss)
+        keep = seq != '-'
+        self.seq = ''.join(seq[keep].tolist())
+        self.ss = ''.join(ss[keep].tolist())
 
     def ss_to_bps(self):
         """Convert secondary structure into a list of basepairs.
@@ -318,20 +278,11 @@ class RNASeq(object):
             bps (list): a list of base pairs, e.g. [[0, 80], [1, 79], [2, 78], [4, 77], [6, 75], [7, 74], ...]
 
         """
-        j = []
-        bps = []
-        pair_types = ['()', '[]', '<>', '{}']
-        for pair_type in pair_types:
-            for i, s in enumerate(self.ss):
-                if s == pair_type[0]:
-                    j.append(i)
-                if s == pair_type[1]:
-                    bps.append([j.pop(), i])
-            if len(j):
-                # if something left, this is a problem (!!!)
-                raise Exception('Mis-paired secondary structure')
-        bps.sort()
-        return bps
+        try:
+            return SecondaryStructure.SecondaryStructure(self.ss).get_pairs(first=0)
+        except SecondaryStructure.ExceptionOpenPairsProblem:
+            # if something left, this is a problem (!!!)
+            raise Exception('Mis-paired secondary structure')
 
     def get_conserved(self, consensus, start=0, to_pymol=True, offset=0):
         """Start
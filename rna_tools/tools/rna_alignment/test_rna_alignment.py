@@ -85,3 +85,39 @@ def test_append():
     assert a.describe() == "SingleLetterAlphabet() alignment with 14 rows and 179 columns"
     a + RNASeq('rna', '-A-GU-AGAGUA-GGUCUUAUACGUAA-----------------AGUG-UCAUCGGA-U-GGGGAGACUUCCGGUGAACGAA-G-G-----------------------------GUUA---------------------------CCGCGUUAUAUGAC-C-GCUUCCG-CUA-C-U-', '')
     assert a.describe() == "SingleLetterAlphabet() alignment with 15 rows and 179 columns"
+
+
+def test_merge_by_species():
+    import io
+    import os
+    import tempfile
+    from rna_tools.tools.rna_alignment.utils.rna_alignment_merge_by_species import \
+        read_stockholm, get_species_seqs, write_merged
+    d = tempfile.mkdtemp()
+    # blocked (interleaved) alignment
+    with open(os.path.join(d, 'a.stk'), 'w') as f:
+        f.write('# STOCKHOLM 1.0\n\nAB1.1/1-6 AAA\nAB1.2/3-9 GGG\nXX1.1/1-6 CCC\n#=GC SS_cons (((\n\n'
+                'AB1.1/1-6 UUU\nAB1.2/3-9 GGG\nXX1.1/1-6 CCC\n#=GC SS_cons )))\n//\n')
+    with open(os.path.join(d, 'b.stk'), 'w') as f:
+        f.write('# STOCKHOLM 1.0\nXX1.1/5-6 GA\nAB1.3/1-2 CU\n#=GC SS_cons ..\n//\n')
+    with open(os.path.join(d, 'c.stk'), 'w') as f:
+        f.write('# STOCKHOLM 1.0\nAB1.1/1-1 A\nXX1.1/1-1 G\n//\n')
+    with open(os.path.join(d, 'dup.stk'), 'w') as f:
+        f.write('# STOCKHOLM 1.0\n\nAB1.1/1-6 AAA\nAB1.1/1-6 CCC\n\nAB1.1/1-6 UUU\n//\n')
+    assert read_stockholm(os.path.join(d, 'dup.stk'))[0]['AB1.1/1-6'] == 'AAAUUU'
+    seqs, gc = read_stockholm(os.path.join(d, 'a.stk'))
+    assert seqs['AB1.1/1-6'] == 'AAAUUU'
+    assert gc['SS_cons'] == '((()))'
+    alignments = []
+    gcs = []
+    for fn in ['a.stk', 'b.stk', 'c.stk']:
+        seqs, gc = read_stockholm(os.path.join(d, fn))
+        alignments.append(get_species_seqs(seqs))
+        gcs.append(gc)
+    out = io.StringIO()
+    assert write_merged(out, alignments, gcs, name_width=10, sep='|') == 2
+    assert out.getvalue() == ('# STOCKHOLM 1.0\n'
+                              'AB1       AAAUUU|CU|A%%%\n'
+                              'XX1       CCCCCC|GA|G%%%\n'
+                              '#=GC SS_cons((()))|..|.\n'
+                              '//\n')
@@ -5,19 +5,23 @@ The output you simply get from the screen, save it it to a file.
 
 Example::
 
-    python rna_alignment_get_species.py ../test_data/u6-with-species.stk ../test_data/u2-with-species.stk
+    python rna_alignment_merge_by_species.py ../test_data/u6-with-species.stk ../test_data/u2-with-species.stk
+
+More than two alignments can be merged in one go, sequences of the same species (the id
+without the range and the version, e.g. AABX02000022.1/363025-363047 -> AABX02000022) that are
+present in all alignments are joined. Alignments can be in the blocked (interleaved) Stockholm format.
 
 Questions: is ``#=GC RF_cons?`` or ``#=GC RF?``
 
 """
 from __future__ import print_function
 
-from rna_tools.utils.rna_alignment.rna_alignment import RNAalignment
-from rna_tools.Seq import RNASequence
-
 import argparse
-import urllib2
 import sys
+from collections import OrderedDict
+
+SEP = '!!!!!!!'
+END = '%%%'
 
 
 def get_parser():
@@ -34,6 +38,7 @@ def get_parser():
     parser.add_argument('--calc-energy', action="store_true")
     parser.add_argument("alignment")
     parser.add_argument("alignment2")
+    parser.add_argument("alignments", nargs='*', help='more alignments to merge')
     return parser
 
 
@@ -64,8 +69,12 @@ def get_species(id, verbose=False):
     id = clean_id(id)
 
     # download
+    try:
+        from urllib2 import urlopen
+    except ImportError:
+        from urllib.request import urlopen
     url = "https://www.ebi.ac.uk/ena/data/view/%s&display=text&download=txt&filename=tmp.txt" % id
-    response = urllib2.urlopen(url)
+    response = (l.decode() if isinstance(l, bytes) else l for l in urlopen(url))
     oc = ''
     os = ''
     for l in response:
@@ -91,65 +100,111 @@ class seq():
         self.seq = seq
 
 
+def read_stockholm(fn):
+    """Read an alignment in the Stockholm format (also blocked/interleaved).
+
+    Args:
+        fn (str): file name
+
+    Returns:
+        (seqs, gc): seqs is an OrderedDict, id -> sequence (pieces of sequences
+        from all blocks are joined, the first one of an id in a block is taken), gc is a dict, feature (e.g. SS_cons) -> string
+    """
+    seqs = OrderedDict()
+    gc = OrderedDict()
+    block = set()  # ids of the current block, a duplicated id in a block is skipped
+    for l in open(fn):
+        if not l.strip():
+            block = set()
+        elif l.startswith('#=GC'):
+            feature, txt = l[4:].split(None, 1)
+            gc[feature] = gc.get(feature, '') + txt.strip()
+        elif not l.startswith('#') and not l.startswith('//') and l.strip():
+            try:
+                id, sequence = l.split()
+            except ValueError:
+                raise Exception('Error in %s: %s' % (fn, l))
+            if id in block:
+                continue
+            block.add(id)
+            seqs[id] = seqs.get(id, '') + sequence
+    return seqs, gc
+
+
+def get_species_seqs(seqs):
+    """Get sequences by species (clean_id), the first sequence of given species is taken.
+
+    Args:
+        seqs (dict): id -> sequence, see read_stockholm()
+
+    Returns:
+        OrderedDict, clean id -> sequence
+    """
+    species = OrderedDict()
+    for id, sequence in seqs.items():
+        cid = clean_id(id)
+        if cid not in species:
+            species[cid] = sequence
+    return species
+
+
+def merge_by_species(alignments):
+    """Join alignments by species.
+
+    Args:
+        alignments (list): list of OrderedDict, clean id -> sequence, see get_species_seqs()
+
+    Yields:
+        (clean id, [sequence of the first alignment, sequence of the second alignment, ...]),
+        only species that are in all alignments, in the order of the first alignment
+    """
+    for cid, sequence in alignments[0].items():
+        seqs = [sequence]
+        for aln in alignments[1:]:
+            s = aln.get(cid)
+            if s is None:
+                break
+            seqs.append(s)
+        else:
+            yield cid, seqs
+
+
+def write_merged(out, alignments, gcs, name_width=50, sep=SEP):
+    """Write merged alignments, line by line.
+
+    Args:
+        out: file handle, e.g. sys.stdout
+        alignments (list): see merge_by_species()
+        gcs (list): features of alignments (dict, e.g. SS_cons -> string), see read_stockholm()
+        name_width (int): width of the id column
+        sep (str): separator between sequences of alignments
+
+    Returns:
+        int: number of merged sequences
+    """
+    out.write('# STOCKHOLM 1.0\n')
+    c = 0
+    for cid, seqs in merge_by_species(alignments):
+        out.write(cid.ljust(name_width) + sep.join(seqs) + END + '\n')
+        c += 1
+    for feature in ['SS_cons', 'RF_cons']:
+        if any(feature in gc for gc in gcs):
+            # use gaps if a feature is missing in an alignment
+            txt = [gc.get(feature, '.' * len(next(iter(aln.values()), ''))) for gc, aln in zip(gcs, alignments)]
+            out.write(('#=GC ' + feature).ljust(name_width) + sep.join(txt) + '\n')
+    out.write('//\n')
+    return c
+
+
 if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
 
-    a = args.alignment
-    name_width = args.id_width
-
-    b = args.alignment2
-    name_width = args.id_width
-
-    alist = []
-    alist_done = []
-    for l in open(a):
-          if not l.startswith('#') and not l.startswith('//'):
-                try:
-                    id, sequence = l.split()
-                except:
-                    print('Error in ', l)
-                    sys.exit(1)
-
-                if id not in alist_done:
-                    alist.append(seq(id, sequence))
-                    alist_done.append(id)
-
-          if '#=GC SS_cons' in l:
-              ss_cons_a = l.replace('#=GC SS_cons', '').strip()
-          if '#=GC RF_cons' in l:
-              rf_cons_a = l.replace('#=GC RF_cons', '').strip()
-
-    blist = []
-    blist_done = []
-    for l in open(b):
-          if not l.startswith('#') and not l.startswith('//'):
-                try:
-                    id, sequence = l.split()
-                except:
-                    print('Error in ', l)
-                    sys.exit(1)
-
-                if id not in blist_done:
-                    blist.append(seq(id, sequence))
-                    blist_done.append(id)
-
-          if '#=GC SS_cons' in l:
-              ss_cons_b = l.replace('#=GC SS_cons', '').strip()
-          if '#=GC RF_cons' in l:
-              rf_cons_b = l.replace('#=GC RF_cons', '').strip()
-
-    sep = '!!!!!!!'
-    out = '# STOCKHOLM 1.0\n'
-    done = []
-    for seqa in alist: # record a
-        for seqb in blist:
-            if seqa.id not in done:
-                if seqa.id == seqb.id:
-                    out += seqa.id.ljust(name_width) + seqa.seq + sep + seqb.seq + '%%%\n'
-                    done.append(seqa.id)
-
-    out += '#=GC SS_cons'.ljust(name_width) + ss_cons_a + sep + ss_cons_b + '\n'
-    out += '#=GC RF_cons'.ljust(name_width) + rf_cons_a + sep + rf_cons_b + '\n'
-    out += '//'
-    print(out)
+    alignments = []
+    gcs = []
+    for fn in [args.alignment, args.alignment2] + args.alignments:
+        seqs, gc = read_stockholm(fn)
+        alignments.append(get_species_seqs(seqs))
+        gcs.append(gc)
+
+    write_merged(sys.stdout, alignments, gcs, args.id_width)
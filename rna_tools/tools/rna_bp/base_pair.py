@@ -8,6 +8,10 @@ from Bio.PDB import PDBIO, Superimposer
 #from SVDSuperimposerDontMove import SVDSuperimposer
 import numpy
 
+from rna_tools.tools.rna_bp.bp_geometry import GLYCOSIDIC_ATOM
+
+SUPERPOSITION_ATOMS = set(["C5'", "C4'", "O4'", "C3'", "O3'", "C2'", "O2'", "C1'"])  # "OP2", "OP1", "OP3",  "P" "O5'" # <- first pair does not have them
+
 class BasePair:
     """BasePair Class
 
@@ -33,26 +37,11 @@ class BasePair:
     def get_name(self):
         return self.name
     def calc_coord(self):
-        """Return coord of base pair
-
-        exclude sugar and posphate and hydrogens"""
-        centroid=PDB.Vector(0,0,0)
-        counter=0.0
-        #exclude = ["O5'","C5'", "C4'", "O4'", "C3'", "O3'", "C2'", "O2'", "P", "OP2", "OP1", "OP3","C1'"] # 
-        exclude = []
-        for atom in self.a:
-            if atom.name not in exclude:
-                if not atom.name.startswith('H'): 
-                    centroid=centroid+atom.get_vector()
-                    counter+=1
-        for atom in self.b:
-            if atom.name not in exclude:
-               if not atom.name.startswith('H'): 
-                    centroid=centroid+atom.get_vector()
-                    counter+=1
+        """Return coord of base pair (a centroid of all atoms, without hydrogens)
 
-        centroid=centroid/counter
-        self.coord = numpy.array((tuple(centroid)), 'f')
+        See bp_geometry.get_pair_centroids() to get centroids of many pairs at once."""
+        coords = [atom.get_coord() for atom in list(self.a) + list(self.b) if not atom.name.startswith('H')]
+        self.coord = numpy.array(coords, 'f').mean(axis=0)
         return self.coord
 
     def __sub__(self, other):
@@ -90,36 +79,22 @@ class BasePair:
         io.save(fn, BpSelect())
         return 'Saved to: %s ' % fn
 
+    def _get_atoms(self, residues):
+        """Get sugar atoms and N9 (purines) or N1 (pyrimidines) of residues."""
+        atoms = []
+        for r in residues:
+            include = SUPERPOSITION_ATOMS | set([GLYCOSIDIC_ATOM.get(r.resname.strip())])
+            atoms.extend([at for at in r if at.name in include])
+        return atoms
+
     def get_atoms_ab(self):
         """Get 18 atoms per base pair.
 
         18
-        [<Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N9>, <Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N1>]"""
-        self.atoms = []
-
-        #for atom in self.a:
-        #    atoms.append(atom)
-        #for atom in self.a:
-        #    atoms.append(atom) 
-        include = ["C5'", "C4'", "O4'", "C3'", "O3'", "C2'", "O2'", "C1'"]# "OP2", "OP1", "OP3",  "P" "O5'" # <- first pair does not have them
-        #self.atoms.extend([self.a['C3\''], self.b['C3\'']])
-
-        for at in self.b:
-            if at.name in include:
-                self.atoms.append(at)
-            if self.b.resname.strip() in ['G', 'A'] and at.name == "N9":
-                self.atoms.append(at)
-            if self.b.resname.strip() in ['U', 'C'] and at.name == "N1":
-                self.atoms.append(at)
-
-        for at in self.a:
-            if at.name in include:
-                self.atoms.append(at)
-            if self.a.resname.strip() in ['G', 'A'] and at.name == "N9":
-                self.atoms.append(at)
-            if self.a.resname.strip() in ['U', 'C'] and at.name == "N1":
-                self.atoms.append(at)
+        [<Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N9>, <Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N1>]
 
+        See bp_geometry.get_superposition_atoms() to get these atoms for many pairs at once."""
+        self.atoms = self._get_atoms([self.b, self.a])
         return self.atoms
 
     def get_atoms_ba(self):
@@ -129,31 +104,7 @@ class BasePair:
         [<Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N9>, <Atom C5'>, <Atom C4'>, <Atom O4'>, <Atom C3'>, <Atom O3'>, <Atom C1'>, <Atom C2'>, <Atom O2'>, <Atom N1>]
 
         print len(coords1) --> 18!"""
-        self.atoms = []
-
-        #for atom in self.a:
-        #    atoms.append(atom)
-        #for atom in self.a:
-        #    atoms.append(atom) 
-        include = ["C5'", "C4'", "O4'", "C3'", "O3'", "C2'", "O2'", "C1'"]# "OP2", "OP1", "OP3",  "P" "O5'" # <- first pair does not have them
-        #self.atoms.extend([self.a['C3\''], self.b['C3\'']])
-
-        for at in self.a:
-            if at.name in include:
-                self.atoms.append(at)
-            if self.a.resname.strip() in ['G', 'A'] and at.name == "N9":
-                self.atoms.append(at)
-            if self.a.resname.strip() in ['U', 'C'] and at.name == "N1":
-                self.atoms.append(at)
-
-        for at in self.b:
-            if at.name in include:
-                self.atoms.append(at)
-            if self.b.resname.strip() in ['G', 'A'] and at.name == "N9":
-                self.atoms.append(at)
-            if self.b.resname.strip() in ['U', 'C'] and at.name == "N1":
-                self.atoms.append(at)
-
+        self.atoms = self._get_atoms([self.a, self.b])
         return self.atoms
 
     def calc_rmsd_to(self, other):
@@ -0,0 +1,447 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bp_annotate.py - base pairs (Leontis-Westhof families) and stacking of a structure, without
+x3dna-dssr, ClaRNA or MC-Annotate.
+
+All residues of a structure are annotated at once, from the coordinate table of the structure
+(see bp_geometry.get_coord_table, PDB, mmCIF and models of archives are fine):
+
+- H-bonds: donors and acceptors of bases (and O2') closer than 3.5 A (one search with a
+  kd-tree) and pointing out of their bases (an angle check),
+- base pairs: two (or more) H-bonds and bases in (more or less) one plane, the edges
+  (W, H, S) of both bases are given by the direction of the H-bonds in the frames of the
+  bases, cis/trans by the glycosidic bonds (C1') on the same or the other side of the pair,
+- stacking: bases close (centroids < 5 A), parallel and on top of each other,
+  with the orientation of normals of bases (``>>``, ``<<``, ``<>``, ``><``).
+
+Canonical pairs (WW_cis of AU, GC and GU) give the secondary structure::
+
+    $ bp_annotate.py ../rna_x3dna/test_data/1xjr.pdb
+    >1xjr nts=46 [1xjr] -- secondary structure derived by bp_annotate
+    GAGUUCACCGAGGCCACGCGGAGUACGAUCGAGGGUACAGUGAAUU
+    .(((((((...((((.((((.....))..))..))).).)))))))
+
+(the same pairs as of x3dna-dssr, the first residue of 1xjr, a modified G, is skipped)
+
+and ``--clarna`` gives pairs and stacking in the format of ClaRNA (``<pdb>.outCR``), see
+compare() to get INFs (as clarna_compare.py) and rna_calc_inf.py (``--method native``)::
+
+    $ bp_annotate.py --clarna ../rna_x3dna/test_data/1xjr.pdb
+    Classifier: Clarna
+    chains:  A 2 47
+    A      2   A      3          stacking G A                       >>   1
+    A      3   A     47          bp A U                   WW_cis   1
+    ...
+"""
+from __future__ import print_function
+
+import argparse
+import os
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from rna_tools.SecondaryStructure import SecondaryStructure
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+
+RING = {'A': ['N9', 'C8', 'N7', 'C5', 'C6', 'N1', 'C2', 'N3', 'C4'],
+        'G': ['N9', 'C8', 'N7', 'C5', 'C6', 'N1', 'C2', 'N3', 'C4'],
+        'C': ['N1', 'C2', 'N3', 'C4', 'C5', 'C6'],
+        'U': ['N1', 'C2', 'N3', 'C4', 'C5', 'C6']}
+DONORS = {'A': ['N6'], 'G': ['N1', 'N2'], 'C': ['N4'], 'U': ['N3']}
+ACCEPTORS = {'A': ['N1', 'N3', 'N7'], 'G': ['O6', 'N3', 'N7'], 'C': ['N3', 'O2'], 'U': ['O4', 'O2']}
+# atoms bonded to donors and acceptors, root -> atom points out of the base
+ROOTS = {'N6': ['C6'], 'O6': ['C6'], 'N2': ['C2'], 'N4': ['C4'], 'O4': ['C4'], 'O2': ['C2'],
+         'N1': ['C2', 'C6'], 'N3': ['C2', 'C4'], 'N7': ['C5', 'C8']}
+# atoms in the middle of the edges, Watson-Crick, Hoogsteen and Sugar
+EDGES = 'WHS'
+EDGE_ATOMS = {'A': ['N1', 'C8', 'N3'], 'G': ['N1', 'C8', 'N3'],
+              'C': ['N3', 'C5', 'O2'], 'U': ['N3', 'C5', 'O2']}
+CANONICAL = set(['AU', 'UA', 'GC', 'CG', 'GU', 'UG'])
+RESNAMES = {'ADE': 'A', 'GUA': 'G', 'CYT': 'C', 'URA': 'U', 'URI': 'U', 'RA': 'A', 'RG': 'G',
+            'RC': 'C', 'RU': 'U', 'RA5': 'A', 'RG5': 'G', 'RC5': 'C', 'RU5': 'U',
+            'RA3': 'A', 'RG3': 'G', 'RC3': 'C', 'RU3': 'U'}
+
+HBOND_DIST = 3.5  # A, between heavy atoms
+HBOND_ANGLE = 90  # degrees, max angle between the H-bond and root->atom of a base
+MIN_HBONDS = 2  # per base pair
+MAX_PAIR_ANGLE = 65  # degrees, between normals of paired bases
+MAX_PAIR_HEIGHT = 2.5  # A, of a base above the plane of the other
+STACK_DIST = 5.0  # A, between centroids of bases
+MAX_STACK_ANGLE = 35  # degrees, between normals of stacked bases
+MAX_STACK_SHIFT = 40  # degrees, between the normal and the centroid-centroid vector
+
+Interaction = namedtuple('Interaction', ['chain_i', 'resi_i', 'chain_j', 'resi_j', 'kind',
+                                         'resname_i', 'resname_j', 'type', 'score'])
+
+
+def get_base(resname):
+    """Get a base (A, C, G, U) of a residue name, None for other residues.
+
+    >>> get_base('A'), get_base('RG5'), get_base('URA'), get_base('HOH')
+    ('A', 'G', 'U', None)
+    """
+    resname = resname.strip()
+    if resname in RING:
+        return resname
+    return RESNAMES.get(resname)
+
+
+class Bases(object):
+    """Bases of a structure, with their frames.
+
+    Attributes:
+        residues (list): (chain, resi) of bases, in the order of the structure
+        seq (str): bases, e.g. ``GGAGU``
+        centroids (n x 3): centroids of rings
+        normals (n x 3): normals of rings, oriented in the same way for all bases (5'->3'
+            in a helix)
+        c1 (n x 3): C1' atoms (nan if missing)
+        edges (n x 3 x 3): atoms in the middle of the W, H and S edges
+    """
+    def __init__(self, table):
+        index = dict(((c, r, n), i) for i, (c, r, n) in
+                     enumerate(zip(table.chains.tolist(), table.resis.tolist(), table.names.tolist())))
+        coords = np.vstack([table.coords, [np.nan] * 3])
+        missing = len(table.coords)
+        self.residues, seq, ring, extra = [], [], [], []
+        for key, s in table.residues.items():
+            base = get_base(table.resnames[s.start])
+            if not base:
+                continue
+            idx = [index.get(key + (n,), missing) for n in RING[base]]
+            if missing in idx[-6:]:  # no six-membered ring
+                continue
+            self.residues.append(key)
+            seq.append(base)
+            ring.append(idx + [missing] * (9 - len(idx)))
+            extra.append([index.get(key + (n,), missing) for n in
+                          ["C1'"] + EDGE_ATOMS[base] + ['N1', 'C2', 'C6']])
+        self.seq = ''.join(seq)
+        self.index = dict((r, i) for i, r in enumerate(self.residues))
+        ring = coords[np.array(ring, dtype=int).reshape(-1, 9)]
+        extra = coords[np.array(extra, dtype=int).reshape(-1, 7)]
+        # atoms of rings (nan for missing atoms and pyrimidines)
+        self.centroids = np.nanmean(ring, axis=1) if len(seq) else np.zeros((0, 3))
+        # normals of the six-membered rings: N1->C2 x N1->C6, of purines the other way round,
+        # (atoms of rings go round in the opposite direction), so bases of a helix point the same way
+        n1, c2, c6 = extra[:, 4], extra[:, 5], extra[:, 6]
+        normals = np.cross(c2 - n1, c6 - n1)
+        normals[np.array([b in 'AG' for b in seq], dtype=bool)] *= -1
+        self.normals = normals / np.linalg.norm(normals, axis=1)[:, None] if len(seq) else normals
+        self.c1 = extra[:, 0]
+        self.edges = extra[:, 1:4]
+
+    def __len__(self):
+        return len(self.residues)
+
+
+def _get_polar_atoms(table, bases):
+    """Get donors and acceptors of bases, and O2' atoms, as arrays of
+    index of the base, coords, coords of roots (see ROOTS), is donor, is acceptor, is O2'."""
+    base_of, coords, roots, don, acc, o2 = [], [], [], [], [], []
+    for k, (c, r) in enumerate(bases.residues):
+        b = bases.seq[k]
+        s = table.residues[(c, r)]
+        atoms = dict(zip(table.names[s].tolist(), table.coords[s]))
+        for n, xyz in atoms.items():
+            if n in DONORS[b] or n in ACCEPTORS[b] or n == "O2'":
+                base_of.append(k)
+                coords.append(xyz)
+                rs = [atoms[x] for x in ROOTS.get(n, []) if x in atoms]
+                roots.append(np.mean(rs, axis=0) if rs else xyz)
+                don.append(n in DONORS[b] or n == "O2'")
+                acc.append(n in ACCEPTORS[b] or n == "O2'")
+                o2.append(n == "O2'")
+    return (np.array(base_of, dtype=int), np.array(coords, dtype=float).reshape(-1, 3),
+            np.array(roots, dtype=float).reshape(-1, 3),
+            np.array(don, dtype=bool), np.array(acc, dtype=bool), np.array(o2, dtype=bool))
+
+
+def _angle_ok(direction, vector, max_angle):
+    """Vectorised, is the angle between direction and vector (rows) <= max_angle."""
+    cos = (direction * vector).sum(axis=1) / (np.linalg.norm(direction, axis=1) *
+                                              np.linalg.norm(vector, axis=1))
+    return cos >= np.cos(np.radians(max_angle))
+
+
+def get_hbonds(table, bases):
+    """Get H-bonds between bases (and base-O2').
+
+    Returns:
+        (k x 2) indexes of bases, (k x 3) middle points of H-bonds, (k) is an H-bond
+        between atoms of bases (not O2')
+    """
+    base_of, coords, roots, don, acc, o2 = _get_polar_atoms(table, bases)
+    if len(coords) < 2:
+        return np.zeros((0, 2), dtype=int), np.zeros((0, 3)), np.zeros(0, dtype=bool)
+    ab = cKDTree(coords).query_pairs(HBOND_DIST, output_type='ndarray')
+    a, b = ab[:, 0], ab[:, 1]
+    keep = (base_of[a] != base_of[b]) & ~(o2[a] & o2[b]) & \
+        ((don[a] & acc[b]) | (acc[a] & don[b]))
+    a, b = a[keep], b[keep]
+    # atoms of bases point to their partners (O2' are not checked)
+    ok = np.ones(len(a), dtype=bool)
+    for x, y in ((a, b), (b, a)):
+        base = ~o2[x]
+        ok[base] &= _angle_ok(coords[x[base]] - roots[x[base]],
+                              coords[y[base]] - coords[x[base]], HBOND_ANGLE)
+    a, b = a[ok], b[ok]
+    return np.stack([base_of[a], base_of[b]], axis=1), (coords[a] + coords[b]) / 2, ~(o2[a] | o2[b])
+
+
+def _get_edges(bases, i, points):
+    """Get edges (0, 1, 2 for W, H, S) of bases i pointing to points (the middle of H-bonds)."""
+    c = bases.centroids[i]
+    n = bases.normals[i]
+    v = points - c
+    v -= (v * n).sum(axis=1)[:, None] * n  # in the plane of the base
+    e = bases.edges[i] - c[:, None]
+    cos = (e * v[:, None]).sum(axis=2) / (np.linalg.norm(e, axis=2) * np.linalg.norm(v, axis=1)[:, None])
+    return np.nanargmax(np.nan_to_num(cos, nan=-2), axis=1)
+
+
+def get_pairs(table, bases):
+    """Get base pairs.
+
+    Returns:
+        list of (i, j, type), i < j are indexes of bases, type e.g. WW_cis
+    """
+    ij, mids, base_base = get_hbonds(table, bases)
+    if not len(ij):
+        return []
+    ij.sort(axis=1)
+    n = len(bases)
+    keys, inverse, counts = np.unique(ij[:, 0] * n + ij[:, 1], return_inverse=True, return_counts=True)
+    # at least one H-bond between atoms of bases
+    keep = (counts >= MIN_HBONDS) & (np.bincount(inverse.ravel(), weights=base_base) > 0)
+    i, j = keys[keep] // n, keys[keep] % n
+    if not len(i):
+        return []
+    # middle points of H-bonds of pairs (averaged)
+    sums = np.zeros((len(keys), 3))
+    np.add.at(sums, inverse.ravel(), mids)
+    points = (sums / counts[:, None])[keep]
+    # in one plane
+    ni, nj = bases.normals[i], bases.normals[j]
+    d = bases.centroids[j] - bases.centroids[i]
+    coplanar = np.abs((ni * nj).sum(axis=1)) >= np.cos(np.radians(MAX_PAIR_ANGLE))
+    coplanar &= (np.abs((d * ni).sum(axis=1)) <= MAX_PAIR_HEIGHT) | \
+        (np.abs((d * nj).sum(axis=1)) <= MAX_PAIR_HEIGHT)
+    i, j, points, d = i[coplanar], j[coplanar], points[coplanar], d[coplanar]
+    edge_i, edge_j = _get_edges(bases, i, points), _get_edges(bases, j, points)
+    # cis: glycosidic bonds on the same side of the line between the bases
+    u = d / np.linalg.norm(d, axis=1)[:, None]
+    gi = bases.c1[i] - bases.centroids[i]
+    gj = bases.c1[j] - bases.centroids[j]
+    gi -= (gi * u).sum(axis=1)[:, None] * u
+    gj -= (gj * u).sum(axis=1)[:, None] * u
+    cis = (gi * gj).sum(axis=1) > 0
+    return [(a, b, EDGES[ea] + EDGES[eb] + ('_cis' if c else '_tran')) for a, b, ea, eb, c in
+            zip(i.tolist(), j.tolist(), edge_i.tolist(), edge_j.tolist(), cis.tolist())]
+
+
+def get_stacks(bases, paired=()):
+    """Get stacking of bases (not paired).
+
+    Returns:
+        list of (i, j, type), i < j are indexes of bases, type ``>>``, ``<<``, ``<>`` or ``><``
+        (``>>``: normals of i and j point in the same direction, from i to j)
+    """
+    if len(bases) < 2:
+        return []
+    ij = cKDTree(bases.centroids).query_pairs(STACK_DIST, output_type='ndarray')
+    i, j = ij.min(axis=1), ij.max(axis=1)
+    ni, nj = bases.normals[i], bases.normals[j]
+    d = bases.centroids[j] - bases.centroids[i]
+    ok = np.abs((ni * nj).sum(axis=1)) >= np.cos(np.radians(MAX_STACK_ANGLE))
+    shift = np.cos(np.radians(MAX_STACK_SHIFT)) * np.linalg.norm(d, axis=1)
+    ok &= (np.abs((d * ni).sum(axis=1)) >= shift) | (np.abs((d * nj).sum(axis=1)) >= shift)
+    paired = set(paired)
+    stacks = []
+    for a, b, up_i, up_j in zip(i[ok].tolist(), j[ok].tolist(), ((d * ni).sum(axis=1) > 0)[ok].tolist(),
+                                ((d * nj).sum(axis=1) > 0)[ok].tolist()):
+        if (a, b) not in paired:
+            stacks.append((a, b, ('>' if up_i else '<') + ('>' if up_j else '<')))
+    return sorted(stacks)
+
+
+def annotate(fn, stacking=True):
+    """Get base pairs and stacking of a structure.
+
+    Args:
+        fn (str): a structure, see get_coord_table (or a CoordTable)
+        stacking (bool): get stacking as well
+
+    Returns:
+        bases (Bases), interactions (list of Interaction, sorted)
+    """
+    table = fn if hasattr(fn, 'residues') else get_coord_table(fn)
+    bases = Bases(table)
+    pairs = get_pairs(table, bases)
+    out = [(i, j, 'bp', t) for i, j, t in pairs]
+    if stacking:
+        out += [(i, j, 'stacking', t) for i, j, t in get_stacks(bases, [(i, j) for i, j, _ in pairs])]
+    interactions = []
+    for i, j, kind, t in sorted(out):
+        (ci, ri), (cj, rj) = bases.residues[i], bases.residues[j]
+        interactions.append(Interaction(ci, ri, cj, rj, kind, bases.seq[i], bases.seq[j], t, 1))
+    return bases, interactions
+
+
+def is_canonical(interaction):
+    """Is a pair canonical, WW_cis of AU, GC or GU."""
+    return interaction.kind == 'bp' and interaction.type == 'WW_cis' and \
+        interaction.resname_i + interaction.resname_j in CANONICAL
+
+
+def get_dot_bracket(bases, interactions):
+    """Get the secondary structure of canonical pairs (a base in more than one canonical pair
+    is paired to the first partner), chains are separated with ``&``.
+
+    Returns:
+        seq, ss
+    """
+    pairs = []
+    taken = set()
+    for x in [x for x in interactions if is_canonical(x)]:
+        i, j = bases.index[(x.chain_i, x.resi_i)], bases.index[(x.chain_j, x.resi_j)]
+        if i not in taken and j not in taken:
+            pairs.append((i, j))
+            taken.update((i, j))
+    ss = SecondaryStructure.from_pairs(pairs, len(bases), first=0).to_dot_bracket()
+    seq_out, ss_out = '', ''
+    for k, (chain, resi) in enumerate(bases.residues):
+        if k and chain != bases.residues[k - 1][0]:
+            seq_out += '&'
+            ss_out += '&'
+        seq_out += bases.seq[k]
+        ss_out += ss[k]
+    return seq_out, ss_out
+
+
+def to_clarna(bases, interactions):
+    """Get the output in the format of ClaRNA (``.outCR``)."""
+    txt = 'Classifier: Clarna\n'
+    chains = []
+    for c, r in bases.residues:
+        if not chains or chains[-1][0] != c:
+            chains.append([c, r, r])
+        chains[-1][2] = r
+    for c, first, last in chains:
+        txt += 'chains:  %s %i %i\n' % (c, first, last)
+    for x in interactions:
+        txt += '%s %6i   %s %6i          %s %s %s %24s   %s\n' % (
+            x.chain_i, x.resi_i, x.chain_j, x.resi_j, x.kind, x.resname_i, x.resname_j,
+            x.type, x.score)
+    return txt
+
+
+def read_clarna(fn):
+    """Read interactions of a ClaRNA output (e.g. of clarna_app.py or of to_clarna())."""
+    interactions = []
+    with open(fn) as f:
+        for l in f:
+            ll = l.split()
+            if len(ll) < 8 or ll[0] in ('Classifier:', 'chains:'):
+                continue
+            interactions.append(Interaction(ll[0], int(ll[1]), ll[2], int(ll[3]), ll[4], ll[5],
+                                            ll[6], ll[7], float(ll[8]) if len(ll) > 8 else 1))
+    return interactions
+
+
+def _get_keys(interactions, kind):
+    """Get keys of interactions to compare, (residue, residue, type) of pairs and
+    (residue, residue) of stacking (an order of residues does not matter)."""
+    keys = set()
+    for x in interactions:
+        a, b = (x.chain_i, x.resi_i), (x.chain_j, x.resi_j)
+        t = x.type
+        if b < a:
+            a, b = b, a
+            t = t[1] + t[0] + t[2:] if x.kind == 'bp' else t
+        if kind == 'stacking' and x.kind == 'stacking':
+            keys.add((a, b))
+        elif kind == 'WC' and is_canonical(x):
+            keys.add((a, b))
+        elif kind == 'nWC' and x.kind == 'bp' and not is_canonical(x):
+            keys.add((a, b, t))
+        elif kind == 'all' and (x.kind == 'bp' or x.kind == 'stacking'):
+            keys.add((a, b, t if x.kind == 'bp' and not is_canonical(x) else x.kind))
+    return keys
+
+
+def get_inf(ref, model):
+    """Get INF (Parisien et al. 2009), sensitivity and PPV of two sets of interactions.
+
+    Returns:
+        inf, sns, ppv, None if both sets are empty
+
+    >>> get_inf(set([1, 2, 3, 4]), set([1, 2, 5]))
+    (0.5773502691896257, 0.5, 0.6666666666666666)
+    """
+    if not ref and not model:
+        return None, None, None
+    tp = len(ref & model)
+    sns = tp / float(len(ref)) if ref else 0.0
+    ppv = tp / float(len(model)) if model else 0.0
+    return float(np.sqrt(sns * ppv)), sns, ppv
+
+
+def compare(ref, model):
+    """Compare interactions of a model to a reference (as clarna_compare.py).
+
+    Returns:
+        list: inf_all, inf_stack, inf_WC, inf_nWC, sns_WC, ppv_WC, sns_nWC, ppv_nWC
+        (None for NA)
+    """
+    inf_all = get_inf(_get_keys(ref, 'all'), _get_keys(model, 'all'))[0]
+    inf_stack = get_inf(_get_keys(ref, 'stacking'), _get_keys(model, 'stacking'))[0]
+    inf_wc, sns_wc, ppv_wc = get_inf(_get_keys(ref, 'WC'), _get_keys(model, 'WC'))
+    inf_nwc, sns_nwc, ppv_nwc = get_inf(_get_keys(ref, 'nWC'), _get_keys(model, 'nWC'))
+    return [inf_all, inf_stack, inf_wc, inf_nwc, sns_wc, ppv_wc, sns_nwc, ppv_nwc]
+
+
+def get_secstruc(fn):
+    """Get the secondary structure as x3DNA.get_secstruc() (a header, seq and ss)."""
+    bases, interactions = annotate(fn, stacking=False)
+    seq, ss = get_dot_bracket(bases, interactions)
+    name = os.path.basename(fn).replace('.pdb', '').replace('.cif', '')
+    return '>%s nts=%i [%s] -- secondary structure derived by bp_annotate\n%s\n%s' % (
+        name, len(bases), name, seq, ss)
+
+
+def get_secstrucs(files, threads=1, cache=None):
+    """Get secondary structures for many files (as rna_x3dna.get_secstrucs), a generator
+    of (file, secondary structure). The cache is not used, the annotation is fast."""
+    if threads < 2:
+        for f in files:
+            yield f, get_secstruc(f)
+        return
+    pool = ThreadPool(threads)
+    try:
+        for r in pool.imap(lambda f: (f, get_secstruc(f)), files):
+            yield r
+    finally:
+        pool.close()
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--clarna', action='store_true',
+                        help="get base pairs and stacking in the format of ClaRNA")
+    parser.add_argument('--no-stacking', action='store_true', help="without stacking (with --clarna)")
+    parser.add_argument('files', help="PDB or mmCIF files", nargs='+')
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_parser().parse_args()
+    for f in args.files:
+        if args.clarna:
+            print(to_clarna(*annotate(f, not args.no_stacking)), end='')
+        else:
+            print(get_secstruc(f))
@@ -0,0 +1,349 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bp_ensemble.py - frequencies of base pairs over an ensemble of structures (decoys, models of
+archives, frames of SimRNA trajectories), the consensus and MEA secondary structures.
+
+Structures are read one by one and their pairs are added to a sparse (L x L) matrix, so
+memory does not grow with the number of structures. Pairs are annotated with bp_annotate
+(PDB, mmCIF, models of archives) or read from secondary structures (``.ss_detected`` of
+SimRNA_trafl2pdbs, one line of ``()`` per level, or dot-bracket files ``.ss``/``.dbn``).
+
+Structures can be weighted by their energies (Boltzmann weights, ``exp(-E/kT)``), from a
+SimRNA trajectory (``--trafl``, energies of frames in the order of the files), from a csv
+file (``--scores``) or from metadata of archives::
+
+    $ bp_ensemble.py --trafl 1a9l.trafl --plot 1a9l_bp.png 1a9l_ALL-0000*.ss_detected
+    # of structures: 100
+    consensus  ((((((.....))))))..
+    mea        ((((((.....))))))..
+
+The consensus are pairs of the frequency > 0.5 (``--threshold``), MEA is the structure of
+the maximum expected accuracy (Do et al. 2006), with ``--gamma`` the weight of pairs.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+from multiprocessing.pool import ThreadPool
+
+import numpy as np
+from scipy import sparse
+
+from rna_tools.rna_archive import get_model, is_archive_ref, expand_archives, read_scores
+from rna_tools.SecondaryStructure import SecondaryStructure
+from rna_tools.tools.rna_bp.bp_annotate import annotate, get_dot_bracket
+from rna_tools.tools.simrna_trajectory.simrna_trajectory import iter_blocks
+
+SS_EXT = ('.ss', '.ss_detected', '.dbn', '.db')
+FLUSH = 100000  # pairs kept in lists before they are added to the matrix
+
+
+class PairFrequencies(object):
+    """Frequencies (weighted) of base pairs over structures, added one by one.
+
+    Args:
+        n (int): length, by default of the first structure
+        kt (float): kT of Boltzmann weights of energies (in units of energies)
+
+    Attributes:
+        n (int): length
+        residues (list): (chain, resi) of the first (annotated) structure, pairs of other
+            structures are mapped to this numbering
+        seq (str): sequence (if known)
+        count (int): # of structures
+        total (float): sum of weights (relative to the lowest energy)
+
+    Weights of energies are relative to the lowest energy seen, the matrix is rescaled
+    when a lower energy comes::
+
+        >>> f = PairFrequencies(6)
+        >>> f.add([(0, 5)], energy=-1)
+        >>> f.add([(0, 5), (1, 4)], energy=-2)
+        >>> print('%.2f %.2f' % (f.get_matrix()[0, 5], f.get_matrix()[1, 4]))
+        1.00 0.73
+        >>> f.get_consensus().to_dot_bracket()
+        '((..))'
+    """
+    def __init__(self, n=None, kt=1.0):
+        self.n = n
+        self.kt = kt
+        self.residues = None
+        self.seq = ''
+        self.count = 0
+        self.total = 0.0
+        self._min = None  # the lowest energy
+        self._matrix = None
+        self._rows, self._cols, self._vals = [], [], []
+
+    def __len__(self):
+        return self.count
+
+    def _flush(self):
+        if self._rows:
+            m = sparse.coo_matrix((self._vals, (self._rows, self._cols)), shape=(self.n, self.n)).tocsr()
+            self._matrix = m if self._matrix is None else self._matrix + m
+            self._rows, self._cols, self._vals = [], [], []
+
+    def add(self, pairs, energy=None, weight=1.0):
+        """Add pairs (i, j) of a structure (numbered from 0), with a weight or an energy
+        (of all structures or none)."""
+        if self.n is None:
+            raise Exception('The length of structures is not known')
+        if self.count and (energy is None) != (self._min is None):
+            raise Exception('Structures with and without energies can not be mixed')
+        if energy is not None:
+            if self._min is None or energy < self._min:
+                if self._min is not None:
+                    scale = np.exp((energy - self._min) / self.kt)
+                    self._flush()
+                    if self._matrix is not None:
+                        self._matrix = self._matrix * scale
+                    self.total *= scale
+                self._min = energy
+            weight = weight * np.exp(-(energy - self._min) / self.kt)
+        for i, j in pairs:
+            if i > j:
+                i, j = j, i
+            if not 0 <= i < j < self.n:
+                raise Exception('Pair %i-%i out of the structure (of length %i)' % (i, j, self.n))
+            self._rows.append(i)
+            self._cols.append(j)
+            self._vals.append(weight)
+        self.total += weight
+        self.count += 1
+        if len(self._rows) > FLUSH:
+            self._flush()
+
+    def add_structure(self, residues, seq, pairs, energy=None, weight=1.0):
+        """Add pairs of (chain, resi) of an annotated structure, see get_pairs()."""
+        if self.residues is None:
+            self.residues = residues
+            self.seq = seq
+            self.n = self.n or len(residues)
+            self._index = dict((r, i) for i, r in enumerate(residues))
+        index = self._index
+        self.add([(index[a], index[b]) for a, b in pairs if a in index and b in index],
+                 energy, weight)
+
+    def get_matrix(self):
+        """Get frequencies of pairs, a sparse (csr) upper triangular matrix (n x n)."""
+        self._flush()
+        if self._matrix is None or not self.total:
+            return sparse.csr_matrix((self.n or 0, self.n or 0))
+        return self._matrix / self.total
+
+    def get_pairs(self, min_freq=0.0):
+        """Get pairs (i, j, frequency), numbered from 0, sorted by the frequency."""
+        m = self.get_matrix().tocoo()
+        pairs = [(i, j, f) for i, j, f in zip(m.row.tolist(), m.col.tolist(), m.data.tolist())
+                 if f > min_freq]
+        return sorted(pairs, key=lambda p: (-p[2], p[0], p[1]))
+
+    def get_consensus(self, threshold=0.5):
+        """Get pairs of the frequency > threshold (a base in more pairs gets the most frequent
+        one) as SecondaryStructure (pseudoknots as levels)."""
+        taken = set()
+        pairs = []
+        for i, j, f in self.get_pairs(threshold):
+            if i not in taken and j not in taken:
+                pairs.append((i, j))
+                taken.update((i, j))
+        return SecondaryStructure.from_pairs(pairs, self.n, first=0)
+
+    def get_mea(self, gamma=1.0):
+        """Get the structure of the maximum expected accuracy (without pseudoknots), the sum of
+        ``2 * gamma * p(i, j)`` of pairs and ``1 - sum_j p(i, j)`` of unpaired bases."""
+        n = self.n
+        p = self.get_matrix().toarray()
+        p = p + p.T
+        q = 1 - p.sum(axis=1)
+        m = np.zeros((n + 1, n + 1))  # m[i, j + 1], the best score of i..j
+        for length in range(1, n + 1):
+            for i in range(0, n - length + 1):
+                j = i + length - 1
+                best = m[i + 1, j + 1] + q[i]
+                if p[i, j] > 0:
+                    best = max(best, m[i + 1, j] + 2 * gamma * p[i, j])
+                if length > 1:  # i..k, k+1..j
+                    best = max(best, (m[i, i + 1:j + 1] + m[i + 1:j + 1, j + 1]).max())
+                m[i, j + 1] = best
+        pairs = []
+        stack = [(0, n - 1)]
+        while stack:
+            i, j = stack.pop()
+            if i >= j:
+                continue
+            if np.isclose(m[i, j + 1], m[i + 1, j + 1] + q[i]):
+                stack.append((i + 1, j))
+            elif p[i, j] > 0 and np.isclose(m[i, j + 1], m[i + 1, j] + 2 * gamma * p[i, j]):
+                pairs.append((i, j))
+                stack.append((i + 1, j - 1))
+            else:
+                k = i + int(np.argmax(m[i, i + 1:j + 1] + m[i + 1:j + 1, j + 1]))
+                stack += [(i, k), (k + 1, j)]
+        return SecondaryStructure.from_pairs(pairs, n, first=0)
+
+    def plot(self, fn, ss=None):
+        """Plot a heatmap of frequencies (upper triangle) and pairs of a structure (lower
+        triangle, e.g. the consensus) to a file."""
+        import matplotlib
+        matplotlib.use('Agg')
+        import matplotlib.pyplot as plt
+        m = self.get_matrix().toarray()
+        if ss is not None:
+            for i, j in ss.get_pairs(first=0):
+                m[j, i] = 1
+        fig, ax = plt.subplots(figsize=(8, 7))
+        im = ax.imshow(m, cmap='Greys', vmin=0, vmax=1, interpolation='nearest')
+        fig.colorbar(im, ax=ax, label='frequency')
+        ax.set_title('Base pairs of %i structures' % self.count)
+        ax.set_xlabel('residue')
+        ax.set_ylabel('residue')
+        fig.savefig(fn, dpi=150, bbox_inches='tight')
+        plt.close(fig)
+
+
+def read_ss(fn):
+    """Read a secondary structure file, lines of ``()`` (as SimRNA, one line per level) or
+    dot-bracket (with pseudoknots), a header (``>``) and a sequence are skipped.
+
+    Returns:
+        seq, SecondaryStructure
+    """
+    with open(fn) as f:
+        lines = [l.strip() for l in f if l.strip() and not l.startswith('>')]
+    seq = ''.join([l for l in lines if l.isalpha()])
+    lines = [l for l in lines if not l.isalpha()]
+    if len(lines) == 1:
+        return seq, SecondaryStructure(lines[0])
+    return seq, SecondaryStructure.from_multiline(lines)
+
+
+def is_ss(fn):
+    return not is_archive_ref(fn) and os.path.splitext(fn)[1] in SS_EXT
+
+
+def get_pairs(fn, canonical=True):
+    """Get pairs of a structure, canonical (as the secondary structure of bp_annotate) or all
+    base pairs.
+
+    Returns:
+        residues (list of (chain, resi)), seq, pairs of residues
+    """
+    bases, interactions = annotate(fn, stacking=False)
+    if canonical:
+        ss = SecondaryStructure(get_dot_bracket(bases, interactions)[1].replace('&', ''))
+        pairs = [(bases.residues[i], bases.residues[j]) for i, j in ss.get_pairs(first=0)]
+    else:
+        pairs = [((x.chain_i, x.resi_i), (x.chain_j, x.resi_j)) for x in interactions]
+    return bases.residues, bases.seq, pairs
+
+
+def get_energies(files, trafl=None, scores=None, key='energy'):
+    """Get energies of files (a generator, None if not known): of frames of a SimRNA
+    trajectory (in the order of files), of a csv file (see rna_archive.read_scores, every file
+    should be there) or of metadata of archives."""
+    if trafl:
+        energies = (e for h, c in iter_blocks(trafl, block_size=100) for e in h[:, 3].tolist())
+        for f in files:
+            e = next(energies, None)
+            if e is None:
+                raise Exception('More files than frames in %s' % trafl)
+            yield e
+        return
+    fn, scores = scores, read_scores(scores) if scores else {}
+    metadata = {}  # archive -> energies of its models
+    for f in files:
+        a, name = get_model(f) if is_archive_ref(f) else (None, f)
+        e = scores.get(os.path.basename(name), {}).get(key)
+        if e is None and fn:
+            raise Exception('No %s of %s in %s' % (key, os.path.basename(name), fn))
+        if e is None and a is not None:
+            if a.fn not in metadata:
+                metadata[a.fn] = a.get_metadata(key)
+            e = metadata[a.fn][a.index[name]]
+            e = None if np.isnan(e) else float(e)
+        yield e
+
+
+def get_frequencies(files, energies=None, kt=1.0, canonical=True, threads=1):
+    """Get PairFrequencies of structures (or secondary structures), structures are
+    annotated in threads, and added one by one.
+
+    Args:
+        files (list): structures (and models of archives) or secondary structures
+        energies (iterable): of files (None for equal weights)
+    """
+    freqs = PairFrequencies(kt=kt)
+    energies = energies if energies is not None else (None for f in files)
+
+    def read(f):
+        if is_ss(f):
+            seq, ss = read_ss(f)
+            return f, None, seq, ss
+        return (f,) + get_pairs(f, canonical)
+
+    pool = ThreadPool(threads) if threads > 1 else None
+    try:
+        for (f, residues, seq, pairs), e in zip(pool.imap(read, files) if pool else map(read, files),
+                                                energies):
+            if freqs.count and (e is None) != (freqs._min is None):
+                raise Exception('%s has %s energy, unlike the structures before, energies should be '
+                                'given for all structures or none' % (f, 'an' if e is not None else 'no'))
+            if residues is None:  # a secondary structure
+                if freqs.n is None:
+                    freqs.n, freqs.seq = len(pairs), seq
+                freqs.add(pairs.get_pairs(first=0), e)
+            else:
+                freqs.add_structure(residues, seq, pairs, e)
+    finally:
+        if pool:
+            pool.close()
+    return freqs
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--trafl', help="SimRNA trajectory, energies of frames (in the order of files)")
+    parser.add_argument('--scores', help="energies of structures, a csv file (name,energy,...)")
+    parser.add_argument('--key', help="a column of --scores (or metadata of archives) with energies",
+                        default='energy')
+    parser.add_argument('--kt', help="kT of Boltzmann weights", type=float, default=1.0)
+    parser.add_argument('--equal', action='store_true', help="equal weights, energies are not used")
+    parser.add_argument('--all', action='store_true', help="all base pairs (not only canonical)")
+    parser.add_argument('--threshold', help="min frequency of pairs of the consensus", type=float,
+                        default=0.5)
+    parser.add_argument('--gamma', help="weight of pairs of MEA", type=float, default=1.0)
+    parser.add_argument('--pairs', help="list pairs of frequency > this", type=float)
+    parser.add_argument('--npz', help="save frequencies (a scipy sparse matrix, .npz)")
+    parser.add_argument('--plot', help="save a heatmap of frequencies (and the consensus)")
+    parser.add_argument('-t', '--threads', help="# of threads to annotate structures", type=int,
+                        default=1)
+    parser.add_argument('files', help="PDB/mmCIF files, archives, secondary structures (.ss_detected)",
+                        nargs='+')
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_parser().parse_args()
+    files = expand_archives(args.files)
+    energies = None if args.equal else get_energies(files, args.trafl, args.scores, args.key)
+    freqs = get_frequencies(files, energies, args.kt, not args.all, args.threads)
+    consensus = freqs.get_consensus(args.threshold)
+    print('# of structures: %i' % len(freqs))
+    if freqs.seq:
+        print('seq        %s' % freqs.seq)
+    print('consensus  %s' % consensus.to_dot_bracket())
+    print('mea        %s' % freqs.get_mea(args.gamma).to_dot_bracket())
+    if args.pairs is not None:
+        for i, j, f in freqs.get_pairs(args.pairs):
+            if freqs.residues:
+                (ci, ri), (cj, rj) = freqs.residues[i], freqs.residues[j]
+                print('%s%-5i %s%-5i %.3f' % (ci, ri, cj, rj, f))
+            else:
+                print('%-5i %-5i %.3f' % (i + 1, j + 1, f))
+    if args.npz:
+        sparse.save_npz(args.npz, freqs.get_matrix())
+    if args.plot:
+        freqs.plot(args.plot, consensus)
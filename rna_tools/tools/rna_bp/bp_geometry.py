@@ -0,0 +1,182 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""Geometry of many base pairs at once (NumPy).
+
+Take a coordinate table of a structure and a list of pairs (i, j) (e.g. from
+``parse_vienna_to_pairs``) and get, for all pairs at once, centroids, frames,
+distances between pairs, and the 18 atoms (sugar atoms + N9/N1 of both residues)
+used to superimpose base pairs (the same atoms as in BasePair.get_atoms_ab())::
+
+    >>> import os
+    >>> fn = os.path.join(os.path.dirname(__file__), os.pardir, 'rna_helix_vis', 'test_data', 'rp14_farna_eloop.out.1.pdb')
+    >>> table = get_coord_table(fn)
+    >>> pairs = [(1, 59), (2, 58), (3, 57)]
+    >>> centroids = get_pair_centroids(table, pairs)
+    >>> centroids.shape
+    (3, 3)
+    >>> get_pair_distances(centroids).shape
+    (3, 3)
+    >>> get_superposition_atoms(table, pairs).shape
+    (3, 18, 3)
+"""
+from __future__ import print_function
+from collections import namedtuple
+
+import numpy as np
+
+from rna_tools.rna_mmcif import is_cif, read_atom_site
+from rna_tools.rna_archive import is_archive_ref, get_table
+
+SUPERPOSITION_ATOMS = ["C5'", "C4'", "O4'", "C3'", "O3'", "C1'", "C2'", "O2'"]
+GLYCOSIDIC_ATOM = {'A': 'N9', 'G': 'N9', 'C': 'N1', 'U': 'N1'}
+
+CoordTable = namedtuple('CoordTable', ['chains', 'resis', 'resnames', 'names', 'coords', 'residues'])
+
+
+def get_coord_table(fn, chain=None):
+    """Read atoms (without hydrogens) of the first model of a PDB file.
+
+    Args:
+        fn (str): a PDB file (or a list of lines), a mmCIF file (see rna_mmcif.py) or
+            a model of an archive (see rna_archive.py)
+        chain (str): only this chain
+
+    Returns:
+        CoordTable: arrays of chains, resis, resnames, names, coords (n x 3) and
+        residues, a dict (chain, resi) -> slice of atoms of the residue
+    """
+    if is_archive_ref(fn) or (isinstance(fn, str) and is_cif(fn)):
+        t = get_table(fn) if is_archive_ref(fn) else read_atom_site(fn, hydrogens=False)
+        mask = np.array([not n.startswith('H') for n in t.names.tolist()], dtype=bool)
+        mask &= t.models == t.models[0]
+        if chain:
+            mask &= t.chains == chain
+        return _get_coord_table(t.chains[mask], t.resis[mask], t.resnames[mask], t.names[mask],
+                                t.coords[mask])
+    lines = open(fn).read().splitlines() if isinstance(fn, str) else fn
+    chains, resis, resnames, names, coords = [], [], [], [], []
+    for l in lines:
+        if l.startswith('ENDMDL'):
+            break
+        if not l.startswith(('ATOM', 'HETATM')):
+            continue
+        name = l[12:16].strip()
+        if name.startswith('H') or (chain and l[21] != chain):
+            continue
+        chains.append(l[21])
+        resis.append(int(l[22:26]))
+        resnames.append(l[17:20].strip())
+        names.append(name)
+        coords.append((float(l[30:38]), float(l[38:46]), float(l[46:54])))
+    return _get_coord_table(np.array(chains), np.array(resis, dtype=int), np.array(resnames),
+                            np.array(names), np.array(coords, dtype=float).reshape(-1, 3))
+
+
+def _get_coord_table(chains, resis, resnames, names, coords):
+    residues = {}
+    for i, key in enumerate(zip(chains.tolist(), resis.tolist())):
+        start = residues[key].start if key in residues else i
+        residues[key] = slice(start, i + 1)
+    return CoordTable(chains, resis, resnames, names, coords, residues)
+
+
+def _get_slices(table, pairs, chain):
+    """Get slices of atoms of residues of pairs, (k, 2) of slices."""
+    try:
+        return [(table.residues[(chain, i)], table.residues[(chain, j)]) for i, j in pairs]
+    except KeyError as e:
+        raise Exception('Residue %s:%i not found in the structure' % e.args[0])
+
+
+def get_pair_centroids(table, pairs, chain='A'):
+    """Get centroids of base pairs (all atoms of both residues, without hydrogens, as BasePair.calc_coord).
+
+    Returns:
+        np.array (k x 3)
+    """
+    if not len(pairs):
+        return np.zeros((0, 3))
+    # sums of coordinates of all residues at once
+    bounds = sorted(set([s.start for s in table.residues.values()]))
+    sums = np.add.reduceat(table.coords, bounds, axis=0)
+    counts = np.diff(bounds + [len(table.coords)])
+    row = dict((b, i) for i, b in enumerate(bounds))
+    idx = np.array([(row[a.start], row[b.start]) for a, b in _get_slices(table, pairs, chain)])
+    return (sums[idx[:, 0]] + sums[idx[:, 1]]) / (counts[idx[:, 0]] + counts[idx[:, 1]])[:, None]
+
+
+def _get_atom_index(table, chain):
+    """Get a dict (resi, atom name) -> index of atom."""
+    idx = np.flatnonzero(table.chains == chain)
+    return dict(zip(zip(table.resis[idx].tolist(), table.names[idx].tolist()), idx.tolist()))
+
+
+def _get_atoms(table, pairs, chain, names_a, names_b):
+    """Get coordinates of atoms (names_a of i + names_b of j), nan if an atom is missing."""
+    index = _get_atom_index(table, chain)
+    coords = np.vstack([table.coords, [np.nan] * 3])
+    missing = len(table.coords)
+    idx = np.array([[index.get((i, n), missing) for n in names_a(i)] + [index.get((j, n), missing) for n in names_b(j)]
+                    for i, j in pairs], dtype=int).reshape(len(pairs), -1)
+    return coords[idx]
+
+
+def get_superposition_atoms(table, pairs, chain='A', order='ba'):
+    """Get 18 atoms per base pair, 8 sugar atoms and N9 (purines) or N1 (pyrimidines)
+    of both residues, in a fixed order, so base pairs can be superimposed.
+
+    Args:
+        order (str): as of BasePair (a is i, b is j), ba: atoms of i first (as
+            BasePair.get_atoms_ba()), ab: atoms of j first (as BasePair.get_atoms_ab())
+
+    Returns:
+        np.array (k x 18 x 3), nan for missing atoms
+    """
+    resnames = dict(((r, n), rn) for r, n, rn in zip(table.resis.tolist(), table.chains.tolist(), table.resnames.tolist()))
+
+    def names(resi):
+        return SUPERPOSITION_ATOMS + [GLYCOSIDIC_ATOM.get(resnames.get((resi, chain)), 'N9')]
+    if order == 'ab':
+        pairs = [(j, i) for i, j in pairs]
+    elif order != 'ba':
+        raise Exception('order should be ab or ba, not %s' % order)
+    return _get_atoms(table, pairs, chain, names, names)
+
+
+def get_pair_frames(table, pairs, chain='A'):
+    """Get frames of base pairs.
+
+    The origin is the centroid of the pair, x goes from C1' of i to C1' of j,
+    y (in the plane of the pair) from the middle of C1'-C1' to the middle of the
+    glycosidic atoms (N9/N1), and z = x × y.
+
+    Returns:
+        origins (k x 3), axes (k x 3 x 3, rows are x, y, z)
+    """
+    resnames = dict(((r, n), rn) for r, n, rn in zip(table.resis.tolist(), table.chains.tolist(), table.resnames.tolist()))
+
+    def glycosidic(resi):
+        return ["C1'", GLYCOSIDIC_ATOM.get(resnames.get((resi, chain)), 'N9')]
+    atoms = _get_atoms(table, pairs, chain, glycosidic, glycosidic)  # C1'(i), N(i), C1'(j), N(j)
+    x = atoms[:, 2] - atoms[:, 0]
+    x /= np.linalg.norm(x, axis=1)[:, None]
+    y = (atoms[:, 1] + atoms[:, 3]) / 2 - (atoms[:, 0] + atoms[:, 2]) / 2
+    y -= (y * x).sum(axis=1)[:, None] * x
+    y /= np.linalg.norm(y, axis=1)[:, None]
+    z = np.cross(x, y)
+    return get_pair_centroids(table, pairs, chain), np.stack([x, y, z], axis=1)
+
+
+def get_pair_distances(centroids, other=None):
+    """Get distances between base pairs (their centroids), k x k (or k x m for other)."""
+    other = centroids if other is None else other
+    diff = centroids[:, None, :] - other[None, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def get_pair_rmsds(atoms, other=None):
+    """Get RMSDs (without superposition, as BasePair.calc_rmsd_to) between sets of
+    atoms of base pairs, k x k (or k x m for other)."""
+    other = atoms if other is None else other
+    diff = atoms[:, None] - other[None, :]
+    return np.sqrt((diff ** 2).sum(axis=-1).mean(axis=-1))
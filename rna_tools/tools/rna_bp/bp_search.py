@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""bp_search.py - search for base pairs or base-pair steps in a library of structures.
+
+A library is built once for a folder of PDB files: all (canonical, see find_pairs()) base pairs
+or base-pair steps (two stacked pairs, (i, j) and (i+1, j-1)) are extracted, their atoms
+(18 atoms per pair, see bp_geometry.get_superposition_atoms()) are saved in the local frame of
+the (first) pair, with rotation-invariant descriptors (distances between C1' and N9/N1 atoms).
+The library is one compact ``.npz`` file (float32).
+
+A query gets candidates with similar descriptors (a kd-tree on descriptors), and only
+these candidates are superimposed to the query (batched Kabsch).
+
+Example::
+
+    $ bp_search.py --build steps.npz --kind step pdbs/*.pdb
+    # of structures: 1000
+    # of steps: 23104
+    $ bp_search.py --lib steps.npz --query target.pdb --pair 5 41 --rmsd 1.0
+    1xjr.pdb A 3 45 0.34
+    [..]
+
+.. warning:: pairs are searched within chains
+"""
+from __future__ import print_function
+
+import argparse
+import os
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table, get_superposition_atoms, \
+    get_pair_frames
+
+# atoms of a canonical base pair: purine, pyrimidine, e.g. N1 of G and N3 of C
+PAIR_ATOMS = {('G', 'C'): ('N1', 'N3'), ('A', 'U'): ('N1', 'N3'), ('G', 'U'): ('N1', 'O2')}
+
+
+def kabsch_rmsd_batch(P, Q, centered=False):
+    """Superimpose (Kabsch) each set of atoms of P on Q and get RMSDs.
+
+    Only RMSDs are needed, so singular values of the covariance matrices (from eigenvalues
+    of H^T H, 3 x 3) are used, without rotation matrices.
+
+    Args:
+        P (np.array): n x m x 3, n sets of m atoms
+        Q (np.array): m x 3 (or n x m x 3)
+        centered (bool): P and Q are already centered
+
+    Returns:
+        np.array: n RMSDs
+
+    >>> Q = np.array([[0, 0, 0], [1, 0, 0], [0, 2, 0], [0, 0, 3.]])
+    >>> R = np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1.]])  # rotation around z
+    >>> P = np.stack([Q.dot(R.T) + 5, Q + [[0, 0, 0], [0, 0, 0], [0, 0, 0], [0, 0, 1]]])
+    >>> np.round(kabsch_rmsd_batch(P, Q), 2).tolist()
+    [0.0, 0.42]
+    """
+    P = np.asarray(P, dtype=float)
+    Q = np.asarray(Q, dtype=float)
+    if not centered:
+        P = P - P.mean(axis=1)[:, None]
+        Q = Q - Q.mean(axis=-2)[..., None, :]
+    H = np.matmul(P.transpose(0, 2, 1), Q)
+    s = np.sqrt(np.maximum(np.linalg.eigvalsh(np.matmul(H.transpose(0, 2, 1), H)), 0))
+    d = np.sign(np.linalg.det(H))  # a reflection
+    e = (P ** 2).sum(axis=(1, 2)) + (Q ** 2).sum(axis=(-2, -1)) - 2 * (s[:, 2] + s[:, 1] + d * s[:, 0])
+    return np.sqrt(np.maximum(e, 0) / P.shape[1])
+
+
+def find_pairs(table, chain='A', cut_off=3.5):
+    """Find canonical base pairs (G-C, A-U and G-U), with a distance between N1 of
+    a purine and N3 (or O2 for G-U) of a pyrimidine below cut_off (one partner per
+    residue, the closest one).
+
+    Returns:
+        list of (i, j), i < j
+
+    >>> import os
+    >>> fn = os.path.join(os.path.dirname(__file__), os.pardir, 'rna_helix_vis', 'test_data', 'rp14_farna_eloop.out.1.pdb')
+    >>> find_pairs(get_coord_table(fn))[:5]
+    [(1, 59), (2, 58), (3, 57), (4, 56), (5, 55)]
+    """
+    in_chain = table.chains == chain
+    resnames = dict(zip(table.resis[in_chain].tolist(), table.resnames[in_chain].tolist()))
+    index = dict(((r, n), i) for i, (r, n) in enumerate(zip(table.resis.tolist(), table.names.tolist()))
+                 if in_chain[i])
+    close = []
+    for (pur, pyr), (a, b) in PAIR_ATOMS.items():
+        ia = [(r, index[(r, a)]) for r, rn in resnames.items() if rn == pur and (r, a) in index]
+        ib = [(r, index[(r, b)]) for r, rn in resnames.items() if rn == pyr and (r, b) in index]
+        if not ia or not ib:
+            continue
+        ta, tb = cKDTree(table.coords[[x[1] for x in ia]]), cKDTree(table.coords[[x[1] for x in ib]])
+        for (k, l), d in ta.sparse_distance_matrix(tb, cut_off).items():
+            i, j = ia[k][0], ib[l][0]
+            if abs(i - j) > 2:
+                close.append((d, min(i, j), max(i, j)))
+    # one partner per residue, the closest one
+    pairs, used = [], set()
+    for d, i, j in sorted(close):
+        if i not in used and j not in used:
+            pairs.append((i, j))
+            used.update((i, j))
+    return sorted(pairs)
+
+
+def get_steps(pairs):
+    """Get base-pair steps, (i, j) followed by (i+1, j-1).
+
+    >>> get_steps([(1, 10), (2, 9), (3, 8), (5, 7)])
+    [((1, 10), (2, 9)), ((2, 9), (3, 8))]
+    """
+    pairs_set = set(pairs)
+    return [((i, j), (i + 1, j - 1)) for i, j in pairs if (i + 1, j - 1) in pairs_set]
+
+
+def get_descriptors(atoms):
+    """Get rotation-invariant descriptors of entries: distances between all C1' and N9/N1 atoms
+    (atoms 5 and 8 of each residue of the 18 atoms sets).
+
+    Args:
+        atoms (np.array): n x (18 * k) x 3, k is 1 for pairs, 2 for steps
+    """
+    idx = [r * 9 + a for r in range(atoms.shape[1] // 9) for a in (5, 8)]
+    sel = atoms[:, idx]
+    iu = np.triu_indices(len(idx), 1)
+    d = np.sqrt(((sel[:, :, None] - sel[:, None, :]) ** 2).sum(axis=-1))
+    return d[:, iu[0], iu[1]]
+
+
+def get_entries(table, pairs, kind='pair', chain='A'):
+    """Get atoms (in the local frame of the first pair) of pairs or steps.
+
+    Returns:
+        keys (list of pairs/steps), atoms (n x 18 (or 36) x 3)
+    """
+    if kind == 'step':
+        keys = get_steps(pairs)
+        first = [s[0] for s in keys]
+        atoms = np.concatenate([get_superposition_atoms(table, first, chain),
+                                get_superposition_atoms(table, [s[1] for s in keys], chain)], axis=1) \
+            if keys else np.zeros((0, 36, 3))
+    else:
+        keys = first = list(pairs)
+        atoms = get_superposition_atoms(table, first, chain) if keys else np.zeros((0, 18, 3))
+    if keys:
+        origins, axes = get_pair_frames(table, first, chain)
+        atoms = np.einsum('nmj,nij->nmi', atoms - origins[:, None], axes)
+    return keys, atoms
+
+
+class BasePairLibrary(object):
+    """A library of base pairs (or base-pair steps) of many structures.
+
+    Attributes:
+        atoms (np.array): n x 18 (or 36) x 3, in local frames
+        descriptors (np.array): n x d
+        files, chains (np.array): for each entry
+        resis (np.array): n x 2 (pairs) or n x 4 (steps), i, j (, i+1, j-1)
+    """
+    def __init__(self, fn=None, kind='pair'):
+        self.kind = kind
+        self.atoms = np.zeros((0, 36 if kind == 'step' else 18, 3), dtype=np.float32)
+        self.descriptors = np.zeros((0, 28 if kind == 'step' else 6), dtype=np.float32)
+        self.files = np.array([], dtype=str)
+        self.chains = np.array([], dtype=str)
+        self.resis = np.zeros((0, 4 if kind == 'step' else 2), dtype=int)
+        self._tree = None
+        if fn:
+            self.load(fn)
+
+    def __len__(self):
+        return len(self.atoms)
+
+    def build(self, files, pairs=None, verbose=False):
+        """Extract pairs (or steps) from files.
+
+        Args:
+            files (list): PDB files
+            pairs (function): gets (table, chain) and returns pairs, by default find_pairs()
+        """
+        pairs = pairs or find_pairs
+        atoms, files_, chains, resis = [], [], [], []
+        for fn in files:
+            table = get_coord_table(fn)
+            for chain in sorted(set(table.chains.tolist())):
+                keys, a = get_entries(table, pairs(table, chain), self.kind, chain)
+                ok = ~np.isnan(a).any(axis=(1, 2))
+                if not ok.any():
+                    continue
+                atoms.append(a[ok])
+                keys = [k for k, o in zip(keys, ok) if o]
+                resis.extend([sum(k, ()) if self.kind == 'step' else k for k in keys])
+                files_.extend([os.path.basename(fn)] * len(keys))
+                chains.extend([chain] * len(keys))
+            if verbose:
+                print(fn, len(files_))
+        if atoms:
+            self.atoms = np.concatenate([self.atoms] + atoms).astype(np.float32)
+            self.resis = np.concatenate([self.resis, np.array(resis, dtype=int)])
+            self.files = np.concatenate([self.files, files_])
+            self.chains = np.concatenate([self.chains, chains])
+            self.descriptors = get_descriptors(self.atoms).astype(np.float32)
+        self._tree = None
+        return self
+
+    def save(self, fn):
+        np.savez_compressed(fn, kind=self.kind, atoms=self.atoms, descriptors=self.descriptors,
+                            files=self.files, chains=self.chains, resis=self.resis)
+
+    def load(self, fn):
+        data = np.load(fn)
+        self.kind = str(data['kind'])
+        for key in ['atoms', 'descriptors', 'files', 'chains', 'resis']:
+            setattr(self, key, data[key])
+        self._tree = None
+
+    def query(self, atoms, max_rmsd=1.0, tolerance=1.0):
+        """Find entries similar to atoms.
+
+        Args:
+            atoms (np.array): 18 (or 36) x 3, atoms of a pair (or step), see get_entries()
+            max_rmsd (float): RMSD cut-off (after superposition)
+            tolerance (float): candidates have descriptors within this distance (A)
+
+        Returns:
+            list of (rmsd, file, chain, resis), sorted by rmsd
+        """
+        if not len(self):
+            return []
+        if self._tree is None:
+            self._tree = cKDTree(self.descriptors)
+        desc = get_descriptors(np.asarray(atoms)[None])[0]
+        candidates = np.array(self._tree.query_ball_point(desc, tolerance), dtype=int)
+        if not len(candidates):
+            return []
+        rmsds = kabsch_rmsd_batch(self.atoms[candidates].astype(float), np.asarray(atoms, dtype=float))
+        hits = np.argsort(rmsds)
+        return [(float(rmsds[h]), str(self.files[candidates[h]]), str(self.chains[candidates[h]]),
+                 tuple(self.resis[candidates[h]].tolist())) for h in hits if rmsds[h] <= max_rmsd]
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--build', help="build a library, save it to this file (.npz)")
+    parser.add_argument('--kind', help="pair or step", default='pair', choices=['pair', 'step'])
+    parser.add_argument('--lib', help="a library to search")
+    parser.add_argument('--query', help="a PDB file with a query")
+    parser.add_argument('--chain', help="chain of the query", default='A')
+    parser.add_argument('--pair', help="a pair of the query, i j (for steps, the first pair)", nargs=2, type=int)
+    parser.add_argument('--rmsd', help="RMSD cut-off", default=1.0, type=float)
+    parser.add_argument('--tolerance', help="tolerance of descriptors (A)", default=1.0, type=float)
+    parser.add_argument("-v", "--verbose", action="store_true", help="be verbose")
+    parser.add_argument('files', help="PDB files to build a library", nargs='*')
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    if args.build:
+        lib = BasePairLibrary(kind=args.kind).build(args.files, verbose=args.verbose)
+        lib.save(args.build)
+        print('# of structures:', len(args.files))
+        print('# of %ss:' % args.kind, len(lib))
+
+    if args.lib:
+        lib = BasePairLibrary(args.lib)
+        i, j = args.pair
+        pairs = [(i, j), (i + 1, j - 1)] if lib.kind == 'step' else [(i, j)]
+        keys, atoms = get_entries(get_coord_table(args.query), pairs, lib.kind, args.chain)
+        if not keys or np.isnan(atoms).any():
+            parser.error('the query (pair/step) not found, or atoms are missing')
+        for rmsd, fn, chain, resis in lib.query(atoms[0], args.rmsd, args.tolerance):
+            print(fn, chain, ' '.join([str(r) for r in resis]), round(rmsd, 2))
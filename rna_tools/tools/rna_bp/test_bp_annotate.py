@@ -0,0 +1,36 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from rna_tools.SecondaryStructure import SecondaryStructure
+from rna_tools.tools.rna_bp.bp_annotate import annotate, get_dot_bracket, to_clarna, read_clarna, \
+    compare
+
+PATH = os.path.dirname(os.path.abspath(__file__))
+X3DNA = os.path.join(PATH, os.pardir, 'rna_x3dna', 'test_data')
+
+
+def test_pairs_as_dssr():
+    # secondary structures of x3dna-dssr, see rna_x3dna.py
+    for fn, dssr in [('1xjr.pdb', '.(((((((...((((.((((.....))..))..))).).)))))))'),  # w/o the modified G1
+                     ('rp2_bujnicki_1_rpr.pdb', '[[[[(((.....(((&{{{{))))))&(((((((.....(.(&]]]]).))))&'
+                                                '[[[[[[......[[[&))))]]].]]&}}}}(((.....(((&]]]]))))))')]:
+        bases, interactions = annotate(os.path.join(X3DNA, fn))
+        seq, ss = get_dot_bracket(bases, interactions)
+        assert ss.count('&') == dssr.count('&')
+        assert SecondaryStructure(ss.replace('&', '')).get_pairs() == \
+            SecondaryStructure(dssr.replace('&', '')).get_pairs()
+
+
+def test_types_and_clarna(tmpdir):
+    bases, interactions = annotate(os.path.join(X3DNA, '1xjr.pdb'))
+    types = dict(((x.resi_i, x.resi_j), x.type) for x in interactions)
+    assert types[(22, 26)] == 'SH_tran'  # the sheared G-A of the GNRA loop
+    assert types[(5, 6)] == '>>'  # stacking in a helix
+    fn = str(tmpdir.join('1xjr.pdb.outCR'))
+    with open(fn, 'w') as f:
+        f.write(to_clarna(bases, interactions))
+    assert read_clarna(fn) == interactions
+    assert compare(interactions, interactions) == [1.0] * 8
+    no_stacking = [x for x in interactions if x.kind == 'bp']
+    assert compare(interactions, no_stacking)[1] == 0.0
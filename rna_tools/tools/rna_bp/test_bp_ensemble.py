@@ -0,0 +1,74 @@
+import os
+
+import numpy as np
+import pytest
+
+from rna_tools.rna_archive import Archive, expand_archives
+from rna_tools.tools.rna_bp.bp_ensemble import PairFrequencies, get_energies, get_frequencies
+from rna_tools.tools.simrna_trajectory.simrna_trajectory import iter_blocks
+
+TEST = os.path.dirname(os.path.abspath(__file__))
+INPUT = os.path.join(TEST, os.pardir, os.pardir, 'input')
+TRAFL = os.path.join(TEST, os.pardir, 'simrna_trajectory', 'test_data', 'mini.trafl')
+
+
+def test_ss_files_and_trafl_energies(tmpdir):
+    structures = ['((((....))))', '(((......)))', '.((......)).', '[[[.((]]].))']
+    files = []
+    for k, ss in enumerate(structures):
+        fn = str(tmpdir.join('f%i.ss_detected' % k))
+        with open(fn, 'w') as f:
+            f.write(ss + '\n')
+        files.append(fn)
+    energies = np.concatenate([h[:, 3] for h, c in iter_blocks(TRAFL)])[:len(files)]
+    freqs = get_frequencies(files, get_energies(files, TRAFL), kt=2.0)
+    w = np.exp(-(energies - energies.min()) / 2.0)
+    assert len(freqs) == 4 and freqs.n == 12
+    assert np.isclose(freqs.get_matrix()[0, 11], w[:2].sum() / w.sum())
+    assert np.isclose(freqs.get_matrix()[0, 8], w[3] / w.sum())
+    # equal weights
+    freqs = get_frequencies(files)
+    assert freqs.get_consensus().to_dot_bracket() == '.((......)).'
+    assert freqs.get_mea(gamma=2).to_dot_bracket() == '(((......)))'
+    freqs.plot(str(tmpdir.join('bp.png')), freqs.get_consensus())
+    assert tmpdir.join('bp.png').check()
+
+
+def test_mea_is_nested():
+    f = PairFrequencies(8)
+    f.add([(0, 7), (1, 6), (2, 5)], weight=0.6)
+    f.add([(0, 4), (3, 7)], weight=0.4)
+    assert f.get_consensus(0.3).to_dot_bracket() == '(((..)))'
+    assert f.get_mea().to_dot_bracket() == '(((..)))'
+    assert f.get_pairs(0.5) == [(0, 7, 0.6), (1, 6, 0.6), (2, 5, 0.6)]
+
+
+def test_archive_metadata(tmpdir):
+    fn = str(tmpdir.join('1xjr.rnarc'))
+    with Archive(fn, 'a') as a:
+        a.add_pdb(os.path.join(INPUT, '1xjr.pdb'), metadata={'energy': -10})
+        a.add_pdb(os.path.join(INPUT, '1xjr_A5-10.pdb'), metadata={'energy': -9})
+    files = expand_archives([fn])
+    assert list(get_energies(files)) == [-10, -9]
+    freqs = get_frequencies(files, get_energies(files), threads=2)
+    assert freqs.seq == 'GAGUUCACCGAGGCCACGCGGAGUACGAUCGAGGGUACAGUGAAUU'
+    assert freqs.get_consensus().to_dot_bracket() == '.(((((((...((((.((((.....))..))..))).).)))))))'
+
+
+def test_missing_energies(tmpdir):
+    f = PairFrequencies(6)
+    f.add([(0, 5)], energy=-100)
+    with pytest.raises(Exception):
+        f.add([(1, 4)])
+    fn = str(tmpdir.join('1xjr.rnarc'))
+    with Archive(fn, 'a') as a:
+        a.add_pdb(os.path.join(INPUT, '1xjr.pdb'), metadata={'energy': -10})
+        a.add_pdb(os.path.join(INPUT, '1xjr_A5-10.pdb'))
+    files = expand_archives([fn])
+    assert list(get_energies(files)) == [-10, None]
+    with pytest.raises(Exception):
+        get_frequencies(files, get_energies(files))
+    scores = tmpdir.join('scores.csv')
+    scores.write('fn,energy\n1xjr.pdb,-10\n')
+    with pytest.raises(Exception):
+        list(get_energies(files, scores=str(scores)))
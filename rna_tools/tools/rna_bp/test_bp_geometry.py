@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+from Bio import PDB
+
+from rna_tools.tools.rna_bp.base_pair import BasePair
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table, get_pair_centroids, \
+    get_superposition_atoms, get_pair_frames, get_pair_rmsds
+
+FN = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'rna_helix_vis', 'test_data',
+                  'rp14_farna_eloop.out.1.pdb')
+PAIRS = [(1, 59), (2, 58), (7, 20)]
+
+
+def test_as_base_pair():
+    struc = PDB.PDBParser(QUIET=True).get_structure('', FN)
+    chain = struc[0]['A']
+    bps = [BasePair(chain[i], chain[j], struc) for i, j in PAIRS]
+    table = get_coord_table(FN)
+    assert np.allclose(get_pair_centroids(table, PAIRS), [bp.coord for bp in bps], atol=1e-4)
+    atoms = get_superposition_atoms(table, PAIRS, order='ab')
+    for bp, a in zip(bps, atoms):
+        assert np.allclose([at.get_coord() for at in bp.get_atoms_ab()], a, atol=1e-4)
+    for bp, a in zip(bps, get_superposition_atoms(table, PAIRS, order='ba')):
+        assert np.allclose([at.get_coord() for at in bp.get_atoms_ba()], a, atol=1e-4)
+    assert np.isclose(get_pair_rmsds(atoms)[0, 1], bps[0].calc_rmsd_to(bps[1]), atol=1e-4)
+
+
+def test_frames():
+    origins, axes = get_pair_frames(get_coord_table(FN), PAIRS)
+    for ax in axes:
+        assert np.allclose(ax.dot(ax.T), np.eye(3))
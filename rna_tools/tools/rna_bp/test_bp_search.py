@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+from rna_tools.tools.rna_bp.bp_search import BasePairLibrary, get_entries, find_pairs, \
+    kabsch_rmsd_batch
+
+FN = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, 'rna_helix_vis', 'test_data',
+                  'rp14_farna_eloop.out.1.pdb')
+
+
+def test_kabsch_rmsd_batch():
+    rng = np.random.RandomState(0)
+    Q = rng.rand(18, 3) * 10
+    angle = 0.7
+    R = np.array([[np.cos(angle), -np.sin(angle), 0], [np.sin(angle), np.cos(angle), 0], [0, 0, 1]])
+    P = np.stack([Q.dot(R.T) + 3, Q[::-1]])
+    rmsds = kabsch_rmsd_batch(P, Q)
+    assert np.isclose(rmsds[0], 0, atol=1e-6)
+    assert rmsds[1] > 1
+
+
+def test_library(tmpdir):
+    for kind in ['pair', 'step']:
+        lib = BasePairLibrary(kind=kind).build([FN])
+        assert len(lib)
+        fn = str(tmpdir.join(kind + '.npz'))
+        lib.save(fn)
+        lib = BasePairLibrary(fn)
+        assert lib.kind == kind
+
+        table = get_coord_table(FN)
+        keys, atoms = get_entries(table, [(1, 59), (2, 58)], kind)
+        hits = lib.query(atoms[0], max_rmsd=0.5)
+        # the query itself is the best hit
+        assert hits[0][0] < 1e-3
+        assert hits[0][1:3] == ('rp14_farna_eloop.out.1.pdb', 'A')
+        assert hits[0][3][:2] == (1, 59)
+        assert all(h[0] <= 0.5 for h in hits)
+
+        # only candidates (similar descriptors) are superimposed
+        all_rmsds = kabsch_rmsd_batch(lib.atoms.astype(float), atoms[0])
+        assert len(hits) <= (all_rmsds <= 0.5).sum()
+
+
+def test_find_pairs():
+    pairs = find_pairs(get_coord_table(FN))
+    residues = [r for p in pairs for r in p]
+    assert len(residues) == len(set(residues))
+    assert (33, 46) in pairs
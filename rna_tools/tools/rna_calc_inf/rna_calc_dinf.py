@@ -20,6 +20,13 @@ use clarna_compare.py::
     [mm] rna_calc_inf$ clarna_compare.py -iref 1Y26.pdb.outCR -ichk 1Y26.pdb.outCR
     1Y26.pdb.outCR                               1Y26.pdb.outCR      1.000      0.000      1.000      1.000      1.000      1.000      1.000      1.000
 
+or get dINF of many models to a reference structure directly (contacts of the reference are
+calculated once)::
+
+    [mm] rna_calc_inf$ ./rna_calc_dinf.py -r test_output/1Y26.pdb test_output/1y26X_M451.pdb
+    fn,dinf,sns,ppv
+    1y26X_M451.pdb,0.902,0.897,0.907
+
 You can use ``-d`` to get a list of all interacting bases, something like::
 
     draw_dists([(13, 14),(13, 83),...(82, 83)])
@@ -34,8 +41,12 @@ Mind, that draw_dists works on C2 atoms, that might be different from atoms dete
 
 """
 from __future__ import print_function
-import Bio.PDB
 import argparse
+import os
+
+import numpy as np
+from scipy.sparse import coo_matrix
+from scipy.spatial import cKDTree
 
 v = False # verbose
 ATOMS = {'G' : "N9 C8 N7 C5 C6 O6 N1 C2 N2 N3 C4".split(),
@@ -73,17 +84,118 @@ class Pair:
         """ get_dists([[62, 71], """
         return(self.a, self.b)
 
+
+def read_atoms(filename):
+    """Read atoms of the first model of a PDB file into arrays.
+
+    Returns:
+        residues (list of (chain, resi, icode, resname)), coords (n x 3 array),
+        res_idx (n, an index of residue of each atom), is_base (n, True for atoms of bases, see ATOMS)
+    """
+    residues = []
+    res_index = {}
+    coords, res_idx, is_base = [], [], []
+    with open(filename) as f:
+        for l in f:
+            if l.startswith('ENDMDL'):
+                break
+            if not l.startswith(('ATOM', 'HETATM')) or l[16] not in ' A':  # only the first altloc
+                continue
+            key = (l[21], int(l[22:26]), l[26].strip(), l[17:20].strip())
+            if key not in res_index:
+                res_index[key] = len(residues)
+                residues.append(key)
+            coords.append((float(l[30:38]), float(l[38:46]), float(l[46:54])))
+            res_idx.append(res_index[key])
+            is_base.append(l[12:16].strip() in ATOMS.get(key[3], ()))
+    return residues, np.array(coords, dtype=float).reshape(-1, 3), np.array(res_idx, dtype=int), \
+        np.array(is_base, dtype=bool)
+
+
+def get_contacts(filename, cut_off=5):
+    """Get residue-residue contacts: a base atom of one residue is closer than cut_off
+    to any atom of another residue.
+
+    All close atoms are found with one search (a kd-tree), then atom contacts are reduced
+    to unique residue pairs (encoded as i * n + j).
+
+    Returns:
+        residues (see read_atoms), pairs (k x 2 array of indexes of residues, i < j, sorted)
+    """
+    residues, coords, res_idx, is_base = read_atoms(filename)
+    if not len(coords):
+        return residues, np.zeros((0, 2), dtype=int)
+    atom_pairs = cKDTree(coords).query_pairs(cut_off, output_type='ndarray')
+    a, b = atom_pairs[:, 0], atom_pairs[:, 1]
+    keep = (is_base[a] | is_base[b]) & (res_idx[a] != res_idx[b])
+    ra, rb = res_idx[a[keep]], res_idx[b[keep]]
+    n = len(residues)
+    keys = np.unique(np.minimum(ra, rb) * n + np.maximum(ra, rb))
+    return residues, np.stack([keys // n, keys % n], axis=1)
+
+
+def get_contact_matrix(residues, pairs):
+    """Get a sparse (scipy.sparse.csr_matrix) residue contact map, upper triangle."""
+    n = len(residues)
+    return coo_matrix((np.ones(len(pairs), dtype=bool), (pairs[:, 0], pairs[:, 1])), shape=(n, n)).tocsr()
+
+
+def encode_contacts(residues, pairs, index):
+    """Encode contacts as int keys, with residue numbering of ``index`` ((chain, resi, icode) -> i),
+    so contacts of many models can be compared. Residues not in index are skipped."""
+    ids = np.array([index.get(r[:3], -1) for r in residues], dtype=int)
+    i, j = ids[pairs[:, 0]], ids[pairs[:, 1]]
+    ok = (i >= 0) & (j >= 0)
+    n = len(index)
+    return np.unique(np.minimum(i[ok], j[ok]) * n + np.maximum(i[ok], j[ok]))
+
+
+def calc_dinf(ref_keys, model_keys):
+    """Calculate distance based INF.
+
+    Args:
+        ref_keys, model_keys: encoded contacts, see encode_contacts()
+
+    Returns:
+        inf, sns (sensitivity), ppv
+
+    >>> calc_dinf(np.array([1, 2, 3, 4]), np.array([1, 2, 5, 6]))
+    (0.5, 0.5, 0.5)
+    """
+    tp = len(np.intersect1d(ref_keys, model_keys, assume_unique=True))
+    sns = tp / float(len(ref_keys)) if len(ref_keys) else 0.0
+    ppv = tp / float(len(model_keys)) if len(model_keys) else 0.0
+    return float(np.sqrt(sns * ppv)), sns, ppv
+
+
+def dinf_many(ref_fn, filenames, cut_off=5):
+    """Calculate dINF of many models to the reference, contacts of the reference are got once.
+
+    Yields:
+        (filename, inf, sns, ppv)
+    """
+    residues, pairs = get_contacts(ref_fn, cut_off)
+    index = dict((r[:3], i) for i, r in enumerate(residues))
+    ref_keys = encode_contacts(residues, pairs, index)
+    for fn in filenames:
+        model_keys = encode_contacts(*get_contacts(fn, cut_off), index=index)
+        yield (fn,) + calc_dinf(ref_keys, model_keys)
+
+
 def get_parser():
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
 
-    parser.add_argument('file', help="a PDB file")
+    parser.add_argument('files', help="a PDB file (or files, with --ref)", nargs='+')
 
     parser.add_argument("-d", "--draw-dists",
                         action="store_true", help="")
 
     parser.add_argument("-c", "--cut-off",
-                        action="store_true", help="", default=5)
+                        type=float, help="cut-off in A, default: 5", default=5)
+
+    parser.add_argument("-r", "--ref",
+                        help="a reference PDB file, get dINF of files to this structure")
 
     parser.add_argument("-v", "--verbose",
                         action="store_true", help="be verbose")
@@ -91,44 +203,11 @@ def get_parser():
 
 
 def infx(filename, draw_dists, cut_off):
-    parser = Bio.PDB.PDBParser(QUIET=True) # QUIET=True avoids comments on errors in the pdb.
-
-    structures = parser.get_structure('struc', filename)
-    structure = structures[0] # 'structures' may contain several proteins in this case only one.
-
-    atoms = Bio.PDB.Selection.unfold_entities(structure, 'A') # Atom
-    ns = Bio.PDB.NeighborSearch(atoms)
-
-    pairs = []
-
-    # I'm working on A and B residues.
-    for atom in atoms:
-        if v: print(atom.get_parent().get_resname().strip(), atom.get_name())
-        if atom.get_name() in ATOMS[atom.get_parent().get_resname().strip()]:  # '  C' so strip it
-            if v: print('    Get distance')
-            #target_atom = structure['A'][311]['CA']
-            # Bs  = Bio.PDB.Selection.unfold_entities(structure, 'A')
-            # print(atom.get_coord(), atom.get_parent())
-            close_atoms = ns.search(atom.get_coord(), cut_off)
-            for close_atom in close_atoms:
-
-                bres = close_atom.get_parent()
-                ares = atom.get_parent()
-
-                if bres != ares:
-                    a = bres.get_id()[1]  # to get res index
-                    b = ares.get_id()[1]
-                    # create an object Pair
-                    p = Pair(b, a, bres.get_resname(), ares.get_resname(), bres.get_parent().id, ares.get_parent().id)
-                    # and check if add it to the list?
-                    if p not in pairs:
-                        pairs.append(p)
-
-        #print("A    %i   A   %i          bp C G                  X   1" % p)
-
-    #print(close_atoms)
-    #for a in close_atoms:
-    #    print(a, a.get_parent())
+    residues, pairs = get_contacts(filename, cut_off)
+
+    pairs = [Pair(residues[i][1], residues[j][1], residues[i][3], residues[j][3],
+                  residues[i][0], residues[j][0]) for i, j in pairs.tolist()]
+
     if not draw_dists:
         print('Classifier: Clarna')
         for p in pairs:
@@ -143,4 +222,10 @@ if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
 
-    infx(args.file, args.draw_dists, args.cut_off)
+    if args.ref:
+        print('fn,dinf,sns,ppv')
+        for fn, inf, sns, ppv in dinf_many(args.ref, args.files, args.cut_off):
+            print('%s,%.3f,%.3f,%.3f' % (os.path.basename(fn), inf, sns, ppv))
+    else:
+        for fn in args.files:
+            infx(fn, args.draw_dists, args.cut_off)
@@ -3,12 +3,16 @@
 """A tool to calc inf_all, inf_stack, inf_WC, inf_nWC, SNS_WC, PPV_WC, SNS_nWC, PPV_nWC between two structures.
 
 Mind, that ClaRNA is pretty slow, it takes even a few seconds to analyze a structure,
-so for, say, 1000 models you need a few hours.
+so for, say, 1000 models you need a few hours. With ``--method native`` base pairs and
+stacking are annotated with rna_bp/bp_annotate.py (a few ms per structure, ClaRNA is not needed).
 
 How to make it faster? First, you can use ``--number_of_threads`` to specify the number of cores used for multiprocessing.
 
 Second, the procedure implemented in here is composed of two steps, first for each structure ClaRNA is used to generate an output with contacts, then these files are used for comparisons. So, if you want to re-run your analysis, you don't have to run re-run ClaRNA itself. Thus, be default ClaRNA is not executed if <model>.outCR is found next to the analyzed files.  To change this behavior force (``--force``) rna_cal_inf.py to re-run ClaRNA.
 
+Third, results are saved in a journal (``<out_fn>.journal``), so when you run the analysis again,
+e.g. with a few new models, only new (or changed) models are analyzed. ``--force`` ignores the journal.
+
 ClaRNA_play required!
 https://gitlab.genesilico.pl/RNA/ClaRNA_play (internal GS gitlab server). Contact <magnus@genesilico.pl>.
 
@@ -25,8 +29,11 @@ import tempfile
 import csv
 import shutil
 
-from multiprocessing import Pool, Lock, Value, Process
+from multiprocessing import Pool
 from rna_tools.tools.clarna_app import clarna_app
+from rna_tools.tools.extra_functions.run_journal import RunJournal
+from rna_tools.rna_archive import is_archive_ref, export_model, expand_archives
+from rna_tools.tools.rna_bp import bp_annotate
 #from rna_tools.opt.BasicAssessMetrics.BasicAssessMetrics import InteractionNetworkFidelity
 
 
@@ -56,12 +63,18 @@ def get_parser():
     parser.add_argument('--debug',
                          action="store_true")
 
-    parser.add_argument('--method', default="clarna", help="you can use mcannotate or clarna")
+    parser.add_argument('--method', default="clarna", help="you can use mcannotate, clarna or native \
+                         (base pairs and stacking of rna_bp/bp_annotate.py, no external tools)")
 
     parser.add_argument('-f',"--force",
                          dest="force",
                          action="store_true",
-                         help="force to run ClaRNA even if <pdb>.outCR file is there")
+                         help="force to run ClaRNA even if <pdb>.outCR file is there (and ignore the journal)")
+
+    parser.add_argument("--journal",
+                         default='',
+                         help="a journal of results (by default <out_fn>.journal), models already in the journal \
+                         (and not changed) are not analyzed again, unless --force is used")
 
     parser.add_argument('-v',"--verbose",
                          dest="verbose",
@@ -76,18 +89,26 @@ def get_parser():
     parser.add_argument('files', help="files, .e.g folder_with_pdbs/*pdbs", nargs='+')
     return parser
 
-# Prepare the lock and the counter for MP
-from ctypes import c_int
-lock = Lock()
-counter = Value(c_int)
 DEBUG = False
 
+def do_job_native(i):
+    """Annotate a model with bp_annotate & compare, return cells of a row of the csv file"""
+    model = bp_annotate.annotate(i, args.stacking)[1]
+    scores = bp_annotate.compare(target_interactions, model)
+    return i, [os.path.basename(target), os.path.basename(i)] + \
+        ['NA' if x is None else '%.3f' % x for x in scores]
+
+
 def do_job(i):  # , method='clarna'):
-    """Run ClaRNA & Compare, add 1 to the counter, write output
-    to csv file (keeping it locked)"""
+    """Run ClaRNA & Compare, return cells of a row of the csv file"""
+    if args.method == 'native':
+        return do_job_native(i)
     #if method == 'clarna':
         # run clarna & compare
-    i_cl_fn = clarna_app.clarna_run(i, args.force, args.stacking)
+    fn = i
+    if is_archive_ref(i):  # ClaRNA needs a file, a model of an archive is saved to a temp folder
+        fn = export_model(i, models_dir)
+    i_cl_fn = clarna_app.clarna_run(fn, args.force, args.stacking)
     output = clarna_app.clarna_compare(target_cl_fn,i_cl_fn, DEBUG)
     if args.verbose:
         print(output)
@@ -99,20 +120,12 @@ def do_job(i):  # , method='clarna'):
     ##     if args.debug:
     ##         print(rmsd)
 
-    # counter and bar
-    global counter
-    counter.value += 1
-    bar.update(counter.value)
-
-    # write csv
-    lock.acquire()
     # take only filename of target
     cells = output.split()
     cells[0] = os.path.basename(cells[0])
-
-    csv_writer.writerow(cells)
-    csv_file.flush()
-    lock.release()
+    if fn != i:
+        cells[1] = os.path.basename(i)
+    return i, cells
 
 #main
 if __name__ == '__main__':
@@ -126,50 +139,85 @@ if __name__ == '__main__':
         print((parser.print_help()))
         sys.exit(1)
 
-    input_files = args.files
-    target_fn = args.target_fn
-    ss = args.ss
-    if ss:
-        # generate target_fn
-        ss_txt = open(ss).read().split('\n')[2]
-        target_cl_fn = clarna_app.get_ClaRNA_output_from_dot_bracket(ss_txt, temp=False)
-    else:
-        target_cl_fn = clarna_app.clarna_run(target_fn, args.force)
-
-    # keep target save, don't overwrite it when force and
-    # target is in the folder that you are running ClaRNA on
-    # /tmp/tmp2nmeVB/1i6uD_M1.pdb.outCR
-    d = tempfile.mkdtemp()
-    tmp_target_cl_fn = d + os.sep + os.path.basename(target_cl_fn)
-    shutil.copyfile(target_cl_fn, tmp_target_cl_fn)
-    target_cl_fn = tmp_target_cl_fn
-    ##
-
-    out_fn = args.out_fn
-
-    # Open output file
-    csv_file = open(out_fn, 'w')
-    csv_writer = csv.writer(csv_file, delimiter=',')
-    csv_writer.writerow('target,fn,inf_all,inf_stack,inf_WC,inf_nWC,sns_WC,ppv_WC,sns_nWC,ppv_nWC'.split(','))
-    csv_file.flush()
-
-    # Init bar and to the job
+    input_files = expand_archives(args.files)  # models of archives (.rnarc) as well
+    models_dir = tempfile.mkdtemp()
     try:
-        bar = progressbar.ProgressBar(max_value=len(input_files))
-        bar.update(0)
-    except TypeError:
-        print('Please install progressbar2 (not progressbar), e.g. pip install progressbar2')
-        sys.exit(1)
-
-    # Main meat
-    number_processes = int(args.nt)
-
-    open('/tmp/empty-index', 'a').close()  ## ugly hack
-
-    if number_processes > 1: # multi
-        p = Pool(number_processes)
-        p.map(do_job, input_files) # , args.method)
-    else: # single process
-        for c, i in enumerate(input_files):#, range(len(input_files))):
-            do_job(i, args.method)
-    print('csv was created! ', out_fn)
+        target_fn = args.target_fn
+        ss = args.ss
+        target = ss or target_fn
+        if args.method == 'native':
+            if ss:
+                ss_txt = open(ss).read().split('\n')[2]
+                target_interactions = bp_annotate.read_clarna(
+                    clarna_app.get_ClaRNA_output_from_dot_bracket(ss_txt))
+            else:
+                target_interactions = bp_annotate.annotate(target_fn, args.stacking)[1]
+        elif ss:
+            # generate target_fn
+            ss_txt = open(ss).read().split('\n')[2]
+            target_cl_fn = clarna_app.get_ClaRNA_output_from_dot_bracket(ss_txt, temp=False)
+        else:
+            target_cl_fn = clarna_app.clarna_run(target_fn, args.force)
+
+        if args.method != 'native':
+            # keep target save, don't overwrite it when force and
+            # target is in the folder that you are running ClaRNA on
+            # /tmp/tmp2nmeVB/1i6uD_M1.pdb.outCR
+            d = tempfile.mkdtemp()
+            tmp_target_cl_fn = d + os.sep + os.path.basename(target_cl_fn)
+            shutil.copyfile(target_cl_fn, tmp_target_cl_fn)
+            target_cl_fn = tmp_target_cl_fn
+        ##
+
+        out_fn = args.out_fn
+
+        # results are kept in a journal, so a re-run (with new models) runs only new (or changed) models
+        journal = RunJournal(args.journal or out_fn + '.journal', batch_size=10, force=args.force)
+        method = args.method + (' stacking' if args.stacking else '')
+
+        # Open output file
+        csv_file = open(out_fn, 'w')
+        csv_writer = csv.writer(csv_file, delimiter=',')
+        csv_writer.writerow('target,fn,inf_all,inf_stack,inf_WC,inf_nWC,sns_WC,ppv_WC,sns_nWC,ppv_nWC'.split(','))
+
+        todo = []
+        for i in input_files:
+            if journal.is_done(i, target, method=method):
+                csv_writer.writerow(journal.get(i, target, method=method))
+            else:
+                todo.append(i)
+        csv_file.flush()
+        print('# of models done before:', len(input_files) - len(todo))
+
+        # Init bar and to the job
+        try:
+            bar = progressbar.ProgressBar(max_value=len(todo))
+            bar.update(0)
+        except TypeError:
+            print('Please install progressbar2 (not progressbar), e.g. pip install progressbar2')
+            sys.exit(1)
+
+        # Main meat
+        number_processes = int(args.nt)
+
+        open('/tmp/empty-index', 'a').close()  ## ugly hack
+
+        if number_processes > 1: # multi
+            p = Pool(number_processes)
+            results = p.imap_unordered(do_job, todo) # , args.method)
+        else: # single process
+            results = (do_job(i) for i in todo)
+
+        with journal:
+            for c, (i, cells) in enumerate(results):
+                csv_writer.writerow(cells)
+                csv_file.flush()
+                journal.add(i, cells, target, method=method)
+                bar.update(c + 1)
+        if number_processes > 1:
+            p.close()
+            p.join()
+        csv_file.close()
+        print('csv was created! ', out_fn)
+    finally:
+        shutil.rmtree(models_dir, ignore_errors=True)
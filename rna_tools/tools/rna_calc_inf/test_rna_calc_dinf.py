@@ -0,0 +1,25 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from rna_tools.tools.rna_calc_inf.rna_calc_dinf import get_contacts, get_contact_matrix, dinf_many
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+REF = os.path.join(DIRNAME, 'test_output', '1Y26.pdb')
+MODEL = os.path.join(DIRNAME, 'test_output', '1y26X_M451.pdb')
+
+
+def test_get_contacts():
+    residues, pairs = get_contacts(REF)
+    assert len(pairs) == 195
+    assert (pairs[:, 0] < pairs[:, 1]).all()
+    # neighbours in the sequence are in contact
+    assert [residues[i][1] for i in pairs[0]] == [13, 14]
+    m = get_contact_matrix(residues, pairs)
+    assert m.nnz == 195 and m[0, 1]
+
+
+def test_dinf_many():
+    results = list(dinf_many(REF, [REF, MODEL]))
+    assert results[0][1:] == (1.0, 1.0, 1.0)
+    assert 0.8 < results[1][1] < 1.0
@@ -11,6 +11,8 @@ license: https://github.com/charnley/rmsd/blob/master/LICENSE
 import numpy as np
 import re
 from rna_tools.tools.extra_functions.select_fragment import is_in_selection
+from rna_tools.rna_mmcif import is_cif, read_atom_site
+from rna_tools.rna_archive import is_archive_ref, get_table
 
 def kabsch_rmsd(P, Q):
     """
@@ -103,9 +105,42 @@ def rmsd(V, W):
 
 def get_coordinates(filename, selection, ignore_selection, fmt, ignore_hydrogens):
     """Get coordinates from filename."""
+    if is_archive_ref(filename):  # a model of an archive, see rna_archive.py
+        return get_coordinates_table(get_table(filename), selection, ignore_selection)
+    if is_cif(filename):
+        return get_coordinates_cif(filename, selection, ignore_selection, ignore_hydrogens)
     return get_coordinates_pdb(filename, selection, ignore_selection, ignore_hydrogens)
 
 
+def get_coordinates_cif(filename, selection, ignore_selection, ignore_hydrogens):
+    """
+    Get coordinates (ATOM, the first model) from a mmCIF file, the same atoms as
+    get_coordinates_pdb().
+
+    """
+    return get_coordinates_table(read_atom_site(filename), selection, ignore_selection)
+
+
+def get_coordinates_table(t, selection, ignore_selection):
+    """
+    Get coordinates (ATOM) of atoms (AtomTable, see rna_mmcif.py), the same atoms as
+    get_coordinates_pdb().
+
+    """
+    mask = t.records == 'ATOM'
+    if selection:
+        in_selection = np.zeros(len(mask), dtype=bool)
+        for chain in selection:
+            in_selection |= (t.chains == chain) & np.isin(t.resis, list(selection[chain]))
+        mask &= in_selection
+        if ignore_selection:
+            for i in np.flatnonzero(mask):
+                if is_in_selection(ignore_selection, t.chains[i], int(t.resis[i]), t.names[i]):
+                    mask[i] = False
+    V = t.coords[mask]
+    return len(V), V
+
+
 def get_coordinates_pdb(filename, selection, ignore_selection, ignore_hydrogens):
     """
     Get coordinates from the first chain in a pdb file
@@ -0,0 +1,165 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rmsd_pruning.py - skip superpositions that cannot pass an RMSD threshold.
+
+For queries like "which models are within X A of the target (or of each other)" most of
+the pairs are far apart. Cheap descriptors of models are computed once and they give lower
+bounds of RMSD (after superposition), a pair with a lower bound above the threshold is
+skipped without a superposition:
+
+- radius of gyration, ``rmsd(P, Q) >= |Rg(P) - Rg(Q)|``,
+- pivots (models chosen far from each other, RMSDs of all models to pivots are calculated
+  once), RMSD is a metric so ``rmsd(P, Q) >= |rmsd(P, pivot) - rmsd(Q, pivot)|``,
+- distances of atoms to the centroid (a profile, atoms in the same order), a rotation does
+  not change them, so ``rmsd(P, Q) >= sqrt(mean((|p_i| - |q_i|)^2))``.
+
+The bounds are exact, so the results are the same as without pruning. Counters
+``n_computed`` and ``n_skipped`` say how many superpositions were calculated and avoided.
+"""
+from __future__ import print_function
+
+import numpy as np
+
+from rna_tools.tools.rna_bp.bp_search import kabsch_rmsd_batch
+
+EPS = 1e-6  # do not skip pairs just at the threshold because of rounding
+
+
+class RMSDPruner(object):
+    """Descriptors of models for thresholded RMSD searches.
+
+    Args:
+        coords (np.array): n x m x 3, n models of m atoms (in the same order)
+        n_pivots (int): # of pivots, each costs n superpositions
+
+    Attributes:
+        coords (np.array): n x m x 3, centered coordinates
+        profiles (np.array): n x m, distances of atoms to the centroid
+        rg (np.array): n, radii of gyration
+        pivots (list): indexes of pivots
+        pivot_rmsds (np.array): n_pivots x n, RMSDs of pivots to all models
+        n_computed, n_skipped (int): # of superpositions calculated and avoided
+    """
+    def __init__(self, coords, n_pivots=3):
+        coords = np.asarray(coords, dtype=float)
+        self.coords = coords - coords.mean(axis=1)[:, None]
+        self.profiles = np.sqrt((self.coords ** 2).sum(axis=2))
+        self.rg = np.sqrt((self.profiles ** 2).mean(axis=1))
+        self.n_computed = 0
+        self.n_skipped = 0
+
+        # pivots, the farthest-point: the first is the biggest model, then a model
+        # the farthest from the pivots so far
+        n = len(self.coords)
+        self.pivots = []
+        rows = []
+        nearest = np.full(n, np.inf)
+        p = int(np.argmax(self.rg)) if n else 0
+        for i in range(min(n_pivots, n)):
+            row = np.zeros(n)
+            row[self.pivots] = [r[p] for r in rows]  # RMSDs to pivots so far are known
+            todo = np.ones(n, dtype=bool)
+            todo[self.pivots + [p]] = False
+            row[todo] = self._rmsd(self.coords[todo], self.coords[p])
+            rows.append(row)
+            self.pivots.append(p)
+            nearest = np.minimum(nearest, rows[-1])
+            p = int(np.argmax(nearest))
+        self.pivot_rmsds = np.array(rows).reshape(len(rows), n)
+        self._pivot_pos = -np.ones(n, dtype=int)  # a model -> its row in pivot_rmsds
+        self._pivot_pos[self.pivots] = np.arange(len(self.pivots))
+
+    def __len__(self):
+        return len(self.coords)
+
+    def _rmsd(self, P, q):
+        self.n_computed += len(P)
+        return kabsch_rmsd_batch(P, q, centered=True)
+
+    def _describe(self, coords):
+        """Centered coordinates, a profile, Rg and RMSDs to pivots of a structure."""
+        coords = np.asarray(coords, dtype=float)
+        if coords.shape != self.coords.shape[1:]:
+            raise Exception('The structure has %i atoms, models have %i atoms' %
+                            (len(coords), self.coords.shape[1]))
+        q = coords - coords.mean(axis=0)
+        profile = np.sqrt((q ** 2).sum(axis=1))
+        rg = np.sqrt((profile ** 2).mean())
+        return q, profile, rg, self._rmsd(self.coords[self.pivots], q)
+
+    def _filter(self, idx, profile, rg, pivot_rmsds, threshold):
+        """Models (of idx) that can be within threshold, the cheapest bounds first."""
+        threshold = threshold + EPS
+        idx = idx[np.abs(self.rg[idx] - rg) <= threshold]
+        if len(self.pivots):
+            bound = np.abs(self.pivot_rmsds[:, idx] - pivot_rmsds[:, None]).max(axis=0)
+            idx = idx[bound <= threshold]
+        bound = np.sqrt(((self.profiles[idx] - profile) ** 2).mean(axis=1))
+        return idx[bound <= threshold]
+
+    def _get_rmsds(self, idx, q, pivot_rmsds):
+        """RMSDs of models (idx) to a structure, RMSDs to pivots are taken (not calculated)."""
+        rmsds = np.empty(len(idx))
+        pos = self._pivot_pos[idx]
+        known = pos >= 0
+        rmsds[known] = pivot_rmsds[pos[known]]
+        if (~known).any():
+            rmsds[~known] = self._rmsd(self.coords[idx[~known]], q)
+        return rmsds, int((~known).sum())
+
+    def lower_bounds(self, coords):
+        """Get lower bounds of RMSDs of a structure to all models.
+
+        >>> c = np.random.RandomState(0).rand(5, 20, 3) * [[[1, 2, 3]]]
+        >>> p = RMSDPruner(c, n_pivots=2)
+        >>> bool((p.lower_bounds(c[0]) <= kabsch_rmsd_batch(c, c[0]) + 1e-9).all())
+        True
+        """
+        q, profile, rg, pivot_rmsds = self._describe(coords)
+        bounds = np.sqrt(((self.profiles - profile) ** 2).mean(axis=1))
+        bounds = np.maximum(bounds, np.abs(self.rg - rg))
+        if len(self.pivots):
+            bounds = np.maximum(bounds, np.abs(self.pivot_rmsds - pivot_rmsds[:, None]).max(axis=0))
+        return bounds
+
+    def within(self, coords, threshold):
+        """Find models within threshold (RMSD) from a structure (e.g. a target).
+
+        Returns:
+            np.array (indexes of models), np.array (their RMSDs)
+
+        >>> c = np.random.RandomState(0).rand(50, 20, 3)
+        >>> c[:5] = c[0] + np.random.RandomState(1).rand(5, 20, 3) * 0.1
+        >>> p = RMSDPruner(c, n_pivots=2)
+        >>> idx, rmsds = p.within(c[0], 0.1)
+        >>> idx.tolist(), p.n_skipped > 0
+        ([0, 1, 2, 3, 4], True)
+        """
+        q, profile, rg, pivot_rmsds = self._describe(coords)
+        idx = self._filter(np.arange(len(self)), profile, rg, pivot_rmsds, threshold)
+        rmsds, computed = self._get_rmsds(idx, q, pivot_rmsds)
+        self.n_skipped += len(self) - len(self.pivots) - computed
+        ok = rmsds <= threshold
+        return idx[ok], rmsds[ok]
+
+    def pairs_within(self, threshold, verbose=False):
+        """Find pairs of models within threshold (RMSD) from each other (all-vs-all).
+
+        Returns:
+            list of (i, j, rmsd), i < j
+        """
+        n = len(self)
+        pairs = []
+        for i in range(n - 1):
+            idx = np.arange(i + 1, n)
+            if self._pivot_pos[i] >= 0:  # a pivot, all RMSDs are known
+                rmsds = self.pivot_rmsds[self._pivot_pos[i], idx]
+            else:
+                idx = self._filter(idx, self.profiles[i], self.rg[i], self.pivot_rmsds[:, i], threshold)
+                rmsds, computed = self._get_rmsds(idx, self.coords[i], self.pivot_rmsds[:, i])
+                self.n_skipped += int((self._pivot_pos[i + 1:] < 0).sum()) - computed
+            ok = rmsds <= threshold
+            pairs.extend((i, j, r) for j, r in zip(idx[ok].tolist(), rmsds[ok].tolist()))
+            if verbose and i % 100 == 0:
+                print('...', i, '/', n)
+        return pairs
@@ -56,12 +56,29 @@ Example #2::
     rmsd_calc_to_target.py -t 5k7c_clean_onechain_renumber_as_puzzle_srr.pdb
     37.93s user 1.07s system 87% cpu 44.650 total
 
+Results are saved in a journal (``<rmsds_fn>.journal``) as they are calculated, so if you
+run the command again (e.g. after a crash, or with new models added) only new or changed
+models are calculated. Use ``--force`` to calculate everything again.
+
+To find only models within a threshold from the target use ``--threshold``, models that
+cannot be that close (e.g. of a different radius of gyration, see rmsd_pruning.py) are skipped
+without a superposition, only models within the threshold are saved::
+
+    $ rna_calc_rmsd.py -t test_data/struc1.pdb --threshold 2 test_data/*.pdb
+    method: all-atom-built-in
+    # of models: 4
+    struc1.pdb 0.0 1321
+    # of superpositions: 1 skipped: 3
+
 """
 from __future__ import print_function
 
 from rna_tools.tools.rna_calc_rmsd.lib.rmsd.calculate_rmsd import *
 import sys
 from rna_tools.tools.extra_functions.select_fragment import select_pdb_fragment_pymol_style, select_pdb_fragment
+from rna_tools.tools.extra_functions.run_journal import RunJournal
+from rna_tools.tools.rna_calc_rmsd.rmsd_pruning import RMSDPruner
+from rna_tools.rna_archive import expand_archives
 import argparse
 import sys
 import math
@@ -71,7 +88,8 @@ import os
 
 def get_rna_models_from_dir(files):
     """
-    :param models: a list of filenames
+    :param models: a list of filenames, archives (.rnarc) are replaced with their models
+                   (see rna_archive.py)
 
     Example of the list::
 
@@ -82,7 +100,7 @@ def get_rna_models_from_dir(files):
     #if not os.path.exists(directory):
     #    raise Exception('Dir does not exist! ', directory)
     #files = glob.glob(directory + "/*.pdb")
-    files_sorted = sort_nicely(files)
+    files_sorted = sort_nicely(expand_archives(files))
     for f in files_sorted:
         models.append(f)
     return models
@@ -192,6 +210,26 @@ def calc_rmsd(a,b, target_selection, target_ignore_selection, model_selection, m
 
     return round(kabsch_rmsd(P, Q),2), atomsP
 
+def calc_rmsd_within(models, target_fn, threshold, target_selection, target_ignore_selection, model_selection, model_ignore_selection):
+    """Find models within threshold (RMSD) from the target, models that cannot be within
+    the threshold are skipped without a superposition.
+
+    :return: a list of (model, rmsd), number of atoms, RMSDPruner (# of superpositions calculated and skipped)
+    """
+    atomsQ, Q = get_coordinates(target_fn, target_selection, target_ignore_selection, 'pdb', True)
+    names, coords = [], []
+    for a in models:
+        atomsP, P = get_coordinates(a, model_selection, model_ignore_selection, 'pdb', True)
+        if atomsQ != atomsP:
+            print('Error: # of atoms is not equal target (' + target_fn + '):' + str(atomsQ) + ' vs model (' + a + '):' + str(atomsP))
+            continue # skip this RNA
+        names.append(a)
+        coords.append(P)
+    # one target, so pivots are not worth it
+    pruner = RMSDPruner(np.array(coords).reshape(len(coords), atomsQ, 3), n_pivots=0)
+    idx, rmsds = pruner.within(Q, threshold)
+    return [(names[i], round(r, 2)) for i, r in zip(idx.tolist(), rmsds.tolist())], atomsQ, pruner
+
 def get_parser():
     parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawTextHelpFormatter)#formatter_class=argparse.RawDescriptionHelpFormatter)
 
@@ -223,6 +261,19 @@ def get_parser():
                          default='rmsds.csv',
                          help="ouput, matrix")
 
+    parser.add_argument("--threshold", type=float,
+                         help="save only models within the threshold (RMSD) from the target,\n"
+                              "models that cannot be within the threshold are skipped (the journal is not used),\n"
+                              "only with the built-in method (not with align or fit of PyMOL)")
+
+    parser.add_argument("--journal",
+                         default='',
+                         help="a journal of results (by default <rmsds_fn>.journal), models\n"
+                              "already in the journal (and not changed) are not calculated again")
+
+    parser.add_argument("-f", "--force", action="store_true",
+                        help="calculate all models again, ignore the journal")
+
     parser.add_argument("-v", "--verbose", action="store_true",
                         help="verbose")
 
@@ -233,6 +284,8 @@ def get_parser():
 if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
+    if args.threshold is not None and args.method in ('align', 'fit'):
+        parser.error('--threshold works only with the built-in method, not with --method %s' % args.method)
 
     input_files = args.files  # opts.input_dir
     rmsds_fn = args.rmsds_fn
@@ -278,24 +331,44 @@ if __name__ == '__main__':
 
     print('# of models:', len(models))
 
-    f = open(rmsds_fn, 'w')
+    if args.threshold is not None:
+        within, atoms, pruner = calc_rmsd_within(models, target_fn, args.threshold, target_selection, target_ignore_selection, model_selection, model_ignore_selection)
+        t = 'fn,rmsd_all\n'
+        for r1, rmsd_curr in within:
+            print(os.path.basename(r1), rmsd_curr, atoms)
+            t += os.path.basename(r1) + ',' + str(rmsd_curr) + ' \n'
+        with open(rmsds_fn, 'w') as f:
+            f.write(t)
+        print('# of superpositions:', pruner.n_computed, 'skipped:', pruner.n_skipped)
+        print('csv was created! ', rmsds_fn)
+        sys.exit(0)
+
+    # results are kept in a journal, so a re-run computes only new (or changed) models
+    journal = RunJournal(args.journal or rmsds_fn + '.journal', force=args.force)
+    selection = ' '.join([args.target_selection, args.target_ignore_selection,
+                          args.model_selection, args.model_ignore_selection])
+
     #t = 'target:' + os.path.basename(target_fn) + ' , rmsd_all\n'
     t = 'fn,rmsd_all\n'
 
-    c = 1
-    for r1 in models:
-        if method == 'align' or method == 'fit':
-            rmsd_curr, atoms = calc_rmsd_pymol(r1, target_fn, method)
-        else:
-            rmsd_curr, atoms = calc_rmsd(r1, target_fn, target_selection, target_ignore_selection, model_selection, model_ignore_selection, args.verbose)
-        r1_basename = os.path.basename(r1)
-        print(r1_basename, rmsd_curr, atoms)
-        t += r1_basename + ',' + str(round(rmsd_curr,3)) + ' '
-        c += 1
-        t += '\n'
-
-    f.write(t)
-    f.close()
+    atoms = 0
+    with journal:
+        for r1 in models:
+            if journal.is_done(r1, target_fn, selection, method):
+                rmsd_curr, atoms = journal.get(r1, target_fn, selection, method)
+            else:
+                if method == 'align' or method == 'fit':
+                    rmsd_curr, atoms = calc_rmsd_pymol(r1, target_fn, method)
+                else:
+                    rmsd_curr, atoms = calc_rmsd(r1, target_fn, target_selection, target_ignore_selection, model_selection, model_ignore_selection, args.verbose)
+                journal.add(r1, [rmsd_curr, atoms], target_fn, selection, method)
+            r1_basename = os.path.basename(r1)
+            print(r1_basename, rmsd_curr, atoms)
+            t += r1_basename + ',' + str(round(rmsd_curr,3)) + ' '
+            t += '\n'
+
+    with open(rmsds_fn, 'w') as f:
+        f.write(t)
 
     #print t.strip() # matrix
 
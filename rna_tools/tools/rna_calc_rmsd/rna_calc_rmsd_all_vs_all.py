@@ -11,11 +11,27 @@ Examples::
     ... 3 test_data/struc3.pdb
     ... 4 test_data/struc4.pdb
 
+With ``--threshold`` only RMSDs up to the threshold are needed (e.g. for clustering with
+a radius), other RMSDs are saved as ``nan``. Pairs that cannot be within the threshold are
+skipped without a superposition (see rmsd_pruning.py, with only 4 models here none is skipped)::
+
+    rna_calc_rmsd_all_vs_all.py -i test_data -o matrix.txt --threshold 5
+     # of models: 4
+    # of superpositions: 6 skipped: 0 (of 6 pairs)
+    # test_data/struc1.pdb test_data/struc2.pdb test_data/struc3.pdb test_data/struc4.pdb
+    0.0 nan 4.879 3.982
+    nan 0.0 nan nan
+    4.879 nan 0.0 3.487
+    3.982 nan 3.487 0.0
+    matrix was created!  matrix.txt
+
 The program is using (https://github.com/charnley/rmsd)
 """
 from __future__ import print_function
 
 from rna_tools.tools.rna_calc_rmsd.lib.rmsd.calculate_rmsd import rmsd, get_coordinates, centroid, kabsch_rmsd
+from rna_tools.tools.rna_calc_rmsd.rmsd_pruning import RMSDPruner
+from rna_tools.rna_archive import is_archive, expand_archives
 
 import argparse
 import glob
@@ -27,6 +43,8 @@ def get_rna_models_from_dir(directory):
     models = []
     if not os.path.exists(directory):
         raise Exception('Dir does not exist! ', directory)
+    if is_archive(directory):  # models of an archive, see rna_archive.py
+        return expand_archives([directory])
     files = glob.glob(directory + "/*.pdb")
     files_sorted = sort_nicely(files)
     for f in files_sorted:
@@ -70,17 +88,43 @@ def calc_rmsd(a, b):
     return kabsch_rmsd(P, Q)
 
 
+def calc_rmsd_within(models, threshold, n_pivots=3):
+    """Calc rmsd all vs all, only up to threshold (other RMSDs are nan).
+
+    Returns:
+        matrix (n x n), RMSDPruner (with # of superpositions calculated and skipped)
+    """
+    coords = [get_coordinates(m, None, None, 'pdb', True)[1] for m in models]
+    sizes = set([len(c) for c in coords])
+    if len(sizes) > 1:
+        raise Exception('Models have different numbers of atoms: %s' % sorted(sizes))
+    pruner = RMSDPruner(coords, n_pivots)
+    matrix = [[float('nan')] * len(models) for m in models]
+    for i in range(len(models)):
+        matrix[i][i] = 0.0
+    for i, j, r in pruner.pairs_within(threshold):
+        matrix[i][j] = matrix[j][i] = r
+    return matrix, pruner
+
+
 def get_parser():
     parser = argparse.ArgumentParser(description=__doc__,
                                      formatter_class=argparse.RawTextHelpFormatter)
     parser.add_argument('-i', "--input_dir",
                         default='',
-                        help="input folder with structures")
+                        help="input folder with structures (or an archive, .rnarc)")
 
     parser.add_argument('-o', "--matrix_fn",
                         default='matrix.txt',
                         help="ouput, matrix")
 
+    parser.add_argument('-t', "--threshold", type=float,
+                        help="calculate only RMSDs up to the threshold (others are nan),\n"
+                             "pairs that cannot be within the threshold are skipped")
+
+    parser.add_argument("--pivots", type=int, default=3,
+                        help="# of pivots (for --threshold), each costs a row of the matrix")
+
     # parser.add_argument("-s", "--save",
     #                    action="store_true", help="")
 
@@ -106,14 +150,21 @@ if __name__ == '__main__':
     # print
     t += '\n'
 
-    c = 1
-    for r1 in models:
-        for r2 in models:
-            rmsd_curr = calc_rmsd(r1, r2)
-            t += str(round(rmsd_curr, 3)) + ' '
-        print('...', c, r1)
-        c += 1
-        t += '\n'
+    if args.threshold is not None:
+        matrix, pruner = calc_rmsd_within(models, args.threshold, args.pivots)
+        for row in matrix:
+            t += ' '.join([str(round(x, 3)) for x in row]) + ' \n'
+        print('# of superpositions: %i skipped: %i (of %i pairs)' %
+              (pruner.n_computed, pruner.n_skipped, len(models) * (len(models) - 1) // 2))
+    else:
+        c = 1
+        for r1 in models:
+            for r2 in models:
+                rmsd_curr = calc_rmsd(r1, r2)
+                t += str(round(rmsd_curr, 3)) + ' '
+            print('...', c, r1)
+            c += 1
+            t += '\n'
 
     f.write(t)
     f.close()
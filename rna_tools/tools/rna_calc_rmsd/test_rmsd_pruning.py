@@ -0,0 +1,53 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import glob
+import os
+
+import numpy as np
+
+from rna_tools.tools.rna_calc_rmsd.rmsd_pruning import RMSDPruner
+from rna_tools.tools.rna_calc_rmsd.rna_calc_rmsd_all_vs_all import calc_rmsd_within
+from rna_tools.tools.rna_cluster.rna_cluster import get_rmsd_matrix, read_matrix
+
+PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def get_decoys(n=200, m=60):
+    """Decoys of a few folds, with different noise."""
+    rng = np.random.RandomState(0)
+    folds = [np.cumsum(rng.randn(m, 3) * 1.5, axis=0) for i in range(5)]
+    return np.array([folds[rng.randint(5)] + rng.randn(m, 3) * rng.uniform(0.3, 3)
+                     for i in range(n)])
+
+
+def test_pairs_within():
+    coords = get_decoys()
+    matrix = get_rmsd_matrix(coords)
+    for n_pivots in [0, 3]:
+        p = RMSDPruner(coords, n_pivots)
+        pairs = p.pairs_within(2.0)
+        i, j = np.triu_indices(len(coords), 1)
+        ok = matrix[i, j] <= 2.0
+        assert [(a, b) for a, b, r in pairs] == list(zip(i[ok].tolist(), j[ok].tolist()))
+        assert np.allclose([r for a, b, r in pairs], matrix[i[ok], j[ok]], atol=1e-4)
+        assert p.n_skipped > 0
+        assert p.n_computed + p.n_skipped == len(i)
+
+
+def test_within():
+    coords = get_decoys()
+    p = RMSDPruner(coords, n_pivots=0)
+    idx, rmsds = p.within(coords[0], 3.0)
+    rmsds_all = get_rmsd_matrix(coords)[0]
+    assert idx.tolist() == np.flatnonzero(rmsds_all <= 3.0).tolist()
+    assert p.n_computed + p.n_skipped == len(coords)
+    assert (p.lower_bounds(coords[0]) <= rmsds_all + 1e-4).all()
+
+
+def test_all_vs_all_threshold():
+    names, matrix = read_matrix(os.path.join(PATH, 'test_output', 'rmsd_calc_dir.tsv'))
+    models = sorted(glob.glob(os.path.join(PATH, 'test_data', 'struc*.pdb')))
+    m, pruner = calc_rmsd_within(models, 5)
+    m = np.array(m)
+    assert np.allclose(m[matrix <= 5], matrix[matrix <= 5], atol=1e-3)
+    assert np.isnan(m[matrix > 5]).all()
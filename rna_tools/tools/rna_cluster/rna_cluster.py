@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_cluster.py - cluster structures (radius clustering) with one RMSD matrix.
+
+The matrix of RMSDs (all-vs-all) is computed once (or loaded, e.g. from
+``rna_calc_rmsd_all_vs_all.py``) and then structures can be clustered with many
+radii, without computing RMSDs again. Two methods:
+
+- greedy (as SimRNA clustering and evoClustRNA/clustix): the structure with the
+  most neighbours (within the radius) is the centre of a cluster, the centre and its
+  neighbours are removed, repeat,
+- leader (as the Rosetta ``cluster`` application): structures are taken in order
+  (e.g. sorted by score), a structure not in any cluster yet starts a new cluster with
+  all free structures within the radius; clusters are sorted by size.
+
+By default the radius is found (a binary search) so the first (the biggest) cluster has
+more than 1/6 of structures (as in ``rna_rosetta_cluster.py`` and evoClustRNA).
+
+Examples::
+
+    $ rna_cluster.py --matrix test_output/rmsd_calc_dir.tsv -f 0.5
+    radius: 3.98
+    cluster 1 size: 3 centre: test_data/struc4.pdb
+    cluster 2 size: 1 centre: test_data/struc2.pdb
+    $ rna_cluster.py -r 5 --method leader -o clusters.txt --save-matrix matrix.txt models/
+"""
+from __future__ import print_function
+
+import argparse
+import glob
+import os
+
+import numpy as np
+
+from rna_tools.rna_archive import is_archive, expand_archives
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+from rna_tools.tools.rna_bp.bp_search import kabsch_rmsd_batch
+
+FRACTION = 1 / 6.
+
+
+def read_matrix(fn):
+    """Read a matrix of RMSDs (as rna_calc_rmsd_all_vs_all.py), the first line
+    ``# <name1> <name2> ...`` is optional.
+
+    Returns:
+        names (list), matrix (np.array, n x n)
+    """
+    with open(fn) as f:
+        first = f.readline()
+    matrix = np.loadtxt(fn, dtype=np.float32, ndmin=2)
+    if first.startswith('#'):
+        names = first[1:].split()
+    else:
+        names = [str(i) for i in range(1, len(matrix) + 1)]
+    if matrix.shape != (len(names), len(names)):
+        raise Exception('The matrix is not square or does not match names: %s' % fn)
+    return names, matrix
+
+
+def save_matrix(fn, names, matrix):
+    """Save a matrix in the format of rna_calc_rmsd_all_vs_all.py."""
+    with open(fn, 'w') as f:
+        f.write('# ' + ' '.join(names) + ' \n')
+        for row in np.round(np.asarray(matrix, dtype=float), 3).tolist():
+            f.write(' '.join([str(x) for x in row]) + ' \n')
+
+
+def load_coords(files):
+    """Load coordinates (heavy atoms, see bp_geometry.get_coord_table()) of structures
+    of the same number of atoms.
+
+    Returns:
+        np.array (n x m x 3)
+    """
+    coords = [get_coord_table(fn).coords for fn in files]
+    sizes = set([len(c) for c in coords])
+    if len(sizes) > 1:
+        raise Exception('Structures have different numbers of atoms: %s' % sorted(sizes))
+    return np.array(coords)
+
+
+def get_rmsd_matrix(coords, verbose=False):
+    """Get RMSDs (after superposition, Kabsch) all-vs-all.
+
+    Args:
+        coords (np.array): n x m x 3 (n structures of m atoms)
+
+    Returns:
+        np.array (n x n, float32)
+
+    >>> c = np.random.RandomState(0).rand(3, 10, 3)
+    >>> m = get_rmsd_matrix(np.concatenate([c, c[:1] + 1]))
+    >>> m.shape, float(m[0, 3]), bool((m == m.T).all())
+    ((4, 4), 0.0, True)
+    """
+    coords = np.asarray(coords, dtype=float)
+    coords = coords - coords.mean(axis=1)[:, None]
+    n = len(coords)
+    matrix = np.zeros((n, n), dtype=np.float32)
+    for i in range(n - 1):
+        matrix[i, i + 1:] = kabsch_rmsd_batch(coords[i + 1:], coords[i], centered=True)
+        if verbose and i % 100 == 0:
+            print('...', i, '/', n)
+    return np.maximum(matrix, matrix.T)
+
+
+def cluster(matrix, radius, method='greedy', limit=None):
+    """Cluster structures.
+
+    Args:
+        matrix (np.array): RMSDs, n x n
+        radius (float): structures within the radius from the centre go to the cluster
+        method (str): greedy or leader, see the module description
+        limit (int): get only this many (the biggest) clusters
+
+    Returns:
+        list of np.arrays, indexes of structures of clusters, the centre first, then
+        by distance to the centre
+
+    >>> m = np.array([[0, 1, 1, 5], [1, 0, 2, 5], [1, 2, 0, 5], [5, 5, 5, 0]])
+    >>> [c.tolist() for c in cluster(m, 1.5)]
+    [[0, 1, 2], [3]]
+    >>> [c.tolist() for c in cluster(m, 1.5, 'leader', limit=1)]
+    [[0, 1, 2]]
+    """
+    matrix = np.asarray(matrix)
+    n = len(matrix)
+    free = np.ones(n, dtype=bool)
+    clusters = []
+    if method == 'greedy':
+        neighbours = matrix <= radius
+        counts = neighbours.sum(axis=1)
+        while free.any() and (limit is None or len(clusters) < limit):
+            centre = int(np.argmax(np.where(free, counts, -1)))
+            members = np.flatnonzero(neighbours[centre] & free)
+            clusters.append(_sort_members(matrix, centre, members))
+            free[members] = False
+            counts -= neighbours[:, members].sum(axis=1)
+    elif method == 'leader':
+        for centre in range(n):
+            if free[centre]:
+                members = np.flatnonzero((matrix[centre] <= radius) & free)
+                clusters.append(_sort_members(matrix, centre, members))
+                free[members] = False
+        clusters = sorted(clusters, key=len, reverse=True)[:limit]
+    else:
+        raise Exception('Unknown method of clustering: %s' % method)
+    return clusters
+
+
+def _sort_members(matrix, centre, members):
+    """The centre first, then members by distance to the centre."""
+    members = members[members != centre]
+    members = members[np.argsort(matrix[centre, members], kind='stable')]
+    return np.concatenate([[centre], members]).astype(int)
+
+
+def find_radius(matrix, fraction=FRACTION, method='greedy', precision=0.01):
+    """Find (a binary search) the smallest radius (+/- precision) for which the first
+    cluster has more than fraction of all structures.
+
+    >>> m = np.array([[0, 1, 3, 5], [1, 0, 2, 5], [3, 2, 0, 5], [5, 5, 5, 0]])
+    >>> round(find_radius(m, fraction=0.5), 1)
+    2.0
+    """
+    matrix = np.asarray(matrix)
+    target = fraction * len(matrix)
+
+    def size(radius):
+        return len(cluster(matrix, radius, method, limit=1)[0])
+    low, high = 0., float(np.nanmax(matrix))  # nan, RMSDs above --threshold of all-vs-all
+    if size(low) > target:
+        return low
+    while high - low > precision:
+        mid = (low + high) / 2
+        if size(mid) > target:
+            high = mid
+        else:
+            low = mid
+    return high
+
+
+def save_clusters(fn, clusters, names, radius=None):
+    """Save clusters, one line per cluster ``<# of cluster> <size> <centre> <members...>``."""
+    with open(fn, 'w') as f:
+        if radius is not None:
+            f.write('# radius %.2f\n' % radius)
+        for i, c in enumerate(clusters, 1):
+            f.write('%i %i %s\n' % (i, len(c), ' '.join([names[x] for x in c])))
+
+
+def get_files(paths):
+    """Get PDB files, for a directory all *.pdb files are taken, for an archive (.rnarc)
+    all its models."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, '*.pdb'))))
+        elif is_archive(p):
+            files.extend(expand_archives([p]))
+        else:
+            files.append(p)
+    return files
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-m', '--matrix', help="a matrix of RMSDs (rna_calc_rmsd_all_vs_all.py)")
+    parser.add_argument('-r', '--radius', type=float,
+                        help="radius of clustering, if not given, it's found for --fraction")
+    parser.add_argument('-f', '--fraction', type=float, default=FRACTION,
+                        help="the first cluster has more than this fraction of structures, default 1/6")
+    parser.add_argument('--method', default='greedy', choices=['greedy', 'leader'],
+                        help="greedy (SimRNA, evoClustRNA) or leader (Rosetta)")
+    parser.add_argument('-l', '--limit-clusters', type=int, help="# of clusters")
+    parser.add_argument('-o', '--output', help="save clusters to this file")
+    parser.add_argument('--save-matrix', help="save the matrix of RMSDs to this file")
+    parser.add_argument("-v", "--verbose", action="store_true", help="be verbose")
+    parser.add_argument('files', nargs='*', help="PDB files (or folders) to cluster (instead of a matrix)")
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    if args.matrix:
+        names, matrix = read_matrix(args.matrix)
+    else:
+        names = get_files(args.files)
+        if not names:
+            parser.error('give a matrix or files')
+        matrix = get_rmsd_matrix(load_coords(names), args.verbose)
+    if args.save_matrix:
+        save_matrix(args.save_matrix, names, matrix)
+
+    radius = args.radius
+    if radius is None:
+        radius = find_radius(matrix, args.fraction, args.method)
+    clusters = cluster(matrix, radius, args.method, args.limit_clusters)
+    print('radius: %.2f' % radius)
+    for i, c in enumerate(clusters, 1):
+        print('cluster %i size: %i centre: %s' % (i, len(c), names[c[0]]))
+    if args.output:
+        save_clusters(args.output, clusters, names, radius)
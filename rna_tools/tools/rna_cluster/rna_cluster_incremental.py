@@ -0,0 +1,203 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_cluster_incremental.py - cluster structures as they arrive (e.g. decoys of running
+SimRNA/Rosetta jobs), without clustering everything again.
+
+A new structure is compared only to representatives (centres) of clusters. It goes to the
+closest centre within the radius, or it starts a new cluster (leader clustering, see
+rna_cluster.py). RMSDs between centres are kept, so many centres are skipped with the
+triangle inequality, ``rmsd(x, c) >= |rmsd(x, c') - rmsd(c', c)|`` for a centre c' already
+compared to x.
+
+The state (coordinates of centres, RMSDs between centres, members of clusters) is saved to a
+file (``.npz``), and a next run adds only new structures::
+
+    $ rna_cluster_incremental.py --state clusters.npz -r 5 test_data/struc1.pdb test_data/struc2.pdb
+    # of structures: 2 (+2) # of clusters: 2 RMSDs: 1 skipped: 0
+    cluster 1 size: 1 centre: test_data/struc1.pdb
+    cluster 2 size: 1 centre: test_data/struc2.pdb
+    $ rna_cluster_incremental.py --state clusters.npz test_data/  # later, more structures
+    # of structures: 4 (+2) # of clusters: 2 RMSDs: 2 skipped: 2
+    cluster 1 size: 3 centre: test_data/struc1.pdb
+    cluster 2 size: 1 centre: test_data/struc2.pdb
+
+Trajectories of SimRNA (``.trafl``) can be given as well, frames are named ``<trafl>:<frame>``.
+"""
+from __future__ import print_function
+
+import argparse
+import os
+
+import numpy as np
+
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+from rna_tools.tools.rna_bp.bp_search import kabsch_rmsd_batch
+from rna_tools.tools.rna_cluster.rna_cluster import get_files
+from rna_tools.tools.simrna_trajectory.simrna_trajectory import iter_blocks
+
+
+class IncrementalClustering(object):
+    """Leader clustering with a persistent state.
+
+    Attributes:
+        radius (float): radius of clustering
+        centres (np.array): k x m x 3, coordinates (centered) of centres of clusters
+        centre_rmsds (np.array): k x k, RMSDs between centres
+        names (list): names of all clustered structures
+        labels (list): a cluster (index of a centre) of every structure
+        rmsds (list): RMSD of every structure to the centre of its cluster
+        n_rmsds, n_skipped (int): # of RMSDs calculated and skipped (triangle inequality)
+    """
+    def __init__(self, radius=None, fn=None):
+        self.radius = radius
+        self.centres = None
+        self.centre_rmsds = np.zeros((0, 0), dtype=np.float32)
+        self.names = []
+        self.labels = []
+        self.rmsds = []
+        self.n_rmsds = 0
+        self.n_skipped = 0
+        if fn and os.path.exists(fn):
+            self.load(fn)
+        if self.radius is None:
+            raise Exception('Give a radius of clustering (or a state file)')
+
+    def __len__(self):
+        return len(self.names)
+
+    def _rmsd(self, coords, idx):
+        self.n_rmsds += len(idx)
+        return kabsch_rmsd_batch(self.centres[idx], coords, centered=True)
+
+    def add(self, name, coords):
+        """Add a structure.
+
+        Args:
+            name (str): a name (e.g. a file)
+            coords (np.array): m x 3, atoms in the same order as in other structures
+
+        Returns:
+            int: a cluster (index of the centre) of the structure
+        """
+        coords = np.asarray(coords, dtype=float)
+        coords = coords - coords.mean(axis=0)
+        if self.centres is None:
+            self.centres = np.zeros((0,) + coords.shape)
+        if self.centres.shape[1:] != coords.shape:
+            raise Exception('%s: %i atoms, clustered structures have %i atoms' %
+                            (name, len(coords), self.centres.shape[1]))
+        k = len(self.centres)
+        dist = np.full(k, np.nan)
+        lower = np.zeros(k)  # lower bounds of RMSDs to centres
+        best, best_rmsd = -1, np.inf
+        while True:
+            candidates = np.flatnonzero(np.isnan(dist) & (lower <= min(self.radius, best_rmsd)))
+            if not len(candidates):
+                break
+            c = candidates[np.argmin(lower[candidates])]
+            dist[c] = self._rmsd(coords, [c])[0]
+            if dist[c] < best_rmsd:
+                best, best_rmsd = c, dist[c]
+            lower = np.maximum(lower, np.abs(dist[c] - self.centre_rmsds[c]))
+        self.n_skipped += int(np.isnan(dist).sum())
+
+        if best_rmsd <= self.radius:
+            label, rmsd = int(best), float(best_rmsd)
+        else:  # a new cluster, RMSDs to all centres are needed
+            todo = np.flatnonzero(np.isnan(dist))
+            if len(todo):
+                dist[todo] = self._rmsd(coords, todo)
+                self.n_skipped -= len(todo)
+            self.centres = np.concatenate([self.centres, coords[None]])
+            rmsds = np.zeros((k + 1, k + 1), dtype=np.float32)
+            rmsds[:k, :k] = self.centre_rmsds
+            rmsds[k, :k] = rmsds[:k, k] = dist
+            self.centre_rmsds = rmsds
+            label, rmsd = k, 0.
+        self.names.append(name)
+        self.labels.append(label)
+        self.rmsds.append(rmsd)
+        return label
+
+    def get_clusters(self):
+        """Get clusters, sorted by size.
+
+        Returns:
+            list of (centre, members), names, the centre is the first member
+        """
+        labels = np.array(self.labels, dtype=int)
+        rmsds = np.array(self.rmsds)
+        clusters = []
+        for c in np.argsort(-np.bincount(labels, minlength=len(self.centre_rmsds)), kind='stable').tolist():
+            members = np.flatnonzero(labels == c)
+            members = members[np.argsort(rmsds[members], kind='stable')]
+            clusters.append((self.names[members[0]], [self.names[i] for i in members]))
+        return clusters
+
+    def save(self, fn):
+        """Save the state (to a temporary file first, so a crash does not destroy the state)."""
+        tmp = fn + '.tmp%i.npz' % os.getpid()
+        centres = self.centres if self.centres is not None else np.zeros((0, 0, 3))  # no structures
+        np.savez_compressed(tmp, radius=self.radius, centres=centres.astype(np.float32),
+                            centre_rmsds=self.centre_rmsds, names=np.array(self.names, dtype=str),
+                            labels=np.array(self.labels, dtype=int),
+                            rmsds=np.array(self.rmsds, dtype=np.float32),
+                            stats=np.array([self.n_rmsds, self.n_skipped]))
+        os.rename(tmp, fn)
+
+    def load(self, fn):
+        data = np.load(fn)
+        if self.radius is not None and self.radius != float(data['radius']):
+            raise Exception('The state %s is clustered with radius %s, not %s' %
+                            (fn, float(data['radius']), self.radius))
+        self.radius = float(data['radius'])
+        self.centres = data['centres'].astype(float) if len(data['centres']) else None
+        self.centre_rmsds = data['centre_rmsds']
+        self.names = data['names'].tolist()
+        self.labels = data['labels'].tolist()
+        self.rmsds = data['rmsds'].tolist()
+        self.n_rmsds, self.n_skipped = data['stats'].tolist()
+
+
+def iter_structures(paths):
+    """Iterate over (name, coords) of PDB files (folders) and frames of SimRNA trajectories."""
+    for fn in get_files(paths):
+        if fn.endswith('.trafl'):
+            c = 0
+            for headers, coords in iter_blocks(fn):
+                for xyz in coords:
+                    yield '%s:%i' % (fn, c), xyz.reshape(-1, 3)
+                    c += 1
+        else:
+            yield fn, get_coord_table(fn).coords
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-s', '--state', help="a file with the state of clustering (.npz)",
+                        default='clusters.npz')
+    parser.add_argument('-r', '--radius', type=float, help="radius of clustering (for a new state, "
+                        "must be the same for a saved state)")
+    parser.add_argument('-l', '--limit-clusters', type=int, default=10, help="# of clusters to show")
+    parser.add_argument('files', nargs='+', help="PDB files, folders or SimRNA trajectories")
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    c = IncrementalClustering(args.radius, args.state)
+    done = set(c.names)
+    n_rmsds, n_skipped, n = c.n_rmsds, c.n_skipped, len(c)
+    for name, coords in iter_structures(args.files):
+        if name not in done:
+            c.add(name, coords)
+            done.add(name)
+    c.save(args.state)
+
+    print('# of structures: %i (+%i) # of clusters: %i RMSDs: %i skipped: %i' %
+          (len(c), len(c) - n, len(c.centre_rmsds), c.n_rmsds - n_rmsds, c.n_skipped - n_skipped))
+    for i, (centre, members) in enumerate(c.get_clusters()[:args.limit_clusters], 1):
+        print('cluster %i size: %i centre: %s' % (i, len(members), centre))
@@ -0,0 +1,58 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import glob
+import os
+
+import numpy as np
+
+from rna_tools.tools.rna_cluster.rna_cluster import read_matrix, save_matrix, load_coords, \
+    get_rmsd_matrix, cluster, find_radius
+from rna_tools.tools.simrna_trajectory.simrna_trajectory import SimRNATrajectory
+from rna_tools.tools.simrna_trajectory.rna_simrna_cluster import cluster_trajectory
+
+TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir)
+RMSD = os.path.join(TOOLS, 'rna_calc_rmsd')
+
+
+def test_matrix(tmpdir):
+    names, matrix = read_matrix(os.path.join(RMSD, 'test_output', 'rmsd_calc_dir.tsv'))
+    files = sorted(glob.glob(os.path.join(RMSD, 'test_data', 'struc*.pdb')))
+    assert len(names) == len(files) == 4
+    m = get_rmsd_matrix(load_coords(files))
+    assert np.allclose(m, matrix, atol=1e-3)
+    fn = str(tmpdir.join('matrix.txt'))
+    save_matrix(fn, names, m)
+    assert read_matrix(fn)[0] == names
+    assert np.allclose(read_matrix(fn)[1], matrix, atol=1e-3)
+
+
+def test_cluster():
+    rng = np.random.RandomState(1)
+    points = np.concatenate([rng.randn(30, 2), rng.randn(10, 2) + 20])
+    matrix = np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+    for method in ['greedy', 'leader']:
+        clusters = cluster(matrix, 5, method)
+        assert [len(c) for c in clusters] == [30, 10]
+        assert sorted(np.concatenate(clusters).tolist()) == list(range(40))
+    # all structures are clustered, clusters do not overlap, members within the radius
+    clusters = cluster(matrix, 1, 'greedy')
+    assert sorted(np.concatenate(clusters).tolist()) == list(range(40))
+    assert all((matrix[c[0], c] <= 1).all() for c in clusters)
+    assert len(cluster(matrix, 1, 'greedy', limit=2)) == 2
+
+
+def test_find_radius():
+    rng = np.random.RandomState(2)
+    points = rng.randn(60, 3) * 3
+    matrix = np.sqrt(((points[:, None] - points[None]) ** 2).sum(axis=-1))
+    for method in ['greedy', 'leader']:
+        radius = find_radius(matrix, 1 / 6., method, precision=0.01)
+        assert len(cluster(matrix, radius, method, 1)[0]) > 10
+        assert len(cluster(matrix, radius - 0.02, method, 1)[0]) <= 10
+
+
+def test_simrna():
+    t = SimRNATrajectory()
+    t.load_from_file(os.path.join(TOOLS, 'simrna_trajectory', 'test_data', 'mini.trafl'), top_level=True)
+    clusters = cluster_trajectory(t, fraction=1, cutoff=100, limit_clusters=5)
+    assert len(clusters) == 1 and len(clusters[0]) == len(t)
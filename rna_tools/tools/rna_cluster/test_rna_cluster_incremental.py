@@ -0,0 +1,56 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import numpy as np
+import pytest
+
+from rna_tools.tools.rna_bp.bp_search import kabsch_rmsd_batch
+from rna_tools.tools.rna_cluster.rna_cluster_incremental import IncrementalClustering
+
+
+def get_decoys(n=120, seed=0):
+    rng = np.random.RandomState(seed)
+    folds = rng.rand(6, 40, 3) * 30
+    return [folds[rng.randint(0, 6)] + rng.randn(40, 3) * 0.5 for i in range(n)]
+
+
+def test_incremental(tmpdir):
+    decoys = get_decoys()
+    c = IncrementalClustering(radius=2)
+    for i, d in enumerate(decoys):
+        c.add(str(i), d)
+    clusters = c.get_clusters()
+    assert len(clusters) == 6
+    assert sum([len(m) for centre, m in clusters]) == len(decoys)
+    # members are within the radius of centres
+    for centre, members in clusters:
+        rmsds = kabsch_rmsd_batch(np.array([decoys[int(m)] for m in members]), decoys[int(centre)])
+        assert (rmsds <= 2).all()
+    # the triangle inequality skips most of RMSDs to other centres
+    assert c.n_skipped > 0
+    assert c.n_rmsds < 6 * len(decoys)
+
+    # the state saved and loaded, structures added later, the same as all at once
+    fn = str(tmpdir.join('clusters.npz'))
+    c1 = IncrementalClustering(radius=2)
+    for i, d in enumerate(decoys[:50]):
+        c1.add(str(i), d)
+    c1.save(fn)
+    c2 = IncrementalClustering(fn=fn)
+    assert c2.radius == 2 and len(c2) == 50
+    assert len(IncrementalClustering(2, fn)) == 50
+    with pytest.raises(Exception):
+        IncrementalClustering(3, fn)
+    for i, d in enumerate(decoys[50:], 50):
+        c2.add(str(i), d)
+    assert c2.labels == c.labels
+    assert [m for centre, m in c2.get_clusters()] == [m for centre, m in clusters]
+
+
+def test_empty_state(tmpdir):
+    fn = str(tmpdir.join('clusters.npz'))
+    IncrementalClustering(radius=2).save(fn)  # e.g. an empty folder
+    c = IncrementalClustering(fn=fn)
+    assert len(c) == 0 and c.get_clusters() == []
+    for i, d in enumerate(get_decoys(10)):
+        c.add(str(i), d)
+    assert sum([len(m) for centre, m in c.get_clusters()]) == 10
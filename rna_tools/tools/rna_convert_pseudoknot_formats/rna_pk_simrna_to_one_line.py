@@ -3,30 +3,24 @@
 
 import argparse
 
-SECOND_PK_CHAR = ['{', '}']
+from rna_tools.SecondaryStructure import BRACKETS
+
 
 def get_one_line(lines):
-    if len(lines) == 2:
-            ss = ''
-            for i,j in zip(lines[0], lines[1]):
-                if j == '(':
-                    i = '['
-                if j == ')':
-                    i = ']'
-                ss += i
-    if len(lines) == 3:
-            ss = ''
-            for i,j,k in zip(lines[0], lines[1], lines[2]):
-                if j == '(':
-                    i = '['
-                if j == ')':
-                    i = ']'
-                if k == '(':
-                    i = SECOND_PK_CHAR[0]
-                if k == ')':
-                    i = SECOND_PK_CHAR[1]
-                ss += i
-    return ss
+    """Get one line (dot-bracket) of the SimRNA format, ``()`` of the n-th line go to the
+    n-th level of brackets (``()``, ``[]``, ``{}``, ``<>``, ``Aa``...)::
+
+        >>> get_one_line(['((..))......\\n', '..((..))....\\n', '........(..)'])
+        '(([[))]]{..}'
+    """
+    lines = [l.rstrip('\n') for l in lines if l.strip()]
+    ss = list(lines[0])
+    for level, line in enumerate(lines[1:], 1):
+        for i, c in enumerate(line):
+            if c in '()':
+                ss[i] = BRACKETS[level]['()'.index(c)]
+    return ''.join(ss)
+
 
 if __name__ == '__main__':
     parser = argparse.ArgumentParser()
@@ -13,33 +13,35 @@ Convert a secondary structure with a pk to the SimRNA format::
 
 import argparse
 
-SECOND_PK_CHAR = ['{', '}']
+from rna_tools.SecondaryStructure import BRACKETS
+
 
 def is_pk(ss):
-    if ss.find('[') > -1:
-        return True
-    if ss.find(']') > -1:
-        return True
+    """Is there any pk (brackets of levels other than ``()``)."""
+    return any(c in ss for o_c in BRACKETS[1:] for c in o_c)
 
-def get_multiple_lines(ss):
-    ss_n = ''
-    ss_pk = ''
-    for i in ss.strip():
-        if i == '[':
-            j = '('
-            i = '.'
-        elif i == ']':
-            j = ')'
-            i = '.'
-        elif i == ' ': # not space
-            j = ' '
-        else:
-            j = '.'
 
-        ss_n += i
-        ss_pk += j
+def get_multiple_lines(ss):
+    """Get the SimRNA format, ``()`` of the level 0 stay in the first line, every level of
+    pks (``[]``, ``{}``, ``<>``, ``Aa``...) goes to its own line as ``()``, spaces (chain
+    breaks) are kept in all lines::
+
+        >>> print(get_multiple_lines('(([[))]] ({)}'))
+        ((..)).. (.).
+        ..((..)) ....
+        ........ .(.)
+    """
+    ss = ss.strip()
+    levels = dict((c, (level, k)) for level, o_c in enumerate(BRACKETS) for k, c in enumerate(o_c))
+    used = sorted(set([levels[c][0] for c in ss if c in levels and levels[c][0] > 0]))
+    lines = [list(ss)] + [[' ' if c == ' ' else '.' for c in ss] for l in used]
+    for i, c in enumerate(ss):
+        if c in levels and levels[c][0] > 0:
+            level, k = levels[c]
+            lines[0][i] = '.'
+            lines[used.index(level) + 1][i] = '()'[k]
+    return '\n'.join([''.join(l) for l in lines])
 
-    return ss_n + '\n' + ss_pk
 
 def get_parser():
     parser = argparse.ArgumentParser()
@@ -0,0 +1,276 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_dca.py - select, map, filter DCA interactions and get restraints in one go.
+
+This is a one-pass version of ``rna_dca_select_interactions.py`` + ``rna_dca_mapping.py`` +
+``rna_pairs2rfilter.py``/``rna_pairs2SimRNArestrs.py``:
+
+1. read the coupling scores (plmc/EVcouplings, ``resi_i, focus_i, resi_j, focus_j, 0, ec_score``,
+   or simply ``i j score``),
+2. select the top K interactions (by default L/2, like in rna_dca_select_interactions.py),
+3. map the interactions from the gapped sequence (columns of the alignment) to the sequence
+   without gaps (``--gseq``), then to the sequence with insertions marked with lower-case
+   letters (``--seq``), and finally to the numbering of a PDB file (``--offset``),
+4. filter out short-range interactions (``--noshort``) and interactions of the secondary structure (``--noss``),
+5. print pairs or restraints for rna_filter or SimRNA.
+
+Gseq and Seq are files in the Fasta format with a header, sequence, and secondary structure
+(as in rna_dca_mapping.py).
+
+Example::
+
+    $ rna_dca.py rf5.scores --gseq 1fir_gapped.fa --seq 1fir.fa --noss --noshort --format simrna
+    SLOPE A/29/MB A/41/MB 0 6 3.0
+    SLOPE A/29/MB A/41/MB 0 7 -3.0
+    [...]
+
+The library can be used for many families, the mappings are arrays, so any number of
+interactions is mapped at once::
+
+    >>> i, j, scores = read_couplings(['1 - 5 - 0 0.1', '2 - 9 - 0 0.9', '3 - 8 - 0 0.5'])
+    >>> i, j, scores = select_top(i, j, scores, 2)
+    >>> i.tolist(), j.tolist()
+    ([2, 3], [9, 8])
+    >>> gap2seq = get_gapped_mapping('G-GA-AC.C')
+    >>> map_positions([2, 3, 9], gap2seq)
+    array([0, 2, 6])
+"""
+from __future__ import print_function
+
+import argparse
+import ast
+
+import numpy as np
+
+from rna_tools.SecondaryStructure import SecondaryStructure
+
+GAPS = '-.'
+
+
+def read_couplings(f, first=1):
+    """Read coupling scores, line by line.
+
+    Args:
+        f: an open file (or a list of lines) with 6 columns (plmc, ``i focus_i j focus_j 0 score``)
+           or 3 columns (``i j score``)
+        first (int): number of the first column of the alignment in the file, 1 or 0
+
+    Returns:
+        (i, j, scores): np.arrays, i and j are columns of the alignment, numbered from 1
+    """
+    def parse():
+        for l in f:
+            l = l.split()
+            if not l or l[0].startswith('#'):
+                continue
+            if len(l) >= 6:
+                yield float(l[0]), float(l[2]), float(l[5])
+            else:
+                yield float(l[0]), float(l[1]), float(l[2])
+    data = np.fromiter((x for row in parse() for x in row), dtype=float).reshape(-1, 3)
+    shift = 1 - first
+    return data[:, 0].astype(int) + shift, data[:, 1].astype(int) + shift, data[:, 2]
+
+
+def select_top(i, j, scores, k=None):
+    """Select top k interactions (partial sort, only the top k interactions are sorted).
+
+    Args:
+        k (int): by default L/2, where L is the highest j
+
+    Returns:
+        (i, j, scores) of top interactions, sorted by scores (the highest first)
+    """
+    if not len(scores):  # e.g. an empty file
+        return i, j, scores
+    if k is None:
+        k = int(j.max()) // 2
+    k = min(k, len(scores))
+    if k <= 0:
+        return i[:0], j[:0], scores[:0]
+    idx = np.argpartition(-scores, k - 1)[:k]
+    idx = idx[np.argsort(-scores[idx], kind='stable')]
+    return i[idx], j[idx], scores[idx]
+
+
+def get_gapped_mapping(gseq, gaps=GAPS):
+    """Get a mapping of columns of the alignment (gapped sequence) to the sequence without gaps.
+
+    Returns:
+        np.array, for each column (index 0 is not used, columns are numbered from 1) a position
+        in the sequence without gaps, 0 for gaps
+    """
+    is_res = np.array([c not in gaps for c in gseq], dtype=bool)
+    mapping = np.zeros(len(gseq) + 1, dtype=int)
+    mapping[1:] = np.where(is_res, np.cumsum(is_res), 0)
+    return mapping
+
+
+def get_insertions_mapping(seq):
+    """Get a mapping of positions of the aligned sequence (upper-case letters) to the sequence
+    with insertions (marked with lower-case letters).
+
+    Returns:
+        np.array, for each position of the aligned sequence (numbered from 1, index 0 is not used)
+        a position in seq
+    """
+    is_aligned = np.array([not c.islower() for c in seq], dtype=bool)
+    return np.concatenate([[0], np.flatnonzero(is_aligned) + 1])
+
+
+def map_positions(positions, mapping):
+    """Map positions with a mapping, see get_gapped_mapping() and get_insertions_mapping().
+
+    Positions outside of the mapping are mapped to 0."""
+    positions = np.asarray(positions, dtype=int)
+    mapped = np.zeros(len(positions), dtype=int)
+    ok = (positions > 0) & (positions < len(mapping))
+    mapped[ok] = mapping[positions[ok]]
+    return mapped
+
+
+def get_partners(ss, n=None):
+    """Get a partner array for secondary structure, ``pt[i] = j`` (numbered from 1, 0 for unpaired)."""
+    pt = np.zeros(max(n or 0, len(ss)) + 1, dtype=int)
+    pt[1:len(ss) + 1] = SecondaryStructure(ss).pt + 1
+    return pt
+
+
+def filter_pairs(i, j, min_dist=None, ss=None):
+    """Get a mask of pairs to keep.
+
+    Args:
+        min_dist (int): remove pairs with j - i < min_dist (``--noshort`` is 6)
+        ss (str): remove pairs of this secondary structure (dot-bracket)
+
+    Returns:
+        np.array (bool)
+    """
+    keep = (i > 0) & (j > 0)
+    if min_dist:
+        keep &= np.abs(j - i) >= min_dist
+    if ss:
+        pt = get_partners(ss, max(i.max(initial=0), j.max(initial=0)))
+        keep &= pt[i] != j
+    return keep
+
+
+def diff_pairs(pairs1, pairs2):
+    """Get pairs of pairs1 that are not in pairs2 (sorted), set-based.
+
+    >>> diff_pairs([[1, 5], [2, 9], [3, 4]], [[2, 9]])
+    [[1, 5], [3, 4]]
+    """
+    pairs2 = set(tuple(p) for p in pairs2)
+    return sorted([list(p) for p in pairs1 if tuple(p) not in pairs2])
+
+
+def read_pairs(fn):
+    """Read a file with a python list of pairs, e.g. ``[[2, 172], [3, 169]]``."""
+    with open(fn) as f:
+        return ast.literal_eval(f.read().strip())
+
+
+def format_rna_filter(pairs, chain='A', distance=10, weight=3):
+    """Get restraints for rna_filter.
+
+    >>> print(format_rna_filter([[1, 10]]))
+    d:A1-A10 < 10.00 3.00
+    """
+    return '\n'.join(['d:%s%i-%s%i < %.2f %.2f' % (chain, a, chain, b, distance, weight) for a, b in pairs])
+
+
+def format_simrna(pairs, chain='A', dist=7, weight=3, well=False):
+    """Get restraints for SimRNA.
+
+    >>> print(format_simrna([[1, 10]]))
+    SLOPE A/1/MB A/10/MB 0 6 3
+    SLOPE A/1/MB A/10/MB 0 7 -3
+    """
+    lines = []
+    for a, b in pairs:
+        if well:
+            lines.append('WELL %s/%i/MB %s/%i/MB 0 %s %s' % (chain, a, chain, b, dist, weight))
+        else:
+            lines.append('SLOPE %s/%i/MB %s/%i/MB 0 %s %s' % (chain, a, chain, b, dist - 1, weight))
+            lines.append('SLOPE %s/%i/MB %s/%i/MB 0 %s -%s' % (chain, a, chain, b, dist, weight))
+    return '\n'.join(lines)
+
+
+def read_seq_ss(fn):
+    """Read a fasta file with a header, sequence and secondary structure."""
+    with open(fn) as f:
+        f.readline()  # get rid of header
+        seq = f.readline().strip()
+        ss = f.readline().strip()
+    return seq, ss
+
+
+def dca_pipeline(scores_fn, gseq=None, seq=None, ss=None, k=None, noshort=False, noss=False,
+                 offset=0, first=1):
+    """Run the whole pipeline.
+
+    Args:
+        scores_fn (str): file with coupling scores
+        gseq (str): gapped sequence (as in the alignment used for DCA)
+        seq (str): sequence with insertions (lower-case letters)
+        ss (str): secondary structure of seq (or of the sequence without gaps if seq is not given)
+        k (int): number of top interactions, by default L/2
+        noshort (bool): remove interactions with j - i < 6
+        noss (bool): remove interactions of the secondary structure
+        offset (int): added to final positions, to get the numbering of a PDB file
+
+    Returns:
+        list of pairs [[i, j], ...], sorted
+    """
+    with open(scores_fn) as f:
+        i, j, scores = read_couplings(f, first)
+    i, j, scores = select_top(i, j, scores, k)
+    if gseq:
+        gap2seq = get_gapped_mapping(gseq)
+        i, j = map_positions(i, gap2seq), map_positions(j, gap2seq)
+    if seq:
+        ins = get_insertions_mapping(seq)
+        i, j = map_positions(i, ins), map_positions(j, ins)
+    keep = filter_pairs(i, j, 6 if noshort else None, ss if noss else None)
+    i, j = i[keep], j[keep]
+    pairs = np.stack([np.minimum(i, j), np.maximum(i, j)], axis=1) + offset
+    return sorted(pairs.tolist())
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('scores', help="coupling scores, direct output from plmc")
+    parser.add_argument('--gseq', help='gapped sequence and secondary structure (like in the alignment used for DCA) in Fasta format')
+    parser.add_argument('--seq', help='seq fn in Fasta format (insertions as lower-case letters) and secondary structure')
+    parser.add_argument('--top', help='number of top interactions, by default L/2', type=int)
+    parser.add_argument('--first', help='number of the first column in the file with scores', type=int, default=1)
+    parser.add_argument('--offset', help="offset", type=int, default=0)
+    parser.add_argument('--noss', help='filter out interactions of the secondary structure', action='store_true')
+    parser.add_argument('--noshort', help='filter out short interactions, dist in seq < 6 nt', action='store_true')
+    parser.add_argument('--format', help='output format', choices=['pairs', 'rna_filter', 'simrna'], default='pairs')
+    parser.add_argument('--chain', help='chain', default='A')
+    parser.add_argument('--dist', help='distance of restraints (rna_filter: 10, simrna: 7)', type=float)
+    parser.add_argument('--weight', help='weight of restraints', type=float, default=3)
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    gseq = seq = ss = None
+    if args.gseq:
+        gseq, ss = read_seq_ss(args.gseq)
+        ss = ''.join([s for s, c in zip(ss, gseq) if c not in GAPS])
+    if args.seq:
+        seq, ss = read_seq_ss(args.seq)
+    pairs = dca_pipeline(args.scores, gseq, seq, ss, args.top, args.noshort, args.noss, args.offset, args.first)
+
+    if args.format == 'rna_filter':
+        print(format_rna_filter(pairs, args.chain, args.dist or 10, args.weight))
+    elif args.format == 'simrna':
+        print(format_simrna(pairs, args.chain, int(args.dist or 7), args.weight))
+    else:
+        print(pairs)
@@ -50,6 +50,7 @@ Usage::
 from __future__ import print_function
 
 from rna_tools.tools.rna_calc_rmsd.lib.rmsd.calculate_rmsd import get_coordinates
+from rna_tools.rna_mmcif import get_pdb_lines
 from rna_tools.tools.extra_functions.select_fragment import select_pdb_fragment_pymol_style, select_pdb_fragment
 from rna_tools.tools.simrna_trajectory.simrna_trajectory import SimRNATrajectory
 
@@ -157,26 +158,25 @@ def parse_pdb(pdb_fn, selection):
     [ 53.57 ,  23.268,  39.971]), "C4'": array([ 55.119,  24.697,  43.283]), "C2'": array([ 54.563,  26.706,  44.341]), 'N1': array([ 55.145,  27.966,  42.27 ]), "O2'": array([ 55.208,  26.577,  45.588]), 'N3': array([ 54.831,  30.285,  41.747]), 'O2': array([ 55.76 ,  29.587,  43.719]), 'C2': array([ 55.258,  29.321,  42.618]), "O3'": array([ 53.272,  24.698,  44.789]), 'C4': array([ 54.313,  29.909,  40.572])}}
     """
     V = {}
-    with open(pdb_fn) as f:
-        for line in f:
-            if line.startswith("ATOM"):
-                curr_chain_id = line[21]
-                curr_resi = int(line[22: 26])
-                curr_atom_name = line[12: 16].strip()
-                if selection:
-                    if curr_chain_id in selection:
-                        if curr_resi in selection[curr_chain_id]:
-                            x = line[30: 38]
-                            y = line[38: 46]
-                            z = line[46: 54]
-                            # V.append(np.asarray([x,y,z],dtype=float))
-                            if curr_chain_id + str(curr_resi) in V:
-                                V[curr_chain_id +
-                                    str(curr_resi)][curr_atom_name] = np.asarray([x, y, z], dtype=float)
-                            else:
-                                V[curr_chain_id + str(curr_resi)] = {}
-                                V[curr_chain_id +
-                                    str(curr_resi)][curr_atom_name] = np.asarray([x, y, z], dtype=float)
+    for line in get_pdb_lines(pdb_fn):  # a PDB or mmCIF file
+        if line.startswith("ATOM"):
+            curr_chain_id = line[21]
+            curr_resi = int(line[22: 26])
+            curr_atom_name = line[12: 16].strip()
+            if selection:
+                if curr_chain_id in selection:
+                    if curr_resi in selection[curr_chain_id]:
+                        x = line[30: 38]
+                        y = line[38: 46]
+                        z = line[46: 54]
+                        # V.append(np.asarray([x,y,z],dtype=float))
+                        if curr_chain_id + str(curr_resi) in V:
+                            V[curr_chain_id +
+                                str(curr_resi)][curr_atom_name] = np.asarray([x, y, z], dtype=float)
+                        else:
+                            V[curr_chain_id + str(curr_resi)] = {}
+                            V[curr_chain_id +
+                                str(curr_resi)][curr_atom_name] = np.asarray([x, y, z], dtype=float)
     return V
 
 
@@ -15,6 +15,8 @@ from __future__ import print_function
 
 import argparse
 
+from rna_tools.tools.rna_filter.rna_dca import read_pairs, diff_pairs
+
 
 def get_parser():
     parser = argparse.ArgumentParser(
@@ -32,18 +34,12 @@ if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
 
-    pairs1 = eval(open(args.pairs1).read().strip())
-    pairs2 = eval(open(args.pairs2).read().strip())
+    pairs1 = read_pairs(args.pairs1)
+    pairs2 = read_pairs(args.pairs2)
 
     # go ever dca and keep if not in ss
-    pairsnonss = []
-    for pair in pairs1:
-        if pair in pairs2:
-            pass
-        else:
-            pairsnonss.append(pair)
+    pairsnonss = diff_pairs(pairs1, pairs2)
     print('# of ec_paris:', len(pairs1))
     print('# of ssbps   :', len(pairs2))
     print('dalta#       :', len(pairsnonss))
-    pairsnonss.sort()
     print(pairsnonss)
@@ -0,0 +1,38 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+from rna_tools.tools.rna_filter.rna_dca import dca_pipeline, get_insertions_mapping, format_simrna, \
+    read_couplings, select_top
+
+
+def test_dca_pipeline(tmpdir):
+    fn = str(tmpdir.join('test.scores'))
+    with open(fn, 'w') as f:
+        # gapped columns, 6 columns as plmc
+        f.write('1 G 12 C 0 0.9\n'   # ss pair
+                '2 G 3 - 0 0.8\n'    # gap
+                '4 A 10 U 0 0.7\n'
+                '5 A 11 C 0 0.1\n'   # not in top
+                '6 A 12 C 0 0.6\n')
+    gseq = 'GG-AAA--AUCC'
+    seq = 'GGaAAAAUCC'
+    ss = '((......))'  # for seq
+    assert dca_pipeline(fn, gseq, seq, ss, k=4) == [[1, 10], [4, 8], [6, 10]]
+    assert dca_pipeline(fn, gseq, seq, ss, k=4, noss=True, noshort=True) == []
+    assert dca_pipeline(fn, gseq, seq, ss, k=4, noss=True, offset=10) == [[14, 18], [16, 20]]
+    assert dca_pipeline(fn, gseq, k=4) == [[1, 9], [3, 7], [5, 9]]
+
+
+def test_no_couplings(tmpdir):
+    i, j, scores = select_top(*read_couplings(['# no couplings']))
+    assert len(i) == len(j) == len(scores) == 0
+    fn = str(tmpdir.join('empty.scores'))
+    open(fn, 'w').close()
+    assert dca_pipeline(fn, 'GG-AAA--AUCC', ss='((......))', noss=True, noshort=True) == []
+
+
+def test_insertions_mapping():
+    assert list(get_insertions_mapping('GGaAAuuC')) == [0, 1, 2, 4, 5, 8]
+
+
+def test_format_simrna():
+    assert format_simrna([[1, 10]], well=True) == 'WELL A/1/MB A/10/MB 0 7 3'
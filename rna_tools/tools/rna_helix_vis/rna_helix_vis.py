@@ -28,7 +28,7 @@ import argparse
 import sys
 import six
 
-from rna_tools.tools.rna_bp.base_pair import *
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table, get_pair_centroids
 
 if six.PY2:
     import forgi.graph.bulge_graph as fgb
@@ -38,13 +38,17 @@ else:
 
 
 class Helix:
-    def __init__(self, id, fn, chain, start, end):
+    def __init__(self, id, fn, chain, start, end, table=None):
+        """table is a coordinate table of the structure (see bp_geometry.get_coord_table()),
+        if not given, the structure is loaded (pass it, if you have many helices)."""
         self.id = id
         self.start = start  # (1,2)
         self.end = end
         self.fn = fn
         self.chain = chain
-        self.load_structure()
+        self.table = table
+        if self.table is None:
+            self.load_structure()
 
     def __repr__(self):
         return 'Helix ' + str(self.id) + ' ' + str(self.start) + '-' + str(self.end)
@@ -58,27 +62,16 @@ class Helix:
         return 'color red, resi ' + t[:-1]
 
     def load_structure(self):
-        parser_pdb = PDB.PDBParser()
-        struct = parser_pdb.get_structure('', self.fn)  # )
-        model = struct[0]
-        self.chain = model[self.chain]
-        self.struct = struct
+        self.table = get_coord_table(self.fn, self.chain)
 
-    def get_helix_coord(self):
-        chain = self.chain
-        struct = self.struct
-        a = chain[self.start[0]]
-        b = chain[self.end[1]]
-
-        bp = BasePair(a, b, struct)
-
-        a = chain[self.start[1]]
-        b = chain[self.end[0]]
-
-        bp2 = BasePair(a, b, struct)
+    def get_pairs(self):
+        """Get the first and the last base pair of the helix."""
+        return [(self.start[0], self.end[1]), (self.start[1], self.end[0])]
 
+    def get_helix_coord(self):
+        bp, bp2 = get_pair_centroids(self.table, self.get_pairs(), self.chain)
         # print "cmd.load_cgo( [9.0, " + ','.join([str(x) for x in bp.calc_coord()]) + ',' +  ','.join([str(x) for x in bp2.calc_coord()]) + ", 5, 1, 0, 0, 1,0,0], 'cylinderx' )"
-        return ','.join([str(x) for x in bp.calc_coord()]) + ',' + ','.join([str(x) for x in bp2.calc_coord()]) + ", 9, 1, 0, 0, 1,0,0"
+        return ','.join(['%g' % x for x in bp]) + ',' + ','.join(['%g' % x for x in bp2]) + ", 9, 1, 0, 0, 1,0,0"
 
 
 def show_cyliders(ss):
@@ -91,6 +84,7 @@ def show_cyliders(ss):
     print("""from pymol.cgo import *
 from pymol import cmd""")
 
+    table = get_coord_table(fn, chain)  # load the structure once, for all helices
     ht = 'obj = [ CYLINDER, '
     for i in bg.to_bg_string().split('\n'):
         # print i
@@ -98,7 +92,7 @@ from pymol import cmd""")
             x = i.replace('define s', '')
             # print x
             x = [int(x) for x in x.split()]
-            h = Helix(x[0], fn, chain, (x[1], x[2]), (x[3], x[4]))
+            h = Helix(x[0], fn, chain, (x[1], x[2]), (x[3], x[4]), table)
             helices.append(h)
             print((h.get_ids()))
             ht += h.get_helix_coord() + ', CYLINDER, '
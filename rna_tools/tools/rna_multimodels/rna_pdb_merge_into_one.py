@@ -2,10 +2,11 @@
 
 import sys
 from rna_tools.rna_tools_lib import RNAStructure
+from rna_tools.rna_archive import expand_archives
 
 
 if __name__ == '__main__':
-    files = sys.argv[1:]
+    files = expand_archives(sys.argv[1:])  # models of archives (.rnarc) as well
     if not files:
         print('rna_pdb_merge_into_one.py test_in/*.pdb')
         sys.exit(1)
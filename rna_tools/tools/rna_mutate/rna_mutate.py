@@ -0,0 +1,351 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_mutate.py - mutate bases of a structure (A, C, G, U) in memory.
+
+A new base (a template, the standard reference frames of bases from 3DNA, Olson et al.
+2001) is placed in the frame of the old base: the template of the old base is superimposed
+(Kabsch, all residues at once) on C1', N9/N1 and ring atoms of the residue, and the same
+transformation is applied to the template of the new base. The backbone and the sugar are
+kept, atoms are renumbered.
+
+The structure is parsed once, so many mutations (and many variants, e.g. saturation
+mutagenesis of a loop) are made without reading files again::
+
+    $ rna_mutate.py --mutate 'A:1A+2A+3A+4A,B:13A' 205d_rmH2o.pdb > 205d_mut.pdb
+    $ rna_mutate.py --saturate A:5-7 -o variants 205d_rmH2o.pdb  # 64 files
+    variants/205d_rmH2o_A5C+A6C+A7A.pdb
+    ...
+
+Use ``--single`` to get only single point mutants of the positions."""
+from __future__ import print_function
+
+import argparse
+import itertools
+import os
+import sys
+
+import numpy as np
+
+# the standard reference frames of bases (3DNA, Atomic_A.pdb etc.), C1' and base atoms
+BASE_TEMPLATES = {
+    'A': [("C1'", -2.479, 5.346, 0.000), ('N9', -1.291, 4.498, 0.000), ('C8', 0.024, 4.897, 0.000),
+          ('N7', 0.877, 3.902, 0.000), ('C5', 0.071, 2.771, 0.000), ('C6', 0.369, 1.398, 0.000),
+          ('N6', 1.611, 0.909, 0.000), ('N1', -0.668, 0.532, 0.000), ('C2', -1.912, 1.023, 0.000),
+          ('N3', -2.320, 2.290, 0.000), ('C4', -1.267, 3.124, 0.000)],
+    'G': [("C1'", -2.477, 5.399, 0.000), ('N9', -1.289, 4.551, 0.000), ('C8', 0.023, 4.962, 0.000),
+          ('N7', 0.870, 3.969, 0.000), ('C5', 0.071, 2.833, 0.000), ('C6', 0.424, 1.460, 0.000),
+          ('O6', 1.554, 0.955, 0.000), ('N1', -0.700, 0.641, 0.000), ('C2', -1.999, 1.087, 0.000),
+          ('N2', -2.949, 0.139, -0.001), ('N3', -2.342, 2.364, 0.001), ('C4', -1.265, 3.177, 0.000)],
+    'C': [("C1'", -2.477, 5.402, 0.000), ('N1', -1.285, 4.542, 0.000), ('C2', -1.472, 3.158, 0.000),
+          ('O2', -2.628, 2.709, 0.001), ('N3', -0.391, 2.344, 0.000), ('C4', 0.837, 2.868, 0.000),
+          ('N4', 1.875, 2.027, 0.001), ('C5', 1.056, 4.275, 0.000), ('C6', -0.023, 5.068, 0.000)],
+    'U': [("C1'", -2.481, 5.354, 0.000), ('N1', -1.284, 4.500, 0.000), ('C2', -1.462, 3.135, 0.000),
+          ('O2', -2.562, 2.608, 0.000), ('N3', -0.298, 2.407, 0.000), ('C4', 0.994, 2.897, 0.000),
+          ('O4', 1.944, 2.119, 0.000), ('C5', 1.106, 4.338, 0.000), ('C6', -0.024, 5.057, 0.000)],
+}
+BASE_ATOMS = dict((b, [a[0] for a in t]) for b, t in BASE_TEMPLATES.items())
+BASE_COORDS = dict((b, np.array([a[1:] for a in t])) for b, t in BASE_TEMPLATES.items())
+MAX_ATOMS = max(len(a) for a in BASE_ATOMS.values())
+# residue names of bases
+RESNAMES = {'A': 'A', 'C': 'C', 'G': 'G', 'U': 'U', 'RA': 'A', 'RC': 'C', 'RG': 'G', 'RU': 'U',
+            'ADE': 'A', 'CYT': 'C', 'GUA': 'G', 'URA': 'U', 'URI': 'U'}
+
+
+def superimpose_batch(P, Q, w=None):
+    """Superimpose (Kabsch) each set of atoms of P on Q, all at once.
+
+    Args:
+        P, Q (np.array): k x m x 3
+        w (np.array): k x m, weights (e.g. 0 for missing atoms)
+
+    Returns:
+        R (k x 3 x 3), t (k x 3): rotations and translations, ``Q ~ P R^T + t``
+
+    >>> Q = np.array([[0, 0, 0], [1, 0, 0], [0, 2, 0], [0, 0, 3.]])
+    >>> R = np.array([[0, -1, 0], [1, 0, 0], [0, 0, 1.]])
+    >>> R2, t = superimpose_batch(Q[None], (Q.dot(R.T) + 5)[None])
+    >>> np.allclose(R2[0], R), np.allclose(t[0], 5)
+    (True, True)
+    """
+    P = np.asarray(P, dtype=float)
+    Q = np.asarray(Q, dtype=float)
+    w = np.ones(P.shape[:2]) if w is None else np.asarray(w, dtype=float)
+    wn = (w / w.sum(axis=1)[:, None])[..., None]
+    pc = (P * wn).sum(axis=1)
+    qc = (Q * wn).sum(axis=1)
+    H = np.matmul(((P - pc[:, None]) * wn).transpose(0, 2, 1), Q - qc[:, None])
+    U, S, Vt = np.linalg.svd(H)
+    D = np.tile(np.eye(3), (len(P), 1, 1))
+    D[:, 2, 2] = np.sign(np.linalg.det(np.matmul(U, Vt)))  # no reflections
+    R = np.matmul(np.matmul(Vt.transpose(0, 2, 1), D), U.transpose(0, 2, 1))
+    t = qc - np.matmul(R, pc[..., None])[..., 0]
+    return R, t
+
+
+def parse_mutations(txt):
+    """Parse mutations, e.g. ``A:1A+2A,B:13C``.
+
+    Returns:
+        list of (chain, resi, base)
+
+    >>> parse_mutations('A:1A+2C,B:13U')
+    [('A', '1', 'A'), ('A', '2', 'C'), ('B', '13', 'U')]
+    """
+    mutations = []
+    for m in txt.split(','):
+        chain, resis = m.strip().split(':')
+        for resi_base in resis.split('+'):
+            mutations.append((chain, resi_base[:-1], resi_base[-1].upper()))
+    return mutations
+
+
+def parse_positions(txt):
+    """Parse positions, e.g. ``A:5-7+10,B:1``.
+
+    Returns:
+        list of (chain, resi)
+
+    >>> parse_positions('A:5-7+10,B:1')
+    [('A', '5'), ('A', '6'), ('A', '7'), ('A', '10'), ('B', '1')]
+    """
+    positions = []
+    for m in txt.split(','):
+        chain, resis = m.strip().split(':')
+        for r in resis.split('+'):
+            if '-' in r:
+                start, end = r.split('-')
+                positions.extend([(chain, str(i)) for i in range(int(start), int(end) + 1)])
+            else:
+                positions.append((chain, r))
+    return positions
+
+
+def get_saturation(positions, bases='ACGU', single=False, wild=None):
+    """Get variants (lists of mutations) of positions.
+
+    Args:
+        positions (list): (chain, resi)
+        bases (str): bases to use
+        single (bool): only single point mutants (of the wild type ``wild``, a dict
+            (chain, resi) -> base), otherwise all combinations
+
+    Returns:
+        list of lists of (chain, resi, base)
+
+    >>> len(get_saturation([('A', '1'), ('A', '2')]))
+    16
+    >>> get_saturation([('A', '1')], 'AC', single=True, wild={('A', '1'): 'A'})
+    [[('A', '1', 'C')]]
+    """
+    if single:
+        return [[(c, r, b)] for c, r in positions for b in bases if not wild or wild[(c, r)] != b]
+    return [[(c, r, b) for (c, r), b in zip(positions, combination)]
+            for combination in itertools.product(bases, repeat=len(positions))]
+
+
+class BaseMutator(object):
+    """A structure (PDB) kept in memory to mutate bases.
+
+    Args:
+        fn (str): a PDB file (or a list of lines)
+
+    Attributes:
+        head, tail (list): lines before and after atoms (e.g. HEADER, END)
+        residues (list): blocks of lines: ((chain, resi), [lines]); other lines between
+            residues (e.g. TER) are blocks with the key None
+    """
+    def __init__(self, fn):
+        lines = open(fn).read().splitlines() if isinstance(fn, str) else list(fn)
+        atoms = [i for i, l in enumerate(lines) if l.startswith(('ATOM', 'HETATM'))]
+        if not atoms:
+            raise Exception('No atoms in the structure')
+        self.head = lines[:atoms[0]]
+        self.tail = lines[atoms[-1] + 1:]
+        self.residues = []
+        self.index = {}
+        for l in lines[atoms[0]:atoms[-1] + 1]:
+            if l.startswith('ENDMDL'):  # only the first model
+                self.tail = [l for l in self.tail if l.startswith('END') and not l.startswith('ENDMDL')]
+                break
+            key = (l[21], l[22:27].strip()) if l.startswith(('ATOM', 'HETATM')) else None
+            if key is None or not self.residues or self.residues[-1][0] != key:
+                if key in self.index:
+                    raise Exception('Residue %s:%s is not in one block' % key)
+                if key is not None:
+                    self.index[key] = len(self.residues)
+                self.residues.append((key, []))
+            self.residues[-1][1].append(l)
+        self._frames = {}
+
+    def get_base(self, key):
+        """Get a base (A, C, G, U) of a residue, key (chain, resi)."""
+        lines = self._get_lines(key)
+        resname = lines[0][17:20].strip()
+        if resname not in RESNAMES:
+            raise Exception('Residue %s:%s is not a standard base (%s)' % (key + (resname,)))
+        return RESNAMES[resname]
+
+    def get_seq(self, keys):
+        """Get bases of residues (keys)."""
+        return ''.join(self.get_base(k) for k in keys)
+
+    def _get_lines(self, key):
+        if key not in self.index:
+            raise Exception('Residue %s:%s not found' % key)
+        return self.residues[self.index[key]][1]
+
+    def get_frames(self, keys):
+        """Get (and keep) frames of bases of residues (superposition of templates of bases).
+
+        Returns:
+            R (k x 3 x 3), t (k x 3): template coordinates to the residue, ``x R^T + t``
+        """
+        todo = [k for k in dict.fromkeys(keys) if k not in self._frames]
+        if todo:
+            P = np.zeros((len(todo), MAX_ATOMS, 3))
+            Q = np.zeros((len(todo), MAX_ATOMS, 3))
+            w = np.zeros((len(todo), MAX_ATOMS))
+            for i, key in enumerate(todo):
+                base = self.get_base(key)
+                atoms = dict((l[12:16].strip(), l) for l in self._get_lines(key))
+                for j, name in enumerate(BASE_ATOMS[base]):
+                    if name in atoms:
+                        l = atoms[name]
+                        P[i, j] = BASE_COORDS[base][j]
+                        Q[i, j] = float(l[30:38]), float(l[38:46]), float(l[46:54])
+                        w[i, j] = 1
+                if w[i].sum() < 3:
+                    raise Exception('Residue %s:%s has less than 3 atoms of the base' % key)
+            R, t = superimpose_batch(P, Q, w)
+            for i, key in enumerate(todo):
+                self._frames[key] = (R[i], t[i])
+        frames = [self._frames[k] for k in keys]
+        return np.array([f[0] for f in frames]).reshape(-1, 3, 3), np.array([f[1] for f in frames]).reshape(-1, 3)
+
+    def _get_residue(self, key, base, R, t):
+        """Lines of a residue with a new base (the same frame)."""
+        lines = self._get_lines(key)
+        old = set(BASE_ATOMS[self.get_base(key)][1:])
+        c1 = [l for l in lines if l[12:16].strip() == "C1'"]
+        if not c1:
+            raise Exception('Residue %s:%s has no C1\' atom' % key)
+        coords = BASE_COORDS[base][1:].dot(R.T) + t
+        new = []
+        for name, xyz in zip(BASE_ATOMS[base][1:], coords):
+            l = c1[0]
+            l = l[:12] + ' ' + name.ljust(3) + l[16:30] + '%8.3f%8.3f%8.3f' % tuple(xyz) + l[54:]
+            if len(l) >= 78:
+                l = l[:76] + name[0].rjust(2) + l[78:]
+            new.append(l)
+        output = []
+        for l in lines:
+            name = l[12:16].strip()
+            if name in old or (name.startswith('H') and "'" not in name):  # hydrogens of the base
+                if new:  # the new base at the place of the old one
+                    output.extend(new)
+                    new = []
+                continue
+            output.append(l)
+        output.extend(new)
+        return [l[:17] + base.rjust(3) + l[20:] for l in output]
+
+    def mutate(self, mutations, inplace=True, verbose=False):
+        """Mutate bases.
+
+        Args:
+            mutations (list): (chain, resi, base), see parse_mutations()
+            inplace (bool): keep mutations in the structure, otherwise get only the text
+
+        Returns:
+            str: text of the mutated structure (PDB)
+        """
+        mutations = [(c, str(r), b.upper()) for c, r, b in mutations]
+        for c, r, b in mutations:
+            if b not in BASE_TEMPLATES:
+                raise Exception('Unknown base: %s (use A, C, G or U)' % b)
+        keys = [(c, r) for c, r, b in mutations]
+        R, t = self.get_frames(keys)
+        changed = {}
+        for i, (c, r, b) in enumerate(mutations):
+            if verbose:
+                print('Mutate %s:%s %s to %s' % (c, r, self.get_base((c, r)), b), file=sys.stderr)
+            changed[self.index[(c, r)]] = self._get_residue((c, r), b, R[i], t[i])
+        if inplace:  # the frame of a new base is the frame of the old one, frames are still fine
+            for i, lines in changed.items():
+                self.residues[i] = (self.residues[i][0], lines)
+        return self.get_text(changed)
+
+    def get_text(self, changed=None):
+        """Get text (PDB) of the structure, atoms renumbered.
+
+        Args:
+            changed (dict): index of a residue -> new lines of the residue
+        """
+        changed = changed or {}
+        output = list(self.head)
+        c = 1
+        for i, (key, lines) in enumerate(self.residues):
+            for l in changed.get(i, lines):
+                if l.startswith(('ATOM', 'HETATM', 'TER')) and len(l) > 11:
+                    l = l[:6] + str(c).rjust(5) + l[11:]
+                    c += 1
+                output.append(l)
+        return '\n'.join(output + self.tail) + '\n'
+
+    def save_variants(self, variants, path, prefix='', threads=4, verbose=False):
+        """Save variants (lists of mutations), the structure itself is not changed.
+
+        Files are named ``<prefix><chain><resi><base>+...pdb`` and written in threads.
+
+        Returns:
+            list of files
+        """
+        from multiprocessing.pool import ThreadPool
+        if not os.path.exists(path):
+            os.makedirs(path)
+        self.get_frames([(c, str(r)) for v in variants for c, r, b in v])  # all frames at once
+
+        def save(variant):
+            fn = os.path.join(path, prefix + '+'.join('%s%s%s' % m for m in variant) + '.pdb')
+            with open(fn, 'w') as f:
+                f.write(self.mutate(variant, inplace=False))
+            if verbose:
+                print(fn)
+            return fn
+        pool = ThreadPool(max(threads, 1))
+        try:
+            return pool.map(save, variants)
+        finally:
+            pool.close()
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--mutate', help="mutations, e.g. A:1A+2A+3A+4A,B:13A")
+    parser.add_argument('--saturate', help="positions to get all variants of, e.g. A:5-10")
+    parser.add_argument('--bases', default='ACGU', help="bases for --saturate, default ACGU")
+    parser.add_argument('--single', action='store_true', help="only single point mutants (--saturate)")
+    parser.add_argument('-o', '--output', default='variants', help="a folder for variants (--saturate)")
+    parser.add_argument('--threads', type=int, default=4, help="# of threads to write files")
+    parser.add_argument("-v", "--verbose", action="store_true", help="be verbose")
+    parser.add_argument('file', help="a PDB file")
+    return parser
+
+
+if __name__ == '__main__':
+    parser = get_parser()
+    args = parser.parse_args()
+
+    m = BaseMutator(args.file)
+    if args.mutate:
+        text = m.mutate(parse_mutations(args.mutate), verbose=args.verbose)
+        if not args.saturate:
+            sys.stdout.write(text)
+    if args.saturate:
+        positions = parse_positions(args.saturate)
+        wild = dict((p, m.get_base(p)) for p in positions)
+        variants = get_saturation(positions, args.bases.upper(), args.single, wild)
+        prefix = os.path.splitext(os.path.basename(args.file))[0] + '_'
+        files = m.save_variants(variants, args.output, prefix, args.threads, args.verbose)
+        print('# of variants:', len(files), 'saved in', args.output)
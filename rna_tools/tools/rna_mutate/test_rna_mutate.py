@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+import numpy as np
+
+from rna_tools.tools.rna_bp.bp_geometry import get_coord_table
+from rna_tools.tools.rna_mutate.rna_mutate import BaseMutator, parse_mutations, parse_positions, \
+    get_saturation
+
+RNA_TOOLS = os.path.join(os.path.dirname(os.path.abspath(__file__)), os.pardir, os.pardir)
+FN = os.path.join(RNA_TOOLS, 'input', '205d_rmH2o.pdb')
+TEST_DATA = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'test_data')
+
+
+def get_atoms(text):
+    t = get_coord_table(text.splitlines())
+    return dict(((c, r, n), (rn, x)) for c, r, rn, n, x in zip(t.chains, t.resis, t.resnames, t.names, t.coords))
+
+
+def test_mutate_as_moderna():
+    """The same atoms as ModeRNA (output of the former rna_pdb_toolsx.py --mutate with ModeRNA),
+    bases placed a bit differently (templates)."""
+    text = BaseMutator(FN).mutate(parse_mutations('A:1A+2A+3A+4A'))
+    atoms = get_atoms(text)
+    moderna = get_atoms(open(os.path.join(TEST_DATA, '205d_rmH2o_mutA1234_moderna.pdb')).read())
+    assert set(atoms) == set(moderna)
+    for k in atoms:
+        assert atoms[k][0] == moderna[k][0]
+        assert np.linalg.norm(atoms[k][1] - moderna[k][1]) < 0.3
+
+
+def test_mutate_same_base():
+    m = BaseMutator(FN)
+    original = get_atoms(m.get_text())
+    keys = [k for k in m.index if k[0] == 'A']
+    text = m.mutate([(c, r, b) for (c, r), b in zip(keys, m.get_seq(keys))])
+    atoms = get_atoms(text)
+    assert set(atoms) == set(original)
+    assert max(np.linalg.norm(atoms[k][1] - original[k][1]) for k in atoms) < 0.1
+    # there and back again
+    m.mutate([('A', '1', 'U')])
+    assert m.get_base(('A', '1')) == 'U'
+    atoms = get_atoms(m.mutate([('A', '1', 'G')]))
+    assert set(atoms) == set(original)
+    assert max(np.linalg.norm(atoms[k][1] - original[k][1]) for k in atoms) < 0.1
+
+
+def test_save_variants(tmpdir):
+    m = BaseMutator(FN)
+    text = m.get_text()
+    positions = parse_positions('A:2-3')
+    variants = get_saturation(positions)
+    files = m.save_variants(variants, str(tmpdir), 'x_', threads=2)
+    assert len(files) == 16 and os.path.basename(files[1]) == 'x_A2A+A3C.pdb'
+    assert m.get_seq(positions) == 'GA' and m.get_text() == text  # not changed
+    assert BaseMutator(files[1]).get_seq(positions) == 'AC'
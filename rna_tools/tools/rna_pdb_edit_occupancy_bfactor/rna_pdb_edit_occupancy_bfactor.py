@@ -17,32 +17,144 @@ Example::
                                      --set-not-selected-to 8
                                      test_data/3w3s_homologymodel.pdb
 
+Per-residue values (e.g. per-residue RMSD, conservation or DCA scores) can be painted
+on many models at once, a file with values has lines ``<chain> <resi> <value>``
+(or ``<chain>:<resi> <value>``)::
+
+   rna_pdb_edit_occupancy_bfactor.py --bfactor --values rmsd_per_residue.txt \
+                                     --outdir painted models/
+
+Columns are edited in place (fixed columns of the PDB format), other lines and
+columns are kept as they are.
 """
 
 from __future__ import print_function
-import re
-import string
 import argparse
+import glob
+import os
+import sys
 
-from Bio import PDB
-from Bio.PDB import PDBIO
-from Bio.PDB.Atom import PDBConstructionWarning
+import numpy as np
 
-import sys
-import warnings
-warnings.simplefilter('ignore', PDBConstructionWarning)
+from rna_tools.pdb_columns import get_atom_table, set_column
+from rna_tools.tools.extra_functions.select_fragment import select_pdb_fragment
+
+def get_residue_values(table, values):
+    """Map per-residue values on atoms.
+
+    Args:
+        table (AtomTable): atoms
+        values (dict): chain -> {resi: value}
+
+    Returns:
+        np.array: a value for each atom, nan for atoms of residues without a value
+    """
+    out = np.full(len(table.idx), np.nan)
+    for chain, resi_values in values.items():
+        if not resi_values:
+            continue
+        lookup = np.full(max(resi_values) + 1, np.nan)
+        lookup[list(resi_values)] = list(resi_values.values())
+        in_chain = np.flatnonzero(table.chains == chain)
+        resis = table.resis[in_chain]
+        ok = (resis >= 0) & (resis < len(lookup))
+        out[in_chain[ok]] = lookup[resis[ok]]
+    return out
+
+
+def read_residue_values(fn):
+    """Read a file with per-residue values, lines ``<chain> <resi> <value>``
+    or ``<chain>:<resi> <value>``.
+
+    Returns:
+        dict: chain -> {resi: value}
+    """
+    values = {}
+    with open(fn) as f:
+        for l in f:
+            l = l.replace(':', ' ').split()
+            if not l or l[0].startswith('#'):
+                continue
+            values.setdefault(l[0], {})[int(l[1])] = float(l[2])
+    return values
+
+
+def get_selection_mask(table, selection, select_atoms=None):
+    """Get a mask of selected atoms.
+
+    Args:
+        table (AtomTable): atoms
+        selection (Selection): residues, see select_pdb_fragment()
+        select_atoms (list): only these atoms (names), all if None
+    """
+    mask = selection.mask(table.chains, table.resis)
+    if select_atoms:
+        mask &= np.isin(table.names, select_atoms)
+    return mask
+
+
+def check_selection(table, selection):
+    """Check if all selected residues are in the structure, returns an error or None."""
+    for chain, residues in selection.items():
+        present = table.resis[table.chains == chain]
+        if not len(present):
+            return 'Error: Chain ' + chain + ' not found in the PDB structure'
+        for start, end in residues.ranges:
+            found = np.unique(present[(present >= start) & (present <= end)])
+            if len(found) != end - start + 1:
+                resi = sorted(set(range(start, end + 1)) - set(found.tolist()))[0]
+                return 'Error: Residue ' + chain + ':' + str(resi) + ' not found in the PDB structure'
+    return None
+
+
+def edit_lines(lines, column, set_to=1, set_not_selected_to=None, selection=None,
+               select_atoms=None, residue_values=None):
+    """Edit a column (occupancy or bfactor) of lines in one masked pass.
+
+    Args:
+        lines (list): lines of a PDB file, modified in place
+        column (str): occupancy or bfactor
+        set_to (float): set to this value, if within selection
+        set_not_selected_to (float): set to this value, if not within selection,
+            if None (or 0, as before) not selected atoms are not changed
+        selection (Selection or str): e.g. A:1-10,B:1-5, all atoms if None
+        select_atoms (list): only these atoms
+        residue_values (dict): chain -> {resi: value}, set these values (instead of set_to)
+
+    Returns:
+        list: lines
+    """
+    table = get_atom_table(lines)
+    if isinstance(selection, str):
+        selection = select_pdb_fragment(selection, splitting='[,:;]')
+    if selection is not None:
+        selected = get_selection_mask(table, selection, select_atoms)
+    else:
+        selected = np.ones(len(table.idx), dtype=bool)
+        if select_atoms:
+            selected &= np.isin(table.names, select_atoms)
+
+    values = np.full(len(table.idx), float(set_to))
+    if residue_values is not None:
+        values = get_residue_values(table, residue_values)
+        selected &= ~np.isnan(values)
+
+    if set_not_selected_to:
+        values[~selected] = set_not_selected_to
+        selected[:] = True
+    return set_column(lines, column, values[selected], table.idx[selected])
 
 
 def edit_occupancy_of_pdb(txt, pdb, pdb_out, bfactor, occupancy, set_to,
-                          set_not_selected_to, select_atoms, v=False):
+                          set_not_selected_to, select_atoms, v=False, residue_values=None):
     """Change ouccupancy or bfactor of pdb file.
 
-    Load the structure, and first set everything to be `set_not_selected_to`
+    First set everything to be `set_not_selected_to`
     and then  set selected to `sel_to`.
 
     Args:
 
-       txt (str): A:1-10, selection, what to change
+       txt (str): A:1-10, selection, what to change (all residues if None)
        pdb (str): filename to read as an input
        pdb_out (str): filename to save an output
        bfactor (bool): if edit bfactor
@@ -51,92 +163,45 @@ def edit_occupancy_of_pdb(txt, pdb, pdb_out, bfactor, occupancy, set_to,
        set_not_selected_to (float): set to this value, if not within selection
        select_atoms (str): P, P+C4\\', use + as a separator
        v (bool): be verbose
+       residue_values (dict): chain -> {resi: value}, per-residue values to set, see read_residue_values()
 
     Returns:
 
        bool: if OK, save an output to pdb_out
-
-    .. warning:: this function requires BioPython
     """
-    struc = PDB.PDBParser().get_structure('struc', pdb)
-
-    # first loop to set everything to set_not_selected_to
-    if set_not_selected_to:
-        for s in struc:
-            for c in s:
-                for r in c:
-                    for a in r:
-                        if bfactor:
-                            a.set_bfactor(set_not_selected_to)
-                        if occupancy:
-                            a.set_occupancy(set_not_selected_to)
-
-    # parser selected
-    txt = txt.replace(' ', '')
-    l = re.split('[,:;]', txt)
-    if v:
-        print(txt)
-        print(l)
-
-    # second loop to set_to for selected
-    for i in l:  # ['A', '1-10', '15', '25-30', 'B', '1-10']
-        if i in string.ascii_letters:
-            if v:
-                print('chain', i)
-            chain_curr = i
-            continue
+    with open(pdb) as f:
+        lines = f.read().splitlines()
+
+    selection = None
+    if txt:
+        selection = select_pdb_fragment(txt, splitting='[,:;]', verbose=v)
+        error = check_selection(get_atom_table(lines), selection)
+        if error:
+            print(error, file=sys.stderr)
+            return False
+    if select_atoms:
+        select_atoms = [x.strip() for x in select_atoms.split('+')]
+
+    for column, edit in (('bfactor', bfactor), ('occupancy', occupancy)):
+        if edit:
+            edit_lines(lines, column, set_to, set_not_selected_to, selection,
+                       select_atoms, residue_values)
+
+    with open(pdb_out, 'w') as f:
+        f.write('\n'.join(lines) + '\n')
+    print('Saved ', pdb_out)
+    return True
 
-        if '-' in i:
-            start, ends = i.split('-')
-            if v:
-                print(start, ends)
 
-            if int(start) > int(ends):
-                print('Error: range start > end ' + i, file=sys.stderr)
-                return False
-            index = list(range(int(start), int(ends)+1))
+def get_files(paths):
+    """Get PDB files, for a directory all *.pdb files are taken."""
+    files = []
+    for p in paths:
+        if os.path.isdir(p):
+            files.extend(sorted(glob.glob(os.path.join(p, '*.pdb'))))
         else:
-            index = [int(i)]
-
-        for i in index:
-            if v:
-                print(index)
-            try:
-                atoms = struc[0][chain_curr][i]
-            except KeyError:
-                if i == chain_curr:
-                    print('Error: Chain ' + chain_curr +
-                          ' not found in the PDB structure', file=sys.stderr)
-                else:
-                    print('Error: Residue ' + chain_curr + ':' + str(i) +
-                          ' found in the PDB structure', file=sys.stderr)
-                    return False
-
-            for a in atoms:
-                # if run it for all atoms
-                if not select_atoms:
-                    if bfactor:
-                        a.set_bfactor(set_to)
-                    if occupancy:
-                        a.set_occupancy(set_to)
-                else:  # if select_atoms
-                    if '+' in select_atoms:
-                            # only for striping atom names
-                            select_atoms_list = [x.strip() for x in
-                                                 select_atoms.split('+')]
-                    else:
-                            select_atoms_list = select_atoms
-                    if a.id in select_atoms_list:
-                        if bfactor:
-                            a.set_bfactor(set_to)
-                        if occupancy:
-                            a.set_occupancy(set_to)
-
-    io = PDBIO()
-    io.set_structure(struc)
-    io.save(pdb_out)
-    print('Saved ', pdb_out)
-    return True
+            files.append(p)
+    return files
 
 
 def get_parser():
@@ -152,12 +217,14 @@ def get_parser():
                                     'e.g A:1-40,B:1-22')
     p.add_argument('--set-to', help='set value to, default is 1', default=1)
     p.add_argument('--set-not-selected-to', help='set value to, default is 0', default=0)
+    p.add_argument('--values', help='a file with per-residue values, lines <chain> <resi> <value>')
     p.add_argument('-o', '--output', help='file output')
+    p.add_argument('--outdir', help='folder for output files (for many files)')
     p.add_argument('--verbose', action='store_true', help="be verbose")
     p.add_argument('--select-atoms', help="select only given atoms"
                                           "can be only one atom, e.g. P"
                                           "or more, use \\' for prims, e.g. P+C4\\'")
-    p.add_argument('file', help='file')
+    p.add_argument('file', help='file (or files, or folders with PDB files)', nargs='+')
     return p
 
 
@@ -165,8 +232,19 @@ def get_parser():
 if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
-    if not args.output:
-        args.output = args.file.replace('.pdb', '_out.pdb')
-    edit_occupancy_of_pdb(args.select, args.file, args.output, args.bfactor, args.occupancy,
-                          float(args.set_to), float(args.set_not_selected_to),
-                          args.select_atoms, args.verbose)
+
+    residue_values = read_residue_values(args.values) if args.values else None
+    files = get_files(args.file)
+    if args.outdir and not os.path.exists(args.outdir):
+        os.makedirs(args.outdir)
+
+    for f in files:
+        if args.outdir:
+            output = os.path.join(args.outdir, os.path.basename(f))
+        elif args.output and len(files) == 1:
+            output = args.output
+        else:
+            output = f.replace('.pdb', '_out.pdb')
+        edit_occupancy_of_pdb(args.select, f, output, args.bfactor, args.occupancy,
+                              float(args.set_to), float(args.set_not_selected_to),
+                              args.select_atoms, args.verbose, residue_values)
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+
+from rna_tools.tools.rna_pdb_edit_occupancy_bfactor.rna_pdb_edit_occupancy_bfactor import \
+    edit_occupancy_of_pdb, edit_lines, get_atom_table
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+PDB = os.path.join(DIRNAME, 'test_data', '3w3s_homologymodel.pdb')
+
+
+def read(fn):
+    with open(fn) as f:
+        return f.read().splitlines()
+
+
+def test_edit_occupancy_of_pdb(tmpdir):
+    out = str(tmpdir.join('out.pdb'))
+    assert edit_occupancy_of_pdb('A:1-2', PDB, out, False, True, 10, 8, "P+C4'")
+    lines = read(out)
+    table = get_atom_table(lines)
+    occ = [float(lines[i][54:60]) for i in table.idx]
+    for chain, resi, name, o in zip(table.chains, table.resis, table.names, occ):
+        if resi <= 2 and name in ('P', "C4'"):
+            assert o == 10
+        else:
+            assert o == 8
+    # other columns and lines are not changed
+    assert [l[:54] + l[60:] for l in lines] == [l[:54] + l[60:] for l in read(PDB)]
+    # missing residues
+    assert not edit_occupancy_of_pdb('A:1-2000', PDB, out, False, True, 10, 8, None)
+
+
+def test_residue_values():
+    lines = read(PDB)
+    edit_lines(lines, 'bfactor', residue_values={'A': {1: 1.5, 3: 100.25}})
+    table = get_atom_table(lines)
+    bfactors = dict((r, lines[i][60:66]) for i, r in zip(table.idx, table.resis))
+    assert bfactors[1] == '  1.50'
+    assert bfactors[2] == '  0.00'  # not changed
+    assert bfactors[3] == '100.25'
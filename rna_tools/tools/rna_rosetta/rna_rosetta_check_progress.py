@@ -12,8 +12,6 @@ Example::
 
 """
 from __future__ import print_function
-import subprocess
-
 import os
 import pandas as pd
 import glob
@@ -25,17 +23,8 @@ try:
 except:
     print('Set up RNA_ROSETTA_RUN_ROOT_DIR_MODELING in rpt_config_local.py')
 
-from rna_tools.rna_tools_config import EASY_CAT_PATH
-# print('Set up EASY_CAT_PATH in rpt_config_local.py')
-print(EASY_CAT_PATH)
-
-
-def run_cmd(cmd):
-    o = subprocess.Popen(
-        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    out = o.stdout.read().strip().decode()
-    err = o.stderr.read().strip().decode()
-    return out, err
+from rna_tools.tools.rna_rosetta.rna_rosetta_silent import get_silent_files, get_no_decoys
+from rna_tools.tools.extra_functions.scheduler import get_scheduler, RUNNING, QUEUED
 
 
 def get_parser():
@@ -50,6 +39,7 @@ right now: \n""" + RNA_ROSETTA_RUN_ROOT_DIR_MODELING)
                         help="check only for mo folder")
     parser.add_argument('-k', '--kill', action='store_true', help="""kill (qdel) jobs if your reach
 limit (nstruc) of structure that you want, right now is %i structures""" % RNA_ROSETTA_NSTRUC)
+    parser.add_argument('--scheduler', help="sge, slurm or local (default: SCHEDULER of rna_tools_config)")
     return parser
 
 
@@ -68,6 +58,15 @@ if __name__ == '__main__':
 
     curr_path = os.getcwd()
 
+    # one query of the scheduler for all jobs (not a qstat per job)
+    scheduler = get_scheduler(args.scheduler)
+    try:
+        cluster_jobs = scheduler.jobs()
+    except Exception as e:  # e.g. no qstat on a workstation, only decoys are counted
+        print('No jobs of the queue (%s): %s' % (scheduler.name, e), file=sys.stderr)
+        cluster_jobs = []
+    to_kill = []
+
     d = {}
     d['#decoys'] = []
     d['jobs'] = []
@@ -84,99 +83,49 @@ if __name__ == '__main__':
         except:
             pass  # OSError: [Errno 20] Not a directory:
 
-        dirs = []
-
         if not args.min_only:
             # Uff.. this is crazy.
-            for c in ['_', '__', '___', 'x', 'y', 'z', 'X', 'Y', 'Z', 'o', 'out'] + ['r' + str(i) for i in range(0, 1000)]:
-                if os.path.exists(c):
-                    dirs.append(c)
-            # print ' ', j, '', dirs
-            cmd = EASY_CAT_PATH + ' ' + ' '.join(dirs)
-            if v:
-                print('cmd: %s' % cmd)
-
-            out, err = run_cmd(cmd)
-
-            if out.strip():
-                if len(j) <= 5:
-                    if v:
-                        print(out + '\t\t', end='')
-                else:
-                    if v:
-                        print(out + '\t', end='')
-                no_decoys = int(out.split()[-2])
-            else:
-                no_decoys = 0
-
-            if v:
-                print('#', no_decoys)
+            candidates = ['_', '__', '___', 'x', 'y', 'z', 'X', 'Y', 'Z', 'o', 'out'] + \
+                ['r' + str(i) for i in range(0, 1000)]
         else:
             # # of minimized
             RNA_ROSETTA_NSTRUC = 1600  # change expected !!!! pretty ugly
-            for c in ['mo']:
-                if os.path.exists(c):
-                    dirs.append(c)
-            # print ' ', j, '', dirs
-            cmd = EASY_CAT_PATH + ' ' + ' '.join(dirs)
-            if v:
-                print(cmd)
-
-            out, err = run_cmd(cmd)
-
-            if out.strip():
-                if len(j) <= 5:
-                    if v:
-                        print(out + '\t\t', end='')
-                else:
-                    if v:
-                        print(out + '\t', end='')
-                no_decoys = int(out.split()[-2])
-            else:
-                no_decoys = 0
+            candidates = ['mo']
+        # one listdir instead of a stat per candidate, decoys are counted with
+        # the (incremental) indexes of silent files, see rna_rosetta_silent.py
+        listed = set(os.listdir('.'))
+        dirs = [c for c in candidates if c in listed]
+        no_decoys = get_no_decoys(get_silent_files(dirs))
 
         if v:
             print('#', no_decoys)
 
         # check current running, only 6 char are taken from dir name
         # /home/magnus/rosetta_jobs/rp17s223 -> rp17s2199, rp17s2185
-        cmd = 'qstat | grep ' + \
-            os.path.basename(j)[:6] + ' | grep "  r  " | wc -l '
+        jobs_of_run = [x for x in cluster_jobs if os.path.basename(j)[:6] in x['name']]
+        curr = len([x for x in jobs_of_run if x['state'] == RUNNING])
         if v:
-            print(cmd)
-
-        out, err = run_cmd(cmd)
-
-        if v:
-            print('@cluster #curr ', out, end="")
-        curr = int(out)
+            print('@cluster #curr ', curr)
         d['#curr'].append(curr)
 
         # check todo
-        out, err = run_cmd('qstat | grep ' + os.path.basename(j)
-                           [:6] + ' | grep "  qw  " | wc -l ')
+        todo = len([x for x in jobs_of_run if x['state'] == QUEUED])
         if v:
-            print('#todo ', out, end="")
-
-        todo = int(out)
+            print('#todo ', todo)
         d['#todo'].append(todo)
 
         d['#decoys'].append(no_decoys)
 
         if no_decoys >= RNA_ROSETTA_NSTRUC:
             if v:
-                print('# @cluster:', out, ' < ............... OK')
+                print('# @cluster:', curr, ' < ............... OK')
             d['done'].append('[x]')
             if args.kill:
-                cmd = 'qstat | grep ' + \
-                    os.path.basename(j)[:6] + \
-                    " | awk '{print $1}' | xargs qdel "
-                print(cmd)
-                os.system(cmd)
+                to_kill += [x['id'] for x in jobs_of_run]
         else:
             d['done'].append('[ ]')
             if v:
-                print('# @cluster:', out)
+                print('# @cluster:', curr)
             # cmd = 'kill '
             # print cmd
 
@@ -185,7 +134,9 @@ if __name__ == '__main__':
     df = pd.DataFrame(d, columns=['jobs', '#curr', '#todo', '#decoys', 'done'])
     print(df)
 
-    out, err = run_cmd('qstat | grep magnus  | grep "  r  " | wc -l ')
-    print('#curr ', out, end="")
-    out, err = run_cmd('qstat | grep magnus | grep "  qw  " | wc -l ')
-    print('#todo ', out)
+    if to_kill:
+        print('kill (%s) %i jobs' % (scheduler.name, len(to_kill)))
+        scheduler.cancel(to_kill)
+
+    print('#curr ', len([x for x in cluster_jobs if x['state'] == RUNNING]), end=" ")
+    print('#todo ', len([x for x in cluster_jobs if x['state'] == QUEUED]))
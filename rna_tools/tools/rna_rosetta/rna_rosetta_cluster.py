@@ -10,6 +10,13 @@ http://www.sciencedirect.com/science/article/pii/S0076687914000524
     rna_rosetta_cluster.py ade_min.out 20000
 
 Take n * 0.005 (.5%) of all frames and put them into `selected.out`. Then the tool clusters this `selected.out`.
+
+Structures of `selected.out` are extracted to PDB files and clustered in-process (see
+rna_tools/tools/rna_cluster/rna_cluster.py): the matrix of RMSDs is computed once (and saved to
+`selected_rmsd.txt`), and the radius for which the first cluster has more than 16% of structures
+is found with a binary search (instead of running the Rosetta `cluster` for every radius).
+Structures of clusters are saved as `c.<cluster>.<structure>.pdb` (`c.0.0.pdb` is the centre of
+the biggest cluster) and clusters to `clusters.txt`.
 """
 from __future__ import print_function
 import platform
@@ -20,6 +27,10 @@ import math
 import logging
 import shutil
 import time
+
+from rna_tools.tools.rna_cluster.rna_cluster import load_coords, get_rmsd_matrix, find_radius, \
+    cluster, save_clusters, save_matrix
+from rna_tools.tools.rna_rosetta.rna_rosetta_silent import SilentFile
 #limit_clusters = 1  # if you want to change this, then rewrite procedure of stopping!
 
 logging.basicConfig(level=logging.INFO)
@@ -31,95 +42,66 @@ def get_parser():
     parser.add_argument('--no_select', action='store_true',
                         help="Don't run selection once again. Use selected.out in the current folder")
     parser.add_argument('--radius-inc-step', type=float, default=0.5,
-                        help="radius incremental step, default 0.5")
-    parser.add_argument('--limit-clusters', default=5,
+                        help="precision of the radius (found with a binary search), default 0.5")
+    parser.add_argument('--limit-clusters', default=5, type=int,
                         help="# of clusters")
     parser.add_argument('file', help='ade.out')
     parser.add_argument('n', type=int, help='# of total structures')
     return parser
 
 
-def get_no_structures_in_first_cluster(fn):
-    """Get # of structures in a silent file.
+def get_tags(fn):
+    """Get tags (names) of structures in a silent file.
 
     Args:
          fn (string): a filename to a silent file
 
     Returns
-         int: # of structures in a silent file"""
-    p = subprocess.Popen('grep SCORE ' + fn + ' | grep c.0 | wc -l', shell=True,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    p.wait()
-    stderr = p.stderr.read().strip()
-    if stderr:
-        print(stderr)
-    return int(p.stdout.read().strip())
+         list: tags, in the order of the file"""
+    return SilentFile(fn).tags
 
 
 def get_selected(file, nc):
-    """Get selected for clustering"""
-    cmd = 'silent_file_sort_and_select.py ' + file + ' -select 1-' + str(nc) + ' -o selected.out'
-    logging.info(cmd)
-    p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    p.wait()
-    stderr = p.stderr.read().strip()
-    if stderr:
-        print(stderr)
-
-
-def cluster(radius, limit_clusters):
-    """Internal function of cluster_loop: It removes cluster.out first."""
-    try:
-        os.remove("cluster.out")
-    except OSError:
-        pass
-
-    if platform.system() == "Darwin":
-        cmd = 'cluster.macosclangrelease'
-    if platform.system() == "Linux":
-        cmd = "cluster.default.linuxgccrelease"
-    cmd += " -in:file:silent selected.out -in:file:fullatom -out:file:silent_struct_type binary -export_only_low false -out:file:silent cluster.out -cluster:limit_clusters " + str(limit_clusters) + " -cluster:radius " + str(radius)
-
-    #'-out:prefix ade_ "#| tee clustering.out"
-    logging.info(cmd)
-    os.system(cmd)
-    #p = subprocess.Popen(cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    # p.wait()
-    #stderr = p.stderr.read().strip()
-    # if stderr:
-    #    print stderr
-
-
-def extract():
-    #cmd = "~/src/rna-pdb-tools/rna_tools/utils/rna_rosetta/rna_extract_lowscore_decoys.py cluster0.out 5"
-    if platform.system() == "Darwin":
-        cmd = 'extract_pdbs.default.macosclangrelease -in::file::silent cluster.out'
-    if platform.system() == "Linux":
-        cmd = 'extract_pdbs.default.linuxgccrelease -in::file::silent cluster.out'
-    os.system(cmd)
-
-
-def cluster_loop(ns, radius_inc_step, limit_clusters):
-    """Go from radius 1 to get 1/6 of structures of ns (# of selected structures)
-    in the first cluster, then it stops."""
-    radius = 1  # should be 1
-    while 1:
-        cluster(radius, limit_clusters)
-        ns1 = get_no_structures_in_first_cluster('cluster.out')
-        print('%i in #1 cluster %i from the total number of structures' % (ns1, ns))
-        if ns1 > ns * .16:  # 1/6
-            break
-        radius += radius_inc_step
-    logging.info('radius %i ; %i in #1 cluster %i from the total number of structures' % (radius, ns1, ns))
-    return radius, ns1
+    """Get selected for clustering, nc structures of the lowest scores go to selected.out
+    (as silent_file_sort_and_select.py of Rosetta, see rna_rosetta_silent.py)."""
+    s = SilentFile(file)
+    s.write('selected.out', s.top(nc))
+    logging.info('%i of %i structures of %s selected to selected.out' % (min(nc, len(s)), len(s), file))
+
+
+def extract(fn='selected.out'):
+    """Extract structures of a silent file to PDB files (<tag>.pdb), see rna_rosetta_silent.py."""
+    SilentFile(fn).extract()
+
+
+def cluster_loop(files, radius_inc_step, limit_clusters, fraction=.16):
+    """Find the radius to get 1/6 (16%) of structures in the first cluster and cluster files.
+
+    RMSDs are calculated once, the radius is found with a binary search (with the precision
+    of radius_inc_step), structures are clustered as with the Rosetta `cluster` (structures
+    taken in order of the silent file, sorted by score, see rna_cluster.cluster(), leader).
+
+    Returns:
+        radius, # of structures in the first cluster, clusters (indexes of files)"""
+    matrix = get_rmsd_matrix(load_coords(files))
+    save_matrix('selected_rmsd.txt', files, matrix)
+    radius = find_radius(matrix, fraction, 'leader', radius_inc_step)
+    clusters = cluster(matrix, radius, 'leader', limit_clusters)
+    ns1 = len(clusters[0])
+    logging.info('radius %.2f ; %i in #1 cluster %i from the total number of structures' % (radius, ns1, len(files)))
+    return radius, ns1, clusters
+
+
+def save_cluster_files(clusters, files):
+    """Save structures of clusters as c.<cluster>.<structure>.pdb (as extracted from cluster.out of Rosetta)."""
+    for i, c in enumerate(clusters):
+        for j, k in enumerate(c):
+            shutil.copy(files[k], 'c.%i.%i.pdb' % (i, j))
+
 
 def get_no_structures(file):
-    p = subprocess.Popen('cat ' + file + ' | grep SCORE | wc -l', shell=True,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stderr = p.stderr.read().strip()
-    if stderr:
-        print(stderr)
-    return int(p.stdout.read().strip()) - 1
+    """Get # of structures in a silent file."""
+    return len(SilentFile(file))
 
 
 def run():
@@ -137,10 +119,15 @@ def run():
         ns = get_no_structures('selected.out')
         print('# selected:', ns)
 
-    ns = get_no_structures('selected.out')
+    tags = get_tags('selected.out')
+    files = [t + '.pdb' for t in tags]
+    if not all([os.path.exists(f) for f in files]):
+        extract('selected.out')
+    ns = len(files)
 
-    radius, ns1 = cluster_loop(ns, args.radius_inc_step, args.limit_clusters)  # loop over selected to get 1/6 in the biggest cluster
-    extract()
+    radius, ns1, clusters = cluster_loop(files, args.radius_inc_step, args.limit_clusters)  # 1/6 in the biggest cluster
+    save_clusters('clusters.txt', clusters, files, radius)
+    save_cluster_files(clusters, files)
 
     print("# of structures in the biggest cluster", ns1)
     logging.info('radius %f, step %f ; %i in #1 cluster %i from the total number of structures' % (radius, args.radius_inc_step, ns1, ns))
@@ -41,20 +41,18 @@ import logging
 import shutil
 import re
 
+from rna_tools.tools.rna_rosetta.rna_rosetta_silent import SilentFile
+from rna_tools.tools.rna_rosetta.rna_rosetta_run import go as submit
+
 
 def get_no_structures(file):
-    """Get a number of structures in a silent file"""
-    p = subprocess.Popen('cat ' + file + ' | grep SCORE | wc -l', shell=True,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    p.wait()
-    stderr = p.stderr.read().strip()
-    if stderr:
-        print(stderr)
-    return int(p.stdout.read().strip()) - 1
+    """Get a number of structures in a silent file (indexed, see rna_rosetta_silent.py)"""
+    return len(SilentFile(file))
 
 
-def min(silent_file, take_n, cpus, go):
-    """Run parallel_min_setup (to MINIMIZE file), rosetta_submit.py, and qsubMINI.
+def min(silent_file, take_n, cpus, go, scheduler=None):
+    """Run parallel_min_setup (to MINIMIZE file), rosetta_submit.py, and submit qsubMINI
+    (with the scheduler, sge, slurm or local).
 
     Fix on the way, qsub files::
 
@@ -107,8 +105,7 @@ def min(silent_file, take_n, cpus, go):
     if go:
         # run qsubMINI
         logging.info('qsubMINI')
-        os.system('chmod +x ./qsubMINI')
-        os.system('./qsubMINI')
+        submit(scheduler)
 
 
 def get_parser():
@@ -117,6 +114,7 @@ def get_parser():
     parser.add_argument('file', help='ade.out')
     parser.add_argument('-g', '--go', action='store_true')
     parser.add_argument('-c', '--cpus', help='default: 200', default=200)
+    parser.add_argument('--scheduler', help="sge, slurm or local (default: SCHEDULER of rna_tools_config)")
     return parser
 
 
@@ -125,7 +123,7 @@ def run():
     ns = get_no_structures(args.file)
     print('# structures:', ns)
     take_n = int(ns * 0.16)  # 1/6
-    min(args.file, take_n, int(args.cpus), args.go)
+    min(args.file, take_n, int(args.cpus), args.go, args.scheduler)
 
 
 # main
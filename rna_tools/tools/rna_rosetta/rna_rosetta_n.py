@@ -9,9 +9,10 @@ Example::
 
 """
 from __future__ import print_function
-import subprocess
 import argparse
 
+from rna_tools.tools.rna_rosetta.rna_rosetta_silent import SilentFile
+
 
 def get_parser():
     parser = argparse.ArgumentParser(
@@ -22,12 +23,8 @@ def get_parser():
 
 
 def get_no_structures(file):
-    p = subprocess.Popen('cat ' + file + ' | grep SCORE | wc -l', shell=True,
-                         stdout=subprocess.PIPE, stderr=subprocess.PIPE)
-    stderr = p.stderr.read().strip()
-    if stderr:
-        print(stderr)
-    return int(p.stdout.read().strip()) - 1
+    """Get a number of structures in a silent file (indexed, see rna_rosetta_silent.py)"""
+    return len(SilentFile(file))
 
 
 def run():
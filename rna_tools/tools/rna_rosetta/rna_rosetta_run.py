@@ -83,6 +83,8 @@ import math
 import os
 import sys
 
+from rna_tools.tools.extra_functions.scheduler import LocalScheduler, get_scheduler, FAILED
+
 try:
     from rna_tools.rna_tools_config import RNA_ROSETTA_RUN_ROOT_DIR_MODELING
 except:
@@ -113,6 +115,8 @@ def get_parser():
     parser.add_argument('-c', '--cpus', help='# of cpus to be used', default=200,
                         type=int)
 
+    parser.add_argument('--scheduler', help="sge, slurm or local (default: SCHEDULER of rna_tools_config)")
+
     parser.add_argument('--sandbox', help="where to run it (default: RNA_ROSETTA_RUN_ROOT_DIR_MODELING",
                         default=RNA_ROSETTA_RUN_ROOT_DIR_MODELING)
 
@@ -167,7 +171,7 @@ def prepare_folder(args, header, seq, ss, path):
 def prepare_helices():
     """Make helices(wrapper around 'helix_preassemble_setup.py')
 
-    .. warning:: I think multiprocessing of helixX.run does not work."""
+    Helix runs (helixX.RUN) are run in parallel on this machine, see LocalScheduler."""
     # run helix_p..
     cmd = 'helix_preassemble_setup.py -secstruct ss.fa -fasta seq.fa'
     os.system(cmd)
@@ -176,30 +180,13 @@ def prepare_helices():
     helix_runs = glob.glob('*RUN')
     print(helix_runs)
 
-    f = open('HRUNS', 'w')
-    for h in helix_runs:
-        f.write(open(h).read().strip() + ' & \n')
-    f.close()
-
-    # does not work (!)
-    # os.system('chmod +x CMDLINES')
-    # os.system('./CMDLINES')
-    # ./CMDLINES: 2: source: not found
-
-    # os.system runs multiprocessing, but does not wait for the rest of the program
-    # hmm... it does not wait because I used & ???
-    # this works in multirpocessing mode but it does not wait for `-r` !!! so if your run -e only it's OK.
-    # don't combile -e with -r because making helices will not wait to run -r (!) and  you will get an error
-    # and only helices made and then the program will finish
-    if False:
-        os.system('bash HRUNS')
-    else:
-        p = subprocess.Popen(open('HRUNS').read(),
-                             shell=True, stderr=subprocess.PIPE)
-        p.wait()
-        stderr = p.stderr.read().strip()
-        if stderr:
-            print(stderr)
+    # helices are run in a local pool (CPUS_CLUSTER at most), and waited for, so -e can be
+    # combined with -r
+    scheduler = LocalScheduler()
+    ids = [scheduler.submit(open(h).read().strip(), name=h) for h in helix_runs]
+    for id, state in scheduler.collect(ids).items():
+        if state == FAILED:
+            print(scheduler.get_output(id))
 
 
 def prepare_rosetta(header, cpus, motif, nstruc):
@@ -239,10 +226,13 @@ def prepare_rosetta(header, cpus, motif, nstruc):
     os.system(cmd)
 
 
-def go():
-    """send jobs to a cluster(run qsubMINI)"""
-    os.system('chmod +x ./qsubMINI')
-    os.system('./qsubMINI')
+def go(scheduler=None):
+    """send jobs to a cluster (job scripts of qsubMINI, with --scheduler)"""
+    scheduler = get_scheduler(scheduler)
+    ids = scheduler.submit_scripts('qsubMINI')
+    print('# jobs submitted:', len(ids))
+    if isinstance(scheduler, LocalScheduler):  # wait for jobs run on this machine
+        scheduler.collect(ids)
 
 
 def main():
@@ -281,7 +271,7 @@ def main():
         if args.rosetta:
             prepare_rosetta(header, cpus, args.motif, args.nstruc)
         if args.go:
-            go()
+            go(args.scheduler)
 
         os.chdir(curr)
 
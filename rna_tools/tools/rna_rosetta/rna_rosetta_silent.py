@@ -0,0 +1,425 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+"""rna_rosetta_silent.py - read (binary) silent files of Rosetta without Rosetta.
+
+A silent file is indexed once, tags of decoys with offsets of their records (in bytes) and
+columns of SCORE lines (a NumPy record array) are saved next to the file
+(``<silent file>.index.npz``). When the file grows (Rosetta jobs still running), only the new
+part is read. With the index:
+
+- # of decoys, scores and top-K decoys by a score are taken without reading the file,
+- a decoy is read with one seek, its coordinates are decoded (the binary format of Rosetta)
+  and saved in the PDB format (instead of ``extract_pdbs``).
+
+Examples::
+
+    $ rna_rosetta_silent.py ade.out
+    # of decoys: 21594
+    $ rna_rosetta_silent.py ade.out --top 3
+    S_000123_5 -532.112
+    S_000321_1 -530.876
+    S_000005_3 -529.004
+    $ rna_rosetta_silent.py ade.out --top 100 --extract  # S_000123_5.pdb ...
+    $ rna_rosetta_silent.py ade.out --top 100 -o selected.out  # a silent file of the top 100
+
+Only RNA (rA, rC, rG, rU, with cutpoint and virtual phosphate variants) can be decoded.
+"""
+from __future__ import print_function
+
+import argparse
+import glob
+import hashlib
+import os
+import re
+
+import numpy as np
+
+from rna_tools.rna_mmcif import AtomTable, to_pdb_lines
+
+# atoms of residues in the order of Rosetta (rna_phenix), heavy atoms of the backbone, then
+# of the side chain (O2' and the base) and hydrogens
+BACKBONE = ['P', 'OP2', 'OP1', "O5'", "C5'", "C4'", "O4'", "C3'", "O3'", "C1'", "C2'"]
+SIDECHAIN = {
+    'a': ['N1', 'C2', 'N3', 'C4', 'C5', 'C6', 'N6', 'N7', 'C8', 'N9'],
+    'c': ['N1', 'C2', 'O2', 'N3', 'C4', 'N4', 'C5', 'C6'],
+    'g': ['N1', 'C2', 'N2', 'N3', 'C4', 'C5', 'C6', 'O6', 'N7', 'C8', 'N9'],
+    'u': ['N1', 'C2', 'O2', 'N3', 'C4', 'O4', 'C5', 'C6'],
+}
+SUGAR_HYDROGENS = ["H5'", "H5''", "H4'", "H3'", "H1'", "H2'", "HO2'"]
+BASE_HYDROGENS = {
+    'a': ['H2', 'H61', 'H62', 'H8'],
+    'c': ['H42', 'H41', 'H5', 'H6'],
+    'g': ['H1', 'H22', 'H21', 'H8'],
+    'u': ['H3', 'H5', 'H6'],
+}
+# virtual atoms of variants (added after the backbone), and atoms made virtual
+VARIANT_ATOMS = {'rna_cutpoint_lower': ['OVL1', 'OVL2'], 'rna_cutpoint_upper': ['OVU1']}
+VIRTUAL = {'Virtual_Phosphate': ['P', 'OP2', 'OP1']}
+
+CODE = 'ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789+/'
+DECODE = np.full(256, 63, dtype=np.uint8)
+DECODE[np.frombuffer(CODE.encode(), dtype=np.uint8)] = np.arange(64, dtype=np.uint8)
+KEYWORDS = ('SCORE:', 'SEQUENCE:', 'ANNOTATED_SEQUENCE:', 'REMARK', 'FOLD_TREE', 'RT', 'RES_NUM',
+            'JUMP', 'CHAIN_ENDINGS')
+
+
+def decode(text):
+    """Decode coordinates (a residue line of a binary silent file, without the first character).
+
+    Every 4 characters are 3 bytes (6 bits per character), the bytes are float32 (x, y, z of
+    atoms).
+
+    Returns:
+        np.array (n x 3, float)
+
+    >>> decode('AAAIABAAAAAAAAAAAAAo/CAAABEAAAwP').tolist()
+    [[2.5, 0.0, 0.0], [-1.25, 3.0, 0.5]]
+    """
+    c = DECODE[np.frombuffer(text.encode(), dtype=np.uint8)]
+    c = np.concatenate([c, np.zeros(-len(c) % 4, dtype=np.uint8)]).reshape(-1, 4)
+    b = np.empty((len(c), 3), dtype=np.uint8)
+    b[:, 0] = (c[:, 0] & 0x3f) | ((c[:, 1] & 0x03) << 6)
+    b[:, 1] = ((c[:, 1] & 0x3c) >> 2) | ((c[:, 2] & 0x0f) << 4)
+    b[:, 2] = ((c[:, 2] & 0x30) >> 4) | ((c[:, 3] & 0x3f) << 2)
+    b = b.ravel()
+    n = len(b) // 12
+    return np.frombuffer(b[:n * 12].tobytes(), dtype='<f4').reshape(n, 3).astype(float)
+
+
+def get_atom_names(residue, variants=()):
+    """Get names of atoms of a residue (a, c, g, u) of Rosetta, with virtual atoms of variants.
+
+    >>> get_atom_names('u', ['rna_cutpoint_upper'])[10:13]
+    ["C2'", 'OVU1', "O2'"]
+    """
+    if residue not in SIDECHAIN:
+        raise Exception('Residue %s can not be decoded (only RNA: a, c, g, u)' % residue)
+    names = list(BACKBONE)
+    for v in variants:
+        names += VARIANT_ATOMS.get(v, [])
+    return names + ["O2'"] + SIDECHAIN[residue] + SUGAR_HYDROGENS + BASE_HYDROGENS[residue]
+
+
+def parse_annotated_sequence(seq):
+    """Get residues and their variants of an annotated sequence.
+
+    >>> parse_annotated_sequence('a[RAD:LowerRNA:Virtual_Phosphate]gc[RCY:rna_cutpoint_lower]')
+    [('a', ['LowerRNA', 'Virtual_Phosphate']), ('g', []), ('c', ['rna_cutpoint_lower'])]
+    """
+    return [(r, v.split(':')[1:] if v else []) for r, v in re.findall(r'(\w)(?:\[([^\]]*)\])?', seq)]
+
+
+def parse_res_num(tokens):
+    """Get (chain, resi) of residues of a RES_NUM line, e.g. ``A:1-3 B:5``.
+
+    >>> parse_res_num(['A:1-3', 'B:5'])
+    [('A', 1), ('A', 2), ('A', 3), ('B', 5)]
+    """
+    res = []
+    for t in tokens:
+        chain, rng = t.split(':') if ':' in t else ('A', t)
+        start, end = re.match(r'(-?\d+)(?:-(-?\d+))?$', rng).groups()
+        res.extend([(chain, i) for i in range(int(start), int(end or start) + 1)])
+    return res
+
+
+class SilentFile(object):
+    """A silent file with the index of decoys.
+
+    Args:
+        fn (str): a silent file
+        index_fn (str): the index, by default ``<fn>.index.npz``, None not to save it
+        update (bool): index the new part of the file (if the file grew)
+
+    Attributes:
+        tags (list): tags of decoys, in the order of the file
+        offsets (np.array): offsets (bytes) of records of decoys
+        columns (list): names of columns of scores
+        sequence (str): the sequence (SEQUENCE:)
+    """
+    def __init__(self, fn, index_fn='', update=True):
+        self.fn = fn
+        self.index_fn = fn + '.index.npz' if index_fn == '' else index_fn
+        self._reset()
+        if self.index_fn and os.path.exists(self.index_fn):
+            self._load()
+        if update:
+            self.update()
+
+    def _reset(self):
+        self.tags = []
+        self.offsets = np.zeros(0, dtype=np.int64)
+        self.headers = []  # SCORE: lines with names of columns
+        self.header_ids = np.zeros(0, dtype=np.int16)  # the header of every decoy
+        self.columns = []
+        self._scores = {}  # column -> np.array
+        self.sequence = ''
+        self.binary = False
+        self.size = 0  # bytes indexed
+        self.tail = ''  # sha1 of the end of the indexed part
+        self._index = None
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __contains__(self, tag):
+        return tag in self.index
+
+    @property
+    def index(self):
+        """A dict tag -> index of a decoy."""
+        if self._index is None:
+            self._index = dict((t, i) for i, t in enumerate(self.tags))
+        return self._index
+
+    @property
+    def scores(self):
+        """Scores of decoys (np.recarray, a field for every column, nan if not given)."""
+        dtype = [(str(c), float) for c in self.columns]
+        scores = np.recarray(len(self), dtype=dtype)
+        for c in self.columns:
+            scores[c] = self._scores[c]
+        return scores
+
+    def _get_tail(self, f, size):
+        f.seek(max(0, size - 4096))
+        return hashlib.sha1(f.read(size - max(0, size - 4096))).hexdigest()
+
+    def _load(self):
+        data = np.load(self.index_fn)
+        self.tags = data['tags'].tolist()
+        self.offsets = data['offsets']
+        self.headers = data['headers'].tolist()
+        self.header_ids = data['header_ids']
+        scores = data['scores']
+        self.columns = list(scores.dtype.names or [])
+        self._scores = dict((c, scores[c]) for c in self.columns)
+        self.sequence = str(data['sequence'])
+        self.binary = bool(data['binary'])
+        self.size = int(data['size'])
+        self.tail = str(data['tail'])
+
+    def save(self):
+        """Save the index (to a temporary file first)."""
+        tmp = self.index_fn + '.tmp%i.npz' % os.getpid()
+        np.savez(tmp, tags=np.array(self.tags, dtype=str), offsets=self.offsets,
+                 headers=np.array(self.headers, dtype=str), header_ids=self.header_ids,
+                 scores=np.asarray(self.scores), sequence=self.sequence, binary=self.binary,
+                 size=self.size, tail=self.tail)
+        os.rename(tmp, self.index_fn)
+
+    def update(self):
+        """Index the file, only the new part if it grew (or all if it changed).
+
+        Returns:
+            int: # of new decoys
+        """
+        size = os.path.getsize(self.fn)
+        with open(self.fn, 'rb') as f:
+            if self.size and (size < self.size or self._get_tail(f, self.size) != self.tail):
+                self._reset()  # the file changed (not only grew), index it again
+            if size == self.size:
+                return 0
+            f.seek(self.size)
+            pos = self.size
+            tags, offsets, header_ids, rows = [], [], [], []
+            header = len(self.headers) - 1
+            for line in f:
+                if not line.endswith(b'\n'):  # being written, index it next time
+                    break
+                if line.startswith(b'SCORE:'):
+                    values = line.decode().split()[1:]
+                    if values[-1] == 'description':
+                        self.headers.append(line.decode().rstrip('\n'))
+                        header += 1
+                        for c in values[:-1]:
+                            if c not in self.columns:
+                                self.columns.append(c)
+                                self._scores[c] = np.full(len(self), np.nan)
+                    else:
+                        tags.append(values[-1])
+                        offsets.append(pos)
+                        header_ids.append(header)
+                        rows.append(values[:-1])
+                elif line.startswith(b'SEQUENCE:') and not self.sequence:
+                    self.sequence = line.decode().split()[1]
+                elif line.startswith(b'REMARK BINARY'):
+                    self.binary = True
+                pos += len(line)
+            self.size = pos
+            self.tail = self._get_tail(f, pos)
+
+        for c in self.columns:
+            self._scores[c] = np.concatenate([self._scores[c], np.full(len(tags), np.nan)])
+        header_columns = [h.split()[1:-1] for h in self.headers] + [[]]  # [-1], no header
+        n = len(self)
+        for i, (h, row) in enumerate(zip(header_ids, rows)):
+            for c, v in zip(header_columns[h], row):
+                try:
+                    self._scores[c][n + i] = float(v)
+                except ValueError:
+                    pass
+        self.tags.extend(tags)
+        self.offsets = np.concatenate([self.offsets, np.array(offsets, dtype=np.int64)])
+        self.header_ids = np.concatenate([self.header_ids, np.array(header_ids, dtype=np.int16)])
+        self._index = None
+        if self.index_fn:
+            self.save()
+        return len(tags)
+
+    def get_scores(self, column='score'):
+        """Get scores (np.array) of a column of all decoys."""
+        if column not in self._scores:
+            raise Exception('No column %s in %s (columns: %s)' % (column, self.fn, ' '.join(self.columns)))
+        return self._scores[column]
+
+    def top(self, k, column='score'):
+        """Get tags of k decoys of the lowest scores (column), sorted by the score."""
+        scores = self.get_scores(column)
+        scores = np.where(np.isnan(scores), np.inf, scores)
+        k = min(k, len(scores))
+        idx = np.argpartition(scores, k - 1)[:k] if 0 < k < len(scores) else np.arange(len(scores))[:k]
+        idx = idx[np.argsort(scores[idx], kind='stable')]
+        return [self.tags[i] for i in idx]
+
+    def get_record(self, tag):
+        """Get lines (text) of a decoy."""
+        i = self.index[tag]
+        end = self.offsets[i + 1] if i + 1 < len(self.offsets) else self.size
+        with open(self.fn, 'rb') as f:
+            f.seek(self.offsets[i])
+            return f.read(end - self.offsets[i]).decode()
+
+    def get_residues(self, tag):
+        """Decode a decoy.
+
+        Returns:
+            list of (residue, variants, coords (n x 3)), residues in the order of the sequence,
+            and a list of (chain, resi) of residues
+        """
+        if not self.binary:
+            raise Exception('%s is not a binary silent file, it can not be decoded' % self.fn)
+        seq = [(r, []) for r in self.sequence]
+        res_num = []
+        coords = []
+        for l in self.get_record(tag).splitlines()[1:]:
+            values = l.split()
+            if l.startswith('ANNOTATED_SEQUENCE:'):
+                seq = parse_annotated_sequence(values[1])
+            elif l.startswith('RES_NUM'):
+                res_num += parse_res_num(values[1:-1])
+            elif len(values) == 2 and not l.startswith(KEYWORDS):
+                coords.append(decode(values[0][1:]))  # the 1st character, secondary structure
+        if len(coords) != len(seq):
+            raise Exception('%s: %i residues decoded, the sequence has %i' % (tag, len(coords), len(seq)))
+        if len(res_num) != len(seq):
+            res_num = [('A', i) for i in range(1, len(seq) + 1)]
+        return [(r, v, c) for (r, v), c in zip(seq, coords)], res_num
+
+    def get_table(self, tag):
+        """Get atoms (AtomTable, see rna_mmcif.py) of a decoy, without virtual atoms."""
+        residues, res_num = self.get_residues(tag)
+        rows = []
+        for (r, variants, coords), (chain, resi) in zip(residues, res_num):
+            names = get_atom_names(r, variants)
+            if len(names) != len(coords):
+                raise Exception('%s: residue %s%i %s has %i atoms, expected %i (unknown variant?)' %
+                                (tag, r, resi, ':'.join(variants), len(coords), len(names)))
+            virtual = set(sum([VIRTUAL.get(v, []) for v in variants], []))
+            for name, xyz in zip(names, coords.tolist()):
+                if name not in virtual and not name.startswith('OV'):
+                    rows.append((name, r.upper(), chain, resi, xyz))
+        n = len(rows)
+        names, resnames, chains, resis, coords = zip(*rows)
+        return AtomTable(np.array(['ATOM'] * n), np.arange(1, n + 1), np.array(names),
+                         np.array([''] * n), np.array(resnames), np.array(chains),
+                         np.array(resis, dtype=int), np.array([''] * n), np.array(coords),
+                         np.ones(n), np.zeros(n), np.array([nm[0] for nm in names]),
+                         np.ones(n, dtype=int))
+
+    def get_coords(self, tag):
+        """Get coordinates (n x 3) of atoms of a decoy (see get_table())."""
+        return self.get_table(tag).coords
+
+    def get_pdb_lines(self, tag):
+        """Get lines of a decoy in the PDB format."""
+        table = self.get_table(tag)
+        lines = to_pdb_lines(table)
+        # TER after every chain
+        out = []
+        for i, l in enumerate(lines):
+            out.append(l)
+            if i + 1 == len(lines) or table.chains[i + 1] != table.chains[i]:
+                out.append('TER')
+        return out + ['END']
+
+    def extract(self, tags=None, directory='.'):
+        """Save decoys (all by default) as PDB files (<tag>.pdb).
+
+        Returns:
+            list: files
+        """
+        files = []
+        for tag in self.tags if tags is None else tags:
+            fn = os.path.join(directory, tag + '.pdb')
+            with open(fn, 'w') as f:
+                f.write('\n'.join(self.get_pdb_lines(tag)) + '\n')
+            files.append(fn)
+        return files
+
+    def write(self, fn, tags):
+        """Save decoys to a new silent file."""
+        with open(fn, 'w') as f:
+            if self.sequence:
+                f.write('SEQUENCE: %s\n' % self.sequence)
+            header = None
+            for tag in tags:
+                h = self.header_ids[self.index[tag]]
+                if h != header and h >= 0:
+                    f.write(self.headers[h] + '\n')
+                    if header is None and self.binary:
+                        f.write('REMARK BINARY SILENTFILE\n')
+                    header = h
+                f.write(self.get_record(tag))
+
+
+def get_silent_files(dirs):
+    """Get silent files (``*.out``) of folders (and their subfolders, e.g. ``out/1/ade.out``)."""
+    files = []
+    for d in dirs:
+        files += sorted(glob.glob(os.path.join(d, '*.out')) + glob.glob(os.path.join(d, '*', '*.out')))
+    return files
+
+
+def get_no_decoys(files):
+    """Get # of decoys in silent files (indexed, see SilentFile)."""
+    return sum([len(SilentFile(f)) for f in files])
+
+
+def get_parser():
+    parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('-t', '--top', type=int, help="take top decoys (the lowest scores)")
+    parser.add_argument('-c', '--column', default='score', help="a column of scores for --top")
+    parser.add_argument('-x', '--extract', action='store_true', help="save decoys as PDB files")
+    parser.add_argument('-o', '--output', help="save decoys to a silent file")
+    parser.add_argument('--tags', nargs='+', help="take these decoys")
+    parser.add_argument('file', help="a silent file")
+    return parser
+
+
+if __name__ == '__main__':
+    args = get_parser().parse_args()
+    s = SilentFile(args.file)
+    tags = args.tags or (s.top(args.top, args.column) if args.top else None)
+    if args.extract:
+        for fn in s.extract(tags):
+            print(fn)
+    elif args.output:
+        s.write(args.output, tags or s.tags)
+    elif tags:
+        scores = s.get_scores(args.column)
+        for t in tags:
+            print(t, scores[s.index[t]])
+    else:
+        print('# of decoys:', len(s))
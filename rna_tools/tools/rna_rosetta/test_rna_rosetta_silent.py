@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+import os
+import shutil
+
+import numpy as np
+
+from rna_tools.tools.rna_rosetta.rna_rosetta_silent import SilentFile, get_silent_files, \
+    get_no_decoys
+
+PATH = os.path.dirname(os.path.abspath(__file__))
+
+
+def test_index_and_decode(tmpdir):
+    fn = str(tmpdir.join('selected.out'))
+    shutil.copy(os.path.join(PATH, 'test_data', 'selected.out'), fn)
+    s = SilentFile(fn)
+    assert len(s) == 5 and os.path.exists(fn + '.index.npz')
+    scores = s.get_scores()
+    assert s.top(2) == [s.tags[i] for i in np.argsort(scores)[:2]]
+
+    t = s.get_table(s.tags[0])
+    o3 = t.coords[t.names == "O3'"]
+    p = t.coords[t.names == 'P']  # w/o virtual phosphates
+    d = np.linalg.norm(p[:, None] - o3[None], axis=2).min(axis=1)
+    assert ((d > 1.4) & (d < 1.8)).all()  # backbone of the decoded decoy is connected
+
+    out = str(tmpdir.join('top.out'))
+    s.write(out, s.top(2))
+    s2 = SilentFile(out)
+    assert s2.tags == s.top(2)
+    assert s2.get_pdb_lines(s2.tags[0]) == s.get_pdb_lines(s2.tags[0])
+
+    s.extract(s.top(1), str(tmpdir))
+    assert os.path.exists(str(tmpdir.join(s.top(1)[0] + '.pdb')))
+
+
+def test_incremental(tmpdir):
+    with open(os.path.join(PATH, 'test_data', 'selected.out')) as f:
+        lines = f.readlines()
+    # the second decoy starts at its SCORE line
+    starts = [i for i, l in enumerate(lines) if l.startswith('SCORE:') and 'description' not in l]
+    fn = str(tmpdir.join('ade.out'))
+    with open(fn, 'w') as f:
+        f.writelines(lines[:starts[1]])
+    assert len(SilentFile(fn)) == 1
+    with open(fn, 'a') as f:
+        f.writelines(lines[starts[1]:])
+    assert len(SilentFile(fn)) == 5
+    assert get_no_decoys(get_silent_files([str(tmpdir)])) == 5
@@ -5,15 +5,26 @@ Parse to BLASTn tabular output format 6 to get sequences in fasta format from da
 BLASTn tabular output format 6 - Column headers:
 qseqid **sseqid** pident length mismatch gapopen **qstart** **qend** sstart send evalue bitscore
 
+Hits are kept in a dictionary (sseqid -> list of ranges), so the database is read only once
+and every range of every hit is saved (a subject with many hits gives many sequences,
+named ``<sseqid>/<start>-<end>``). Sequences are written one by one, as soon as they are found.
+
+For big databases use ``--index``: an index of the fasta file (``<db>.fai``, the same format as of
+``samtools faidx``) is built once (or an existing one is used) and only the hit sequences are read
+from the database.
+
 author: A. Zyla - azyla
 
 .. warning:: Tested only on fasta files! and requires Biopython (tested with v1.68)
 """
-
+from __future__ import print_function
 
 import logging
 import argparse
+import os
+from collections import OrderedDict
 from Bio.SeqRecord import SeqRecord
+from Bio.Seq import Seq
 from Bio import SeqIO
 import warnings
 # logger
@@ -30,29 +41,31 @@ def get_headers(blastn_out6):
     headers_list = []
     seq_start_list = []
     seq_end_list = []
-    param_list = []
 
     for line in blastn_out6:
         new_line = line.split('\t')
-        #print new_line
         headers_list.append(new_line[1])
-        headers_list = list(headers_list)  # you can put a list(set(headers_list)) to remove duplicates
-        #print headers_list
         seq_start_list.append(new_line[6])
-        seq_start_list=list(seq_start_list)
-
         seq_end_list.append(new_line[7])
-        seq_end_list=list(seq_end_list)
-        #print seq_start_list
+    return [headers_list, seq_start_list, seq_end_list]
 
 
-        param_list = list([headers_list, seq_start_list, seq_end_list])
-        #print param_list
-    return param_list
+def get_hits(blastn_out6):
+    """Parse blastn_out6 to get a dictionary of hits.
 
+    :param blastn_out6: BLASTn tabular output format 6 (an open file or a list of lines)
+    :return: OrderedDict, sseqid -> list of (start, end), 1-based, inclusive
+    """
+    hits = OrderedDict()
+    for line in blastn_out6:
+        if not line.strip() or line.startswith('#'):
+            continue
+        new_line = line.split('\t')
+        hits.setdefault(new_line[1].strip(), []).append((int(new_line[6]), int(new_line[7])))
+    return hits
 
-0
-def get_records(sequences_file, headers,seq_start, seq_end):
+
+def get_records(sequences_file, headers, seq_start, seq_end):
     """Get a list of records from fasta sequence file according to list headers and range of sequence
 
     :param sequences_file: Biopython object file with sequences - SeqIO
@@ -61,20 +74,112 @@ def get_records(sequences_file, headers,seq_start, seq_end):
     :param seq_end: An ending position of matched sequence
     :return: List of Biopython objects - SeqRecord
     """
-    rec_list = []  #list of records
+    hits = OrderedDict()
+    for header, i, j in zip(headers, seq_start, seq_end):
+        hits.setdefault(header.strip(), []).append((int(i), int(j)))
+    return list(iter_records(sequences_file, hits))
+
+
+def _get_record(seqid, description, seq, start, end):
+    """Make a new SeqRecord for a range of seq (1-based, inclusive)."""
+    name = '%s/%i-%i' % (seqid, start, end)
+    return SeqRecord(seq, id=name, name=name, description=description)
+
+
+def iter_records(sequences_file, hits):
+    """Go over the database once and yield records of all hits.
+
+    :param sequences_file: Biopython object file with sequences - SeqIO
+    :param hits: dictionary, sseqid -> list of (start, end), see get_hits()
+    :return: a generator of SeqRecord, one per hit, in the order of the database
+    """
     for record in sequences_file:
-        seqid = record.id
-        for header,i,j in zip(headers, seq_start, seq_end):
-            i = int(i) - 1 # start -1 because python is counting from 0 :)
-            j = int(j) - 1 # end
-                # print i,j
-                # print record.seq
-                # record.seq = record.seq[i:j]
-            if header.strip() == seqid: #check if IDs are the same
-                record.seq=record.seq[i:j] # check a range
-                rec_list.append(record)
+        for i, j in hits.get(record.id, []):
+            yield _get_record(record.id, record.description, record.seq[i - 1:j], i, j)
+
 
-    return rec_list
+class FastaIndex(object):
+    """Index of a fasta file for random access to sequences.
+
+    The index is kept in ``<fasta>.fai`` in the format of samtools faidx
+    (name, length, offset, bases per line, bytes per line), so an index
+    made by samtools can be used as well. Lines of a sequence have to be of the same length.
+    """
+    def __init__(self, fn):
+        self.fn = fn
+        self.index_fn = fn + '.fai'
+        if not os.path.exists(self.index_fn) or os.path.getmtime(self.index_fn) < os.path.getmtime(fn):
+            self.build()
+        self.index = {}
+        with open(self.index_fn) as f:
+            for l in f:
+                name, length, offset, linebases, linewidth = l.split('\t')[:5]
+                self.index[name] = (int(length), int(offset), int(linebases), int(linewidth))
+
+    def build(self):
+        """Build the index, one pass over the fasta file."""
+        entries = []
+        with open(self.fn, 'rb') as f:
+            offset = 0
+            entry = None
+            for l in f:
+                if l.startswith(b'>'):
+                    if entry:
+                        entries.append(entry)
+                    name = l[1:].split()[0].decode() if l[1:].strip() else ''
+                    entry = [name, 0, offset + len(l), 0, 0]
+                elif entry is not None:
+                    bases = len(l.rstrip(b'\r\n'))
+                    if not entry[3]:
+                        entry[3] = bases
+                        entry[4] = len(l)
+                    entry[1] += bases
+                offset += len(l)
+            if entry:
+                entries.append(entry)
+        tmp = self.index_fn + '.tmp'
+        with open(tmp, 'w') as f:
+            for e in entries:
+                f.write('\t'.join([str(x) for x in e]) + '\n')
+        os.rename(tmp, self.index_fn)
+
+    def fetch(self, name, start, end, handle=None):
+        """Get a fragment of a sequence.
+
+        :param name: id of a sequence
+        :param start: 1-based
+        :param end: 1-based, inclusive
+        :param handle: an open (binary) handle to the fasta file, to re-use it for many queries
+        :return: str, the fragment
+        """
+        length, offset, linebases, linewidth = self.index[name]
+        start = max(start - 1, 0)
+        end = min(end, length)
+        if end <= start:
+            return ''
+        byte_start = offset + (start // linebases) * linewidth + start % linebases
+        byte_end = offset + ((end - 1) // linebases) * linewidth + (end - 1) % linebases + 1
+        if handle is None:
+            with open(self.fn, 'rb') as f:
+                f.seek(byte_start)
+                txt = f.read(byte_end - byte_start)
+        else:
+            handle.seek(byte_start)
+            txt = handle.read(byte_end - byte_start)
+        return txt.replace(b'\n', b'').replace(b'\r', b'').decode()
+
+    def iter_records(self, hits):
+        """Yield records of all hits, in the order of hits, only these sequences are read.
+
+        :param hits: dictionary, sseqid -> list of (start, end), see get_hits()
+        """
+        with open(self.fn, 'rb') as f:
+            for seqid, ranges in hits.items():
+                if seqid not in self.index:
+                    logger.info('%s not found in the database' % seqid)
+                    continue
+                for i, j in ranges:
+                    yield _get_record(seqid, seqid, Seq(self.fetch(seqid, i, j, f)), i, j)
 
 
 def get_parser():
@@ -86,6 +191,8 @@ def get_parser():
     parser.add_argument("blastn_out6", help="blastn_out6")
 
     parser.add_argument("--outfn", help="output aln file (default: seqfn .fasta -> _out.fasta)")
+    parser.add_argument("--index", help="use (build if needed) an index of the database <Seqfn>.fai",
+                        action="store_true")
     return parser
 
 
@@ -100,28 +207,17 @@ if __name__ == '__main__':
     if not args.outfn:
         args.outfn = args.Seqfn.replace('.fasta', '_out.fasta')
 
-    print "If your  database of sequence is big, patience you must have, my dear user :) "
+    with open(args.blastn_out6) as blastn_out6:
+        hits = get_hits(blastn_out6)
 
-    Seqfn=args.Seqfn
-    blastn_out6 = open(args.blastn_out6)
-    sequences_file = SeqIO.parse(Seqfn, 'fasta') #load sequences file
-
-    list_of_param = get_headers(blastn_out6)
-    #print list_of_param[1]
-    headers = list_of_param[0]
-    #print headers
-
-    seq_start = list_of_param[1]
-    #print seq_start
-    seq_end = list_of_param[2]
-
-
-    sequences = get_records(sequences_file,headers, seq_start,seq_end) #
-    if sequences == []:
-        print "Warning: No sequences found!"
+    if args.index:
+        sequences = FastaIndex(args.Seqfn).iter_records(hits)
     else:
-        #print sequences
-        SeqIO.write(sequences, args.outfn, "fasta")
-        print 'DONE \nSaved to:', args.outfn
-
+        sequences = iter_records(SeqIO.parse(args.Seqfn, 'fasta'), hits)
 
+    with open(args.outfn, 'w') as f:
+        n = SeqIO.write(sequences, f, "fasta")
+    if not n:
+        print("Warning: No sequences found!")
+    else:
+        print('DONE \nSaved %i sequences to: %s' % (n, args.outfn))
@@ -0,0 +1,34 @@
+#!/usr/bin/env python
+import os
+import shutil
+import sys
+import tempfile
+
+from Bio import SeqIO
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+sys.path.append(DIRNAME)
+from select_seq_fromBLAStn_6outfm import get_hits, iter_records, FastaIndex
+
+HITS = ['Query_1\tseq2\t79.51\t122\t16\t8\t2\t9\t7\t5\t6e-11\t78.7',
+        'Query_1\tseq1\t79.51\t122\t16\t8\t1\t5\t7\t5\t6e-11\t78.7',
+        'Query_1\tseq2\t79.51\t122\t16\t8\t7\t14\t7\t5\t6e-11\t78.7']
+
+
+def test_all_ranges_streaming_and_index():
+    db = os.path.join(tempfile.mkdtemp(), 'db.fasta')
+    with open(db, 'w') as f:
+        f.write('>seq1 first\nAAGAG\nGGAGA\nGA\n>seq2\nGGCCU\nUGCAG\nCCAG\n>seq3\nUUUU\n')
+    hits = get_hits(HITS)
+    assert hits['seq2'] == [(2, 9), (7, 14)]
+    records = list(iter_records(SeqIO.parse(db, 'fasta'), hits))
+    assert [(r.id, str(r.seq)) for r in records] == [('seq1/1-5', 'AAGAG'),
+                                                     ('seq2/2-9', 'GCCUUGCA'),
+                                                     ('seq2/7-14', 'GCAGCCAG')]
+    index = FastaIndex(db)
+    assert os.path.exists(db + '.fai')
+    records2 = list(index.iter_records(hits))
+    assert sorted([(r.id, str(r.seq)) for r in records2]) == sorted([(r.id, str(r.seq)) for r in records])
+    # the index is re-used
+    assert FastaIndex(db).index == index.index
+    shutil.rmtree(os.path.dirname(db))
@@ -35,12 +35,19 @@ For multiple structures in the folder, run the script like this::
     CCGGAGGAACUACUG&CCGGCAGCCU&CCGGAGGAACUACUG&CCGGCAGCCU&CCGGAGGAACUACUG&CCGGCAGCCU&CCGGAGGAACUACUG&CCGGCAGCCU
     [[[[(((.....(((&{{{{))))))&(((((((.....(.(&]]]]).))))&[[[[[[......[[[&))))]]].]]&}}}}(((.....(((&]]]]))))))
 
+Each run of x3dna-dssr is done in its own temporary directory, so many structures can be
+processed in parallel (``-t``, ``--threads``). Use ``--cache <dir>`` to keep the secondary
+structures, a file is processed again only if its content has changed.
 """
 import re
 import argparse
+import hashlib
+import shutil
+import tempfile
+from multiprocessing.pool import ThreadPool
 
 from subprocess import Popen, PIPE
-from os import remove, path, readlink
+from os import path, readlink
 
 PATH = path.abspath(__file__)
 if path.islink(PATH):
@@ -48,7 +55,10 @@ if path.islink(PATH):
 else:
     PATH = path.dirname(path.abspath(__file__))
 
-from rna_x3dna_config import BINARY_PATH
+try:
+    from rna_tools.tools.rna_x3dna.rna_x3dna_config import BINARY_PATH
+except ImportError:
+    from rna_x3dna_config import BINARY_PATH
 
 
 class x3DNAMissingFile(Exception):
@@ -59,6 +69,9 @@ def get_parser():
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('-c', '--compact',  action='store_true')
+    parser.add_argument('-t', '--threads', help='number of x3dna-dssr runs at the same time',
+                        type=int, default=1)
+    parser.add_argument('--cache', help='a folder to keep results, re-used for files of the same content')
     parser.add_argument('files', help='file', nargs='+')
     return parser
 
@@ -70,14 +83,36 @@ class x3DNA(object):
 
      **curr_fn**
      **report**
+     **secstruc**
 
+    Args:
+        pdbfn (str): path to a PDB file
+        binary_path (str): path to x3dna-dssr, by default BINARY_PATH from the config
+        cache (ResultCache): if given, results are taken from the cache (key: the content
+                             of the file), and new results are saved there, see `rna_tools.Seq.ResultCache`
     """
 
-    def __init__(self, pdbfn):
+    def __init__(self, pdbfn, binary_path=None, cache=None):
         """Set self.curr_fn based on pdbfn"""
         self.curr_fn = pdbfn
-        self.run_x3dna()
-        self.clean_up()
+        self.binary_path = path.expanduser(binary_path or BINARY_PATH)
+        self.workdir = None
+        self.secstruc = None
+
+        key = None
+        if cache is not None:
+            with open(pdbfn, 'rb') as f:
+                key = cache.key('x3dna-dssr', hashlib.sha1(f.read()).hexdigest(), '', [self.binary_path])
+            result = cache.get(key)
+            if result is not None:
+                self.report, self.secstruc = result
+                return
+        try:
+            self.run_x3dna()
+        finally:
+            self.clean_up()
+        if cache is not None:
+            cache.put(key, [self.report, self.secstruc])
 
     def __get_report(self):
         """Off right now. Run find_pair
@@ -101,10 +136,12 @@ class x3DNA(object):
     def get_modifications(self):
         """Run find_pair to find modifications.
         """
-        cmd = BINARY_PATH_FP + ' -p ' + self.curr_fn + ' /tmp/fpout'  # hack
-        out = Popen([cmd], stderr=PIPE, stdout=PIPE, shell=True)
+        workdir = tempfile.mkdtemp(prefix='x3dna_')
+        cmd = BINARY_PATH_FP + ' -p ' + path.abspath(self.curr_fn) + ' ' + path.join(workdir, 'fpout')
+        out = Popen([cmd], stderr=PIPE, stdout=PIPE, shell=True, cwd=workdir)
 
-        outerr = out.stderr.read()
+        outerr = out.communicate()[1].decode()
+        shutil.rmtree(workdir, ignore_errors=True)
 
         text = ''
         for l in outerr.split('\n'):
@@ -113,20 +150,28 @@ class x3DNA(object):
         return text.strip()
 
     def run_x3dna(self):
+        """Run x3dna-dssr in a new temporary folder (self.workdir).
+
+        All files of x3dna-dssr (py3dna.log, dssr-*) are kept in this folder,
+        and removed with clean_up(). The secondary structure is saved in self.secstruc.
         """
-        """
-        cmd = BINARY_PATH + ' -i=' + self.curr_fn
-        out = Popen([cmd], stderr=PIPE, stdout=PIPE, shell=True)
+        self.workdir = tempfile.mkdtemp(prefix='x3dna_')
+        cmd = [self.binary_path, '-i=' + path.abspath(self.curr_fn)]
+        try:
+            out = Popen(cmd, stderr=PIPE, stdout=PIPE, cwd=self.workdir)
+        except OSError:
+            raise Exception('x3dna not found!')
 
-        stdout = str(out.stdout.read())
-        outerr = str(out.stderr.read())
+        stdout, outerr = out.communicate()
+        stdout = stdout.decode()
+        outerr = outerr.decode()
 
-        f = open('py3dna.log', 'w')
-        f.write(cmd + '\n' + stdout)
+        f = open(path.join(self.workdir, 'py3dna.log'), 'w')
+        f.write(' '.join(cmd) + '\n' + stdout)
         f.close()
 
         if outerr.find('does not exist!') > -1:  # not very pretty
-            raise Py3DNAMissingFile
+            raise x3DNAMissingFile
         if outerr.find('not found') > -1:  # not very pretty
             raise Exception('x3dna not found!')
 
@@ -141,6 +186,11 @@ class x3DNA(object):
         if no_of_DNARNA_chains:
             self.report = stdout.strip()
 
+        dbn = path.join(self.workdir, 'dssr-2ndstrs.dbn')
+        if path.exists(dbn):
+            with open(dbn) as f:
+                self.secstruc = f.read().strip()
+
     def get_ion_water_report(self):
         """@todo
 File name: /tmp/tmp0pdNHS
@@ -152,25 +202,12 @@ File name: /tmp/tmp0pdNHS
         pass
 
     def clean_up(self, verbose=False):
-        files_to_remove = [
-            'dssr-helices.pdb',
-            'dssr-pairs.pdb',
-            'dssr-torsions.dat',
-            'dssr-hairpins.pdb',
-            'dssr-multiplets.pdb',
-            'dssr-stems.pdb',
-            'dssr-Aminors.pdb',
-            'hel_regions.pdb',
-            'bp_order.dat',
-            'bestpairs.pdb',
-        ]
-
-        for f in files_to_remove:
-            try:
-                remove(f)
-            except OSError:
-                if verbose:
-                    print('can not remove %s' % f)
+        """Remove the temporary folder of the run with all files of x3dna-dssr."""
+        if self.workdir:
+            shutil.rmtree(self.workdir, ignore_errors=True)
+            if verbose:
+                print('removed %s' % self.workdir)
+            self.workdir = None
 
     def get_seq(self):
         """Get sequence.
@@ -183,7 +220,37 @@ File name: /tmp/tmp0pdNHS
     def get_secstruc(self):
         """Get secondary structure.
         """
-        return open('dssr-2ndstrs.dbn').read().strip()  # self.report.split('\n')[-1]
+        if self.secstruc is None:
+            raise x3DNAMissingFile('dssr-2ndstrs.dbn was not created for %s' % self.curr_fn)
+        return self.secstruc
+
+
+def get_secstrucs(files, threads=1, cache=None, binary_path=None):
+    """Get secondary structures for many files, with at most `threads` runs of
+    x3dna-dssr at the same time.
+
+    Args:
+        files (list): paths to PDB files
+        threads (int): number of workers
+        cache (ResultCache): see x3DNA
+        binary_path (str): see x3DNA
+
+    Returns:
+        a generator of (file, secondary structure), in the order of files
+    """
+    def get_ss(f):
+        return f, x3DNA(f, binary_path, cache).get_secstruc()
+
+    if threads < 2:
+        for f in files:
+            yield get_ss(f)
+        return
+    pool = ThreadPool(threads)
+    try:
+        for r in pool.imap(get_ss, files):
+            yield r
+    finally:
+        pool.close()
 
 
 # name
@@ -204,17 +271,14 @@ if __name__ == '__main__':
     # except IndexError:
     #    compact = False
 
-    for f in args.files:
+    cache = None
+    if args.cache:
+        from rna_tools.Seq import ResultCache
+        cache = ResultCache(args.cache)
+
+    for f, s in get_secstrucs(args.files, args.threads, cache):
         if args.compact:
-            p = x3DNA(f)
-            print((f, p.get_secstruc()))
+            print((f, s))
         else:
             print(f)
-
-            p = x3DNA(f)
-
-            #s = p.get_seq()
-            # print s
-
-            s = p.get_secstruc()
             print(s)
@@ -1,5 +1,8 @@
 BINARY_PATH = ""
 try:
-    from rna_x3dna_config_local import BINARY_PATH
+    from rna_tools.tools.rna_x3dna.rna_x3dna_config_local import BINARY_PATH
 except ImportError:
-    pass
+    try:
+        from rna_x3dna_config_local import BINARY_PATH
+    except ImportError:
+        pass
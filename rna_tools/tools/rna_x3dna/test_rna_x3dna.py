@@ -0,0 +1,66 @@
+#!/usr/bin/env python
+"""Test of the x3DNA runner with a fake x3dna-dssr.
+
+The fake binary writes dssr-2ndstrs.dbn into the current folder (like the
+real program) and saves each call to a log file.
+"""
+import os
+import stat
+
+from rna_tools.Seq import ResultCache
+from rna_tools.tools.rna_x3dna.rna_x3dna import x3DNA, get_secstrucs
+
+DIRNAME = os.path.dirname(os.path.abspath(__file__))
+
+FAKE_DSSR = '''#!/usr/bin/env python
+import os
+import sys
+import time
+fn = sys.argv[1].replace('-i=', '')
+with open(os.environ['FAKE_DSSR_LOG'], 'a') as f:
+    f.write(fn + '\\n')
+time.sleep(0.1)
+name = os.path.basename(fn).replace('.pdb', '')
+with open('dssr-2ndstrs.dbn', 'w') as f:
+    f.write('>%s nts=4 [%s] -- secondary structure derived by DSSR\\nGGCC\\n(())\\n' % (name, name))
+with open('dssr-pairs.pdb', 'w') as f:
+    f.write('')
+print('List of 1 type of 1 nucleotide')
+print('  no. of DNA/RNA chains: 1 [A=4]')
+'''
+
+
+def setup_fake_dssr(tmpdir, monkeypatch):
+    fn = str(tmpdir.join('x3dna-dssr'))
+    with open(fn, 'w') as f:
+        f.write(FAKE_DSSR)
+    os.chmod(fn, os.stat(fn).st_mode | stat.S_IEXEC)
+    # restored by monkeypatch after the test
+    monkeypatch.setenv('FAKE_DSSR_LOG', str(tmpdir.join('log')))
+    return fn, os.environ['FAKE_DSSR_LOG']
+
+
+def test_x3dna_workdir(tmpdir, monkeypatch):
+    binary, log = setup_fake_dssr(tmpdir, monkeypatch)
+    cwd_files = set(os.listdir('.'))
+    p = x3DNA(os.path.join(DIRNAME, 'test_data', '1xjr.pdb'), binary)
+    assert p.get_secstruc().endswith('GGCC\n(())')
+    assert p.workdir is None
+    # nothing is left in the current folder
+    assert set(os.listdir('.')) == cwd_files
+
+
+def test_get_secstrucs_cache(tmpdir, monkeypatch):
+    binary, log = setup_fake_dssr(tmpdir, monkeypatch)
+    files = [os.path.join(DIRNAME, 'test_data', f) for f in ['1xjr.pdb', '6TNA.pdb', 'rp2_bujnicki_1_rpr.pdb']]
+    cache = ResultCache(str(tmpdir.join('cache')))
+    results = list(get_secstrucs(files, threads=3, cache=cache, binary_path=binary))
+    assert [r[0] for r in results] == files
+    assert results[1][1].startswith('>6TNA')
+    with open(log) as f:
+        assert len(f.readlines()) == 3
+    # the second time all results are in the cache
+    results2 = list(get_secstrucs(files, threads=3, cache=ResultCache(cache.path), binary_path=binary))
+    assert results2 == results
+    with open(log) as f:
+        assert len(f.readlines()) == 3
@@ -1,14 +1,21 @@
 #!/usr/bin/env python3
 # -*- coding: utf-8 -*-
-"""SimRNA cluster - a simple wrapper around clustering of SimRNA.
+"""SimRNA cluster - clustering of SimRNA trajectories.
 
-By default: cluster 1% and give 5 clusters
+By default: cluster 1% (of the lowest energy frames) and give 5 clusters, with the cut-off
+0.1 * length of the sequence (as SimRNA ``clustering``). Clustering is done in-process (see
+rna_tools/tools/rna_cluster/rna_cluster.py, greedy), clusters are saved as
+``<trafl>_clust01.trafl``, ``<trafl>_clust02.trafl``... (the centre first).
 
-.. warning :: clustering has to be visiable in your shell by the script!"""
+Use ``--external`` to run SimRNA ``clustering`` instead.
+
+.. warning :: for --external clustering has to be visiable in your shell by the script!"""
 
 from __future__ import print_function
 from rna_tools.tools.simrna_trajectory.simrna_trajectory import SimRNATrajectory
+from rna_tools.tools.rna_cluster.rna_cluster import get_rmsd_matrix, cluster
 import argparse
+import math
 import os
 
 
@@ -16,25 +23,55 @@ def get_parser():
     parser = argparse.ArgumentParser(
         description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
     parser.add_argument('trafl', help="SimRNA trafl file")
+    parser.add_argument('--fraction', type=float, default=0.01,
+                        help="fraction of the lowest energy frames to cluster, default 0.01")
+    parser.add_argument('--cutoff', type=float,
+                        help="RMSD cut-off, by default 0.1 * length of the sequence")
+    parser.add_argument('--limit-clusters', type=int, default=5, help="# of clusters")
+    parser.add_argument('--external', action='store_true', help="run SimRNA clustering")
     return parser
 
 
+def cluster_trajectory(t, fraction=0.01, cutoff=None, limit_clusters=5):
+    """Cluster the lowest energy frames of a trajectory.
+
+    Args:
+        t (SimRNATrajectory): a trajectory
+        fraction (float): fraction of the lowest energy frames to cluster
+        cutoff (float): RMSD cut-off, by default 0.1 * length of the sequence
+
+    Returns:
+        list of lists of frames (the centre first)
+    """
+    frames = t.sort(inplace=False)[:max(1, int(math.ceil(len(t) * fraction)))]
+    if cutoff is None:
+        cutoff = 0.1 * len(frames[0])
+    coords = [f.get_coords().reshape(-1, 3) for f in frames]
+    matrix = get_rmsd_matrix(coords)
+    return [[frames[i] for i in c] for c in cluster(matrix, cutoff, 'greedy', limit_clusters)]
+
+
 if __name__ == '__main__':
     parser = get_parser()
     args = parser.parse_args()
 
     fn = args.trafl
-    # 12.5
-    # How to get the length?
-    t = SimRNATrajectory()
-    t.load_from_file(fn, only_first_frame=True)
-
-    # print len(t) # get length of trajectory (# of frames)
-    print('len of the first frame:', len(t[0]))  # get length of 1 frames (# of residues)
-
-    # fraction of lowest energy frames to clustering: 0.01
-    # rmsd thrs for clustering 0.1*seq_lenght which is: 12.5
-    cutoff = 0.1 * len(t[0])
-    cmd = "clustering " + fn + " 0.01 " + str(cutoff) + " | tee clustering.log"
-    print(cmd)
-    os.system(cmd)
+    if args.external:
+        t = SimRNATrajectory()
+        t.load_from_file(fn, only_first_frame=True)
+        print('len of the first frame:', len(t[0]))  # get length of 1 frames (# of residues)
+        # fraction of lowest energy frames to clustering: 0.01
+        # rmsd thrs for clustering 0.1*seq_lenght which is: 12.5
+        cutoff = args.cutoff or 0.1 * len(t[0])
+        cmd = "clustering " + fn + " " + str(args.fraction) + " " + str(cutoff) + " | tee clustering.log"
+        print(cmd)
+        os.system(cmd)
+    else:
+        t = SimRNATrajectory()
+        t.load_from_file(fn, top_level=True)
+        clusters = cluster_trajectory(t, args.fraction, args.cutoff, args.limit_clusters)
+        for i, frames in enumerate(clusters, 1):
+            c = SimRNATrajectory()
+            c.load_from_list(frames)
+            c.save(fn.replace('.trafl', '') + '_clust%02i.trafl' % i, verbose=False)
+            print('cluster %i size: %i centre: %s' % (i, len(frames), frames[0]))
@@ -3,13 +3,99 @@
 """SimRNATrajectory module.
 
 SimRNATrajectory / Frame / Residue / Atom
+
+Coordinates of a frame can be also used as one array of shape (n_res, 5, 3),
+see Frame.get_coords(); and all frames of a trajectory (or a block of frames
+read from a file, see iter_blocks()) as an array of shape (n_frames, n_res, 5, 3).
+Distances between residues are computed for all pairs at once on these arrays::
+
+    >>> s = SimRNATrajectory()
+    >>> s.load_from_file('test_data/mini.trafl')
+    >>> f = s.frames[0]
+    >>> f.get_coords().shape
+    (62, 5, 3)
+    >>> print(round(f.get_dist_matrix()[0, 1], 3) == round(f.residues[0] - f.residues[1], 3))
+    True
+    >>> f.get_distances([(1, 2), (1, 62)]).round(2)
+    array([ 6.04, 14.39])
 """
 
 from __future__ import print_function
-from collections import deque
 import numpy as np
 import gc
 
+# order of the coarse-grained atoms of a residue
+ATOM_NAMES = ['p', 'c4p', 'n1n9', 'b1', 'b2']
+
+
+def get_centers(coords):
+    """Get centers of residues ``(n1n9 + b2) / 2``, see Residue.get_center().
+
+    Args:
+        coords (np.array): coordinates of shape (..., n_res, 5, 3),
+                           one frame or a block of frames
+
+    Returns:
+        np.array of shape (..., n_res, 3)
+    """
+    return (coords[..., 2, :] + coords[..., 4, :]) / 2
+
+
+def get_dist_matrix(points):
+    """Get all-pairs distances.
+
+    Args:
+        points (np.array): shape (..., n, 3), e.g. centers of one frame or a block of frames
+
+    Returns:
+        np.array of shape (..., n, n)
+    """
+    diff = points[..., :, np.newaxis, :] - points[..., np.newaxis, :, :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def get_distances(points, pairs):
+    """Get distances for selected pairs only.
+
+    Args:
+        points (np.array): shape (..., n, 3)
+        pairs (list): (i, j), residues are numbered from 1 (as Residue.id)
+
+    Returns:
+        np.array of shape (..., n_pairs)
+    """
+    pairs = np.asarray(pairs, dtype=int).reshape(-1, 2) - 1
+    diff = points[..., pairs[:, 0], :] - points[..., pairs[:, 1], :]
+    return np.sqrt((diff ** 2).sum(axis=-1))
+
+
+def iter_blocks(fn, block_size=1000):
+    """Read a trajectory from a file in blocks of frames, without making Frame objects.
+
+    Args:
+        fn (str): trafl file
+        block_size (int): number of frames in one block
+
+    Yields:
+        (headers, coords): np.array of shape (n, 5) and np.array of shape (n, n_res, 5, 3),
+        where n <= block_size
+    """
+    headers = []
+    coords = []
+    with open(fn) as f:
+        for h in f:
+            l = next(f, '')
+            if not h.strip() or not l.strip():
+                continue
+            headers.append(h.split())
+            coords.append(l.split())
+            if len(headers) == block_size:
+                yield np.array(headers, dtype=float), np.array(coords, dtype=float).reshape(len(coords), -1, 5, 3)
+                headers = []
+                coords = []
+    if headers:
+        yield np.array(headers, dtype=float), np.array(coords, dtype=float).reshape(len(coords), -1, 5, 3)
+
 
 class SimRNATrajectory:
     """SimRNATrajectory"""
@@ -111,6 +197,25 @@ class SimRNATrajectory:
         plt.savefig(plotfn, figsize=(30, 10))  # bbox_inches='tight',
         plt.close()
 
+    def get_coords(self):
+        """Get coordinates of all frames as an array of shape (n_frames, n_res, 5, 3)."""
+        return np.array([f.get_coords() for f in self.frames])
+
+    def get_centers(self):
+        """Get centers of residues of all frames, an array of shape (n_frames, n_res, 3)."""
+        return get_centers(self.get_coords())
+
+    def get_distances(self, pairs):
+        """Get distances between centers of selected pairs of residues for all frames.
+
+        Args:
+            pairs (list): (i, j), residues are numbered from 1
+
+        Returns:
+            np.array of shape (n_frames, n_pairs)
+        """
+        return get_distances(self.get_centers(), pairs)
+
     def __len__(self):
         """Get number of frames"""
         return len(self.frames)
@@ -146,28 +251,62 @@ class Frame:
         self.energy = float(l[3])
 
         self.coords = coords
-        coords = deque(coords.split())
-        if top_level:
-            self.residues = []
-        else:
-            self.residues = []
-            c = 1
-            while coords:
-                p = Atom('p', coords.popleft(), coords.popleft(), coords.popleft())
-                c4p = Atom('c4p', coords.popleft(), coords.popleft(), coords.popleft())
-                n1n9 = Atom('n1n9', coords.popleft(), coords.popleft(), coords.popleft())
-                b1 = Atom('b1', coords.popleft(), coords.popleft(), coords.popleft())
-                b2 = Atom('b2', coords.popleft(), coords.popleft(), coords.popleft())
-                r = Residue(c, p, c4p, n1n9, b1, b2)
+        self._xyz = None
+        self.residues = []
+        if not top_level:
+            for c, res in enumerate(self.get_coords(), 1):
+                r = Residue(c, *[Atom(name, *xyz) for name, xyz in zip(ATOM_NAMES, res)])
                 self.residues.append(r)
-                c += 1
+
+    def get_coords(self):
+        """Get coordinates as an array of shape (n_res, 5, 3), atoms are in the order of ATOM_NAMES.
+
+        The array is made from the text of coordinates the first time it's needed."""
+        if self._xyz is None:
+            self._xyz = np.array(self.coords.split(), dtype=float).reshape(-1, 5, 3)
+        return self._xyz
+
+    def get_centers(self):
+        """Get centers of residues ``(n1n9 + b2) / 2``, an array of shape (n_res, 3)."""
+        return get_centers(self.get_coords())
+
+    def get_dist_matrix(self, atom=None):
+        """Get distances between all pairs of residues.
+
+        Args:
+            atom (str): by default distances between centers of residues,
+                        or between given atoms (one of ATOM_NAMES), e.g. 'p'
+
+        Returns:
+            np.array of shape (n_res, n_res)
+        """
+        if atom:
+            points = self.get_coords()[:, ATOM_NAMES.index(atom)]
+        else:
+            points = self.get_centers()
+        return get_dist_matrix(points)
+
+    def get_contact_map(self, cutoff=7.5, atom=None):
+        """Get a contact map (bool array (n_res, n_res)), residues closer than cutoff, see get_dist_matrix()."""
+        return self.get_dist_matrix(atom) < cutoff
+
+    def get_distances(self, pairs):
+        """Get distances between centers of selected pairs of residues.
+
+        Args:
+            pairs (list): (i, j), residues are numbered from 1 (as Residue.id)
+
+        Returns:
+            np.array of shape (n_pairs,)
+        """
+        return get_distances(self.get_centers(), pairs)
 
     def __repr__(self):
         return 'Frame #' + str(self.id) + ' e:' + str(round(self.energy, 2))
 
     def __len__(self):
         """Get a number of residues"""
-        return len(self.residues)
+        return len(self.get_coords())
 
 
 class Residue:
@@ -1,4 +1,6 @@
-from simrna_trajectory import SimRNATrajectory
+import numpy as np
+
+from simrna_trajectory import SimRNATrajectory, iter_blocks
 
 
 def test():
@@ -7,5 +9,20 @@ def test():
     s.plot_energy('plot.png')
     print('OK')
 
+def test_vectorized_distances():
+    s = SimRNATrajectory()
+    s.load_from_file('test_data/mini.trafl')
+    f = s.frames[-1]
+    d = f.get_dist_matrix()
+    for i, j in [(0, 1), (3, 40), (61, 2)]:
+        assert np.isclose(d[i, j], f.residues[i] - f.residues[j])
+    assert np.isclose(f.get_dist_matrix('p')[3, 7], f.residues[3].p - f.residues[7].p)
+    assert f.get_contact_map(7.5).sum() == (d < 7.5).sum()
+    # frames read in blocks give the same coordinates/distances as frames
+    coords = np.concatenate([c for h, c in iter_blocks('test_data/mini.trafl', block_size=5)])
+    assert np.allclose(coords, s.get_coords())
+    assert np.allclose(s.get_distances([(1, 2), (4, 41)])[-1], [d[0, 1], d[3, 40]])
+
+
 if __name__=="__main__":
     test()